@@ -4,6 +4,7 @@ import os
 ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 SCREENSHOT_DIRECTORY = f"{ROOT_DIRECTORY}/tests/screenshots"
 MOCK_LOCATIONS_FILE = f"{ROOT_DIRECTORY}/tests/data/mock_locations.json"
+FORM_SNAPSHOT_DIRECTORY = f"{ROOT_DIRECTORY}/data/form_snapshots"
 
 # Development environment
 PROD_ENV = os.getenv('PROD_ENV')
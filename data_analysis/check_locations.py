@@ -6,26 +6,21 @@ of calling the geocoder on entire FracTracker Dataset
 '''
 
 from utilities.fractracker_api import FracAPI
-import pandas as pd
 
 # Set start date before all reports
 START_DATE = "01-01-2000"
-api_results = FracAPI(START_DATE)
+api_results = FracAPI(START_DATE, check_emails=False, bulk=True)
 
-df = pd.DataFrame()
-report_vars = {}
+# Remove some more complicated variables from table for simplicity
+exclude_vars = ['senses', 'image_url', 'report_type']
+df = api_results.table.to_dataframe().drop(columns=exclude_vars)
 
-# Remove some more complicated variables from object for simplicity
-exclude_vars = ['location', 'email_is_valid', 'senses', 'image_url']
-
-for r in api_results.reports:
-    report_vars = {k:v for k,v in vars(r).items() if k not in exclude_vars}
-    report_vars['location.is_valid'] = r.location.is_valid
-    report_vars['location.zip'] = r.location.zip
-    report_vars['location.county'] = r.location.county
-    report_vars['location.state'] = r.location.state
-    new_df = pd.DataFrame(report_vars)
-    df = df.append(new_df)
+# Geocode each report and add location columns in one step
+locations = [r.location for r in api_results.reports]
+df['location.is_valid'] = [loc.is_valid for loc in locations]
+df['location.zip'] = [loc.zip for loc in locations]
+df['location.county'] = [loc.county for loc in locations]
+df['location.state'] = [loc.state for loc in locations]
 
 # Save as csv to look at more easily
 df.to_csv("data/all_api_report_locations.csv", index=False)
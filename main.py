@@ -10,27 +10,54 @@ and submitting the data through a web form or email.
 import datetime
 import json
 import os
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from constants import MOCK_LOCATIONS_FILE, PROD, PROD_ENV, TEST
 from flask import Flask, request
+from models.agency_health import DeferredSubmissions, resubmit_deferred
+from models.backfill import BackfillCheckpoints, run_backfill
 from models.base_report import Report
+from models.email_template import discard_rendered
+from models.merged_report import MergedReport, merge_nearby_reports, merged_metadata
 from models.mock_report import MockReport
-from models.submission import Submission
+from models.metadata import Metadata
+from models.retry_queue import RetryQueue
+from models.shard import Shard
+from models.submission import Submission, prepare_submissions, validate_submissions
+from models.validation import clear_photo_checks
+from utilities import metrics
 from utilities.config import Config
+from utilities.coordination import Lease, LeaseUnavailable, SingleFlight, held_leases
 from utilities.fractracker_api import FracAPI
 from utilities.logger import logger
-from utilities.storage import LocalDatastore, CloudDatastore
-from typing import List
+from utilities.photo_staging import bind_photo_stage, staged_photos
+from utilities.profiling import DETERMINISTIC, profiled
+from utilities.storage import IDatastore, LocalDatastore, CloudDatastore, WriteConflict
+from typing import TYPE_CHECKING, List, Tuple
+
+# pandas is imported on first use to shorten cold starts
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Initialize global variables
 app = Flask(__name__)
 config = Config()
 
-# Set datastore
+# The number of report ids requested from the API at once when retrying
+RETRY_BATCH_SIZE = 100
+
+# Set datastores for submission metadata and failed submissions
+# to retry. Cloud storage clients are created on first use.
 if PROD_ENV in (TEST, PROD):
     datastore = CloudDatastore(config.cloud_bucket_name, config.cloud_blob_name)
+    retry_datastore = CloudDatastore(config.cloud_bucket_name, config.cloud_retry_queue_blob_name)
+    backfill_datastore = CloudDatastore(config.cloud_bucket_name, config.cloud_backfill_blob_name)
 else:
     datastore = LocalDatastore(config.metadata_path)
+    retry_datastore = LocalDatastore(config.retry_queue_path)
+    backfill_datastore = LocalDatastore(config.backfill_checkpoints_path)
+
+# Concurrent identical requests share a single run
+triggers = SingleFlight()
 
 @app.route("/", methods = ['POST'])
 def submit_complaints():
@@ -38,40 +65,207 @@ def submit_complaints():
     Main execution logic for program. Orchestrates submission of
     complaint data from the FracTracker API to corresponding
     state and sub-state agencies through emails and web
-    form submissions.
+    form submissions. Requests with `"backfill": true` submit
+    the reports of a long date range window by window (see
+    `backfill_complaints`), and requests with a `shard` only
+    submit a subset of the reports (see `models.shard`).
+    Concurrent identical requests (e.g., a request retried by
+    Cloud Scheduler while still being served) are coalesced
+    into one run, whose response they all receive.
     '''
     try:
         logger.info(f'Beginning program execution. Current environment is {PROD_ENV}.')
 
         logger.info("Parsing request body for inclusive start and end date of report retieval.")
         request_body = request.get_json()
+        key = json.dumps(request_body, sort_keys=True)
+    except Exception as e:
+        msg = f"Automated complaint submission failed. {e}"
+        logger.error(msg)
+        return msg, 500
+
+    return triggers.do(key, lambda: run_submission(request_body))
+
+
+def run_submission(request_body: dict) -> Tuple[str, int]:
+    '''
+    Runs the submission requested by a request body. The run holds a
+    lease on its shard for its duration, so that no run over some of
+    the same reports can start on another instance in the meantime:
+    unsharded runs and backfills lease every report, and conflict with
+    all other runs, while shard runs only conflict with runs of
+    overlapping shards. Runs that find a conflicting lease held are
+    skipped, and runs that lose their lease stop submitting.
+    Runs are profiled if the request body's `profile` (or else the
+    config file's `profiling.mode`) names a mode, or is true for
+    `deterministic` (see `utilities.profiling`).
+
+    Parameters:
+        request_body (dict): The request body.
+
+    Returns:
+        ((str, int)): The response message and status code.
+    '''
+    try:
         start_date = request_body.get('start_date')
         end_date = request_body.get('end_date')
+        shard = Shard.from_spec(request_body.get('shard'))
+        backfill = request_body.get('backfill')
+        if backfill and shard:
+            raise Exception("Backfills cannot be sharded.")
 
-        logger.info("Retrieving reports.")
-        reports = get_mock_reports() if PROD_ENV == TEST else get_api_reports(start_date, end_date)
-        num_reports = len(reports)
+        # Requests may turn profiling on or off, as in `"profile": "sampling"`
+        mode = request_body.get('profile', config.profiling_mode)
+        profile_name = f"profile_{datetime.datetime.utcnow():%Y%m%dT%H%M%S}" + \
+            (f"_{shard.name}" if shard else '')
 
-        if not num_reports:
-            msg = "No reports found in timespan."
-            logger.info(msg)
-            return msg, 200
+        with run_lease(shard).hold(), \
+            profiled(DETERMINISTIC if mode is True else mode or None, datastore,
+                profile_name, config.profiling_interval_in_sec):
+            if backfill:
+                window = request_body.get('window', config.backfill_window)
+                return backfill_complaints(start_date, end_date, window)
+            return submit_run(start_date, end_date, shard)
 
-        logger.info(f"{len(reports)} report(s) found. Starting submission process.")
-        metadata_df = submit_reports(reports)
+    except LeaseUnavailable as e:
+        msg = f"Automated complaint submission skipped. {e}"
+        logger.warning(msg)
+        return msg, 409
 
-        logger.info(f'Submitted all state emails/web forms. Updating metadata.')
-        datastore.write_data(metadata_df)
+    except Exception as e:
+        msg = f"Automated complaint submission failed. {e}"
+        logger.error(msg)
+        return msg, 500
 
-        logger.info("Automated complaint submission complete.")
-        return "Automated complaint submission complete.", 201
+
+def submit_run(
+    start_date: str,
+    end_date: str,
+    shard: Shard=None) -> Tuple[str, int]:
+    '''
+    Submits the reports dated within a range, or those of a shard,
+    along with the submissions due for a retry.
+
+    Parameters:
+        start_date (str): The first date of the range, as "%m-%d-%Y".
+
+        end_date (str): The last date of the range, as "%m-%d-%Y".
+
+        shard (Shard): The shard, if any.
+
+    Returns:
+        ((str, int)): The response message and status code.
+    '''
+    logger.info("Retrieving reports.")
+    reports = get_mock_reports() if PROD_ENV == TEST else get_api_reports(start_date, end_date)
+    if shard:
+        logger.info(f"Selecting the reports of shard '{shard}'.")
+        reports = shard.select(reports)
+        partition, retry_partition = partition_datastores(shard)
+    num_reports = len(reports)
+
+    # Mock reports receive new ids on each run and cannot be retried.
+    # Each shard queues its own failed submissions.
+    logger.info("Loading failed submissions queued for retry.")
+    retry_queue = None if PROD_ENV == TEST else \
+        load_retry_queue(retry_partition if shard else retry_datastore)
+    num_retries = len(retry_queue.due()) if retry_queue else 0
+
+    if not num_reports and not num_retries:
+        msg = "No reports found in timespan."
+        logger.info(msg)
+        return msg, 200
+
+    logger.info(f"{num_reports} report(s) found and {num_retries} report(s) "
+        "due for retry. Starting submission process.")
+    if shard:
+        submit_shard_reports(reports, retry_queue, partition)
+    else:
+        submit_and_save(reports, retry_queue, datastore)
+    if retry_queue:
+        retry_queue.save()
+
+    logger.info("Automated complaint submission complete.")
+    return "Automated complaint submission complete.", 201
+
+
+@app.route("/merge", methods = ['POST'])
+def merge_shard_metadata():
+    '''
+    Merges the metadata partitions of the shards listed in the request
+    body (e.g., `{"shards": [{"states": ["ohio"]}, {"index": 0, "count": 2}]}`)
+    into the metadata, once the shards of a run have completed.
+    '''
+    try:
+        request_body = request.get_json()
+        shards = [Shard.from_spec(spec) for spec in request_body.get('shards', [])]
+        if not shards:
+            raise Exception("No shards given.")
+        merge_shards(shards)
+        msg = f"Merged the metadata of {len(shards)} shard(s)."
+        logger.info(msg)
+        return msg, 201
 
     except Exception as e:
-        msg = f"Automated complaint submission failed. {e}"
+        msg = f"Merging shard metadata failed. {e}"
         logger.error(msg)
         return msg, 500
 
 
+@app.route("/metrics", methods = ['GET'])
+def get_metrics():
+    '''
+    Exposes the app's counters and histograms (e.g., reports
+    fetched and submission latencies) in the Prometheus text
+    exposition format. See `utilities.metrics`.
+    '''
+    return metrics.REGISTRY.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+
+def backfill_complaints(
+    start_date: str,
+    end_date: str,
+    window: str) -> Tuple[str, int]:
+    '''
+    Submits the reports of a date range window by window, saving the
+    metadata and retry queue after each window. Windows completed by
+    an earlier backfill of the range are skipped.
+
+    Parameters:
+        start_date (str): The first date of the range, as "%m-%d-%Y".
+
+        end_date (str): The last date of the range, as "%m-%d-%Y".
+
+        window (str): The window length, either 'day' or 'week'.
+
+    Returns:
+        ((str, int)): The response message and status code.
+    '''
+    if not start_date or not end_date:
+        raise Exception("A backfill requires a start and end date.")
+
+    retry_queue = load_retry_queue()
+    checkpoints = BackfillCheckpoints(backfill_datastore).load()
+
+    def submit_window(reports: List[Report]) -> None:
+        submit_and_save(reports, retry_queue, datastore)
+        retry_queue.save()
+
+    summary = run_backfill(
+        start_date,
+        end_date,
+        window,
+        fetch=get_api_reports,
+        submit=submit_window,
+        checkpoints=checkpoints,
+        max_workers=config.backfill_max_workers)
+
+    msg = (f"Backfill complete. {summary['completed']} window(s) completed, "
+        f"{summary['skipped']} skipped and {summary['failed']} failed.")
+    logger.info(msg)
+    return msg, 500 if summary['failed'] else 201
+
+
 def get_mock_reports() -> List[Report]:
     '''
     Generates mock FracTracker reports from a JSON file.
@@ -120,34 +314,407 @@ def get_api_reports(
         api_results = FracAPI(
             begin_date=begin_date,
             end_date=end_date, 
-            check_emails=False)
+            check_emails=config.email_validation_enabled,
+            base_url=config.fractracker_base_api_url)
     except Exception as e:
         raise Exception(f"Failed to retrieve reports from API. {e}")
 
     return api_results.reports
    
 
-def submit_reports(reports: List[Report]) -> pd.DataFrame:
+def load_retry_queue(queue_datastore: IDatastore=None) -> RetryQueue:
+    '''
+    Reads the queue of failed submissions from its datastore.
+
+    Parameters:
+        queue_datastore (IDatastore): The datastore holding the
+            queue. Defaults to that of unsharded runs.
+
+    Returns:
+        (RetryQueue): The queue.
+    '''
+    return RetryQueue(
+        queue_datastore or retry_datastore,
+        max_attempts=config.retry_max_attempts,
+        base_delay_in_sec=config.retry_base_delay_in_sec,
+        max_delay_in_sec=config.retry_max_delay_in_sec).load()
+
+
+def get_retry_submissions(retry_queue: RetryQueue) -> List[Tuple[Report, List[str]]]:
+    '''
+    Retrieves the reports with submissions due for a retry. Only
+    those reports, and those merged into them, are requested from
+    the API, by id, and merged again. Reports no longer available
+    from the API are discarded from the queue.
+
+    Parameters:
+        retry_queue (RetryQueue): The queue of failed submissions.
+
+    Returns:
+        (list of (Report, list of str)): Each report along with
+            the agencies to which it should be resubmitted.
+    '''
+    due = retry_queue.due()
+    if not due:
+        return []
+
+    merged_ids = {report_id: retry_queue.merged_ids(report_id) for report_id in due}
+    ids = list(dict.fromkeys([*due, *(i for m in merged_ids.values() for i in m)]))
+    reports = []
+    try:
+        for i in range(0, len(ids), RETRY_BATCH_SIZE):
+            api_results = FracAPI(
+                ids=ids[i:i + RETRY_BATCH_SIZE],
+                check_emails=config.email_validation_enabled,
+                base_url=config.fractracker_base_api_url)
+            reports.extend(api_results.reports)
+    except Exception as e:
+        logger.error(f"Failed to retrieve reports queued for retry from API. {e}")
+        return []
+
+    reports_by_id = {r.id: r for r in reports}
+    for report_id in due:
+        if report_id not in reports_by_id:
+            logger.warning(f"Report {report_id} queued for retry not found. Discarding.")
+            retry_queue.discard(report_id)
+
+    # Resubmit merged reports along with the reports merged into them
+    submissions = []
+    for report_id, agencies in due.items():
+        if report_id not in reports_by_id:
+            continue
+        members = [reports_by_id[i] for i in merged_ids[report_id] if i in reports_by_id]
+        report = reports_by_id[report_id]
+        submissions.append((MergedReport([report, *members]) if members else report, agencies))
+    return submissions
+
+
+def submit_reports(
+    reports: List[Report],
+    retry_queue: RetryQueue=None,
+    metadata_df: 'pd.DataFrame'=None) -> 'pd.DataFrame':
     '''
     Submits a given list of reports to their respective state
-    agencies and aggregates submission metadata.
+    agencies and aggregates submission metadata. Submissions
+    due for a retry, if a queue is given, are made first, and
+    the queue is updated with the outcome of every submission.
+    New reports of the same incident are merged into one.
+    Reports failing their state's pre-flight checks are rejected
+    without being submitted. The rest are submitted concurrently,
+    while each agency's
+    health tracker limits its own concurrency and defers
+    submissions while the agency is unavailable. Deferred
+    submissions are retried at the end of the run if the
+    agency recovers in time.
 
     Parameters:
         reports (list of Report): The reports to submit.
 
+        retry_queue (RetryQueue): The queue of failed submissions.
+            Defaults to None, in which case nothing is retried.
+
+        metadata_df (pd.DataFrame): The metadata of previous
+            submissions. Defaults to that in the datastore.
+
     Returns:
         (pd.DataFrame): The returned metadata.
     '''
     # Get previous submissions
+    if metadata_df is None:
+        metadata_df = datastore.read_data()
+    submitted_ids = set(metadata_df["id"].values) if len(metadata_df.index) else set()
+
+    # Drain retries ahead of new reports, merging reports of the same incident
+    submissions = get_retry_submissions(retry_queue) if retry_queue else []
+    new_reports = merge_nearby_reports(
+        [r for r in reports if r.id not in submitted_ids],
+        config.deduplication_distance_in_m,
+        config.deduplication_window_in_min)
+    submissions += [(r, None) for r in new_reports]
+
+    # Reject reports that would fail, then render emails
+    # and similar per-state work in one batch
+    reports_to_submit = [report for report, _ in submissions]
+    rejections = validate_submissions(reports_to_submit)
+    prepare_submissions(reports_to_submit)
+
+    # Stop submitting once the run's lease is lost, leaving
+    # the remaining reports to the run that took it over
+    leases = held_leases()
+    lost_lease = lambda: any(lease.lost.is_set() for lease in leases)
+
+    # Submissions deferred by this run, which only it retries
+    deferred = DeferredSubmissions()
+    def submit(submission: Tuple[Report, List[str]]) -> List[Metadata]:
+        if lost_lease():
+            return []
+        report, agencies = submission
+        return Submission(report, agencies, rejections=rejections.get(report.id),
+            deferred=deferred).metadata
+
+    metadata = []
+    try:
+        # Photos staged for web forms are shared by a report's agencies
+        # and removed once every submission of the run has ended
+        with staged_photos() as stage:
+            with ThreadPoolExecutor(max_workers=config.submission_max_workers) as executor:
+                for metadata_list in executor.map(bind_photo_stage(submit, stage), submissions):
+                    metadata.extend(metadata_list)
+
+            # Replace deferred metadata with that of any successful retries
+            retried = {} if lost_lease() else {(m.id, m.agency): m for m in
+                resubmit_deferred(config.submission_deferred_max_wait_in_sec, deferred)}
+    finally:
+        # Rendered emails and photo checks only hold for this run,
+        # even if it failed
+        discard_rendered()
+        clear_photo_checks()
+    metadata = [retried.pop((m.id, m.agency), m) for m in metadata]
+    metadata.extend(retried.values())
+    submitted = {m.id for m in metadata}
+    metadata.extend(merged_metadata([r for r in new_reports if r.id in submitted]))
+
+    if retry_queue:
+        retry_queue.record(metadata, merged_ids={r.id: r.merged_ids
+            for r in reports_to_submit if isinstance(r, MergedReport)})
+
+    for m in metadata:
+        metrics.SUBMISSIONS.inc(state=m.state or 'unknown',
+            channel=m.submission_type, status=m.status)
+
+    if not metadata:
+        return metadata_df
+
+    import pandas as pd
+    return replace_metadata(metadata_df, pd.DataFrame([m.to_dict() for m in metadata]))
+
+
+def replace_metadata(
+    metadata_df: 'pd.DataFrame',
+    new_metadata_df: 'pd.DataFrame') -> 'pd.DataFrame':
+    '''
+    Appends new metadata to earlier metadata, replacing the earlier
+    rows of the same report and agency (e.g., of retried submissions).
+
+    Parameters:
+        metadata_df (pd.DataFrame): The earlier metadata.
+
+        new_metadata_df (pd.DataFrame): The new metadata.
+
+    Returns:
+        (pd.DataFrame): The combined metadata.
+    '''
+    import pandas as pd
+
+    if len(metadata_df.index) and len(new_metadata_df.index):
+        keys = set(zip(new_metadata_df["id"], new_metadata_df["agency"]))
+        is_stale = [k in keys for k in zip(metadata_df["id"], metadata_df["agency"])]
+        metadata_df = metadata_df[~pd.Series(is_stale, index=metadata_df.index)]
+
+    return pd.concat([metadata_df, new_metadata_df], ignore_index=True)
+
+
+def changed_metadata(
+    metadata_df: 'pd.DataFrame',
+    base_df: 'pd.DataFrame') -> 'pd.DataFrame':
+    '''
+    The rows of metadata that are new or were changed (e.g., by a
+    retry) since the metadata it was based on.
+
+    Parameters:
+        metadata_df (pd.DataFrame): The metadata.
+
+        base_df (pd.DataFrame): The metadata it was based on.
+
+    Returns:
+        (pd.DataFrame): The new and changed rows.
+    '''
+    if not len(base_df.index):
+        return metadata_df
+
+    # Compare rows as strings, so that missing values are equal
+    as_rows = lambda df: df.reindex(columns=base_df.columns).astype(str) \
+        .itertuples(index=False, name=None)
+    base_rows = set(as_rows(base_df))
+    return metadata_df[[row not in base_rows for row in as_rows(metadata_df)]]
+
+
+def write_merged(
+    metadata_datastore: IDatastore,
+    metadata_df: 'pd.DataFrame',
+    base_df: 'pd.DataFrame',
+    version) -> 'pd.DataFrame':
+    '''
+    Writes metadata to its datastore, unless another run saved metadata
+    since that on which it was based was read. In that case, the new
+    and changed rows are merged into the metadata last saved, and the
+    result is written again, under the same condition.
+
+    Parameters:
+        metadata_datastore (IDatastore): The datastore of the metadata.
+
+        metadata_df (pd.DataFrame): The metadata.
+
+        base_df (pd.DataFrame): The metadata it was based on.
+
+        version: The version of the metadata it was based on.
+
+    Returns:
+        (pd.DataFrame): The metadata written.
+    '''
+    changes = None
+    for _ in range(config.coordination_write_attempts):
+        try:
+            metadata_datastore.write_data_if(metadata_df, version)
+            return metadata_df
+        except WriteConflict as e:
+            logger.warning(f"{e} Merging with the metadata saved by another run.")
+            if changes is None:
+                changes = changed_metadata(metadata_df, base_df)
+            current_df, version = metadata_datastore.read_versioned_data()
+            metadata_df = replace_metadata(current_df, changes)
+
+    raise Exception(f"Failed to save metadata after "
+        f"{config.coordination_write_attempts} conflicting writes.")
+
+
+def submit_and_save(
+    reports: List[Report],
+    retry_queue: RetryQueue,
+    metadata_datastore: IDatastore,
+    skip_ids: set=frozenset()) -> 'pd.DataFrame':
+    '''
+    Submits reports (see `submit_reports`) and saves their metadata,
+    merging it with any metadata saved by other runs in the meantime
+    (see `write_merged`).
+
+    Parameters:
+        reports (list of Report): The reports to submit.
+
+        retry_queue (RetryQueue): The queue of failed submissions, if any.
+
+        metadata_datastore (IDatastore): The datastore of the metadata.
+
+        skip_ids (set): The ids of reports not to submit.
+
+    Returns:
+        (pd.DataFrame): The metadata saved.
+    '''
+    base_df, version = metadata_datastore.read_versioned_data()
+    metadata_df = submit_reports([r for r in reports if r.id not in skip_ids],
+        retry_queue, metadata_df=base_df)
+    logger.info(f'Submitted all state emails/web forms. Updating metadata.')
+    metadata_df = write_merged(metadata_datastore, metadata_df, base_df, version)
+
+    # Fail the run if it stopped early, once its submissions are saved
+    for lease in held_leases():
+        lease.check()
+    return metadata_df
+
+
+def run_lease(shard: Shard=None) -> Lease:
+    '''
+    The lease on runs of a shard, named after the shard and stored
+    with the leases of all runs alongside the metadata. It conflicts
+    with the leases of overlapping shards.
+
+    Parameters:
+        shard (Shard): The shard. Defaults to None,
+            in which case every report is leased.
+
+    Returns:
+        (Lease): The lease.
+    '''
+    overlap = lambda name, other: Shard.from_name(name).overlaps(Shard.from_name(other))
+    return Lease(datastore.sibling("leases"), (shard or Shard()).name,
+        ttl_in_sec=config.coordination_lease_ttl_in_sec,
+        conflicts=overlap,
+        write_attempts=config.coordination_write_attempts)
+
+
+def partition_datastores(shard: Shard) -> Tuple[IDatastore, IDatastore]:
+    '''
+    The datastores holding a shard's metadata partition and its queue
+    of failed submissions, named after the shard and stored alongside
+    the metadata.
+
+    Parameters:
+        shard (Shard): The shard.
+
+    Returns:
+        ((IDatastore, IDatastore)): The metadata and retry datastores.
+    '''
+    if PROD_ENV in (TEST, PROD):
+        return (
+            CloudDatastore(config.cloud_bucket_name, f"{config.cloud_blob_name}_{shard.name}"),
+            CloudDatastore(config.cloud_bucket_name,
+                f"{config.cloud_retry_queue_blob_name}_{shard.name}"))
+
+    def partition_path(path: str) -> str:
+        root, extension = os.path.splitext(path)
+        return f"{root}_{shard.name}{extension}"
+
+    return (
+        LocalDatastore(partition_path(config.metadata_path)),
+        LocalDatastore(partition_path(config.retry_queue_path)))
+
+
+def submit_shard_reports(
+    reports: List[Report],
+    retry_queue: RetryQueue,
+    partition: IDatastore) -> 'pd.DataFrame':
+    '''
+    Submits a shard's reports, skipping those already submitted
+    according to the metadata or the shard's own partition, and
+    saves their metadata to the partition.
+
+    Parameters:
+        reports (list of Report): The shard's reports.
+
+        retry_queue (RetryQueue): The shard's queue of failed submissions.
+
+        partition (IDatastore): The shard's metadata partition.
+
+    Returns:
+        (pd.DataFrame): The shard's metadata partition,
+            including the new submissions.
+    '''
     metadata_df = datastore.read_data()
-    
-    for report in reports:
-        if len(metadata_df.index)==0 or (
-            report.id not in metadata_df["id"].values):
-            metadata_list = Submission(report).metadata
-            for meta in metadata_list:
-                metadata_df = metadata_df.append(vars(meta), ignore_index=True)
+    submitted_ids = set(metadata_df["id"].values) if len(metadata_df.index) else set()
+    return submit_and_save(reports, retry_queue, partition, skip_ids=submitted_ids)
+
+
+def merge_shards(shards: List[Shard]) -> 'pd.DataFrame':
+    '''
+    Merges the metadata partitions of shards into the metadata,
+    then empties the partitions. Merging is idempotent, so an
+    interrupted merge may be repeated. Partitions saved to by a
+    shard while being merged are not emptied, and their new
+    metadata is merged by the next merge.
+
+    Parameters:
+        shards (list of Shard): The shards.
+
+    Returns:
+        (pd.DataFrame): The merged metadata.
+    '''
+    import pandas as pd
+
+    base_df, version = datastore.read_versioned_data()
+    metadata_df = base_df
+    partitions = []
+    for shard in shards:
+        partition = partition_datastores(shard)[0]
+        partition_df, partition_version = partition.read_versioned_data()
+        metadata_df = replace_metadata(metadata_df, partition_df)
+        partitions.append((partition, partition_version))
+    metadata_df = write_merged(datastore, metadata_df, base_df, version)
 
+    for partition, partition_version in partitions:
+        try:
+            partition.write_data_if(pd.DataFrame(columns=Metadata.FIELDS), partition_version)
+        except WriteConflict as e:
+            logger.warning(f"{e} Leaving the partition for the next merge.")
     return metadata_df
 
 
@@ -0,0 +1,403 @@
+'''
+agency_health.py
+
+Tracks the health of each agency's web form or email endpoint during
+submission. A circuit breaker stops submissions to an agency after
+consecutive failures, deferring them until the agency can be probed
+again, while an adaptive limit caps how many submissions to the agency
+run concurrently based on their observed latency. Submissions are
+deferred per run (see `deferred_submissions`), so that runs sharing
+the process only retry their own.
+'''
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+from utilities.config import Config
+from utilities.logger import logger
+
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half open'
+
+
+class AgencyHealth:
+    '''
+    A circuit breaker and adaptive concurrency limit for one agency.
+
+    The circuit opens after `failure_threshold` consecutive failures.
+    Once `reset_timeout_in_sec` has elapsed, a single probe submission
+    is allowed through; its success closes the circuit and its failure
+    reopens it. The concurrency limit grows additively while latencies
+    stay within `latency_tolerance` times the fastest latency observed
+    and is halved when a submission is slower than that or fails.
+    '''
+
+    def __init__(
+        self,
+        agency: str,
+        failure_threshold: int=3,
+        reset_timeout_in_sec: float=300,
+        max_concurrency: int=2,
+        latency_tolerance: float=2.0) -> None:
+        '''
+        The constructor for `AgencyHealth`.
+
+        Parameters:
+            agency (str): The name of the agency (e.g., "Texas Commission
+                on Environmental Quality").
+
+            failure_threshold (int): The number of consecutive failures
+                after which the circuit opens.
+
+            reset_timeout_in_sec (float): The number of seconds an open
+                circuit waits before allowing a probe submission.
+
+            max_concurrency (int): The upper bound of the concurrency limit.
+
+            latency_tolerance (float): The multiple of the fastest observed
+                latency above which a submission counts as slow.
+
+        Returns:
+            None
+        '''
+        self.agency = agency
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_in_sec = reset_timeout_in_sec
+        self.max_concurrency = max(1, max_concurrency)
+        self.latency_tolerance = latency_tolerance
+
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.min_latency_in_sec = None
+        self.limit = 1.0
+        self.in_flight = 0
+
+        self._probe_in_flight = False
+        self._condition = threading.Condition()
+
+
+    @property
+    def concurrency(self) -> int:
+        '''
+        The number of submissions currently allowed to run at once.
+        '''
+        return max(1, int(self.limit))
+
+
+    @property
+    def seconds_until_probe(self) -> float:
+        '''
+        The number of seconds until an open circuit allows a probe.
+        Returns zero if the circuit is not open.
+        '''
+        with self._condition:
+            if self.state != CIRCUIT_OPEN:
+                return 0.0
+            elapsed = time.monotonic() - self.opened_at
+            return max(0.0, self.reset_timeout_in_sec - elapsed)
+
+
+    def allow_request(self) -> bool:
+        '''
+        Determines whether a submission to the agency may proceed.
+        Moves an open circuit to half open once its reset timeout
+        has elapsed, admitting a single probe submission.
+
+        Parameters:
+            None
+
+        Returns:
+            (bool): True if the submission may proceed.
+        '''
+        with self._condition:
+            if self.state == CIRCUIT_OPEN and \
+                time.monotonic() - self.opened_at >= self.reset_timeout_in_sec:
+                self.state = CIRCUIT_HALF_OPEN
+                logger.info(f'Probing {self.agency} after circuit reset timeout.')
+
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+
+    @contextmanager
+    def slot(self):
+        '''
+        Blocks until the number of submissions in flight
+        is below the concurrency limit, then holds a slot
+        for the duration of the block.
+        '''
+        with self._condition:
+            self._condition.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+
+    def record_success(self, latency_in_sec: float) -> None:
+        '''
+        Records a successful submission, closing the circuit
+        and adjusting the concurrency limit for its latency.
+
+        Parameters:
+            latency_in_sec (float): The duration of the submission.
+
+        Returns:
+            None
+        '''
+        with self._condition:
+            if self.state != CIRCUIT_CLOSED:
+                logger.info(f'Closing circuit for {self.agency}.')
+            self.state = CIRCUIT_CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+            if self.min_latency_in_sec is None or latency_in_sec < self.min_latency_in_sec:
+                self.min_latency_in_sec = latency_in_sec
+
+            if latency_in_sec > self.min_latency_in_sec * self.latency_tolerance:
+                self._decrease_limit()
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.concurrency)
+            self._condition.notify_all()
+
+
+    def record_failure(self, latency_in_sec: float) -> None:
+        '''
+        Records a failed submission, opening the circuit if the
+        failure threshold is reached or a probe has failed.
+
+        Parameters:
+            latency_in_sec (float): The duration of the submission.
+
+        Returns:
+            None
+        '''
+        with self._condition:
+            self.consecutive_failures += 1
+            self._decrease_limit()
+            if self.state == CIRCUIT_HALF_OPEN or \
+                self.consecutive_failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    logger.warning(f'Opening circuit for {self.agency} after '
+                        f'{self.consecutive_failures} consecutive failure(s).')
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+    def record_report_failure(self) -> None:
+        '''
+        Records a submission that failed because of its report (e.g.,
+        a county the agency's web form does not offer) rather than the
+        agency, which neither counts toward opening the circuit nor
+        closes it. A probe failing this way lets another submission
+        probe the agency.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        '''
+        with self._condition:
+            self._probe_in_flight = False
+
+
+    def _decrease_limit(self) -> None:
+        self.limit = max(1.0, self.limit / 2)
+
+
+class DeferredSubmissions:
+    '''
+    The submissions deferred while their agencies were
+    unavailable, keyed by agency.
+    '''
+
+    def __init__(self) -> None:
+        '''
+        The constructor for `DeferredSubmissions`.
+        '''
+        self._pending: Dict[str, List[Callable]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+
+    def add(self, agency: str, submit: Callable) -> None:
+        '''
+        Queues a submission to retry once the agency can be probed.
+
+        Parameters:
+            agency (str): The name of the agency.
+
+            submit (callable): Resubmits the report, returning
+                its `Metadata`.
+
+        Returns:
+            None
+        '''
+        with self._lock:
+            self._pending[agency].append(submit)
+
+
+    def take(self, agency: str) -> List[Callable]:
+        '''
+        Removes and returns the submissions deferred for an agency.
+        '''
+        with self._lock:
+            return self._pending.pop(agency, [])
+
+
+    def agencies(self) -> List[str]:
+        '''
+        The agencies with deferred submissions.
+        '''
+        with self._lock:
+            return [a for a, pending in self._pending.items() if pending]
+
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(pending) for pending in self._pending.values())
+
+
+# The submissions deferred by the run in progress in the current thread
+_run_deferred: ContextVar[Optional[DeferredSubmissions]] = ContextVar(
+    'deferred_submissions', default=None)
+
+# The submissions deferred outside of runs (e.g., when submitting directly)
+_deferred = DeferredSubmissions()
+
+
+@contextmanager
+def deferred_submissions(deferred: DeferredSubmissions) -> Iterator[DeferredSubmissions]:
+    '''
+    Records the submissions deferred within a `with` block (e.g.,
+    by a run's submission of a report) in the given queue, apart
+    from those of other runs sharing the process.
+
+    Parameters:
+        deferred (DeferredSubmissions): The queue.
+
+    Returns:
+        (DeferredSubmissions): The queue.
+    '''
+    token = _run_deferred.set(deferred)
+    try:
+        yield deferred
+    finally:
+        _run_deferred.reset(token)
+
+
+def get_deferred_submissions() -> DeferredSubmissions:
+    '''
+    Retrieves the deferred submissions of the run in progress in the
+    current thread or, outside of runs, those of the process.
+    '''
+    deferred = _run_deferred.get()
+    return deferred if deferred is not None else _deferred
+
+
+# Health trackers keyed by agency name, shared across submissions
+_registry: Dict[str, AgencyHealth] = {}
+_registry_lock = threading.Lock()
+
+
+def get_agency_health(agency: str) -> AgencyHealth:
+    '''
+    Retrieves the health tracker for an agency, creating
+    it from the submission settings in the config file.
+
+    Parameters:
+        agency (str): The name of the agency.
+
+    Returns:
+        (AgencyHealth): The tracker.
+    '''
+    with _registry_lock:
+        if agency not in _registry:
+            config = Config()
+            _registry[agency] = AgencyHealth(
+                agency=agency,
+                failure_threshold=config.submission_failure_threshold,
+                reset_timeout_in_sec=config.submission_reset_timeout_in_sec,
+                max_concurrency=config.submission_max_concurrency_per_agency,
+                latency_tolerance=config.submission_latency_tolerance)
+        return _registry[agency]
+
+
+def reset_agency_health() -> None:
+    '''
+    Discards all health trackers, closing every circuit, along
+    with the submissions deferred outside of runs.
+    '''
+    global _deferred
+    with _registry_lock:
+        _registry.clear()
+        _deferred = DeferredSubmissions()
+
+
+def resubmit_deferred(
+    max_wait_in_sec: float=0,
+    deferred: DeferredSubmissions=None) -> List:
+    '''
+    Retries deferred submissions, agency by agency, as their
+    circuits allow probes. Waits up to `max_wait_in_sec` for
+    open circuits to reach their reset timeouts. Submissions
+    still deferred after that remain recorded as deferred and
+    are dropped from the queue, to be retried by later runs
+    through the retry queue.
+
+    Parameters:
+        max_wait_in_sec (float): The maximum number of seconds
+            to wait for open circuits.
+
+        deferred (DeferredSubmissions): The submissions to retry.
+            Defaults to those of the current thread's run.
+
+    Returns:
+        (list of Metadata): The metadata of the retried submissions.
+    '''
+    if deferred is None:
+        deferred = get_deferred_submissions()
+    deadline = time.monotonic() + max_wait_in_sec
+    trackers = [get_agency_health(a) for a in deferred.agencies()]
+
+    metadata = []
+    # Submissions deferred again are queued with the same run's
+    with deferred_submissions(deferred):
+        while trackers:
+            for health in trackers:
+                if health.seconds_until_probe > 0:
+                    continue
+
+                # The first retry claims the probe; if it fails, the
+                # remaining retries are deferred again by the circuit
+                pending = deferred.take(health.agency)
+                logger.info(f'Retrying {len(pending)} deferred submission(s) to {health.agency}.')
+                metadata.extend(submit() for submit in pending)
+
+            agencies = set(deferred.agencies())
+            trackers = [h for h in trackers if h.agency in agencies]
+            wait = min((h.seconds_until_probe for h in trackers), default=0)
+            if not trackers or time.monotonic() + wait > deadline:
+                break
+            time.sleep(wait)
+
+    for health in trackers:
+        logger.info(f'{len(deferred.take(health.agency))} submission(s) to '
+            f'{health.agency} remain deferred.')
+
+    return metadata
@@ -4,17 +4,52 @@ api_report.py
 Takes in a single json report and creates attributes from json items.
 '''
 
+from datetime import datetime
 from models.base_location import Location
-from models.base_report import Report
-from typing import Dict, List
+from models.base_report import Report, parse_report_date
+from typing import Dict, List, Tuple
 from models.geocoded_location import GeocodedLocation
-from validate_email import validate_email
+from models.senses import Sense, mask_to_senses, senses_to_mask
+from utilities.email_validation import get_email_validator
+
+
+def feature_coordinates(json: dict) -> Tuple[float, float]:
+    '''
+    Extracts the latitude and longitude of a report from the API.
+
+    Inputs: json: json-formatted dictionary of report from API
+    Returns: the latitude and longitude
+    '''
+    # Some coords found in "geometries", others found directly in "coords"
+    geometry = json['geometry']
+    if 'geometries' in geometry.keys():
+        coords = geometry['geometries'][0]['coordinates']
+    else:
+        coords = geometry['coordinates']
+    return coords[1], coords[0]
+
+
+def feature_email(json: dict) -> str:
+    '''
+    Extracts the email address of the user who submitted a report.
+
+    Inputs: json: json-formatted dictionary of report from API
+    Returns: the email address
+    '''
+    return json['properties']['created_by']['properties']['email']
 
 
 class ApiReport(Report):
     '''
     Class to store relevant report information from FracTracker API JSON.
+    Attributes are held in slots, the report date is parsed into a
+    `datetime` on first use and affected senses are stored as a `Sense`
+    bitmask to keep instances small during full-history backfills.
     '''
+
+    __slots__ = ('_id', '_description', '_date', '_date_time', '_first_name', '_last_name',
+        '_email', 'email_is_valid', '_lat', '_lon', '_location', '_senses',
+        '_image_url', '_report_type')
     
     def __init__(self, json:dict, check_emails:bool=True) -> None:
         '''
@@ -37,6 +72,7 @@ class ApiReport(Report):
         props_level_1 = json['properties']
         self._description = props_level_1['description']
         self._date = props_level_1['report_date']
+        self._date_time = None
 
         # Extract second level data
         props_level_2 = props_level_1['created_by']['properties']
@@ -46,7 +82,7 @@ class ApiReport(Report):
 
         # Validate email address if indicated
         if check_emails:
-            self.email_is_valid = validate_email(email_address=self._email)
+            self.email_is_valid = get_email_validator().is_valid(self._email)
 
         # Extract more complicated data from json
         self._lat, self._lon = None, None
@@ -91,10 +127,21 @@ class ApiReport(Report):
     @property
     def date(self) -> str:
         '''
-        The date on which the report was submitted.
+        The date on which the report was submitted, as sent by the API.
         '''
         return self._date
 
+
+    @property
+    def date_time(self) -> datetime:
+        '''
+        The date on which the report was submitted, as a `datetime`.
+        Raises a `ReportError` if the date is not in ISO format.
+        '''
+        if self._date_time is None:
+            self._date_time = parse_report_date(self._date)
+        return self._date_time
+
     
     @property
     def first_name(self) -> str:
@@ -135,7 +182,7 @@ class ApiReport(Report):
         Keys include 'Sight', 'Smell', 'Taste','Touch',
         and 'Sound', while values are either booleans.
         '''
-        return self._senses
+        return mask_to_senses(self._senses)
 
 
     @property
@@ -161,30 +208,19 @@ class ApiReport(Report):
         Inputs: json: json-formatted dictionary of report from API
         Returns: instance of Location class
         '''
-        # Some coords found in "geometries", others found directly in "coords"
-        geometry = json['geometry']
-        if 'geometries' in geometry.keys():
-            coords = geometry['geometries'][0]['coordinates']    
-        else:
-            coords = geometry['coordinates']
-        self._lat, self._lon = coords[1], coords[0]
+        self._lat, self._lon = feature_coordinates(json)
         return GeocodedLocation(lat=self._lat, lon=self._lon)
 
 
-    def get_senses(self, json):
+    def get_senses(self, json) -> Sense:
         '''
         Method to check if each sense was listed in report.
 
         Inputs: json: json-formatted dictionary of report from API.
-        Returns: a dictionary of keys = senses, and values = bools.
+        Returns: a `Sense` bitmask of the listed senses.
         '''
-        senses = ['Sight', 'Smell', 'Taste','Touch','Sound']
-        senses_dict = {sense: False for sense in senses}
-
-        for s in json['properties']['senses']:
-            sense = s['properties']['name']
-            senses_dict[sense] = True
-        return senses_dict
+        return Sense(senses_to_mask(
+            s['properties']['name'] for s in json['properties']['senses']))
 
 
     def get_val_from_list(self, json, prop_type, item_type):
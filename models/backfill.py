@@ -0,0 +1,244 @@
+'''
+backfill.py
+
+Backfills submissions over long date ranges (e.g., after an outage).
+The range is split into day or week windows. The reports of upcoming
+windows are retrieved from the API concurrently, a bounded number of
+windows at a time, while windows are submitted one after another, in
+order, since each submission run already submits its reports
+concurrently. Every window is checkpointed once its submissions are
+saved, so that rerunning a backfill over the same range skips the
+windows already completed and retries those that failed.
+'''
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+from models.base_report import Report
+from utilities.coordination import LeaseLost
+from utilities.logger import logger
+from utilities.storage import IDatastore
+
+
+# The date format of request bodies and API queries
+DATE_FORMAT = "%m-%d-%Y"
+
+# The number of days in each window length
+WINDOW_DAYS = {'day': 1, 'week': 7}
+
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+# Columns of the persisted checkpoints, in order
+BACKFILL_COLUMNS = ['begin_date', 'end_date', 'status', 'num_reports',
+    'status_reason', 'checkpoint_time']
+
+
+def split_range(begin: date, end: date, window: str) -> List[Tuple[date, date]]:
+    '''
+    Splits an inclusive date range into consecutive windows.
+
+    Parameters:
+        begin (date): The first date of the range.
+
+        end (date): The last date of the range.
+
+        window (str): The window length, either 'day' or 'week'.
+            Weeks start on the first date of the range, and
+            the last window may be shorter.
+
+    Returns:
+        (list of (date, date)): The first and last date of each window.
+    '''
+    if window not in WINDOW_DAYS:
+        raise Exception(f"Unknown backfill window '{window}'. "
+            f"Expected one of {list(WINDOW_DAYS)}.")
+    if begin > end:
+        raise Exception(f"Backfill start date {begin} follows end date {end}.")
+
+    step = timedelta(days=WINDOW_DAYS[window])
+    windows = []
+    while begin <= end:
+        windows.append((begin, min(begin + step - timedelta(days=1), end)))
+        begin += step
+    return windows
+
+
+class BackfillCheckpoints:
+    '''
+    The outcome of each backfilled window, keyed by its first
+    and last date, persisted through a datastore between runs.
+    '''
+
+    def __init__(self, datastore: IDatastore) -> None:
+        '''
+        The constructor for `BackfillCheckpoints`.
+
+        Parameters:
+            datastore (IDatastore): The datastore holding the checkpoints.
+
+        Returns:
+            None
+        '''
+        self._datastore = datastore
+        self.entries = {}
+
+
+    def load(self) -> 'BackfillCheckpoints':
+        '''
+        Reads the checkpoints from the datastore.
+
+        Parameters:
+            None
+
+        Returns:
+            (BackfillCheckpoints): The checkpoints themselves.
+        '''
+        df = self._datastore.read_data()
+        self.entries = {}
+        if len(df.index):
+            for entry in df.to_dict('records'):
+                self.entries[(entry['begin_date'], entry['end_date'])] = entry
+        logger.info(f'Loaded {len(self.entries)} backfill checkpoint(s).')
+        return self
+
+
+    def save(self) -> None:
+        '''
+        Writes the checkpoints to the datastore.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        '''
+        import pandas as pd
+        self._datastore.write_data(pd.DataFrame(list(self.entries.values()),
+            columns=BACKFILL_COLUMNS))
+
+
+    def is_completed(self, window: Tuple[date, date]) -> bool:
+        '''
+        Whether a window was already backfilled.
+        '''
+        entry = self.entries.get((window[0].isoformat(), window[1].isoformat()))
+        return entry is not None and entry['status'] == STATUS_COMPLETED
+
+
+    def record(
+        self,
+        window: Tuple[date, date],
+        status: str,
+        num_reports: int=None,
+        status_reason: str=None) -> None:
+        '''
+        Records the outcome of a window.
+
+        Parameters:
+            window ((date, date)): The first and last date of the window.
+
+            status (str): Either `STATUS_COMPLETED` or `STATUS_FAILED`.
+
+            num_reports (int): The number of reports retrieved.
+
+            status_reason (str): The reason the window failed, if any.
+
+        Returns:
+            None
+        '''
+        key = (window[0].isoformat(), window[1].isoformat())
+        self.entries[key] = {
+            'begin_date': key[0],
+            'end_date': key[1],
+            'status': status,
+            'num_reports': num_reports,
+            'status_reason': status_reason,
+            'checkpoint_time': datetime.utcnow().isoformat()
+        }
+
+
+def run_backfill(
+    begin_date: str,
+    end_date: str,
+    window: str,
+    fetch: Callable[[str, str], List[Report]],
+    submit: Callable[[List[Report]], None],
+    checkpoints: BackfillCheckpoints,
+    max_workers: int=4) -> Dict[str, int]:
+    '''
+    Backfills a date range window by window, skipping the windows
+    already completed. A window whose retrieval or submission fails
+    is checkpointed as failed and the backfill moves on, unless the
+    run lost its lease, in which case the backfill stops.
+
+    Parameters:
+        begin_date (str): The first date of the range, as "%m-%d-%Y".
+
+        end_date (str): The last date of the range, as "%m-%d-%Y".
+
+        window (str): The window length, either 'day' or 'week'.
+
+        fetch (function): Retrieves the reports dated between the
+            first and last date of a window, given as "%m-%d-%Y".
+
+        submit (function): Submits a window's reports and saves
+            the outcome of their submission.
+
+        checkpoints (BackfillCheckpoints): The loaded checkpoints,
+            saved after every window.
+
+        max_workers (int): The number of windows
+            whose reports are retrieved concurrently.
+
+    Returns:
+        (dict): The number of windows in the range and the
+            number skipped, completed and failed.
+    '''
+    windows = split_range(
+        datetime.strptime(begin_date, DATE_FORMAT).date(),
+        datetime.strptime(end_date, DATE_FORMAT).date(),
+        window)
+    remaining = [w for w in windows if not checkpoints.is_completed(w)]
+    logger.info(f"Backfilling {len(remaining)} of {len(windows)} {window} window(s) "
+        f"between {begin_date} and {end_date}, inclusive.")
+
+    def fetch_window(w: Tuple[date, date]) -> List[Report]:
+        return fetch(w[0].strftime(DATE_FORMAT), w[1].strftime(DATE_FORMAT))
+
+    summary = {'windows': len(windows), 'skipped': len(windows) - len(remaining),
+        'completed': 0, 'failed': 0}
+    upcoming = iter(remaining)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Retrieve up to `max_workers` windows ahead of the one being submitted
+        pending = deque((w, executor.submit(fetch_window, w))
+            for _, w in zip(range(max_workers), upcoming))
+        while pending:
+            w, future = pending.popleft()
+            following = next(upcoming, None)
+            if following is not None:
+                pending.append((following, executor.submit(fetch_window, following)))
+
+            try:
+                reports = future.result()
+                submit(reports)
+            except LeaseLost as e:
+                # Another run took over the range, so stop backfilling it
+                logger.error(f"Stopped backfilling at window {w[0]} to {w[1]}. {e}")
+                checkpoints.record(w, STATUS_FAILED, status_reason=str(e))
+                checkpoints.save()
+                for _, following_future in pending:
+                    following_future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Failed to backfill window {w[0]} to {w[1]}. {e}")
+                checkpoints.record(w, STATUS_FAILED, status_reason=str(e))
+                summary['failed'] += 1
+            else:
+                logger.info(f"Backfilled {len(reports)} report(s) dated {w[0]} to {w[1]}.")
+                checkpoints.record(w, STATUS_COMPLETED, num_reports=len(reports))
+                summary['completed'] += 1
+            checkpoints.save()
+
+    return summary
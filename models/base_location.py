@@ -4,6 +4,7 @@ base_location.py
 
 import json
 from abc import ABC, abstractproperty
+from typing import Dict
 
 
 class Location(ABC):
@@ -12,6 +13,8 @@ class Location(ABC):
     Enforces the existence of expected properties for subclasses.
     '''
 
+    __slots__ = ()
+
     @abstractproperty
     def latitude(self) -> float:
         '''
@@ -84,5 +87,26 @@ class Location(ABC):
         Overrides the default implementation for representing
         a `Location` instance as an official string.
         '''
-        return json.dumps(vars(self), indent=2)
+        return json.dumps(slot_values(self), indent=2, default=str)
+
+
+def slot_values(obj) -> Dict:
+    '''
+    Collects the attributes of an instance whose class
+    hierarchy may declare `__slots__` in place of `__dict__`.
+
+    Parameters:
+        obj (object): The instance.
+
+    Returns:
+        (dict): The attribute names and values.
+    '''
+    values = {}
+    for cls in reversed(type(obj).__mro__):
+        slots = getattr(cls, '__slots__', ())
+        for name in ((slots,) if isinstance(slots, str) else slots):
+            if hasattr(obj, name):
+                values[name] = getattr(obj, name)
+    values.update(getattr(obj, '__dict__', {}))
+    return values
 
@@ -3,16 +3,47 @@ base_report.py
 '''
 
 from abc import ABC, abstractproperty
-from models.base_location import Location
+from datetime import datetime
+from models.base_location import Location, slot_values
 from typing import Dict, List
 
 
+class ReportError(Exception):
+    '''
+    Raised when a report cannot be submitted as it stands (e.g., its
+    county is not an option of the agency's web form), however
+    available the agency
+    '''
+
+
+def parse_report_date(value: str) -> datetime:
+    '''
+    Parses the ISO date of a report, including the `Z` suffix
+    of UTC dates, which `datetime.fromisoformat` rejects
+    before Python 3.11.
+
+    Parameters:
+        value (str): The date, in ISO format.
+
+    Returns:
+        (datetime): The date.
+    '''
+    try:
+        if value.endswith('Z'):
+            value = f"{value[:-1]}+00:00"
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ReportError(f"Report date '{value}' is not in ISO format.")
+
+
 class Report(ABC):
     '''
     An abstract version of a FracTracker complaint report.
     Enforces the existence of expected properties for subclasses.
     '''
 
+    __slots__ = ()
+
     @abstractproperty
     def id(self) -> str:
         '''
@@ -52,6 +83,14 @@ class Report(ABC):
         '''
         raise NotImplementedError
 
+
+    @property
+    def date_time(self) -> datetime:
+        '''
+        The date on which the report was submitted, as a `datetime`.
+        '''
+        return parse_report_date(self.date)
+
     
     @abstractproperty
     def first_name(self) -> str:
@@ -140,7 +179,7 @@ class Report(ABC):
         Returns:
             (str): The string reprsentation.
         '''
-        return str(vars(self))
+        return str(slot_values(self))
 
 
     def __eq__(self, other) -> bool:
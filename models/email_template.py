@@ -0,0 +1,266 @@
+'''
+email_template.py
+
+Precompiled plain-text and HTML templates for the complaint emails sent
+to state agencies. Templates are compiled once, when the module is
+imported, and may be overridden per agency. Emails for a batch of
+reports can be rendered ahead of submission and are then picked up
+by `StateEmail` when each report is emailed.
+'''
+
+import html
+import threading
+from datetime import date
+from functools import lru_cache
+from models.base_report import Report
+from string import Template
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+
+def _num_suffix(num: int) -> str:
+    '''
+    Appends the appropriate English suffix to a number.
+    Example: '3' would become '3rd' and '212', '212th'.
+    '''
+    if num % 100 in range(4, 20):
+        return f'{num}th'
+    return f'{num}' + {1: 'st', 2: 'nd', 3: 'rd'}.get(num % 10, 'th')
+
+
+# Days of the month with their English suffixes (e.g., '1st')
+DAY_SUFFIXES = {day: _num_suffix(day) for day in range(1, 32)}
+
+
+def append_num_suffix(num: int) -> str:
+    '''
+    Appends the appropriate English suffix to a number,
+    looking up days of the month in a precomputed table.
+
+    Parameters:
+        num (int): The number.
+
+    Returns:
+        (str): The formatted number.
+    '''
+    return DAY_SUFFIXES.get(num) or _num_suffix(num)
+
+
+@lru_cache(maxsize=512)
+def format_date(day: date) -> str:
+    '''
+    Formats a date as its month and day (e.g., 'April 15th').
+    '''
+    return f'{day.strftime("%B")} {append_num_suffix(day.day)}'
+
+
+class RenderedEmail(NamedTuple):
+    '''
+    The plain-text and HTML bodies of one complaint email.
+    '''
+    plain: str
+    html: str
+
+
+class EmailTemplate:
+    '''
+    A compiled email body. Optional passages, such as the sender's
+    introduction, are compiled as fragments that are only rendered
+    when the field they depend on has a value.
+    '''
+
+    def __init__(
+        self,
+        body: str,
+        fragments: Dict[str, Tuple[str, str, str]],
+        escape: bool=False) -> None:
+        '''
+        The constructor for `EmailTemplate`.
+
+        Parameters:
+            body (str): The `string.Template` source of the body.
+
+            fragments (dict): The optional passages keyed by their
+                placeholder in the body. Each value is a tuple of the
+                field the passage depends on, the `string.Template`
+                source used when the field has a value and the text
+                used when it does not.
+
+            escape (bool): Whether to HTML-escape field values.
+
+        Returns:
+            None
+        '''
+        self.body = Template(body)
+        self.fragments = {name: (field, Template(present), missing)
+            for name, (field, present, missing) in fragments.items()}
+        self.escape = escape
+
+
+    def render(self, fields: Dict[str, str]) -> str:
+        '''
+        Renders the email body.
+
+        Parameters:
+            fields (dict): The report fields, as built by `email_fields`.
+
+        Returns:
+            (str): The email body.
+        '''
+        values = {k: html.escape(v) for k, v in fields.items()} if self.escape else fields
+        parts = dict(values)
+        for name, (field, present, missing) in self.fragments.items():
+            parts[name] = present.substitute(values) if fields[field] else missing
+        return self.body.substitute(parts)
+
+
+PLAIN_TEMPLATE = EmailTemplate(
+    body=('To the ${agency}:\n\n${intro}On ${date}, I reported an environmental '
+        'complaint using the FracTracker mobile app and agreed that it be forwarded '
+        'to your agency. The incident I witnessed occurred at roughly ${lat} degrees '
+        'latitude and ${lon} degrees longitude${in_county}${with_description} Please '
+        '${images}contact me directly at ${email} to follow up with next steps. '
+        'Thank you, and have a great day!${closing}'),
+    fragments={
+        'intro': ('full_name', 'Hi, my name is ${full_name}. ', ''),
+        'in_county': ('county', ' in ${county}', ''),
+        'with_description': ('description', '. In the app, I included the following '
+            'description: "${description}".', '.'),
+        'images': ('has_images', 'find supporting images attached and ', ''),
+        'closing': ('full_name', '\n\nSincerely,\n${full_name}', '')
+    })
+
+HTML_TEMPLATE = EmailTemplate(
+    body=('<html><body>\n<p>To the ${agency}:</p>\n<p>${intro}On ${date}, I reported an '
+        'environmental complaint using the FracTracker mobile app and agreed that it be '
+        'forwarded to your agency. The incident I witnessed occurred at roughly '
+        '${lat} degrees latitude and ${lon} degrees longitude${in_county}'
+        '${with_description}\n<p>Please ${images}contact me directly at '
+        '<a href="mailto:${email}">${email}</a> to follow up with next steps. '
+        'Thank you, and have a great day!</p>${closing}\n</body></html>'),
+    fragments={
+        'intro': ('full_name', 'Hi, my name is ${full_name}. ', ''),
+        'in_county': ('county', ' in ${county}', ''),
+        'with_description': ('description', '. In the app, I included the following '
+            'description:</p>\n<blockquote>${description}</blockquote>', '.</p>'),
+        'images': ('has_images', 'find supporting images attached and ', ''),
+        'closing': ('full_name', '\n<p>Sincerely,<br>\n${full_name}</p>', '')
+    },
+    escape=True)
+
+
+# Templates compiled for specific agencies, overriding the defaults
+_agency_templates: Dict[str, Tuple[EmailTemplate, EmailTemplate]] = {}
+
+# Emails rendered ahead of submission, keyed by report id and agency
+_rendered: Dict[Tuple[object, str], RenderedEmail] = {}
+_rendered_lock = threading.Lock()
+
+
+def register_templates(
+    agency: str,
+    plain_template: EmailTemplate,
+    html_template: EmailTemplate) -> None:
+    '''
+    Overrides the plain-text and HTML templates used for an agency.
+
+    Parameters:
+        agency (str): The name of the agency.
+
+        plain_template (EmailTemplate): The plain-text template.
+
+        html_template (EmailTemplate): The HTML template.
+
+    Returns:
+        None
+    '''
+    _agency_templates[agency] = (plain_template, html_template)
+
+
+def get_templates(agency: str) -> Tuple[EmailTemplate, EmailTemplate]:
+    '''
+    Retrieves the plain-text and HTML templates used for an agency.
+    '''
+    return _agency_templates.get(agency, (PLAIN_TEMPLATE, HTML_TEMPLATE))
+
+
+def email_fields(report: Report, agency: str) -> Dict[str, str]:
+    '''
+    Extracts the values substituted into complaint email templates.
+
+    Parameters:
+        report (Report): The complaint from the FracTracker API.
+
+        agency (str): The name of the agency receiving the email.
+
+    Returns:
+        (dict of str): The template fields.
+    '''
+    # Handle situations with missing first or last name
+    missing_name = not report.first_name or not report.last_name
+    return {
+        'agency': agency,
+        'date': format_date(report.date_time.date()),
+        'lat': f'{report.lat:.4f}',
+        'lon': f'{report.lon:.4f}',
+        'county': report.location.county or '',
+        'description': report.description or '',
+        'email': report.email or '',
+        'full_name': '' if missing_name else f'{report.first_name} {report.last_name}',
+        'has_images': 'yes' if report.image_url else ''
+    }
+
+
+def render_email(report: Report, agency: str) -> RenderedEmail:
+    '''
+    Retrieves the email for a report rendered in a batch,
+    or renders it now if it was not.
+
+    Parameters:
+        report (Report): The complaint from the FracTracker API.
+
+        agency (str): The name of the agency receiving the email.
+
+    Returns:
+        (RenderedEmail): The plain-text and HTML email bodies.
+    '''
+    with _rendered_lock:
+        rendered = _rendered.pop((report.id, agency), None)
+    if rendered:
+        return rendered
+
+    plain_template, html_template = get_templates(agency)
+    fields = email_fields(report, agency)
+    return RenderedEmail(plain=plain_template.render(fields), html=html_template.render(fields))
+
+
+def render_batch(reports: Iterable[Report], agency: str) -> None:
+    '''
+    Renders the emails for a batch of reports sent to the same
+    agency, holding them until each report is emailed.
+
+    Parameters:
+        reports (iterable of Report): The complaints to render.
+
+        agency (str): The name of the agency receiving the emails.
+
+    Returns:
+        None
+    '''
+    plain_template, html_template = get_templates(agency)
+    rendered = {}
+    for report in reports:
+        fields = email_fields(report, agency)
+        rendered[(report.id, agency)] = RenderedEmail(
+            plain=plain_template.render(fields), html=html_template.render(fields))
+
+    with _rendered_lock:
+        _rendered.update(rendered)
+
+
+def discard_rendered() -> None:
+    '''
+    Discards emails rendered in a batch but never sent
+    (e.g., because their submission was deferred).
+    '''
+    with _rendered_lock:
+        _rendered.clear()
@@ -2,20 +2,22 @@
 geocoded_location.py
 '''
 
-import geopy
-import numpy as np
-from geopy.extra.rate_limiter import RateLimiter
+import math
 from models.base_location import Location
+from typing import Iterable, Tuple
+from utilities.geocoding import get_geocoder
 
     
 class GeocodedLocation(Location):
     '''
-    Utilizes the open source reverse geocoding library
-    Nominatim to capture information associated with a
-    given latitude and longitude, such as street address,
+    Reverse geocodes a given latitude and longitude through
+    the configured geocoding providers (e.g., Nominatim) to
+    capture associated information such as street address,
     city, state, and/or county data.
     '''
 
+    __slots__ = ('_lat', '_lon', '_is_valid', '_state', '_zip', '_county', '_full_address')
+
     def __init__(self, lat: float, lon: float) -> None:
         '''
         The constructor for `Location`.
@@ -39,13 +41,7 @@ class GeocodedLocation(Location):
             return
 
         # Attempt to reverse geocode coordinates
-        geolocator = geopy.Nominatim(user_agent='def', timeout=30)
-        geocode = RateLimiter(
-            func=geolocator.reverse,
-            min_delay_seconds=1,
-            return_value_on_exception=None
-        ) 
-        location = geocode((lat, lon))
+        location = get_geocoder().reverse(lat, lon)
 
         # Return empty location if geocoding failed:
         if not location:
@@ -53,19 +49,10 @@ class GeocodedLocation(Location):
 
         # Parse location for remaining properties
         self._is_valid = True
-        self._state = location.raw['address']["state"]
-        try:
-            self._full_address = location.raw['display_name']
-        except:
-            self._full_address = None
-        try:
-            self._zip = location.raw['address']["postcode"]
-        except:
-            self._zip = None
-        try:
-            self._county = location.raw['address']["county"]
-        except:
-            self._county = None
+        self._state = location.state
+        self._full_address = location.full_address
+        self._zip = location.zip
+        self._county = location.county
 
 
     @property
@@ -124,7 +111,26 @@ class GeocodedLocation(Location):
         return self._is_valid
 
 
-    def _is_valid_latlon(self, lat:float, lon:float) -> bool:
+    @classmethod
+    def prefetch(cls, coords: Iterable[Tuple[float, float]]) -> None:
+        '''
+        Reverse geocodes many coordinate pairs concurrently, such
+        as those of a page of reports, so that locations created
+        for them afterwards are answered from the cache.
+
+        Parameters:
+            coords (iterable of (float, float)): The latitude-longitude pairs.
+
+        Returns:
+            None
+        '''
+        valid = [(lat, lon) for lat, lon in coords if cls._is_valid_latlon(lat, lon)]
+        if valid:
+            get_geocoder().reverse_many(valid)
+
+
+    @staticmethod
+    def _is_valid_latlon(lat:float, lon:float) -> bool:
         """
         Validates a coordinate pair. See:
         http://en.wikipedia.org/wiki/Extreme_points_of_the_United_States#Westernmost
@@ -137,10 +143,10 @@ class GeocodedLocation(Location):
             (boolean)
         """
         return (
-            np.isfinite(lat) and 
+            math.isfinite(lat) and 
             lat > 0 and
             lat <= 90 and
-            np.isfinite(lon) and 
+            math.isfinite(lon) and 
             lon < 0 and
             lon >= -180
         )
@@ -0,0 +1,273 @@
+'''
+merged_report.py
+
+Merges near-identical reports before submission. Users often file
+the same incident several times, from a few meters apart and within
+minutes. Reports from the same user that lie within a distance and
+time window of one another, directly or through a chain of other
+such reports, are merged into a single `MergedReport` whose images,
+senses and report types combine those of its members.
+
+Candidate pairs are found with a grid over each user's reports, in
+cells one distance wide and one time window long, so that only
+reports in neighboring cells are compared.
+'''
+
+import math
+from collections import defaultdict
+from datetime import datetime
+from models.base_location import Location
+from models.base_report import Report, ReportError
+from models.metadata import NA, STATUS_MERGED, Metadata
+from typing import Dict, List, Optional, Tuple
+
+
+EARTH_RADIUS_IN_M = 6_371_000
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_IN_M / 180
+
+
+def haversine_in_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    '''
+    Computes the great-circle distance between two
+    coordinates, in meters.
+    '''
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_IN_M * math.asin(math.sqrt(a))
+
+
+class MergedReport(Report):
+    '''
+    A complaint combining several reports of the same incident. Takes
+    its id, reporter, location and date from the earliest report.
+    '''
+
+    __slots__ = ('_reports',)
+
+    def __init__(self, reports: List[Report]) -> None:
+        '''
+        The constructor for `MergedReport`.
+
+        Parameters:
+            reports (list of Report): The reports to merge.
+
+        Returns:
+            None
+        '''
+        self._reports = sorted(reports, key=lambda r: r.date_time)
+
+
+    @property
+    def reports(self) -> List[Report]:
+        '''
+        The merged reports, earliest first.
+        '''
+        return self._reports
+
+
+    @property
+    def merged_ids(self) -> List:
+        '''
+        The ids of the reports merged into the earliest one.
+        '''
+        return [r.id for r in self._reports[1:]]
+
+
+    @property
+    def id(self):
+        return self._reports[0].id
+
+
+    @property
+    def lat(self) -> float:
+        return self._reports[0].lat
+
+
+    @property
+    def lon(self) -> float:
+        return self._reports[0].lon
+
+
+    @property
+    def description(self) -> str:
+        '''
+        The distinct descriptions of the merged reports, in order.
+        '''
+        descriptions = dict.fromkeys(r.description for r in self._reports if r.description)
+        return '\n\n'.join(descriptions)
+
+
+    @property
+    def date(self) -> str:
+        return self._reports[0].date
+
+
+    @property
+    def date_time(self) -> datetime:
+        return self._reports[0].date_time
+
+
+    @property
+    def first_name(self) -> str:
+        return self._reports[0].first_name
+
+
+    @property
+    def last_name(self) -> str:
+        return self._reports[0].last_name
+
+
+    @property
+    def email(self) -> str:
+        return self._reports[0].email
+
+
+    @property
+    def location(self) -> Location:
+        return self._reports[0].location
+
+
+    @property
+    def senses(self) -> Dict:
+        '''
+        The senses affected in any of the merged reports.
+        '''
+        senses = {}
+        for report in self._reports:
+            for name, affected in report.senses.items():
+                senses[name] = senses.get(name, False) or affected
+        return senses
+
+
+    @property
+    def image_url(self) -> List[str]:
+        '''
+        The distinct images of the merged reports, in order.
+        '''
+        return list(dict.fromkeys(url for r in self._reports for url in r.image_url))
+
+
+    @property
+    def report_type(self) -> List:
+        '''
+        The distinct report types of the merged reports, in order.
+        '''
+        return list(dict.fromkeys(t for r in self._reports for t in r.report_type))
+
+
+def _reporter(report: Report) -> Optional[str]:
+    '''
+    The user who filed a report, or None if unknown,
+    in which case the report is never merged.
+    '''
+    return report.email.strip().lower() if report.email else None
+
+
+def merge_nearby_reports(
+    reports: List[Report],
+    distance_in_m: float,
+    window_in_min: float) -> List[Report]:
+    '''
+    Merges reports filed by the same user within a distance and time
+    window of one another. Reports without coordinates or an email
+    address are left as they are.
+
+    Parameters:
+        reports (list of Report): The reports.
+
+        distance_in_m (float): The maximum distance between reports
+            of the same incident. Zero disables merging.
+
+        window_in_min (float): The maximum number of minutes between
+            reports of the same incident. Zero disables merging.
+
+    Returns:
+        (list of Report): The reports, with those of the same incident
+            replaced by a `MergedReport` at the position of the first.
+    '''
+    if not distance_in_m or not window_in_min or len(reports) < 2:
+        return list(reports)
+
+    window_in_sec = window_in_min * 60
+    parents = list(range(len(reports)))
+
+    def find(i: int) -> int:
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    # Project coordinates onto a local plane, in meters, to assign cells
+    points: List[Optional[Tuple[float, float, float]]] = []
+    grid: Dict[Tuple, List[int]] = defaultdict(list)
+    for i, report in enumerate(reports):
+        reporter = _reporter(report)
+        if reporter is None or report.lat is None or report.lon is None:
+            points.append(None)
+            continue
+        try:
+            t = report.date_time.timestamp()
+        except ReportError:
+            # Left to fail on its own when submitted
+            points.append(None)
+            continue
+
+        lat, lon = report.lat, report.lon
+        points.append((lat, lon, t))
+        y = lat * METERS_PER_DEGREE
+        x = lon * METERS_PER_DEGREE * math.cos(math.radians(lat))
+        cell = (int(x // distance_in_m), int(y // distance_in_m), int(t // window_in_sec))
+
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dt in (-1, 0, 1):
+                    neighbor = (reporter, cell[0] + dx, cell[1] + dy, cell[2] + dt)
+                    for j in grid.get(neighbor, ()):
+                        other = points[j]
+                        if abs(t - other[2]) <= window_in_sec and \
+                            haversine_in_m(lat, lon, other[0], other[1]) <= distance_in_m:
+                            parents[find(i)] = find(j)
+        grid[(reporter, *cell)].append(i)
+
+    clusters: Dict[int, List[Report]] = defaultdict(list)
+    for i, report in enumerate(reports):
+        clusters[find(i)].append(report)
+
+    merged, seen = [], set()
+    for i in range(len(reports)):
+        root = find(i)
+        if root in seen:
+            continue
+        seen.add(root)
+        members = clusters[root]
+        merged.append(members[0] if len(members) == 1 else MergedReport(members))
+    return merged
+
+
+def merged_metadata(reports: List[Report]) -> List[Metadata]:
+    '''
+    Records the reports merged into others, so that they
+    are not submitted again on later runs.
+
+    Parameters:
+        reports (list of Report): The reports, as returned
+            by `merge_nearby_reports`.
+
+    Returns:
+        (list of Metadata): One entry per merged report.
+    '''
+    metadata = []
+    for report in reports:
+        if isinstance(report, MergedReport):
+            for member in report.reports[1:]:
+                metadata.append(Metadata(
+                    member,
+                    submission_type=NA,
+                    agency=NA,
+                    status=STATUS_MERGED,
+                    status_reason=f"Merged into report {report.id}.",
+                    submission_time=None))
+    return metadata
@@ -4,22 +4,50 @@ metadata.py
 Class to store metadata from submission.
 '''
 
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
+from functools import partial
 from types import FunctionType
+from typing import Dict, Iterable, Optional
+from models.agency_health import get_agency_health, get_deferred_submissions
 from models.api_report import Report
+from models.base_report import ReportError
+from models.validation import missing_fields
+from utilities import metrics, web_workers
 
 
 WEB_SUBMISSION = 'web'
 EMAIL_SUBMISSION = 'email'
 STATUS_NOT_SUBMITTED = 'not submitted'
 STATUS_SUBMITTED = 'submitted'
+STATUS_DEFERRED = 'deferred'
+STATUS_REJECTED = 'rejected'
+STATUS_MERGED = 'merged'
 NA = 'N/A'
 
+# Agencies to which submissions are limited, if any (e.g., when retrying)
+_agency_filter: ContextVar = ContextVar('agency_filter', default=None)
+
+# Submissions rejected by pre-flight checks, keyed by agency and submission type
+_rejections: ContextVar = ContextVar('rejections', default={})
+
+# Fields the state module's forms require, declared as its `REQUIRED_FIELDS`
+_required_fields: ContextVar = ContextVar('required_fields', default=())
+
 
 class Metadata:
     '''
     Class to store submission-related metadata
     '''
+
+    # Metadata fields, in column order
+    FIELDS = ('id', 'report_date', 'agency', 'submission_type', 'status',
+        'status_reason', 'submission_time', 'state', 'county')
+
+    __slots__ = tuple(FIELDS)
+
     def __init__(
         self,
         report:Report,
@@ -55,16 +83,81 @@ class Metadata:
         else:
             self.county, self.state = None, None
 
-    
+
+    def to_dict(self) -> Dict:
+        '''
+        Converts the metadata into a dictionary with
+        one key per metadata field, in column order.
+
+        Parameters:
+            None
+
+        Returns:
+            (dict): The metadata row.
+        '''
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
     def __str__(self):
-        return f'{vars(self)}'
+        return f'{self.to_dict()}'
+
+
+@contextmanager
+def only_agencies(agencies: Iterable[str]):
+    '''
+    Limits the submissions made within the block to the given
+    agencies. Submissions to other agencies are skipped.
+
+    Parameters:
+        agencies (iterable of str): The names of the agencies.
+    '''
+    token = _agency_filter.set(set(agencies))
+    try:
+        yield
+    finally:
+        _agency_filter.reset(token)
+
+
+@contextmanager
+def rejected_submissions(rejections: Iterable['Metadata']):
+    '''
+    Records the given rejections in place of the submissions made
+    within the block to the same agency with the same submission
+    type. Other submissions of the report are made as usual.
+
+    Parameters:
+        rejections (iterable of Metadata): The rejected submissions.
+    '''
+    token = _rejections.set({(m.agency, m.submission_type): m for m in rejections})
+    try:
+        yield
+    finally:
+        _rejections.reset(token)
+
+
+@contextmanager
+def requiring_fields(fields: Iterable[str]):
+    '''
+    Declares the report fields required by the forms submitted within
+    the block, so that their failures on reports missing any of them
+    are recorded as rejections rather than against the agency.
+
+    Parameters:
+        fields (iterable of str): The required fields (e.g., 'email').
+    '''
+    token = _required_fields.set(tuple(fields))
+    try:
+        yield
+    finally:
+        _required_fields.reset(token)
 
 
 def submit_and_return_metadata(
     report:Report,
     submit_fun:FunctionType, 
     submission_type:str,
-    agency:str) -> Metadata:
+    agency:str,
+    required_fields:Iterable[str]=None) -> Optional[Metadata]:
     '''
     Submits report to state agencies and prepares metadata.
 
@@ -73,25 +166,74 @@ def submit_and_return_metadata(
         submit_fun (function): state-specific submission function
         submission_type (str): "web" or "email"
         agency (str): Name of state agency (e.g., Colorado DEP)
+        required_fields (iterable of str): Fields the submission
+            requires. Defaults to those declared by `requiring_fields`.
     Returns:
-        Metadata instance corresponding to unqiue agency submissions.  
+        Metadata instance corresponding to unqiue agency submissions,
+        or None if submissions to the agency are being skipped.
     '''
-    try:
-        submit_fun(report)
-        return Metadata(
-            report,
-            submission_type=submission_type, 
-            agency=agency, 
-            status=STATUS_SUBMITTED,
-            status_reason=None,
-            submission_time=datetime.utcnow()
-        )
-    except Exception as e:
+    agencies = _agency_filter.get()
+    if agencies is not None and agency not in agencies:
+        return None
+
+    # Record submissions that failed their pre-flight checks as rejected
+    rejection = _rejections.get().get((agency, submission_type))
+    if rejection is not None:
+        return rejection
+
+    if required_fields is None:
+        required_fields = _required_fields.get()
+
+    # Skip agencies whose circuit is open, queueing the submission for a retry
+    health = get_agency_health(agency)
+    if not health.allow_request():
+        get_deferred_submissions().add(agency, partial(submit_and_return_metadata,
+            report, submit_fun, submission_type, agency, required_fields))
         return Metadata(
             report,
-            submission_type=submission_type, 
+            submission_type=submission_type,
             agency=agency,
-            status=STATUS_NOT_SUBMITTED,
-            status_reason=f"Error in submitting web form. {e}",
+            status=STATUS_DEFERRED,
+            status_reason=f"Deferred while {agency} is unavailable.",
             submission_time=None
         )
+
+    with health.slot():
+        start = time.perf_counter()
+        try:
+            # Web forms may be submitted in an isolated worker process
+            if submission_type == WEB_SUBMISSION:
+                with metrics.FORM_SUBMISSION_SECONDS.time(agency=agency):
+                    web_workers.submit(submit_fun, report)
+            else:
+                submit_fun(report)
+            health.record_success(time.perf_counter() - start)
+            return Metadata(
+                report,
+                submission_type=submission_type, 
+                agency=agency, 
+                status=STATUS_SUBMITTED,
+                status_reason=None,
+                submission_time=datetime.utcnow()
+            )
+        except Exception as e:
+            # Failures caused by the report say nothing of the agency's health
+            if isinstance(e, ReportError) or missing_fields(report, required_fields):
+                health.record_report_failure()
+                return Metadata(
+                    report,
+                    submission_type=submission_type,
+                    agency=agency,
+                    status=STATUS_REJECTED,
+                    status_reason=f"Report cannot be submitted. {e}",
+                    submission_time=None
+                )
+            health.record_failure(time.perf_counter() - start)
+            return Metadata(
+                report,
+                submission_type=submission_type, 
+                agency=agency,
+                status=STATUS_NOT_SUBMITTED,
+                status_reason=f"Error in submitting web form. {e}",
+                submission_time=None
+            )
@@ -6,6 +6,8 @@ from models.base_location import Location
 
 
 class MockLocation(Location):
+
+    __slots__ = ('_lat', '_lon', '_state', '_zip', '_county', '_full_address')
     
     def __init__(
         self,
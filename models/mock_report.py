@@ -15,6 +15,8 @@ class MockReport(Report):
     A mock report to use for test submissions.
     '''
 
+    __slots__ = ('_id', '_lat', '_lon', '_location')
+
     def __init__(self, json: Dict) -> None:
         '''
         The constructor for `MockReport`.
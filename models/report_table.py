@@ -0,0 +1,289 @@
+'''
+report_table.py
+
+Normalizes pages of FracTracker API reports into a columnar table in a
+single pass, as an alternative to building one `ApiReport` at a time.
+Rows of the table are exposed as lightweight `Report` views.
+'''
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from models.base_location import Location
+from models.base_report import Report
+from models.geocoded_location import GeocodedLocation
+from models.senses import SENSE_NAMES, mask_to_senses, senses_to_mask
+from typing import Dict, Iterable, Iterator, List
+
+
+# Columns held by a `ReportTable`, in order
+COLUMNS = ['id', 'date', 'lat', 'lon', 'senses', 'description',
+    'first_name', 'last_name', 'email', 'image_url', 'report_type']
+
+
+class ReportTable:
+    '''
+    Column-oriented storage for FracTracker API reports. Ids, dates,
+    coordinates and sense bitmasks are held in numpy arrays, while
+    text fields and the image and industry lists are object columns.
+    '''
+
+    def __init__(self, columns: Dict[str, np.ndarray]) -> None:
+        '''
+        The constructor for `ReportTable`. Use `from_features` or
+        `concat` to build a table from API data.
+
+        Parameters:
+            columns (dict of np.ndarray): Equal-length arrays keyed
+                by the names in `COLUMNS`.
+
+        Returns:
+            None
+        '''
+        self.columns = columns
+
+
+    @classmethod
+    def from_features(cls, features: Iterable[Dict]) -> 'ReportTable':
+        '''
+        Builds a table from report features, such as the
+        `features` list of a single API page.
+
+        Parameters:
+            features (iterable of dict): The reports as returned
+                by the FracTracker API.
+
+        Returns:
+            (ReportTable): The table.
+        '''
+        values = {name: [] for name in COLUMNS}
+        for f in features:
+            props = f['properties']
+            user = props['created_by']['properties']
+
+            # Some coords found in "geometries", others found directly in "coords"
+            geometry = f['geometry']
+            if 'geometries' in geometry:
+                lon, lat = geometry['geometries'][0]['coordinates'][:2]
+            else:
+                lon, lat = geometry['coordinates'][:2]
+
+            values['id'].append(f['id'])
+            values['date'].append(props['report_date'])
+            values['lat'].append(lat)
+            values['lon'].append(lon)
+            values['senses'].append(senses_to_mask(
+                s['properties']['name'] for s in props['senses']))
+            values['description'].append(props['description'])
+            values['first_name'].append(user['first_name'] if not user['first_name'] else 'NA')
+            values['last_name'].append(user['last_name'] if not user['last_name'] else 'NA')
+            values['email'].append(user['email'])
+            values['image_url'].append(
+                [s['properties']['original'] for s in props['images']])
+            values['report_type'].append(
+                [s['properties']['name'] for s in props['industries']])
+
+        return cls({
+            'id': np.array(values['id'], dtype=np.int64),
+            'date': np.array(values['date'], dtype='datetime64[us]'),
+            'lat': np.array(values['lat'], dtype=np.float64),
+            'lon': np.array(values['lon'], dtype=np.float64),
+            'senses': np.array(values['senses'], dtype=np.uint8),
+            **{name: _object_array(values[name]) for name in
+                ('description', 'first_name', 'last_name', 'email',
+                'image_url', 'report_type')}
+        })
+
+
+    @classmethod
+    def concat(cls, tables: List['ReportTable']) -> 'ReportTable':
+        '''
+        Stacks several tables (e.g., one per API page) into one.
+        '''
+        if not tables:
+            return cls.from_features([])
+        return cls({name: np.concatenate([t.columns[name] for t in tables])
+            for name in COLUMNS})
+
+
+    def __len__(self) -> int:
+        return len(self.columns['id'])
+
+
+    def __getitem__(self, index: int) -> 'ReportRow':
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Report index {index} out of range.")
+        return ReportRow(self, index % len(self))
+
+
+    def __iter__(self) -> Iterator['ReportRow']:
+        return (ReportRow(self, i) for i in range(len(self)))
+
+
+    def to_dataframe(self) -> pd.DataFrame:
+        '''
+        Converts the table into a DataFrame without copying
+        it row by row. Sense bitmasks are expanded into one
+        boolean column per sense (e.g., 'senses.Smell').
+
+        Parameters:
+            None
+
+        Returns:
+            (pd.DataFrame): The reports.
+        '''
+        df = pd.DataFrame({name: self.columns[name] for name in COLUMNS})
+        for name, sense in SENSE_NAMES.items():
+            df[f'senses.{name}'] = (self.columns['senses'] & int(sense)) > 0
+        return df
+
+
+def _object_array(values: List) -> np.ndarray:
+    '''
+    Builds a one-dimensional object array, even when the
+    values are themselves lists of equal length.
+    '''
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+class ReportRow(Report):
+    '''
+    A read-only `Report` view over one row of a `ReportTable`.
+    The location is reverse geocoded on first access.
+    '''
+
+    __slots__ = ('_table', '_index', '_location')
+
+    def __init__(self, table: ReportTable, index: int) -> None:
+        '''
+        The constructor for `ReportRow`.
+
+        Parameters:
+            table (ReportTable): The table holding the report.
+
+            index (int): The row of the report within the table.
+
+        Returns:
+            None
+        '''
+        self._table = table
+        self._index = index
+        self._location = None
+
+
+    def _get(self, column: str):
+        return self._table.columns[column][self._index]
+
+
+    @property
+    def id(self) -> str:
+        '''
+        The report id.
+        '''
+        return int(self._get('id'))
+
+
+    @property
+    def lat(self) -> float:
+        '''
+        The latitude of the incident described by the report.
+        '''
+        return float(self._get('lat'))
+
+
+    @property
+    def lon(self) -> float:
+        '''
+        The longitude of the incident described by the report.
+        '''
+        return float(self._get('lon'))
+
+
+    @property
+    def description(self) -> str:
+        '''
+        The report description.
+        '''
+        return self._get('description')
+
+
+    @property
+    def date(self) -> str:
+        '''
+        The date on which the report was submitted. Uses ISO format.
+        '''
+        return self.date_time.isoformat()
+
+
+    @property
+    def date_time(self) -> datetime:
+        '''
+        The date on which the report was submitted, as a `datetime`.
+        '''
+        return self._get('date').item()
+
+
+    @property
+    def first_name(self) -> str:
+        '''
+        The first name of the FracTracker user submitting the report.
+        '''
+        return self._get('first_name')
+
+
+    @property
+    def last_name(self) -> str:
+        '''
+        The last name of the FracTracker user submitting the report.
+        '''
+        return self._get('last_name')
+
+
+    @property
+    def email(self) -> str:
+        '''
+        The email address of the FracTracker user submitting the report.
+        '''
+        return self._get('email')
+
+
+    @property
+    def location(self) -> Location:
+        '''
+        The location in which the user observed an incident.
+        '''
+        if self._location is None:
+            self._location = GeocodedLocation(lat=self.lat, lon=self.lon)
+        return self._location
+
+
+    @property
+    def senses(self) -> Dict:
+        '''
+        A dictionary enumerating affected user senses.
+        Keys include 'Sight', 'Smell', 'Taste','Touch',
+        and 'Sound', while values are either booleans.
+        '''
+        return mask_to_senses(int(self._get('senses')))
+
+
+    @property
+    def image_url(self) -> List[str]:
+        '''
+        The list of URLs to images uploaded by the user.
+        '''
+        return self._get('image_url')
+
+
+    @property
+    def report_type(self) -> List:
+        '''
+        A list of complaint report types.
+        '''
+        return self._get('report_type')
+
+
+    def __repr__(self) -> str:
+        return f'ReportRow(index={self._index}, id={self.id})'
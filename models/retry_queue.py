@@ -0,0 +1,207 @@
+'''
+retry_queue.py
+
+A durable queue of failed agency submissions. Each entry tracks the
+attempts made to submit one report to one agency and the earliest time
+at which it should be retried, backing off exponentially between
+attempts until the maximum number of attempts is reached. Entries of
+merged reports keep the ids of the reports merged into them, so that
+retries resubmit the whole incident.
+'''
+
+import json
+from datetime import datetime, timedelta
+from models.metadata import (NA, STATUS_DEFERRED, STATUS_NOT_SUBMITTED,
+    STATUS_REJECTED, STATUS_SUBMITTED, Metadata)
+from typing import Dict, List
+from utilities.logger import logger
+from utilities.storage import IDatastore
+
+
+# Columns of the persisted queue, in order
+RETRY_COLUMNS = ['id', 'agency', 'attempts', 'last_status',
+    'last_status_reason', 'last_attempt_time', 'next_attempt_time', 'merged_ids']
+
+# Statuses for which a submission is queued for a retry
+RETRYABLE_STATUSES = (STATUS_NOT_SUBMITTED, STATUS_DEFERRED)
+
+
+class RetryQueue:
+    '''
+    Failed submissions keyed by report id and agency, persisted
+    through a datastore between runs.
+    '''
+
+    def __init__(
+        self,
+        datastore: IDatastore,
+        max_attempts: int=5,
+        base_delay_in_sec: float=3600,
+        max_delay_in_sec: float=604800) -> None:
+        '''
+        The constructor for `RetryQueue`.
+
+        Parameters:
+            datastore (IDatastore): The datastore holding the queue.
+
+            max_attempts (int): The number of failed attempts after
+                which a submission is dropped from the queue.
+
+            base_delay_in_sec (float): The delay before the first retry.
+                Doubles with each subsequent failed attempt.
+
+            max_delay_in_sec (float): The upper bound of the delay.
+
+        Returns:
+            None
+        '''
+        self._datastore = datastore
+        self.max_attempts = max_attempts
+        self.base_delay_in_sec = base_delay_in_sec
+        self.max_delay_in_sec = max_delay_in_sec
+        self.entries = {}
+
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+    def load(self) -> 'RetryQueue':
+        '''
+        Reads the queue from the datastore.
+
+        Parameters:
+            None
+
+        Returns:
+            (RetryQueue): The queue itself.
+        '''
+        df = self._datastore.read_data()
+        self.entries = {}
+        if len(df.index):
+            for entry in df.to_dict('records'):
+                entry['attempts'] = int(entry['attempts'])
+                entry['next_attempt_time'] = datetime.fromisoformat(entry['next_attempt_time'])
+                # Queues saved before merged ids were kept lack them
+                merged_ids = entry.get('merged_ids')
+                entry['merged_ids'] = json.loads(merged_ids) \
+                    if isinstance(merged_ids, str) and merged_ids else []
+                self.entries[(entry['id'], entry['agency'])] = entry
+        logger.info(f'Loaded {len(self.entries)} submission(s) queued for retry.')
+        return self
+
+
+    def save(self) -> None:
+        '''
+        Writes the queue to the datastore.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        '''
+        rows = [{**e, 'next_attempt_time': e['next_attempt_time'].isoformat(),
+            'merged_ids': json.dumps(e.get('merged_ids', []))}
+            for e in self.entries.values()]
+        import pandas as pd
+        self._datastore.write_data(pd.DataFrame(rows, columns=RETRY_COLUMNS))
+
+
+    def due(self, now: datetime=None) -> Dict[object, List[str]]:
+        '''
+        Finds the queued submissions whose backoff has elapsed.
+
+        Parameters:
+            now (datetime): The current UTC time. Defaults to now.
+
+        Returns:
+            (dict): The agencies to retry, keyed by report id.
+        '''
+        now = now or datetime.utcnow()
+        due = {}
+        for (report_id, agency), entry in self.entries.items():
+            if entry['next_attempt_time'] <= now:
+                due.setdefault(report_id, []).append(agency)
+        return due
+
+
+    def merged_ids(self, report_id) -> List:
+        '''
+        The ids of the reports merged into a queued report, if any.
+        '''
+        for (entry_id, _), entry in self.entries.items():
+            if entry_id == report_id and entry.get('merged_ids'):
+                return list(entry['merged_ids'])
+        return []
+
+
+    def record(
+        self,
+        metadata: List[Metadata],
+        now: datetime=None,
+        merged_ids: Dict[object, List]=None) -> None:
+        '''
+        Updates the queue with the outcome of submissions. Successful
+        and rejected submissions are removed, since retrying the
+        latter would fail again, failed ones are (re)scheduled with
+        exponential backoff and deferred ones are rescheduled without
+        counting as an attempt.
+
+        Parameters:
+            metadata (list of Metadata): The submission metadata.
+
+            now (datetime): The current UTC time. Defaults to now.
+
+            merged_ids (dict of list): The ids of the reports merged
+                into each submitted report, keyed by its id.
+
+        Returns:
+            None
+        '''
+        now = now or datetime.utcnow()
+        for meta in metadata:
+            key = (meta.id, meta.agency)
+            if meta.status in (STATUS_SUBMITTED, STATUS_REJECTED):
+                self.entries.pop(key, None)
+                continue
+            if meta.status not in RETRYABLE_STATUSES or meta.agency == NA:
+                continue
+
+            entry = self.entries.get(key) or {'id': meta.id, 'agency': meta.agency,
+                'attempts': 0, 'merged_ids': []}
+            if merged_ids and meta.id in merged_ids:
+                entry['merged_ids'] = list(merged_ids[meta.id])
+            if meta.status == STATUS_NOT_SUBMITTED:
+                entry['attempts'] += 1
+
+            if entry['attempts'] >= self.max_attempts:
+                logger.warning(f'Giving up on submitting report {meta.id} to '
+                    f'{meta.agency} after {entry["attempts"]} attempt(s).')
+                self.entries.pop(key, None)
+                continue
+
+            delay = min(self.max_delay_in_sec,
+                self.base_delay_in_sec * 2 ** max(entry['attempts'] - 1, 0))
+            entry.update({
+                'last_status': meta.status,
+                'last_status_reason': meta.status_reason,
+                'last_attempt_time': now.isoformat(),
+                'next_attempt_time': now + timedelta(seconds=delay)
+            })
+            self.entries[key] = entry
+
+
+    def discard(self, report_id) -> None:
+        '''
+        Removes every queued submission of a report,
+        such as one no longer available from the API.
+
+        Parameters:
+            report_id (int): The report id.
+
+        Returns:
+            None
+        '''
+        for key in [k for k in self.entries if k[0] == report_id]:
+            del self.entries[key]
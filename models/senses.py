@@ -0,0 +1,68 @@
+'''
+senses.py
+
+Bitmask representation of the physical senses a FracTracker
+user can mark as affected in a report. Senses the API lists under
+names not known here are logged and kept as `Sense.OTHER`.
+'''
+
+from enum import IntFlag
+from typing import Dict, Iterable
+from utilities.logger import logger
+
+
+class Sense(IntFlag):
+    '''
+    The affected senses, combinable into a single integer mask.
+    '''
+    SIGHT = 1
+    SMELL = 2
+    TASTE = 4
+    TOUCH = 8
+    SOUND = 16
+    OTHER = 32
+
+
+# Sense names as they appear in the FracTracker API (e.g., 'Smell')
+SENSE_NAMES = {sense.name.title(): sense for sense in Sense if sense != Sense.OTHER}
+
+# The key of senses under unknown names in the dictionary of senses
+OTHER_SENSE_NAME = 'Other'
+
+
+def senses_to_mask(names: Iterable[str]) -> int:
+    '''
+    Combines sense names from the API into a bitmask.
+
+    Parameters:
+        names (iterable of str): The sense names (e.g., ['Sight', 'Smell']).
+
+    Returns:
+        (int): The bitmask.
+    '''
+    mask = 0
+    for name in names:
+        sense = SENSE_NAMES.get(name)
+        if sense is None:
+            logger.warning(f"Unknown sense '{name}' recorded as {OTHER_SENSE_NAME.lower()}.")
+            sense = Sense.OTHER
+        mask |= sense
+    return mask
+
+
+def mask_to_senses(mask: int) -> Dict[str, bool]:
+    '''
+    Expands a bitmask into the dictionary of senses exposed
+    by the `senses` property of a `Report`.
+
+    Parameters:
+        mask (int): The bitmask.
+
+    Returns:
+        (dict): Keys are sense names and values are booleans,
+            with an `Other` key only if unknown senses were listed.
+    '''
+    senses = {name: bool(mask & sense) for name, sense in SENSE_NAMES.items()}
+    if mask & Sense.OTHER:
+        senses[OTHER_SENSE_NAME] = True
+    return senses
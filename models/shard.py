@@ -0,0 +1,165 @@
+'''
+shard.py
+
+Shards let a nightly run fan out across several instances of the app,
+each submitting a subset of the reports: those located in a set of
+states (e.g., the states with web forms on one shard and those taking
+emails on another), those whose id falls in one of several hash
+buckets, or both. Each shard saves its metadata to its own partition,
+and the partitions are merged into the metadata afterwards.
+'''
+
+import math
+import re
+import submissions
+import zlib
+from models.base_report import Report
+from models.submission import state_module_name
+from typing import Dict, Iterable, List, Optional
+
+
+class Shard:
+    '''
+    A subset of reports selected by state and/or by a hash of their ids.
+    '''
+
+    def __init__(
+        self,
+        states: Iterable[str]=None,
+        index: int=None,
+        count: int=None) -> None:
+        '''
+        The constructor for `Shard`.
+
+        Parameters:
+            states (iterable of str): The states whose reports are
+                included, named as in `submissions` (e.g., 'west_virginia')
+                or in full (e.g., 'West Virginia'). Defaults to all
+                states, including reports without a known state.
+
+            index (int): The hash bucket of the report ids included,
+                from zero to `count` - 1.
+
+            count (int): The number of hash buckets. Defaults
+                to None, in which case ids are not hashed.
+
+        Returns:
+            None
+        '''
+        self.states = None
+        if states is not None:
+            self.states = sorted({s.strip().replace(' ', '_').lower() for s in states})
+            unknown = [s for s in self.states if s not in submissions.__all__]
+            if not self.states or unknown:
+                raise Exception(f"Shard states {unknown or '[]'} are not configured "
+                    f"for submission. Expected some of {submissions.__all__}.")
+
+        if (index is None) != (count is None):
+            raise Exception("A hash shard requires both an index and a count.")
+        if count is not None and not (isinstance(count, int) and isinstance(index, int)
+            and count > 0 and 0 <= index < count):
+            raise Exception(f"Invalid hash shard {index} of {count}.")
+        self.index = index
+        self.count = count
+
+
+    @classmethod
+    def from_spec(cls, spec: Optional[Dict]) -> Optional['Shard']:
+        '''
+        Creates a shard from the `shard` field of a request body, as in
+        `{"states": ["ohio", "texas"]}` or `{"index": 0, "count": 4}`.
+
+        Parameters:
+            spec (dict): The shard specification, if any.
+
+        Returns:
+            (Shard): The shard, or None if no spec was given.
+        '''
+        if spec is None:
+            return None
+        if not isinstance(spec, dict) or set(spec) - {'states', 'index', 'count'}:
+            raise Exception(f"Invalid shard {spec}. Expected "
+                "'states' and/or an 'index' and 'count'.")
+        return cls(spec.get('states'), spec.get('index'), spec.get('count'))
+
+
+    @classmethod
+    def from_name(cls, name: str) -> 'Shard':
+        '''
+        Creates a shard from its name (e.g., 'ohio_texas',
+        '0_of_4' or 'all'), the inverse of `name`.
+
+        Parameters:
+            name (str): The shard's name.
+
+        Returns:
+            (Shard): The shard.
+        '''
+        index = count = None
+        match = re.fullmatch(r'(?:(.*)_)?(\d+)_of_(\d+)', name)
+        if match:
+            remainder, index, count = match.group(1) or '', int(match.group(2)), int(match.group(3))
+        else:
+            remainder = '' if name == 'all' else name
+
+        # State names contain underscores, so match the longest name first
+        states = []
+        while remainder:
+            state = max((s for s in submissions.__all__ if remainder == s
+                or remainder.startswith(f'{s}_')), key=len, default=None)
+            if state is None:
+                raise Exception(f"Invalid shard name '{name}'.")
+            states.append(state)
+            remainder = remainder[len(state) + 1:]
+        return cls(states or None, index, count)
+
+
+    @property
+    def name(self) -> str:
+        '''
+        A name identifying the shard, used to name its partitions
+        (e.g., 'ohio_texas' or '0_of_4').
+        '''
+        parts = list(self.states or [])
+        if self.count is not None:
+            parts.append(f'{self.index}_of_{self.count}')
+        return re.sub(r'[^a-z0-9_]', '', '_'.join(parts)) or 'all'
+
+
+    def includes(self, report: Report) -> bool:
+        '''
+        Whether a report belongs to the shard. Ids are hashed with
+        CRC-32, which, unlike `hash`, is stable across processes.
+        '''
+        if self.states is not None:
+            state = report.location.state if report.location.is_valid else None
+            if not state or state_module_name(report) not in self.states:
+                return False
+        if self.count is not None:
+            return zlib.crc32(str(report.id).encode()) % self.count == self.index
+        return True
+
+
+    def overlaps(self, other: 'Shard') -> bool:
+        '''
+        Whether a report may belong to both shards. Hash buckets
+        `i` of `n` and `j` of `m` share ids if `i` and `j` are
+        congruent modulo the greatest common divisor of `n` and `m`.
+        '''
+        if self.states is not None and other.states is not None \
+            and not set(self.states) & set(other.states):
+            return False
+        if self.count is not None and other.count is not None:
+            return (self.index - other.index) % math.gcd(self.count, other.count) == 0
+        return True
+
+
+    def select(self, reports: List[Report]) -> List[Report]:
+        '''
+        Filters reports down to those belonging to the shard.
+        '''
+        return [r for r in reports if self.includes(r)]
+
+
+    def __str__(self) -> str:
+        return self.name
@@ -5,12 +5,18 @@ Utilities to process submissions to state agencies
 
 '''
 
-import pandas as pd
+import importlib
+import submissions
+from collections import defaultdict
+from contextlib import ExitStack
+from models.agency_health import DeferredSubmissions, deferred_submissions
 from models.base_report import Report
-from models.metadata import Metadata
-from submissions import *
-from typing import List
-from utilities.logger import logger
+from models.metadata import (STATUS_REJECTED, WEB_SUBMISSION, Metadata,
+    only_agencies, rejected_submissions, requiring_fields)
+from models.validation import validate_batch
+from types import ModuleType
+from typing import Dict, List, Optional
+from utilities.logger import log_context, logger
 
 
 class Submission:
@@ -18,24 +24,52 @@ class Submission:
     Represents a complaint submission to a governmental agency.
     '''
 
-    def __init__(self, report: Report) -> None:
+    def __init__(
+        self,
+        report: Report,
+        agencies: List[str]=None,
+        rejections: List[Metadata]=None,
+        deferred: DeferredSubmissions=None) -> None:
         '''
         The constructor for `Submission`.
 
         Parameters: 
             report (Report): The report to submit.
 
+            agencies (list of str): The names of the agencies to
+                which the report should be submitted (e.g., when
+                retrying failed submissions). Defaults to all
+                agencies configured for the report's state.
+
+            rejections (list of Metadata): The report's submissions
+                that failed their pre-flight checks, as returned by
+                `validate_submissions`. They are recorded as rejected
+                instead of being made, while the report's other
+                submissions (e.g., emails) are made as usual.
+
+            deferred (DeferredSubmissions): The queue of the run's
+                submissions deferred while their agencies are
+                unavailable. Defaults to that of the current thread.
+
         Returns:
             None
         '''
         self.report = report
-        if not report.location.is_valid:
-            self.metadata = [Metadata(report, status_reason='Location data invalid.')]
-        else:
-            self.metadata = self._submit_to_agency()
+        state = report.location.state if report.location.is_valid else None
+        with log_context(report_id=report.id, state=state, stage='submission'):
+            if not report.location.is_valid:
+                self.metadata = [Metadata(report, status_reason='Location data invalid.')]
+            else:
+                with ExitStack() as stack:
+                    if agencies is not None:
+                        stack.enter_context(only_agencies(agencies))
+                    if deferred is not None:
+                        stack.enter_context(deferred_submissions(deferred))
+                    stack.enter_context(rejected_submissions(rejections or ()))
+                    self.metadata = self._submit_to_agency()
         
 
-    def _submit_to_agency(self) -> List[pd.DataFrame]:
+    def _submit_to_agency(self) -> List[Metadata]:
         '''
         If there are no errors with submission, send
         information to state via webform or email.
@@ -44,16 +78,16 @@ class Submission:
             None
 
         Returns:
-            (list of pd.DataFrame): The submission metadata.
+            (list of Metadata): The submission metadata.
         '''        
         try:
-            # Replace spaces with underscores for states like "West Virginia"
-            state_string = self.report.location.state.replace(' ', '_').lower()
-
             # Get reference to state Python module and call its
             # main method to submit complaint to state agenc(y/ies)
-            fun = globals()[state_string]
-            metadata = fun.main(self.report)
+            fun = state_module(state_module_name(self.report))
+            if fun is None:
+                raise KeyError(state_module_name(self.report))
+            with requiring_fields(getattr(fun, 'REQUIRED_FIELDS', ())):
+                metadata = [m for m in fun.main(self.report) if m is not None]
 
             # Log metadata from submission
             for meta in metadata:
@@ -66,3 +100,89 @@ class Submission:
             msg = 'State not yet configured for submission.'
             return [Metadata(self.report, status_reason = msg)]        
 
+
+
+def state_module_name(report: Report) -> str:
+    '''
+    The name of the submission module for a report's state.
+    Replaces spaces with underscores for states like "West Virginia".
+    '''
+    return report.location.state.replace(' ', '_').lower()
+
+
+def state_module(state: str) -> Optional[ModuleType]:
+    '''
+    The submission module of a state, imported on first use, or
+    None if the state is not yet configured for submission.
+    '''
+    if state not in submissions.__all__:
+        return None
+    return importlib.import_module(f'submissions.{state}')
+
+
+def group_by_state(reports: List[Report]) -> Dict[str, List[Report]]:
+    '''
+    Groups reports with valid locations by the name of their state module.
+    '''
+    reports_by_state = defaultdict(list)
+    for report in reports:
+        if report.location.is_valid and report.location.state:
+            reports_by_state[state_module_name(report)].append(report)
+    return reports_by_state
+
+
+def validate_submissions(reports: List[Report]) -> Dict[object, List[Metadata]]:
+    '''
+    Runs each state module's pre-flight checks against all reports
+    before any is submitted, so that reports whose web form would
+    fail are rejected without launching a browser. The checks concern
+    the web form of the module's agency, so only that submission is
+    rejected. See `models.validation` for the checks modules may declare.
+
+    Parameters:
+        reports (list of Report): The reports to submit.
+
+    Returns:
+        (dict of list of Metadata): The metadata of rejected
+            submissions, keyed by report id.
+    '''
+    reports_by_id = {r.id: r for r in reports}
+    rejections = {}
+    for state, state_reports in group_by_state(reports).items():
+        module = state_module(state)
+        if module is None:
+            continue
+        for report_id, reasons in validate_batch(module, state_reports).items():
+            report = reports_by_id[report_id]
+            rejections.setdefault(report_id, []).append(Metadata(
+                report,
+                submission_type=WEB_SUBMISSION,
+                agency=module.AGENCY_NAME,
+                status=STATUS_REJECTED,
+                status_reason=' '.join(reasons),
+                submission_time=None))
+            logger.info(f'Rejected report {report_id} for {module.AGENCY_NAME}. '
+                f'{" ".join(reasons)}', extra={'report_id': report_id,
+                'state': report.location.state, 'stage': 'validation'})
+    return rejections
+
+
+def prepare_submissions(reports: List[Report]) -> None:
+    '''
+    Lets each state module prepare a batch of reports before they
+    are submitted one at a time (e.g., by rendering all of a run's
+    complaint emails). Modules opt in by defining `prepare(reports)`.
+
+    Parameters:
+        reports (list of Report): The reports to submit.
+
+    Returns:
+        None
+    '''
+    for state, state_reports in group_by_state(reports).items():
+        module = state_module(state)
+        if hasattr(module, 'prepare'):
+            try:
+                module.prepare(state_reports)
+            except Exception as e:
+                logger.warning(f'Failed to prepare submissions for {state}. {e}')
@@ -0,0 +1,171 @@
+'''
+validation.py
+
+Pre-flight checks run against a batch of reports before any browser
+is launched. Each state module may declare the report fields its web
+form requires as `REQUIRED_FIELDS` (e.g., 'location.county'), define
+`photo_urls(report)` returning the photos its submission will upload
+and define `validate(report)` returning the reasons, if any, a report
+would fail for other causes. Photos are checked concurrently for the
+whole batch with HEAD requests.
+'''
+
+import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from models.base_report import Report
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional
+from utilities.county_index import get_county_index
+
+
+PHOTO_CHECK_TIMEOUT_IN_SEC = 10
+PHOTO_CHECK_MAX_WORKERS = 8
+
+# Results of photo checks, keyed by URL; None when the photo is available
+_photo_errors: Dict[str, Optional[str]] = {}
+_photo_errors_lock = threading.Lock()
+
+
+def missing_fields(report: Report, fields: Iterable[str]) -> List[str]:
+    '''
+    Finds the required report fields that have no value.
+
+    Parameters:
+        report (Report): The complaint from the FracTracker API.
+
+        fields (iterable of str): The fields, with nested attributes
+            separated by periods (e.g., 'location.county').
+
+    Returns:
+        (list of str): One reason per missing field.
+    '''
+    reasons = []
+    for field in fields:
+        value = report
+        for attr in field.split('.'):
+            value = getattr(value, attr, None)
+        if value is None or value == '':
+            reasons.append(f"Missing {field}.")
+    return reasons
+
+
+def unknown_county(state: str, report: Report) -> List[str]:
+    '''
+    Checks that a report's county is offered by a state web form's
+    county dropdown. Missing counties are left to `missing_fields`.
+    '''
+    county = report.location.county
+    if not county:
+        return []
+    try:
+        get_county_index(state).option(county)
+    except Exception as e:
+        return [str(e)]
+    return []
+
+
+def _check_photo(url: str) -> Optional[str]:
+    '''
+    Requests the headers of a photo, returning the reason it
+    could not be retrieved or None if it is available.
+    '''
+    try:
+        response = requests.head(url, allow_redirects=True,
+            timeout=PHOTO_CHECK_TIMEOUT_IN_SEC)
+    except requests.RequestException as e:
+        return f"Photo '{url}' could not be retrieved. {e}"
+    if not response.ok:
+        return f"Photo '{url}' could not be retrieved (HTTP {response.status_code})."
+    return None
+
+
+def check_photos(urls: Iterable[str]) -> None:
+    '''
+    Checks photos that have not yet been checked concurrently.
+
+    Parameters:
+        urls (iterable of str): The photo URLs.
+
+    Returns:
+        None
+    '''
+    with _photo_errors_lock:
+        unchecked = list(dict.fromkeys(u for u in urls if u not in _photo_errors))
+    if not unchecked:
+        return
+
+    with ThreadPoolExecutor(max_workers=PHOTO_CHECK_MAX_WORKERS) as executor:
+        errors = dict(zip(unchecked, executor.map(_check_photo, unchecked)))
+    with _photo_errors_lock:
+        _photo_errors.update(errors)
+
+
+def photo_errors(urls: List[str]) -> List[str]:
+    '''
+    Finds the photos that could not be retrieved,
+    checking any not already checked.
+
+    Parameters:
+        urls (list of str): The photo URLs.
+
+    Returns:
+        (list of str): One reason per unavailable photo.
+    '''
+    check_photos(urls)
+    with _photo_errors_lock:
+        return [_photo_errors[u] for u in urls if _photo_errors[u]]
+
+
+def rejection_reasons(module: ModuleType, report: Report) -> List[str]:
+    '''
+    Runs a state module's pre-flight checks against a report.
+
+    Parameters:
+        module (ModuleType): The state submission module.
+
+        report (Report): The complaint from the FracTracker API.
+
+    Returns:
+        (list of str): The reasons the submission would fail,
+            if any.
+    '''
+    reasons = missing_fields(report, getattr(module, 'REQUIRED_FIELDS', ()))
+    if hasattr(module, 'validate'):
+        reasons.extend(module.validate(report))
+    if hasattr(module, 'photo_urls'):
+        reasons.extend(photo_errors(module.photo_urls(report)))
+    return reasons
+
+
+def validate_batch(module: ModuleType, reports: List[Report]) -> Dict[object, List[str]]:
+    '''
+    Runs a state module's pre-flight checks against a batch of
+    reports, checking all of the batch's photos concurrently first.
+
+    Parameters:
+        module (ModuleType): The state submission module.
+
+        reports (list of Report): The complaints to check.
+
+    Returns:
+        (dict of list of str): The reasons for rejection,
+            keyed by the id of each failing report.
+    '''
+    if hasattr(module, 'photo_urls'):
+        check_photos(url for r in reports for url in module.photo_urls(r))
+
+    rejections = {}
+    for report in reports:
+        reasons = rejection_reasons(module, report)
+        if reasons:
+            rejections[report.id] = reasons
+    return rejections
+
+
+def clear_photo_checks() -> None:
+    '''
+    Forgets the results of photo checks (e.g., between runs).
+    '''
+    with _photo_errors_lock:
+        _photo_errors.clear()
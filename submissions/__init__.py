@@ -1,11 +1,21 @@
-import submissions.california
-import submissions.colorado
-import submissions.kentucky
-import submissions.nebraska
-import submissions.new_mexico
-import submissions.north_dakota
-import submissions.ohio
-import submissions.pennsylvania
-import submissions.tennessee
-import submissions.texas
-import submissions.west_virginia
\ No newline at end of file
+'''
+Submission modules, one per state, named after the state in
+lowercase with spaces replaced by underscores. Modules are imported
+when a state first has reports to submit (see
+`models.submission.state_module`), so that the Selenium bindings
+used by most of them are not loaded when the app starts.
+'''
+
+__all__ = [
+    'california',
+    'colorado',
+    'kentucky',
+    'nebraska',
+    'new_mexico',
+    'north_dakota',
+    'ohio',
+    'pennsylvania',
+    'tennessee',
+    'texas',
+    'west_virginia'
+]
@@ -9,11 +9,13 @@ Colorado's webform if the complaint occurs in that locale.
 
 from constants import DEV, PROD, PROD_ENV, TEST
 from models.base_report import Report
+from models.email_template import render_batch
 from models.metadata import EMAIL_SUBMISSION, STATUS_SUBMITTED, NA, submit_and_return_metadata, Metadata
 from models.state_email import StateEmail
-from selenium.webdriver.support.ui import Select
+from selenium.webdriver.common.by import By
 from typing import List
 from utilities import web_utilities
+from utilities.county_index import get_county_index
 from utilities.config import Config
 from utilities.fractracker_api import FracAPI
 
@@ -34,81 +36,68 @@ def submit(report):
     Outputs:
         screenshot (png): temporary output
     '''
-    # Start browser instance
-    driver = web_utilities.launch_chrome_browser(URL, "Submission")
-
-    # Complaint Type - default value is others, and put specific value in input
-    driver.find_element_by_id("Field103_other").click()
-    text_elements_complaint_type = {'Field103_other_value': report.report_type}
-    web_utilities.complete_text_fields_id(text_elements_complaint_type, driver)
-
-    # County
-    select = Select(driver.find_element_by_name('Field100'))
-    select.select_by_visible_text(report.location.county)
-
-    # connection to incident: choose other
-    driver.find_element_by_id('Field95_other').click()
-    # fill in other with NA value
-    text_element_connection_incident = {'Field95_other_value': NA}
-    web_utilities.complete_text_fields_id(text_element_connection_incident, driver)
-
-    # will you provide personal information for this complaint, check yes
-    driver.find_element_by_id('Field47-0').click()
-    text_elements_personal_info = {
-        'Field4': NA,
-        'Field5': report.location.city,
-        'Field45': report.first_name,
-        'Field102': report.last_name,
-        'Field7': report.location.zip,
-        'Field8': report.email
-    }
-    web_utilities.complete_text_fields_id(text_elements_personal_info, driver)
-    # best way to communicate is email
-    driver.find_element_by_id('Field97-1').click()
-
-    # description of complaint
-    text_elements_description = {'Field50': report.location.full_address,
-    'Field51': report.description}
-    web_utilities.complete_text_fields_id(text_elements_description, driver)
-
-    # Is this an ongoing issue(s)? check no
-    driver.find_element_by_id('Field104-1').click()
-
-    # Do you know who the oil and gas company is? check no
-    driver.find_element_by_id('Field54-1').click()
-
-    # attachment
-    # Upload photos if there is attachment
-    if report.image_url:
-        driver.find_element_by_id('Field39-0').click()
-        image_urls = report.image_url[:MAX_ALLOWED_PHOTOS]
-        photo_xpath = "//input[@id='Field40']"
-        web_utilities.upload_photos(driver, image_urls, photo_xpath)
-    # if there is no attachment, check no
-    else:
-        driver.find_element_by_id('Field39-1').click()
-
-    # Submit
-    #driver.find_element_by_id('action').click()
-    if PROD_ENV == TEST or PROD_ENV == DEV:
-        image_path = f"{report.location.state}_{report.id}.png"
-        web_utilities.take_screenshot(driver, image_path)
-
-    elif PROD_ENV == PROD:
-        submit_path = "action"
-        web_utilities.submit_and_check(browser=driver,
-                                       submit_string=submit_path, 
-                                       id=True)
-
-    # Quit browser instance
-    driver.quit()
-
+    # Confirm the county is offered by the form before launching browser
+    county_index = get_county_index('colorado')
+    county_index.option(report.location.county)
 
-def main(report: Report) -> List[Metadata]:
+    # Start browser instance
+    with web_utilities.chrome_browser(URL, "Submission") as driver:
+        # County
+        county_index.select(driver.find_element_by_name('Field100'), report.location.county)
+
+        form_elements = {
+            # Complaint Type - default value is others, and put specific value in input
+            'Field103_other': True,
+            'Field103_other_value': ', '.join(report.report_type),
+            # connection to incident: choose other and fill in other with NA value
+            'Field95_other': True,
+            'Field95_other_value': NA,
+            # will you provide personal information for this complaint, check yes
+            'Field47-0': True,
+            'Field4': NA,
+            'Field5': NA,  # City is not provided by the geocoder
+            'Field45': report.first_name,
+            'Field102': report.last_name,
+            'Field7': report.location.zip,
+            'Field8': report.email,
+            # best way to communicate is email
+            'Field97-1': True,
+            # description of complaint
+            'Field50': report.location.full_address,
+            'Field51': report.description,
+            # Is this an ongoing issue(s)? check no
+            'Field104-1': True,
+            # Do you know who the oil and gas company is? check no
+            'Field54-1': True,
+            # attachment: check yes if there are photos and no otherwise
+            'Field39-0' if report.image_url else 'Field39-1': True
+        }
+        web_utilities.fill_form(driver, form_elements, By.ID)
+
+        # attachment
+        # Upload photos if there is attachment
+        if report.image_url:
+            image_urls = report.image_url[:MAX_ALLOWED_PHOTOS]
+            photo_xpath = "//input[@id='Field40']"
+            web_utilities.upload_photos(driver, image_urls, photo_xpath)
+
+        # Submit
+        #driver.find_element_by_id('action').click()
+        if PROD_ENV == TEST or PROD_ENV == DEV:
+            image_path = f"{report.location.state}_{report.id}.png"
+            web_utilities.take_screenshot(driver, image_path)
+
+        elif PROD_ENV == PROD:
+            submit_path = "action"
+            web_utilities.submit_and_check(browser=driver,
+                                           submit_string=submit_path, 
+                                           id=True)
+
+
+def submit_email(report: Report):
     '''
-    Main function to open headless chrome browser and submit a state web
-    form and/or send environmental complaint email to Colorado state agency
-    depending on report county
+    Main function to send environmental complaint email to Colorado state agency
+
     Parameters:
         report (Report instance): Single complaint from FracTracker API
     '''
@@ -122,9 +111,30 @@ def main(report: Report) -> List[Metadata]:
         subject=SUBJECT
     )
     colorado_email.email_agency()
+
+
+def prepare(reports: List[Report]) -> None:
+    '''
+    Renders the complaint emails for a batch of reports
+    ahead of their submission.
+
+    Parameters:
+        reports (list of Report): Complaints from FracTracker API
+    '''
+    render_batch(reports, AGENCY_NAME)
+
+
+def main(report: Report) -> List[Metadata]:
+    '''
+    Main function to open headless chrome browser and submit a state web
+    form and/or send environmental complaint email to Colorado state agency
+    depending on report county
+    Parameters:
+        report (Report instance): Single complaint from FracTracker API
+    '''
     email_metadata = submit_and_return_metadata(
         report=report,
-        submit_fun=StateEmail.email_agency,
+        submit_fun=submit_email,
         submission_type=EMAIL_SUBMISSION,
         agency=AGENCY_NAME
     )
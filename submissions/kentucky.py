@@ -7,6 +7,7 @@ with environmental complaints.
 
 from models.state_email import StateEmail
 from models.base_report import Report
+from models.email_template import render_batch
 from models.metadata import EMAIL_SUBMISSION, Metadata, submit_and_return_metadata
 from typing import List
 from utilities.config import Config
@@ -35,6 +36,17 @@ def submit(report:Report):
     kentucky_email.email_agency()
 
 
+def prepare(reports: List[Report]) -> None:
+    '''
+    Renders the complaint emails for a batch of reports
+    ahead of their submission.
+
+    Parameters:
+        reports (list of Report): Complaints from FracTracker API
+    '''
+    render_batch(reports, AGENCY_NAME)
+
+
 def main(report: Report) -> List[Metadata]:
     '''
     Submits and returns metadata for a given report.
@@ -9,18 +9,29 @@ import time
 from constants import PROD, PROD_ENV, TEST
 from models.base_report import Report
 from models.metadata import WEB_SUBMISSION, Metadata, submit_and_return_metadata
+from models.validation import unknown_county
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select, WebDriverWait
+from selenium.webdriver.support.ui import WebDriverWait
 from typing import List
 from utilities import web_utilities
+from utilities.county_index import get_county_index
 
 
 AGENCY_NAME = "New Mexico Environment Department"
 URL = "https://ents.web.env.nm.gov/public/INCIDENT_HDR_add.php"
 
+# Report fields the web form cannot be completed without
+REQUIRED_FIELDS = ('location.county', 'description', 'email')
+
+
+def validate(report: Report) -> List[str]:
+    '''
+    Checks that the report's county is offered by the web form.
+    '''
+    return unknown_county('new_mexico', report)
+
 
 def submit(report):
     '''
@@ -32,54 +43,32 @@ def submit(report):
     Outputs:
         screenshot (png): temporary output
     '''
+    # Confirm the county is offered by the form before launching browser
+    county_index = get_county_index('new_mexico')
+    county_index.option(report.location.county)
+
     # Start browser instance
-    browser = web_utilities.launch_chrome_browser(
+    with web_utilities.chrome_browser(
         url=URL,
         check_string="Envir",
-        avoid_detection=True)
-
-    # Complaint Type
-    # Directions say to select "No Match in List, Describe Below"
-    select = Select(browser.find_element_by_name('value1'))
-    select.select_by_value("ZZ")
-
-    # County
-    county = report.location.county.replace(' County', '')
-    select = Select(browser.find_element_by_name('value13'))
-    select.select_by_visible_text(county)
-
-    # Text elements
-    location = "The latitude-longitude is (" + format(report.lat) + "," + format(report.lon)+ ")"
-    text_elements = {
-        'value16': report.description,
-        'value4': location,
-        'value17': f'{report.first_name} {report.last_name}',
-        'value24': report.email
-    }
-    complete_text_fields(text_elements, browser)
-
-    # Submit and document new page in non-dev environments
-    if PROD_ENV in [TEST, PROD]:
-        submit_web_form(report.id, browser)
-
-    # Quit browser instance
-    browser.quit()
-
-
-def complete_text_fields(text_elements, browser):
-    '''
-    Completes all text fields set up in dictionary.
-    Inputs:
-    - dictionary with keys as html element ids (e.g., "city") and values as
-      string inputs, e.g., ("Miami")
-    - current selenium webdriver instance (browser)
-    '''
-    for ids, val in text_elements.items():
-        elem = browser.find_element_by_name(ids)
-        elem.clear()
-        elem.send_keys(val)
-        elem.send_keys(Keys.TAB)
-        time.sleep(0.5)
+        avoid_detection=True) as browser:
+        # Complaint type, county and text elements
+        # Directions say to select "No Match in List, Describe Below"
+        county = county_index.option(report.location.county)
+        location = "The latitude-longitude is (" + format(report.lat) + "," + format(report.lon)+ ")"
+        form_elements = {
+            'value1': "ZZ",
+            'value13': county.value or county.text,
+            'value16': report.description,
+            'value4': location,
+            'value17': f'{report.first_name} {report.last_name}',
+            'value24': report.email
+        }
+        web_utilities.fill_form(browser, form_elements, By.NAME)
+
+        # Submit and document new page in non-dev environments
+        if PROD_ENV in [TEST, PROD]:
+            submit_web_form(report.id, browser)
 
 
 def submit_web_form(
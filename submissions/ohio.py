@@ -6,13 +6,11 @@ Protection Agency's web form for complaints.
 
 import time
 from constants import PROD, PROD_ENV, TEST
-from datetime import datetime
 from models.base_report import Report
 from models.metadata import WEB_SUBMISSION, Metadata
 from models.metadata import submit_and_return_metadata
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from typing import Dict, List, Tuple
@@ -23,6 +21,17 @@ AGENCY_NAME = "Ohio Environmental Protection Agency"
 URL ="https://survey123.arcgis.com/share/af6b0b7597d842cb8debfc73c51ff085"
 MAX_ALLOWED_PHOTOS = 3
 
+# Report fields the web form cannot be completed without. Users
+# often leave their names blank, which the form accepts.
+REQUIRED_FIELDS = ('description', 'email')
+
+# The Survey123 form can be completed without the basemap
+# tiles of its location widget, fonts or images
+BROWSER_PROFILE = web_utilities.BrowserProfile(
+    blocked_url_patterns=web_utilities.DEFAULT_BLOCKED_URL_PATTERNS + (
+        '*basemaps.arcgis.com*', '*basemaps-api.arcgis.com*',
+        '*/MapServer/tile/*', '*/VectorTileServer/tile/*'))
+
 def fill_dictionaries(report: Report) -> Tuple[Dict, Dict]:
     '''
     Fill the dictionaries with the relevant paths and information
@@ -44,13 +53,20 @@ def fill_dictionaries(report: Report) -> Tuple[Dict, Dict]:
         'description': report.description,
         'latitude': str(report.lat),
         'longitude': str(report.lon),
-        'date': datetime.fromisoformat(report.date).strftime('%m/%d/%Y'),
+        'date': report.date_time.strftime('%m/%d/%Y'),
         'name': " ".join([report.first_name,report.last_name]),
         'email': report.email
     }
     return dict_xpath, dict_text
 
 
+def photo_urls(report: Report) -> List[str]:
+    '''
+    The photos uploaded with the report's submission.
+    '''
+    return report.image_url[:MAX_ALLOWED_PHOTOS]
+
+
 def submit(report: Report) -> None:
     '''
     Pushes and fills all necessary buttons to submit a claim for Ohio.
@@ -60,40 +76,37 @@ def submit(report: Report) -> None:
         dict_xpath (dict) - the xpaths for the dict keys
     '''
     # Launch browser
-    browser = web_utilities.launch_chrome_browser(URL, "Environmental Complaint")
-    
-    # Fill in all the text variables
-    complex_bypath(browser, report)
-
-    # Populate complaint category
-    complaint_cat = complaint_category(report)
-    cat_comp = WebDriverWait(browser, 10).until(
-        EC.element_to_be_clickable((By.XPATH, complaint_cat)))
-    cat_comp.click()
-    time.sleep(0.5)
-
-    # Populate complaint type
-    other = "//*[@id='Complaints']/fieldset[2]/fieldset/div/label[last()]"
-    other_cat = WebDriverWait(browser, 20).until(
-        EC.element_to_be_clickable((By.XPATH, other)))
-    other_cat.click()
-    time.sleep(0.5)
+    with web_utilities.chrome_browser(URL, "Environmental Complaint",
+        profile=BROWSER_PROFILE) as browser:
+        # Fill in all the text variables
+        complex_bypath(browser, report)
+
+        # Populate complaint category
+        complaint_cat = complaint_category(report)
+        cat_comp = WebDriverWait(browser, 10).until(
+            EC.element_to_be_clickable((By.XPATH, complaint_cat)))
+        cat_comp.click()
+        time.sleep(0.5)
 
-    # Upload photos
-    if report.image_url:
-        image_urls = report.image_url[:MAX_ALLOWED_PHOTOS]
-        photo_xpath = '//*[@id="Complaints"]/label[6]/input[1]'
-        web_utilities.upload_photos(browser, image_urls, photo_xpath)
+        # Populate complaint type
+        other = "//*[@id='Complaints']/fieldset[2]/fieldset/div/label[last()]"
+        other_cat = WebDriverWait(browser, 20).until(
+            EC.element_to_be_clickable((By.XPATH, other)))
+        other_cat.click()
+        time.sleep(0.5)
 
-    # Save tracking number
-    complaint_tracking = browser.find_element_by_xpath("//*[@id='Complaints']/label[8]/p").text
+        # Upload photos
+        if report.image_url:
+            image_urls = photo_urls(report)
+            photo_xpath = '//*[@id="Complaints"]/label[6]/input[1]'
+            web_utilities.upload_photos(browser, image_urls, photo_xpath)
 
-    # Submit and document new page in non-dev environments
-    if PROD_ENV in [TEST, PROD]:
-        submit_web_form(report.id, browser)
+        # Save tracking number
+        complaint_tracking = browser.find_element_by_xpath("//*[@id='Complaints']/label[8]/p").text
 
-    # Quit browser instance
-    browser.quit()
+        # Submit and document new page in non-dev environments
+        if PROD_ENV in [TEST, PROD]:
+            submit_web_form(report.id, browser)
 
 
 def complaint_category(report: Report) -> str:
@@ -131,13 +144,8 @@ def complex_bypath(browser: WebDriver, report: Report) -> None:
         report (class instance) - report class instance
     '''
     dict_xpath, dict_text = fill_dictionaries(report)
-    for key, _ in dict_text.items():
-        var_ = WebDriverWait(browser, 20).until(
-            EC.element_to_be_clickable((By.XPATH, dict_xpath[key])))
-        var_.send_keys(dict_text[key])
-        if key != "date":
-            var_.send_keys(Keys.TAB)
-        time.sleep(0.5)
+    fields = {dict_xpath[key]: text for key, text in dict_text.items()}
+    web_utilities.fill_form(browser, fields, By.XPATH, fallback_wait_in_sec=20)
 
 
 def submit_web_form(
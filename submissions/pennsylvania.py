@@ -13,12 +13,17 @@ from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from utilities import web_utilities
+from utilities.county_index import get_county_index
 from models.metadata import WEB_SUBMISSION, Metadata, submit_and_return_metadata
+from models.validation import unknown_county
 
 
 AGENCY_NAME = "Pennsylvania Department of Environmental Protection"
 URL = "https://www.depgreenport.state.pa.us/EnvironmentalComplaintForm/"
 
+# Report fields the web form cannot be completed without
+REQUIRED_FIELDS = ('location.county', 'location.full_address', 'description', 'email')
+
 
 def complete_all_fields(report: Report, browser: WebDriver):
     '''
@@ -47,9 +52,8 @@ def complete_all_fields(report: Report, browser: WebDriver):
 
     ## COMPLAINT INFO
     # County
-    county = report.location.county.replace(' County', '')
-    select = Select(browser.find_element_by_id('countyProblem'))
-    select.select_by_visible_text(county)
+    get_county_index('pennsylvania').select(
+        browser.find_element_by_id('countyProblem'), report.location.county)
 
     # Township
     address_chunks = report.location.full_address.split(", ")
@@ -65,36 +69,42 @@ def complete_all_fields(report: Report, browser: WebDriver):
     browser.find_element_by_xpath(xpath).click()
 
 
+def validate(report: Report) -> List[str]:
+    '''
+    Checks that the report's county is offered by the web form.
+    '''
+    return unknown_county('pennsylvania', report)
+
+
 def submit(report:Report):
     '''
     Main function to open headless chrome browswer and submit a state web form.
     Parameters:
         report (Report instance): Single complaint from FracTracker API
     '''
+    # Confirm the county is offered by the form before launching browser
+    get_county_index('pennsylvania').option(report.location.county)
+
     # Launch web browser
-    browser = web_utilities.launch_chrome_browser(
+    with web_utilities.chrome_browser(
         url=URL,
         check_string="Complaint Form",
-        avoid_detection=True)
-
-    # Populate fields
-    complete_all_fields(report, browser)
-    web_utilities.take_screenshot(browser, "pa.png")
-
-    # Submit and document new page in non-dev environments
-    if PROD_ENV in [TEST, PROD]:
-        web_utilities.submit_web_form(
-            report_state='pennsylvania',
-            report_id=report.id,
-            browser=browser,
-            find_by_method=By.ID,
-            find_by_target='SubmitButton',
-            confirmation_find_by_method=By.ID,
-            confirmation_find_by_target='submitForm'
-        )
-
-    # Quit browser instance
-    browser.quit()
+        avoid_detection=True) as browser:
+        # Populate fields
+        complete_all_fields(report, browser)
+        web_utilities.take_screenshot(browser, "pa.png")
+
+        # Submit and document new page in non-dev environments
+        if PROD_ENV in [TEST, PROD]:
+            web_utilities.submit_web_form(
+                report_state='pennsylvania',
+                report_id=report.id,
+                browser=browser,
+                find_by_method=By.ID,
+                find_by_target='SubmitButton',
+                confirmation_find_by_method=By.ID,
+                confirmation_find_by_target='submitForm'
+            )
 
 
 def main(report:Report) -> List[Metadata]:
@@ -5,18 +5,21 @@ Emails Tennessee Department of Environment and Conservation
 with environmental complaints.
 '''
 from models.state_email import StateEmail
+from typing import List
 from utilities.config import Config
 from utilities.fractracker_api import FracAPI
 from models.base_report import Report
-from models.metadata import EMAIL_SUBMISSION, submit_and_return_metadata
+from models.email_template import render_batch
+from models.metadata import EMAIL_SUBMISSION, Metadata, submit_and_return_metadata
 
 AGENCY_NAME = "Tennessee Department of Environment and Conservation"
 SUBJECT = "Environmental Complaint"
 
 
-def main(report: Report):
+def submit(report: Report):
     '''
     Main function to send environmental complaint email to Tennessee state agency
+    
     Parameters:
         report (Report instance): Single complaint from FracTracker API
     '''
@@ -30,9 +33,29 @@ def main(report: Report):
         subject=SUBJECT
     )
     tennessee_email.email_agency()
+
+
+def prepare(reports: List[Report]) -> None:
+    '''
+    Renders the complaint emails for a batch of reports
+    ahead of their submission.
+
+    Parameters:
+        reports (list of Report): Complaints from FracTracker API
+    '''
+    render_batch(reports, AGENCY_NAME)
+
+
+def main(report: Report) -> List[Metadata]:
+    '''
+    Submits and returns metadata for a given report.
+
+    Parameters:
+        report (Report instance): Single complaint from FracTracker API
+    '''
     email_metadata = submit_and_return_metadata(
         report=report,
-        submit_fun=StateEmail.email_agency,
+        submit_fun=submit,
         submission_type=EMAIL_SUBMISSION,
         agency=AGENCY_NAME
     )
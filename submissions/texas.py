@@ -10,16 +10,20 @@ from datetime import datetime
 from models.base_report import Report
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.webdriver import WebDriver
-from selenium.webdriver.support.ui import Select
 from typing import List
 from utilities import web_utilities
+from utilities.county_index import get_county_index
 from models.metadata import WEB_SUBMISSION, Metadata, submit_and_return_metadata
+from models.validation import unknown_county
 from utilities.logger import logger
 
 
 AGENCY_NAME = "Texas Comission on Environmental Quality"
 URL = "https://www.tceq.texas.gov/assets/public/compliance/monops/complaints/complaints.html"
 
+# Report fields the web form cannot be completed without
+REQUIRED_FIELDS = ('location.county', 'location.full_address', 'email')
+
 
 def complete_all_fields(report: Report, browser: WebDriver):
     '''
@@ -30,19 +34,7 @@ def complete_all_fields(report: Report, browser: WebDriver):
         browser: (selenium webdriver instance)
     '''
     # Parse datetime
-    report_date: datetime = datetime.fromisoformat(report.date)
-
-    # All text elements
-    text_elements = {
-        'datepicker': report_date.strftime('%m/%d/%Y'),
-        'location': report.location.full_address,
-        'concern': report.description if report.description else "N/A",
-        'name': f'{report.first_name} {report.last_name}',
-        'email': report.email,
-        'city': 'See address above',
-        'who': 'N/A'
-    }
-    web_utilities.complete_text_fields_id(text_elements, browser)
+    report_date: datetime = report.date_time
 
     # Time observed in nearest 15-minute increment
     hour = 12 if report_date.hour in (0, 12) else report_date.hour % 12
@@ -50,19 +42,32 @@ def complete_all_fields(report: Report, browser: WebDriver):
     minute = round(report_date.minute / 15) * 15
     minute_str = str(minute).rjust(2, '0')
     time_observed = f"{hour_str}:{minute_str}"
-    
-    time_select = Select(browser.find_element_by_id('time'))
-    time_select.select_by_value(time_observed)
 
     # AM or PM
     am_pm = 'am' if report_date.hour < 12 else 'pm'
-    am_pm_select = Select(browser.find_element_by_id('ampm'))
-    am_pm_select.select_by_value(am_pm)
 
-    # County
-    county = report.location.county.replace(' County', '').strip()
-    county_select = Select(browser.find_element_by_id('county'))
-    county_select.select_by_value(county)
+    # All text elements and dropdowns
+    county = get_county_index('texas').option(report.location.county)
+    form_elements = {
+        'datepicker': report_date.strftime('%m/%d/%Y'),
+        'location': report.location.full_address,
+        'concern': report.description if report.description else "N/A",
+        'name': f'{report.first_name} {report.last_name}',
+        'email': report.email,
+        'city': 'See address above',
+        'who': 'N/A',
+        'time': time_observed,
+        'ampm': am_pm,
+        'county': county.value or county.text
+    }
+    web_utilities.fill_form(browser, form_elements, By.ID)
+
+
+def validate(report: Report) -> List[str]:
+    '''
+    Checks that the report's county is offered by the web form.
+    '''
+    return unknown_county('texas', report)
 
 
 def submit(report: Report):
@@ -72,28 +77,27 @@ def submit(report: Report):
     Parameters:
         report (Report instance): Single complaint from FracTracker API
     '''
+    # Confirm the county is offered by the form before launching browser
+    get_county_index('texas').option(report.location.county)
+
     # Extract report here to eliminate other code changes
-    browser = web_utilities.launch_chrome_browser(
+    with web_utilities.chrome_browser(
         url=URL,
         check_string="TCEQ",
         page_load_wait_in_sec=20,
-        avoid_detection=True)
-
-    complete_all_fields(report, browser)
-    web_utilities.take_screenshot(browser, "texas.png")
-
-    # Submit and document new page in non-dev environments
-    if PROD_ENV in [TEST, PROD]:
-        web_utilities.submit_web_form(
-            report_state='texas',
-            report_id=report.id,
-            browser=browser,
-            find_by_method=By.XPATH,
-            find_by_target='//*[@id="content"]/p/button'
-        )
-
-    # Quit browser instance
-    browser.quit()
+        avoid_detection=True) as browser:
+        complete_all_fields(report, browser)
+        web_utilities.take_screenshot(browser, "texas.png")
+
+        # Submit and document new page in non-dev environments
+        if PROD_ENV in [TEST, PROD]:
+            web_utilities.submit_web_form(
+                report_state='texas',
+                report_id=report.id,
+                browser=browser,
+                find_by_method=By.XPATH,
+                find_by_target='//*[@id="content"]/p/button'
+            )
 
 
 def main(report:Report) -> List[Metadata]:
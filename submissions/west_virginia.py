@@ -9,19 +9,24 @@ related to air quality.
 
 from constants import PROD, PROD_ENV, TEST
 from models.base_report import Report
+from models.email_template import render_batch
 from models.metadata import EMAIL_SUBMISSION, WEB_SUBMISSION, Metadata, submit_and_return_metadata
 from models.state_email import StateEmail
+from models.validation import missing_fields, unknown_county
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
 from typing import List
 from utilities import web_utilities
 from utilities.config import Config
+from utilities.county_index import get_county_index
 
 
 AGENCY_NAME = "West Virginia Department of Environmental Protection"
 SUBJECT = "Environmental Complaint"
 URL = "https://dep.wv.gov/WWE/ee/geninfo/Pages/complaints.aspx"
 
+# Report fields the web form cannot be completed without
+WEB_FORM_REQUIRED_FIELDS = ('location.county', 'description')
+
 
 def submit_web_form(report: Report):
     '''
@@ -33,37 +38,85 @@ def submit_web_form(report: Report):
     Output:
         screenshot: Temporary output
     '''
+    # Confirm the county is offered by the form before launching browser
+    county_index = get_county_index('west_virginia')
+    county_index.option(report.location.county)
+
     # Launch web browser and switch to form contained in iframe
-    browser = web_utilities.launch_chrome_browser(URL, "Complaint")
-    browser.switch_to.frame("MSOPageViewerWebPart_WebPartWPQ1")
+    with web_utilities.chrome_browser(URL, "Complaint") as browser:
+        browser.switch_to.frame("MSOPageViewerWebPart_WebPartWPQ1")
 
-    # Select county
-    selector = Select(browser.find_element_by_name('c_county'))
-    county = report.location.county.replace(' County', '')
-    selector.select_by_value(county)
+        # Select county
+        county_index.select(browser.find_element_by_name('c_county'), report.location.county)
     
-    # Enter data into text fields
-    text_elements = {
-        'c_location': f"The latitude-longitude is ({report.lat}, {report.lon})",
-        'c_description': report.description,
-        'c_name': f'{report.first_name} {report.last_name}'
-    }
-    web_utilities.complete_text_fields_name(text_elements, browser)
-    web_utilities.take_screenshot(browser, "wv.png")
-
-    # Submit and document new page in non-dev environments
-    if PROD_ENV in [TEST, PROD]:
-        print("Submitting form.")
-        web_utilities.submit_web_form(
-            report_state='west_virginia',
-            report_id=report.id,
-            browser=browser,
-            find_by_method=By.NAME,
-            find_by_target='submit'
-        )
+        # Enter data into text fields
+        text_elements = {
+            'c_location': f"The latitude-longitude is ({report.lat}, {report.lon})",
+            'c_description': report.description,
+            'c_name': f'{report.first_name} {report.last_name}'
+        }
+        web_utilities.complete_text_fields_name(text_elements, browser)
+        web_utilities.take_screenshot(browser, "wv.png")
+
+        # Submit and document new page in non-dev environments
+        if PROD_ENV in [TEST, PROD]:
+            print("Submitting form.")
+            web_utilities.submit_web_form(
+                report_state='west_virginia',
+                report_id=report.id,
+                browser=browser,
+                find_by_method=By.NAME,
+                find_by_target='submit'
+            )
+
+
+def submit_email(report: Report):
+    '''
+    Sends an environmental complaint email to the West Virginia state agency.
 
-    # Quit browser instance
-    browser.quit()
+    Parameters:
+        report (Report instance): Single complaint from FracTracker API
+    '''
+    config = Config()
+    west_virginia_email = StateEmail(
+        report=report,
+        to_email=config.west_virginia_email,
+        from_email=config.from_email,
+        cc_email=config.cc_email,
+        agency=AGENCY_NAME,
+        subject=SUBJECT
+    )
+    west_virginia_email.email_agency()
+
+
+def is_email_complaint(report: Report) -> bool:
+    '''
+    Complaints specifically related to air quality are emailed
+    rather than submitted through the web form.
+    '''
+    return report.senses["Smell"] or report.report_type == "Compressors"
+
+
+def validate(report: Report) -> List[str]:
+    '''
+    Checks that reports submitted through the web form have the
+    fields it requires and a county offered by its dropdown.
+    '''
+    if is_email_complaint(report):
+        return []
+    return (missing_fields(report, WEB_FORM_REQUIRED_FIELDS)
+        + unknown_county('west_virginia', report))
+
+
+def prepare(reports: List[Report]) -> None:
+    '''
+    Renders the complaint emails for the reports in a
+    batch that will be emailed, ahead of their submission.
+
+    Parameters:
+        reports (list of Report): Complaints from FracTracker API
+    '''
+    render_batch([r for r in reports if is_email_complaint(r)], AGENCY_NAME)
 
 
 def main(report:Report) -> List[Metadata]:
@@ -75,20 +128,10 @@ def main(report:Report) -> List[Metadata]:
     Parameters:
         report (Report instance): Single complaint from FracTracker API
     '''
-    if report.senses["Smell"] or report.report_type == "Compressors":
-        config = Config()
-        west_virginia_email = StateEmail(
-            report=report,
-            to_email=config.west_virginia_email,
-            from_email=config.from_email,
-            cc_email=config.cc_email,
-            agency=AGENCY_NAME,
-            subject=SUBJECT
-        )
-        west_virginia_email.email_agency()
+    if is_email_complaint(report):
         email_metadata = submit_and_return_metadata(
             report=report,
-            submit_fun=StateEmail.email_agency,
+            submit_fun=submit_email,
             submission_type=EMAIL_SUBMISSION,
             agency=AGENCY_NAME
         )
@@ -0,0 +1,161 @@
+'''
+benchmark_fractracker_api.py
+
+Load tests the report ingestion code against the local FracTracker API
+simulator. Three scenarios are measured for each report volume:
+
+1. `fracapi` - `FracAPI` paging through and parsing every report.
+2. `fracapi_bulk` - `FracAPI` normalizing each page into a `ReportTable`.
+3. `submit_complaints` - the Flask endpoint in `main.py`, with agency
+   submissions replaced by a dry run so only ingestion and metadata
+   handling are timed.
+
+Geocoding is served offline by `tests.mocks.mock_geocoder`. To run the
+benchmark, enter the command:
+
+    python -m tests.benchmarks.benchmark_fractracker_api --volumes 1000 10000
+'''
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from models.metadata import Metadata
+from tests.mocks.mock_fractracker_api import MockFracTrackerAPI, SyntheticReportGenerator
+from tests.mocks.mock_geocoder import offline_geocoding
+from typing import Dict, List
+from unittest import mock
+from utilities.fractracker_api import FracAPI
+from utilities.storage import LocalDatastore
+
+
+BEGIN_DATE = "01-01-2014"
+END_DATE = "12-31-2021"
+SCENARIOS = ['fracapi', 'fracapi_bulk', 'submit_complaints']
+
+
+class DryRunSubmission:
+    '''
+    Stands in for `models.submission.Submission` so that
+    no agency is contacted during the benchmark.
+    '''
+
+    def __init__(self, report, agencies=None, rejection=None) -> None:
+        self.metadata = [Metadata(report, status_reason='Benchmark dry run.')]
+
+
+def benchmark_fracapi(api: MockFracTrackerAPI, bulk: bool=False) -> Dict:
+    '''
+    Times `FracAPI` retrieving all reports from the simulator.
+    '''
+    start = time.perf_counter()
+    results = FracAPI(
+        begin_date=BEGIN_DATE,
+        end_date=END_DATE,
+        check_emails=False,
+        base_url=api.url,
+        bulk=bulk)
+    elapsed = time.perf_counter() - start
+    return {'num_reports': len(results.reports), 'elapsed_in_sec': elapsed}
+
+
+def benchmark_submit_complaints(api: MockFracTrackerAPI) -> Dict:
+    '''
+    Times a full POST to the Flask endpoint with dry-run submissions.
+    '''
+    import main
+
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+        mock.patch.dict(os.environ, {'FRACTRACKER_API_URL': api.url}), \
+        mock.patch.object(main, 'Submission', DryRunSubmission), \
+        mock.patch.object(main, 'datastore', LocalDatastore(f"{tmp_dir}/metadata.csv")), \
+        mock.patch.object(main, 'retry_datastore', LocalDatastore(f"{tmp_dir}/retry_queue.csv")), \
+        mock.patch('models.validation._check_photo', lambda url: None):
+
+        client = main.app.test_client()
+        start = time.perf_counter()
+        response = client.post('/', json={'start_date': BEGIN_DATE, 'end_date': END_DATE})
+        elapsed = time.perf_counter() - start
+
+    return {'status_code': response.status_code, 'elapsed_in_sec': elapsed}
+
+
+def run(
+    volumes: List[int],
+    duplicate_rate: float,
+    latency_in_sec: float,
+    error_rate: float,
+    results_per_page: int,
+    scenarios: List[str]) -> List[Dict]:
+    '''
+    Runs each scenario once per report volume.
+
+    Returns:
+        (list of dict): One result row per scenario and volume.
+    '''
+    rows = []
+    for volume in volumes:
+        generator = SyntheticReportGenerator(
+            num_reports=volume,
+            begin_date=datetime.strptime(BEGIN_DATE, "%m-%d-%Y"),
+            end_date=datetime.strptime(END_DATE, "%m-%d-%Y"),
+            duplicate_rate=duplicate_rate)
+
+        for scenario in scenarios:
+            with MockFracTrackerAPI(
+                generator,
+                results_per_page=results_per_page,
+                latency_in_sec=latency_in_sec,
+                error_rate=error_rate) as api, offline_geocoding():
+
+                try:
+                    if scenario == 'fracapi':
+                        result = benchmark_fracapi(api)
+                    elif scenario == 'fracapi_bulk':
+                        result = benchmark_fracapi(api, bulk=True)
+                    else:
+                        result = benchmark_submit_complaints(api)
+                    error = None
+                except Exception as e:
+                    result, error = {}, str(e)
+
+                elapsed = result.get('elapsed_in_sec')
+                rows.append({
+                    'scenario': scenario,
+                    'volume': volume,
+                    'requests': api.num_requests,
+                    'injected_errors': api.num_errors,
+                    'elapsed_in_sec': elapsed,
+                    'reports_per_sec': volume / elapsed if elapsed else None,
+                    'status_code': result.get('status_code'),
+                    'error': error
+                })
+                print(json.dumps(rows[-1]))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--volumes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--results-per-page', type=int, default=100)
+    parser.add_argument('--scenarios', nargs='+',
+        choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--output', help='Optional path of a JSON file for the results.')
+    args = parser.parse_args()
+
+    rows = run(
+        volumes=args.volumes,
+        duplicate_rate=args.duplicate_rate,
+        latency_in_sec=args.latency,
+        error_rate=args.error_rate,
+        results_per_page=args.results_per_page,
+        scenarios=args.scenarios)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,290 @@
+'''
+benchmark_pipeline.py
+
+Benchmarks the nightly pipeline end to end, as run by the Flask
+endpoint in `main.py`, in three timed stages:
+
+1. `fetch` - `main.get_api_reports`, paging through the local
+   FracTracker API simulator and geocoding every report offline.
+2. `submit` - `main.submit_reports`, validating, preparing and
+   submitting every report. Emails are delivered to the local
+   SendGrid stand-in, and web forms to the local replica forms.
+3. `write` - `main.datastore.write_data`, saving the metadata to
+   a local datastore.
+
+Each run uses a report volume and a state mix. The `email` mix runs
+anywhere, while the `browser` and `all` mixes drive
+headless Chrome, so Chrome and Chromedriver must be installed
+(e.g., inside the project's Docker container).
+
+Every run records its throughput, per-stage latency and peak traced
+memory as a JSON line, tagged with the current commit, appended to
+the results file. To run the benchmark, enter the command:
+
+    python -m tests.benchmarks.benchmark_pipeline --volumes 100 1000 --mixes email
+
+To compare the runs recorded for each commit, enter the command:
+
+    python -m tests.benchmarks.benchmark_pipeline --compare
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from constants import ROOT_DIRECTORY, TEST
+from contextlib import ExitStack
+from datetime import datetime
+from models.agency_health import reset_agency_health
+from tests.mocks.mock_agency_forms import MockAgencyForms
+from tests.mocks.mock_fractracker_api import MockFracTrackerAPI, SyntheticReportGenerator
+from tests.mocks.mock_geocoder import offline_geocoding
+from tests.mocks.mock_send_grid import MockSendGrid, redirect_send_grid
+from typing import Callable, Dict, List, Tuple
+from unittest import mock
+from utilities.config import Config
+from utilities.storage import LocalDatastore
+
+
+BEGIN_DATE = "01-01-2020"
+END_DATE = "12-31-2020"
+DEFAULT_OUTPUT = f"{ROOT_DIRECTORY}/tests/benchmarks/results/benchmark_pipeline.jsonl"
+
+# The states in which reports are located for each mix.
+# Mixes with web forms require Chrome.
+STATE_MIXES = {
+    'email': ['Colorado', 'Kentucky', 'Nebraska', 'North Dakota', 'Tennessee'],
+    'browser': ['California', 'New Mexico', 'Ohio', 'Pennsylvania', 'Texas', 'West Virginia'],
+    'all': None
+}
+
+# State modules submitting web forms, whose URLs point to the replicas
+WEB_FORM_STATES = ['california', 'colorado', 'new_mexico', 'ohio',
+    'pennsylvania', 'texas', 'west_virginia']
+
+
+def current_commit() -> str:
+    '''
+    Returns the abbreviated hash of the checked-out commit,
+    or None if it cannot be determined.
+    '''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT_DIRECTORY, stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def local_stand_ins(
+    stack: ExitStack,
+    api: MockFracTrackerAPI,
+    forms: MockAgencyForms,
+    send_grid: MockSendGrid,
+    tmp_dir: str) -> None:
+    '''
+    Points the pipeline at the local stand-ins for the duration
+    of a run and submits in the test environment, so that web
+    forms are posted to the replicas rather than just completed.
+    '''
+    import main
+
+    stack.enter_context(offline_geocoding())
+    stack.enter_context(redirect_send_grid(send_grid))
+    stack.enter_context(mock.patch.dict(os.environ, {'FRACTRACKER_API_URL': api.url}))
+    stack.enter_context(mock.patch('tests.mocks.mock_fractracker_api.IMAGE_URL_TEMPLATE',
+        f"{forms.base_url}/photos/{{}}.jpg"))
+    stack.enter_context(mock.patch.object(main, 'datastore',
+        LocalDatastore(f"{tmp_dir}/metadata.csv")))
+    stack.enter_context(mock.patch('utilities.web_utilities.SCREENSHOT_DIRECTORY', tmp_dir))
+    stack.enter_context(mock.patch.object(Config, 'submission_deferred_max_wait_in_sec',
+        new_callable=mock.PropertyMock, return_value=0))
+    for state in WEB_FORM_STATES:
+        stack.enter_context(mock.patch(f'submissions.{state}.URL', forms.url(state)))
+        stack.enter_context(mock.patch(f'submissions.{state}.PROD_ENV', TEST))
+
+
+def timed(fun: Callable, trace_memory: bool) -> Tuple[object, float, float]:
+    '''
+    Calls a function, returning its result, the elapsed seconds
+    and the peak traced memory in megabytes while it ran.
+    '''
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = fun()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else None
+    return result, elapsed, peak
+
+
+def benchmark_pipeline(
+    volume: int,
+    mix: str,
+    duplicate_rate: float,
+    api_latency_in_sec: float,
+    email_latency_in_sec: float,
+    trace_memory: bool) -> Dict:
+    '''
+    Runs the pipeline once against freshly started stand-ins.
+
+    Parameters:
+        volume (int): The number of reports served by the API.
+
+        mix (str): The state mix, a key of `STATE_MIXES`.
+
+        duplicate_rate (float): The share of reports repeating
+            the content of the previous report.
+
+        api_latency_in_sec (float): The delay added to every API page.
+
+        email_latency_in_sec (float): The delay added to every email.
+
+        trace_memory (bool): Whether to record peak memory with
+            `tracemalloc`, which slows every stage.
+
+    Returns:
+        (dict): The results of the run.
+    '''
+    import main
+
+    generator = SyntheticReportGenerator(
+        num_reports=volume,
+        begin_date=datetime.strptime(BEGIN_DATE, "%m-%d-%Y"),
+        end_date=datetime.strptime(END_DATE, "%m-%d-%Y"),
+        duplicate_rate=duplicate_rate,
+        states=STATE_MIXES[mix])
+
+    with ExitStack() as stack:
+        api = stack.enter_context(MockFracTrackerAPI(generator, latency_in_sec=api_latency_in_sec))
+        forms = stack.enter_context(MockAgencyForms())
+        send_grid = stack.enter_context(MockSendGrid(latency_in_sec=email_latency_in_sec))
+        tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        local_stand_ins(stack, api, forms, send_grid, tmp_dir)
+        reset_agency_health()
+
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            reports, fetch_sec, fetch_mb = timed(
+                lambda: main.get_api_reports(BEGIN_DATE, END_DATE), trace_memory)
+            metadata_df, submit_sec, submit_mb = timed(
+                lambda: main.submit_reports(reports), trace_memory)
+            _, write_sec, write_mb = timed(
+                lambda: main.datastore.write_data(metadata_df), trace_memory)
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+
+        total_sec = fetch_sec + submit_sec + write_sec
+        statuses = Counter(metadata_df['status']) if len(metadata_df.index) else Counter()
+        return {
+            'commit': current_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'mix': mix,
+            'volume': volume,
+            'reports': len(reports),
+            'submissions': len(metadata_df.index),
+            'statuses': dict(statuses),
+            'emails_received': len(send_grid.messages),
+            'forms_received': sum(len(v) for v in forms.submissions.values()),
+            'fetch_in_sec': fetch_sec,
+            'submit_in_sec': submit_sec,
+            'write_in_sec': write_sec,
+            'total_in_sec': total_sec,
+            'reports_per_sec': len(reports) / total_sec if total_sec else None,
+            'peak_memory_in_mb': max(fetch_mb, submit_mb, write_mb) if trace_memory else None,
+            'peak_memory_by_stage_in_mb': {'fetch': fetch_mb, 'submit': submit_mb,
+                'write': write_mb} if trace_memory else None
+        }
+
+
+def compare(path: str) -> None:
+    '''
+    Prints the latest recorded result of each mix and volume for every
+    commit in a results file, in the order the commits were first run.
+
+    Parameters:
+        path (str): The results file.
+
+    Returns:
+        None
+    '''
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    latest = {}
+    for row in rows:
+        latest[(row['mix'], row['volume'], row['commit'])] = row
+
+    print(f"{'mix':<12}{'volume':>8}  {'commit':<10}{'reports/s':>10}"
+        f"{'fetch s':>10}{'submit s':>10}{'write s':>10}{'peak MB':>10}")
+    for (mix, volume, commit), row in sorted(latest.items(),
+        key=lambda item: (item[0][0], item[0][1])):
+        peak = row['peak_memory_in_mb']
+        print(f"{mix:<12}{volume:>8}  {str(commit):<10}{row['reports_per_sec'] or 0:>10.1f}"
+            f"{row['fetch_in_sec']:>10.2f}{row['submit_in_sec']:>10.2f}"
+            f"{row['write_in_sec']:>10.2f}{peak if peak is not None else float('nan'):>10.1f}")
+
+
+def run(
+    volumes: List[int],
+    mixes: List[str],
+    duplicate_rate: float,
+    api_latency_in_sec: float,
+    email_latency_in_sec: float,
+    trace_memory: bool,
+    output: str) -> List[Dict]:
+    '''
+    Runs the pipeline once per state mix and volume,
+    appending each result to the results file.
+
+    Returns:
+        (list of dict): One result row per mix and volume.
+    '''
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    rows = []
+    for mix in mixes:
+        for volume in volumes:
+            try:
+                row = benchmark_pipeline(volume, mix, duplicate_rate,
+                    api_latency_in_sec, email_latency_in_sec, trace_memory)
+            except Exception as e:
+                row = {'commit': current_commit(), 'mix': mix, 'volume': volume, 'error': str(e)}
+            rows.append(row)
+            print(json.dumps(row))
+            with open(output, 'a') as f:
+                f.write(json.dumps(row) + '\n')
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--volumes', type=int, nargs='+', default=[100, 1_000])
+    parser.add_argument('--mixes', nargs='+', choices=list(STATE_MIXES),
+        default=['email'])
+    parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    parser.add_argument('--api-latency', type=float, default=0.0)
+    parser.add_argument('--email-latency', type=float, default=0.0)
+    parser.add_argument('--no-memory', action='store_true',
+        help='Skip tracing memory, which slows every stage.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+        help='The JSON Lines file to which results are appended.')
+    parser.add_argument('--compare', action='store_true',
+        help='Print the results recorded for each commit and exit.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.output)
+    else:
+        run(
+            volumes=args.volumes,
+            mixes=args.mixes,
+            duplicate_rate=args.duplicate_rate,
+            api_latency_in_sec=args.api_latency,
+            email_latency_in_sec=args.email_latency,
+            trace_memory=not args.no_memory,
+            output=args.output)
@@ -0,0 +1,146 @@
+'''
+benchmark_report_memory.py
+
+Measures the memory retained by report and metadata objects when the
+historical FracTracker dataset (`data_analysis/api_data/all_api_reports.csv`)
+is loaded, optionally replicated to approximate a full-history backfill.
+Four collections are measured with `tracemalloc`:
+
+1. `api_reports` - `ApiReport` instances with their `GeocodedLocation`s.
+2. `report_table` - the same reports normalized into a `ReportTable`.
+3. `metadata` - one `Metadata` instance per report.
+4. `metadata_rows` - the metadata converted into rows for the datastore.
+
+Nominatim is replaced by `tests.mocks.mock_geocoder`. To run the
+benchmark, enter the command:
+
+    python -m tests.benchmarks.benchmark_report_memory --scale 1 10
+'''
+
+import argparse
+import ast
+import csv
+import gc
+import json
+import tracemalloc
+from constants import ROOT_DIRECTORY
+from models.api_report import ApiReport
+from models.metadata import Metadata
+from models.report_table import ReportTable
+from tests.mocks.mock_geocoder import offline_nominatim
+from typing import Callable, Dict, List
+
+
+HISTORICAL_REPORTS_FILE = f"{ROOT_DIRECTORY}/data_analysis/api_data/all_api_reports.csv"
+COLLECTIONS = ['api_reports', 'report_table', 'metadata', 'metadata_rows']
+
+
+def load_features(scale: int=1) -> List[Dict]:
+    '''
+    Rebuilds API report features from the historical dataset.
+
+    Parameters:
+        scale (int): The number of times to replicate the dataset.
+            Replicated reports receive new ids.
+
+    Returns:
+        (list of dict): The report features.
+    '''
+    with open(HISTORICAL_REPORTS_FILE) as f:
+        rows = list(csv.DictReader(f))
+
+    max_id = max(int(row['id']) for row in rows)
+    features = []
+    for copy in range(scale):
+        for row in rows:
+            features.append({
+                'id': int(row['id']) + copy * max_id,
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [float(row['lon']), float(row['lat'])]
+                },
+                'properties': {
+                    'description': row['description'],
+                    'report_date': row['date'],
+                    'created_by': {'properties': {
+                        'first_name': row['first_name'],
+                        'last_name': row['last_name'],
+                        'email': row['email']
+                    }},
+                    'senses': [{'properties': {'name': name}}
+                        for name in ast.literal_eval(row['senses'] or '[]')],
+                    'images': [{'properties': {'original': row['image_url']}}]
+                        if row['image_url'] else [],
+                    'industries': [{'properties': {'name': row['report_type']}}]
+                        if row['report_type'] else []
+                }
+            })
+    return features
+
+
+def measure(build: Callable) -> Dict:
+    '''
+    Builds a collection while tracing allocations.
+
+    Parameters:
+        build (callable): Returns the collection to measure.
+
+    Returns:
+        (dict): The collection along with the bytes it
+            retains and the peak bytes allocated building it.
+    '''
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    collection = build()
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'collection': collection,
+        'retained_bytes': after - before,
+        'peak_bytes': peak - before
+    }
+
+
+def run(scales: List[int]) -> List[Dict]:
+    '''
+    Measures each collection once per dataset scale.
+
+    Returns:
+        (list of dict): One result row per collection and scale.
+    '''
+    rows = []
+    for scale in scales:
+        features = load_features(scale)
+        with offline_nominatim():
+            reports = measure(lambda: [ApiReport(f, check_emails=False) for f in features])
+            table = measure(lambda: ReportTable.from_features(features))
+            metadata = measure(lambda: [Metadata(r) for r in reports['collection']])
+            metadata_rows = measure(lambda: [m.to_dict() for m in metadata['collection']])
+
+        results = dict(zip(COLLECTIONS, (reports, table, metadata, metadata_rows)))
+        for name, result in results.items():
+            rows.append({
+                'collection': name,
+                'scale': scale,
+                'num_reports': len(features),
+                'retained_bytes': result['retained_bytes'],
+                'bytes_per_report': round(result['retained_bytes'] / len(features), 1),
+                'peak_bytes': result['peak_bytes']
+            })
+            print(json.dumps(rows[-1]))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--output', help='Optional path of a JSON file for the results.')
+    args = parser.parse_args()
+
+    rows = run(scales=args.scale)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,201 @@
+'''
+benchmark_startup.py
+
+Benchmarks the cold start of the Flask app in `main.py`, as paid
+by every instance Cloud Run starts on demand. Each run starts the
+app in a fresh interpreter and records:
+
+1. `import` - the seconds taken to import `main`.
+2. `ready` - the seconds from starting the interpreter until the
+   app accepts connections.
+3. `first_request` - the seconds from starting the interpreter until
+   the app has handled its first request, a `POST /` for a day
+   without reports, served by the local FracTracker API simulator.
+
+The budget for the first handled request is `STARTUP_BUDGET_IN_SEC`.
+Heavy dependencies (pandas, numpy, geopy, Google Cloud Storage and the
+Selenium-based state modules) are imported on first use, so that they
+are not paid before the app can accept requests; a run over budget
+usually means one of them is imported by `main` again. To list the
+modules imported by `main` and their cost, enter the command:
+
+    python -X importtime -c "import main"
+
+To run the benchmark, enter the command:
+
+    python -m tests.benchmarks.benchmark_startup --runs 5
+
+The command exits with status 1 if the median time to the
+first handled request exceeds the budget.
+'''
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from constants import DEV, ROOT_DIRECTORY
+from datetime import datetime
+from typing import Dict, List
+
+
+# The maximum median number of seconds from starting
+# the interpreter until the first request is handled
+STARTUP_BUDGET_IN_SEC = 2.0
+
+DEFAULT_OUTPUT = f"{ROOT_DIRECTORY}/tests/benchmarks/results/benchmark_startup.jsonl"
+
+REPORT_DATE = "01-01-2020"
+
+
+def free_port() -> int:
+    '''
+    Returns a port on which nothing is listening.
+    '''
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(port: int, tmp_dir: str) -> None:
+    '''
+    Imports and serves the app, as run in the child interpreter.
+    The benchmark's own dependencies are imported within functions,
+    so that they are not loaded before `main` is timed. Prints the seconds taken to import `main` as a JSON line
+    before accepting connections. Datastores are kept in a
+    temporary directory.
+
+    Parameters:
+        port (int): The port on which to serve the app.
+
+        tmp_dir (str): The directory of the datastores.
+
+    Returns:
+        None
+    '''
+    start = time.perf_counter()
+    import main
+    import_sec = time.perf_counter() - start
+
+    from utilities.storage import LocalDatastore
+    main.datastore = LocalDatastore(f"{tmp_dir}/metadata.csv")
+    main.retry_datastore = LocalDatastore(f"{tmp_dir}/retry_queue.csv")
+    print(json.dumps({'import_in_sec': import_sec}), flush=True)
+    main.app.run(host='127.0.0.1', port=port, debug=False)
+
+
+def benchmark_startup(api_url: str, timeout_in_sec: float) -> Dict:
+    '''
+    Starts the app in a fresh interpreter and times
+    its start-up until the first handled request.
+
+    Parameters:
+        api_url (str): The URL of the FracTracker API simulator.
+
+        timeout_in_sec (float): The number of seconds after
+            which the app is considered to have failed to start.
+
+    Returns:
+        (dict): The results of the run.
+    '''
+    from tests.benchmarks.benchmark_pipeline import current_commit
+
+    port = free_port()
+    body = json.dumps({'start_date': REPORT_DATE, 'end_date': REPORT_DATE}).encode()
+    env = {**os.environ, 'PROD_ENV': DEV, 'FRACTRACKER_API_URL': api_url,
+        'PYTHONDONTWRITEBYTECODE': '1'}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'tests.benchmarks.benchmark_startup',
+                '--serve', str(port), '--tmp-dir', tmp_dir],
+            cwd=ROOT_DIRECTORY, env=env, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True)
+        try:
+            ready_sec = None
+            while ready_sec is None:
+                if process.poll() is not None:
+                    raise Exception(f"App exited with status {process.returncode}.")
+                if time.perf_counter() - start > timeout_in_sec:
+                    raise Exception(f"App did not start within {timeout_in_sec} seconds.")
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    ready_sec = time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.005)
+
+            request = urllib.request.Request(f"http://127.0.0.1:{port}/", data=body,
+                headers={'Content-Type': 'application/json'}, method='POST')
+            with urllib.request.urlopen(request, timeout=timeout_in_sec) as response:
+                status = response.status
+            first_request_sec = time.perf_counter() - start
+            import_sec = json.loads(process.stdout.readline())['import_in_sec']
+        finally:
+            process.terminate()
+            process.wait()
+
+    return {
+        'commit': current_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'status': status,
+        'import_in_sec': import_sec,
+        'ready_in_sec': ready_sec,
+        'first_request_in_sec': first_request_sec
+    }
+
+
+def run(runs: int, timeout_in_sec: float, output: str) -> List[Dict]:
+    '''
+    Times the requested number of cold starts against a
+    FracTracker API simulator serving no reports, appending
+    each result and a summary to the results file.
+
+    Returns:
+        (list of dict): One result row per run.
+    '''
+    from tests.mocks.mock_fractracker_api import MockFracTrackerAPI, SyntheticReportGenerator
+
+    generator = SyntheticReportGenerator(
+        num_reports=0,
+        begin_date=datetime.strptime(REPORT_DATE, "%m-%d-%Y"),
+        end_date=datetime.strptime(REPORT_DATE, "%m-%d-%Y"))
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    rows = []
+    with MockFracTrackerAPI(generator) as api:
+        for _ in range(runs):
+            row = benchmark_startup(api.url, timeout_in_sec)
+            rows.append(row)
+            print(json.dumps(row))
+            with open(output, 'a') as f:
+                f.write(json.dumps(row) + '\n')
+
+    median = statistics.median(r['first_request_in_sec'] for r in rows)
+    print(f"Median import: {statistics.median(r['import_in_sec'] for r in rows):.2f}s, "
+        f"ready: {statistics.median(r['ready_in_sec'] for r in rows):.2f}s, "
+        f"first request: {median:.2f}s (budget {STARTUP_BUDGET_IN_SEC:.2f}s).")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+        help='The JSON Lines file to which results are appended.')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--tmp-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.tmp_dir)
+    else:
+        rows = run(args.runs, args.timeout, args.output)
+        median = statistics.median(r['first_request_in_sec'] for r in rows)
+        sys.exit(1 if median > STARTUP_BUDGET_IN_SEC else 0)
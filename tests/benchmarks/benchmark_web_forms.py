@@ -0,0 +1,139 @@
+'''
+benchmark_web_forms.py
+
+Measures web form submission throughput, in submissions per minute,
+for each state module against the local replica agency forms in
+`tests.mocks.mock_agency_forms`. Every submission drives the module's
+real Selenium code in headless Chrome, so Chrome and Chromedriver must
+be installed (e.g., inside the project's Docker container).
+
+To run the benchmark, enter the command:
+
+    python -m tests.benchmarks.benchmark_web_forms --states ohio texas --submissions 3
+'''
+
+import argparse
+import json
+import tempfile
+import time
+from constants import MOCK_LOCATIONS_FILE, TEST
+from importlib import import_module
+from models.mock_report import MockReport
+from tests.mocks.mock_agency_forms import MockAgencyForms
+from typing import Dict, List
+from unittest import mock
+
+
+# The web form submission function of each state module
+SUBMIT_FUNCTIONS = {
+    'california': 'submit',
+    'colorado': 'submit',
+    'new_mexico': 'submit',
+    'ohio': 'submit',
+    'pennsylvania': 'submit',
+    'texas': 'submit',
+    'west_virginia': 'submit_web_form'
+}
+
+
+class BenchmarkReport(MockReport):
+    '''
+    A mock report whose photos are served by the replica form server.
+    '''
+
+    def __init__(self, json: Dict, image_urls: List[str]) -> None:
+        super().__init__(json)
+        self._image_urls = image_urls
+
+
+    @property
+    def image_url(self) -> List[str]:
+        return self._image_urls
+
+
+def load_report(state: str, image_urls: List[str]) -> BenchmarkReport:
+    '''
+    Creates a benchmark report from the mock location of a state.
+    '''
+    with open(MOCK_LOCATIONS_FILE) as f:
+        locations = json.load(f)
+    state_name = state.replace('_', ' ').lower()
+    location = next(loc for loc in locations if loc['state'].lower() == state_name)
+    return BenchmarkReport(location, image_urls)
+
+
+def benchmark_state(
+    forms: MockAgencyForms,
+    state: str,
+    num_submissions: int,
+    num_photos: int) -> Dict:
+    '''
+    Submits a state's replica form repeatedly and times each attempt.
+
+    Parameters:
+        forms (MockAgencyForms): The running replica form server.
+
+        state (str): The state module name (e.g., 'new_mexico').
+
+        num_submissions (int): The number of submissions to attempt.
+
+        num_photos (int): The number of photos attached to each report.
+
+    Returns:
+        (dict): The throughput results for the state.
+    '''
+    module = import_module(f'submissions.{state}')
+    submit = getattr(module, SUBMIT_FUNCTIONS[state])
+    image_urls = [forms.photo_url(i) for i in range(num_photos)]
+    durations, errors = [], []
+
+    with tempfile.TemporaryDirectory() as screenshot_dir, \
+        mock.patch.object(module, 'URL', forms.url(state)), \
+        mock.patch.object(module, 'PROD_ENV', TEST), \
+        mock.patch('utilities.web_utilities.SCREENSHOT_DIRECTORY', screenshot_dir):
+
+        for _ in range(num_submissions):
+            report = load_report(state, image_urls)
+            start = time.perf_counter()
+            try:
+                submit(report)
+            except Exception as e:
+                errors.append(str(e))
+            durations.append(time.perf_counter() - start)
+
+    total = sum(durations)
+    return {
+        'state': state,
+        'attempts': num_submissions,
+        'succeeded': num_submissions - len(errors),
+        'received_by_server': len(forms.submissions.get(state, [])),
+        'mean_seconds_per_submission': total / num_submissions,
+        'submissions_per_minute': 60 * (num_submissions - len(errors)) / total,
+        'errors': errors
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--states', nargs='+', choices=list(SUBMIT_FUNCTIONS),
+        default=list(SUBMIT_FUNCTIONS))
+    parser.add_argument('--submissions', type=int, default=3)
+    parser.add_argument('--photos', type=int, default=1)
+    parser.add_argument('--page-delay', type=float, default=0.0,
+        help='Seconds the server waits before returning a form page.')
+    parser.add_argument('--render-delay', type=float, default=0.0,
+        help='Seconds before a form page becomes visible in the browser.')
+    parser.add_argument('--output', help='Optional path of a JSON file for the results.')
+    args = parser.parse_args()
+
+    rows = []
+    with MockAgencyForms(
+        page_delay_in_sec=args.page_delay,
+        render_delay_in_sec=args.render_delay) as forms:
+        for state in args.states:
+            rows.append(benchmark_state(forms, state, args.submissions, args.photos))
+            print(json.dumps(rows[-1]))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
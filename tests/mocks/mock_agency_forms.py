@@ -0,0 +1,518 @@
+'''
+mock_agency_forms.py
+
+A local HTTP server hosting replicas of the state agency complaint
+forms driven by the `submissions` modules. Each replica reproduces
+the page title, element ids, names and xpaths its module relies on,
+along with file inputs and confirmation pages, so that web form
+submissions can be exercised and timed without contacting a
+government website.
+
+Slow-loading agency sites can be simulated with a server-side delay
+before each form page is sent (`page_delay_in_sec`) and a client-side
+delay before the form is rendered (`render_delay_in_sec`).
+
+To run the server standalone, enter the command:
+
+    python -m tests.mocks.mock_agency_forms --port 5002
+'''
+
+import argparse
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+from utilities.county_index import load_snapshot
+
+
+# County options offered by each replica's county dropdown, as
+# captured in the snapshots of the live forms
+COUNTIES = {state: [o.get('value', o['text']) for o in load_snapshot(state)['options']]
+    for state in ('colorado', 'new_mexico', 'pennsylvania', 'texas', 'west_virginia')}
+
+# Municipalities offered by the Pennsylvania township dropdown
+PA_MUNICIPALITIES = ['Greensburg', 'Hempfield', 'Pittsburgh', 'Washington']
+
+PHOTO_BYTES = b'\xff\xd8\xff\xe0' + b'\x00' * 2048 + b'\xff\xd9'
+
+CONFIRMATION_TEXT = {
+    'new_mexico': 'Your notification has been received.'
+}
+DEFAULT_CONFIRMATION_TEXT = 'Thank you. Your complaint has been submitted.'
+
+
+def _options(values: List[str]) -> str:
+    return ''.join(f'<option value="{v}">{v}</option>' for v in values)
+
+
+CALIFORNIA = '''
+<title>New Complaint - CalEPA Environmental Complaint System</title>
+<form method="post" action="/california/submit" enctype="multipart/form-data">
+  <div id="page1">
+    <input type="radio" name="category" id="air" value="air"><label for="air">Air</label>
+    <input type="radio" name="category" id="water" value="water"><label for="water">Water</label>
+    <input type="radio" name="category" id="waste" value="waste"><label for="waste">Waste</label>
+    <button type="button" id="complaintDetailsButton" onclick="showPage(2)">Next</button>
+  </div>
+  <div id="page2" style="display:none">
+    <textarea name="details:JCMC:detailsForm:descriptionTextArea"></textarea>
+    <textarea name="details:JCMC:detailsForm:locationDescriptionTextArea"></textarea>
+    <input type="hidden" name="dateOfOccurence" id="dateValue">
+    <div id="dateOfOccurence"><div><div>
+      <div>
+        <div><table><thead><tr><th>&lt;</th><th>Days</th></tr></thead></table></div>
+        <div><table><thead><tr><th>&lt;</th><th>Months</th></tr></thead></table></div>
+      </div>
+      <div id="years"></div>
+      <div id="months"></div>
+      <table><tbody id="days"></tbody></table>
+    </div></div></div>
+    <input type="file" name="details:JCMC:detailsForm:fileInput" id="details:JCMC:detailsForm:fileInput" multiple>
+    <button type="button" id="almostDoneButton" onclick="showPage(3)">Almost Done</button>
+  </div>
+  <div id="page3" style="display:none">
+    <input type="text" name="ComplaintContact:JCMC:AnonymousForm:FirstName">
+    <input type="text" name="ComplaintContact:JCMC:AnonymousForm:LastName">
+    <input type="text" name="ComplaintContact:JCMC:AnonymousForm:email">
+    <input type="text" name="ComplaintContact:JCMC:AnonymousForm:confirmEmail">
+    <input type="submit" id="iButton" value="Submit">
+  </div>
+</form>
+<script>
+  var MONTHS = ['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'];
+  var year = null;
+  function showPage(n) {
+    [1, 2, 3].forEach(function(i) {
+      document.getElementById('page' + i).style.display = i === n ? '' : 'none';
+    });
+  }
+  function pad(n) { return (n < 10 ? '0' : '') + n; }
+  for (var y = 2010; y <= new Date().getFullYear(); y++) {
+    var span = document.createElement('span');
+    span.textContent = String(y);
+    span.onclick = (function(y) { return function() { year = y; }; })(y);
+    document.getElementById('years').appendChild(span);
+  }
+  MONTHS.forEach(function(m, i) {
+    var span = document.createElement('span');
+    span.textContent = m;
+    span.onclick = function() {
+      var tbody = document.getElementById('days');
+      tbody.innerHTML = '';
+      var row = document.createElement('tr');
+      var numDays = new Date(year, i + 1, 0).getDate();
+      for (var d = 1; d <= numDays; d++) {
+        var td = document.createElement('td');
+        td.textContent = d;
+        td.setAttribute('data-day', pad(i + 1) + '/' + pad(d) + '/' + year);
+        td.onclick = function() {
+          document.getElementById('dateValue').value = this.getAttribute('data-day');
+        };
+        row.appendChild(td);
+      }
+      tbody.appendChild(row);
+    };
+    document.getElementById('months').appendChild(span);
+  });
+</script>
+'''
+
+COLORADO = '''
+<title>Submission - COGCC Complaint Intake</title>
+<form method="post" action="/colorado/submit" enctype="multipart/form-data">
+  <input type="radio" name="Field103" id="Field103_other" value="other">
+  <input type="text" name="Field103_other_value" id="Field103_other_value">
+  <select name="Field100" id="Field100"><option value=""></option>{counties}</select>
+  <input type="radio" name="Field95" id="Field95_other" value="other">
+  <input type="text" name="Field95_other_value" id="Field95_other_value">
+  <input type="radio" name="Field47" id="Field47-0" value="Yes">
+  <input type="radio" name="Field47" id="Field47-1" value="No">
+  <input type="text" name="Field4" id="Field4">
+  <input type="text" name="Field5" id="Field5">
+  <input type="text" name="Field45" id="Field45">
+  <input type="text" name="Field102" id="Field102">
+  <input type="text" name="Field7" id="Field7">
+  <input type="text" name="Field8" id="Field8">
+  <input type="radio" name="Field97" id="Field97-0" value="Phone">
+  <input type="radio" name="Field97" id="Field97-1" value="Email">
+  <textarea name="Field50" id="Field50"></textarea>
+  <textarea name="Field51" id="Field51"></textarea>
+  <input type="radio" name="Field104" id="Field104-0" value="Yes">
+  <input type="radio" name="Field104" id="Field104-1" value="No">
+  <input type="radio" name="Field54" id="Field54-0" value="Yes">
+  <input type="radio" name="Field54" id="Field54-1" value="No">
+  <input type="radio" name="Field39" id="Field39-0" value="Yes">
+  <input type="radio" name="Field39" id="Field39-1" value="No">
+  <input type="file" name="Field40" id="Field40" multiple>
+  <input type="submit" id="action" name="action" value="Submit">
+</form>
+'''
+
+NEW_MEXICO = '''
+<title>New Mexico Environment Department - Incident Notification</title>
+<form method="post" action="/new_mexico/submit">
+  <select name="value1"><option value="AQ">Air Quality</option>
+    <option value="ZZ">No Match in List, Describe Below</option></select>
+  <select name="value13"><option value=""></option>{counties}</select>
+  <textarea name="value16"></textarea>
+  <input type="text" name="value4">
+  <input type="text" name="value17">
+  <input type="text" name="value24">
+  <input type="submit" id="submit1" value="Submit">
+</form>
+'''
+
+OHIO = '''
+<title>Environmental Complaint - Ohio EPA</title>
+<form id="Complaints" onsubmit="return false;">
+  <label>Description<textarea name="description"></textarea></label>
+  <label>Category hint</label>
+  <label>Type hint</label>
+  <label>Location hint</label>
+  <label>Date<div><div>Calendar</div><div><input type="text" name="date"></div></div></label>
+  <label>Photos<input type="file" name="photos" multiple></label>
+  <label>Notes</label>
+  <label>Tracking<p>OH-{tracking}</p></label>
+  <div class="geo">
+    <label class="geo lat" contenteditable="true"></label>
+    <label class="geo long" contenteditable="true"></label>
+  </div>
+  <fieldset><fieldset><div>
+    <label><input type="radio" name="category" value="air">Air</label>
+    <label><input type="radio" name="category" value="water">Water</label>
+    <label><input type="radio" name="category" value="drinking_water">Drinking Water</label>
+    <label><input type="radio" name="category" value="land">Land</label>
+  </div></fieldset></fieldset>
+  <fieldset><fieldset><div>
+    <label><input type="radio" name="type" value="odor">Odor</label>
+    <label><input type="radio" name="type" value="other">Other</label>
+  </div></fieldset></fieldset>
+  <section><p>Contact information</p></section>
+  <section><fieldset>
+    <label><input type="text" name="name"></label>
+    <label><input type="text" name="address"></label>
+    <label><input type="text" name="city"></label>
+    <label><input type="text" name="state"></label>
+    <label><input type="text" name="zip"></label>
+    <label><input type="text" name="phone"></label>
+    <label><input type="text" name="email"></label>
+  </fieldset></section>
+  <button type="button" id="validate-form" onclick="submitSurvey()">Submit</button>
+</form>
+<div id="screenContentPage" class="hide">{confirmation}</div>
+<script>
+  function submitSurvey() {
+    var form = document.getElementById('Complaints');
+    var data = new FormData(form);
+    data.append('latitude', document.querySelector("label[class='geo lat']").textContent);
+    data.append('longitude', document.querySelector("label[class='geo long']").textContent);
+    fetch('/ohio/submit', {method: 'POST', body: data}).then(function() {
+      form.style.display = 'none';
+      document.getElementById('validate-form').remove();
+      document.getElementById('screenContentPage').className = 'show';
+    });
+  }
+</script>
+'''
+
+PENNSYLVANIA = '''
+<title>Environmental Complaint Form - PA DEP</title>
+<form id="complaintForm" method="post" action="/pennsylvania/submit">
+  <input type="text" name="ec_name" id="ec_name">
+  <input type="text" name="email" id="email">
+  <textarea name="pd1_comments_field" id="pd1_comments_field"></textarea>
+  <textarea name="pd2_comments_field" id="pd2_comments_field"></textarea>
+  <input type="checkbox" name="ConfirmationCheck" id="ConfirmationCheckYes"
+    onclick="document.getElementById('emailDialog').style.display = ''">
+  <div id="emailDialog" style="display:none">
+    <button type="button" id="buttonOk"
+      onclick="document.getElementById('emailDialog').style.display = 'none'">OK</button>
+  </div>
+  <select name="countyProblem" id="countyProblem"><option value=""></option>{counties}</select>
+  <select name="locationProblem" id="locationProblem"><option value=""></option>{municipalities}</select>
+  <input type="radio" name="OBKey__312_1" value="1">
+  <input type="radio" name="OBKey__312_1" value="0">
+  <button type="button" id="SubmitButton"
+    onclick="document.getElementById('confirmDialog').style.display = ''">Submit</button>
+  <div id="confirmDialog" style="display:none">
+    <button type="submit" id="submitForm">Confirm</button>
+  </div>
+</form>
+'''
+
+TEXAS = '''
+<title>TCEQ Environmental Complaints</title>
+<form method="post" action="/texas/submit">
+  <div id="content">
+    <input type="text" name="datepicker" id="datepicker">
+    <input type="text" name="location" id="location">
+    <textarea name="concern" id="concern"></textarea>
+    <input type="text" name="name" id="name">
+    <input type="text" name="email" id="email">
+    <input type="text" name="city" id="city">
+    <input type="text" name="who" id="who">
+    <select name="time" id="time">{times}</select>
+    <select name="ampm" id="ampm"><option value="am">AM</option><option value="pm">PM</option></select>
+    <select name="county" id="county"><option value=""></option>{counties}</select>
+    <p><button type="submit">Submit</button></p>
+  </div>
+</form>
+'''
+
+WEST_VIRGINIA = '''
+<title>Complaints - WV DEP</title>
+<iframe name="MSOPageViewerWebPart_WebPartWPQ1" id="MSOPageViewerWebPart_WebPartWPQ1"
+  src="/west_virginia/frame" width="100%" height="800"></iframe>
+'''
+
+WEST_VIRGINIA_FRAME = '''
+<title>Complaint Form</title>
+<form method="post" action="/west_virginia/submit">
+  <select name="c_county"><option value=""></option>{counties}</select>
+  <input type="text" name="c_location">
+  <textarea name="c_description"></textarea>
+  <input type="text" name="c_name">
+  <input type="submit" name="submit" value="Submit">
+</form>
+'''
+
+TIMES = [f'{h}:{m:02d}' for h in range(1, 13) for m in (0, 15, 30, 45)]
+
+PAGES = {
+    'california': lambda: CALIFORNIA,
+    'colorado': lambda: COLORADO.format(counties=_options(COUNTIES['colorado'])),
+    'new_mexico': lambda: NEW_MEXICO.format(counties=_options(COUNTIES['new_mexico'])),
+    'ohio': lambda: OHIO
+        .replace('{tracking}', str(int(time.time() * 1000) % 1_000_000))
+        .replace('{confirmation}', DEFAULT_CONFIRMATION_TEXT),
+    'pennsylvania': lambda: PENNSYLVANIA.format(
+        counties=_options(COUNTIES['pennsylvania']),
+        municipalities=_options(PA_MUNICIPALITIES)),
+    'texas': lambda: TEXAS.format(
+        times=_options(TIMES), counties=_options(COUNTIES['texas'])),
+    'west_virginia': lambda: WEST_VIRGINIA,
+    'west_virginia/frame': lambda: WEST_VIRGINIA_FRAME.format(
+        counties=_options(COUNTIES['west_virginia']))
+}
+
+RENDER_DELAY_SCRIPT = '''
+<script>
+  document.documentElement.style.visibility = 'hidden';
+  setTimeout(function() {{
+    document.documentElement.style.visibility = '';
+  }}, {delay_in_ms});
+</script>
+'''
+
+
+def parse_form_body(content_type: str, body: bytes) -> Dict:
+    '''
+    Parses a url-encoded or multipart form submission.
+
+    Parameters:
+        content_type (str): The request's Content-Type header.
+
+        body (bytes): The request body.
+
+    Returns:
+        (dict): The submitted text fields, as lists of values, and
+            the submitted files under the key '__files__', as a
+            list of (field name, file name, size in bytes) tuples.
+    '''
+    fields = defaultdict(list)
+    files = []
+    if content_type.startswith('multipart/form-data'):
+        headers = f'Content-Type: {content_type}\r\n\r\n'.encode()
+        message = BytesParser(policy=HTTP).parsebytes(headers + body)
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            filename = part.get_filename()
+            payload = part.get_payload(decode=True) or b''
+            if filename is not None:
+                if filename:
+                    files.append((name, filename, len(payload)))
+            else:
+                fields[name].append(payload.decode('utf-8', errors='replace'))
+    else:
+        for name, values in parse_qs(body.decode(), keep_blank_values=True).items():
+            fields[name].extend(values)
+    fields['__files__'] = files
+    return dict(fields)
+
+
+class MockAgencyForms:
+    '''
+    A threaded HTTP server that hosts replica agency forms and records
+    every submission it receives. May be used as a context manager, in
+    which case the server runs on a background thread.
+    '''
+
+    def __init__(
+        self,
+        page_delay_in_sec: float=0.0,
+        render_delay_in_sec: float=0.0,
+        host: str='127.0.0.1',
+        port: int=0) -> None:
+        '''
+        The constructor for `MockAgencyForms`.
+
+        Parameters:
+            page_delay_in_sec (float): The delay before a form page
+                is returned, simulating a slow agency server.
+
+            render_delay_in_sec (float): The delay before a form page
+                becomes visible in the browser, simulating slow
+                client-side rendering.
+
+            host (str): The host address to bind.
+
+            port (int): The port to bind. Defaults to any free port.
+
+        Returns:
+            None
+        '''
+        self.page_delay_in_sec = page_delay_in_sec
+        self.render_delay_in_sec = render_delay_in_sec
+        self.submissions = defaultdict(list)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+
+    @property
+    def base_url(self) -> str:
+        '''
+        The root URL of the server.
+        '''
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+    def url(self, state: str) -> str:
+        '''
+        The URL of a state's replica form (e.g., 'new_mexico').
+        '''
+        return f"{self.base_url}/{state}"
+
+
+    def photo_url(self, num: int) -> str:
+        '''
+        The URL of a placeholder JPEG for photo upload tests.
+        '''
+        return f"{self.base_url}/photos/{num}.jpg"
+
+
+    def start(self) -> 'MockAgencyForms':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def stop(self) -> None:
+        if self._thread:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+
+    def __enter__(self) -> 'MockAgencyForms':
+        return self.start()
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+    def render_page(self, path: str) -> str:
+        '''
+        Renders the replica page registered under a path.
+        '''
+        title, body = PAGES[path]().split('</title>', 1)
+        if self.render_delay_in_sec:
+            delay_in_ms = int(self.render_delay_in_sec * 1000)
+            body = RENDER_DELAY_SCRIPT.format(delay_in_ms=delay_in_ms) + body
+        return f'<!DOCTYPE html><html><head>{title.strip()}</title></head>' \
+            f'<body>{body}</body></html>'
+
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body: bytes, content_type: str='text/html', status: int=200):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path.strip('/')
+                if path.startswith('photos/'):
+                    self._send(PHOTO_BYTES, content_type='image/jpeg')
+                    return
+                if path not in PAGES:
+                    self.send_error(404, 'Not Found')
+                    return
+                if server.page_delay_in_sec:
+                    time.sleep(server.page_delay_in_sec)
+                self._send(server.render_page(path).encode())
+
+            def do_HEAD(self):
+                path = urlparse(self.path).path.strip('/')
+                if not path.startswith('photos/'):
+                    self.send_error(404, 'Not Found')
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(PHOTO_BYTES)))
+                self.end_headers()
+
+            def do_POST(self):
+                parts = urlparse(self.path).path.strip('/').split('/')
+                if len(parts) != 2 or parts[1] != 'submit' or parts[0] not in PAGES:
+                    self.send_error(404, 'Not Found')
+                    return
+                state = parts[0]
+                length = int(self.headers.get('Content-Length', 0))
+                fields = parse_form_body(
+                    self.headers.get('Content-Type', ''), self.rfile.read(length))
+                fields['__received__'] = datetime.utcnow().isoformat()
+                with server._lock:
+                    server.submissions[state].append(fields)
+
+                text = CONFIRMATION_TEXT.get(state, DEFAULT_CONFIRMATION_TEXT)
+                html = f'<!DOCTYPE html><html><head><title>Confirmation</title></head>' \
+                    f'<body><h1>{text}</h1></body></html>'
+                self._send(html.encode())
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--page-delay', type=float, default=0.0)
+    parser.add_argument('--render-delay', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=5002)
+    args = parser.parse_args()
+
+    forms = MockAgencyForms(
+        page_delay_in_sec=args.page_delay,
+        render_delay_in_sec=args.render_delay,
+        host='0.0.0.0',
+        port=args.port)
+    print(f"Serving replica agency forms at {forms.base_url}.")
+    try:
+        forms._server.serve_forever()
+    except KeyboardInterrupt:
+        forms.stop()
@@ -0,0 +1,423 @@
+'''
+mock_fractracker_api.py
+
+A local stand-in for the FracTracker report API. Serves paginated,
+synthetic reports with the same `features` and `properties.total_pages`/
+`properties.num_results` structure as the live API (see
+`data_analysis/api_data/sample_report.json`) so that `FracAPI` and
+`main.submit_complaints` can be load tested offline.
+
+Reports are generated lazily and deterministically from their index,
+so the simulator can serve millions of reports without holding them
+in memory. Duplicates, latency and errors can be injected on demand.
+
+To run the simulator as a standalone server, enter the command:
+
+    python -m tests.mocks.mock_fractracker_api --num-reports 1000000
+'''
+
+import argparse
+import bisect
+import json
+import random
+import threading
+import time
+from constants import MOCK_LOCATIONS_FILE
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+
+DEFAULT_BEGIN_DATE = datetime(2014, 1, 1)
+DEFAULT_END_DATE = datetime(2021, 12, 31)
+DEFAULT_RESULTS_PER_PAGE = 10
+IMAGE_URL_TEMPLATE = "https://api.fractracker.org/static/usercontent/FS_{}_original.jpg"
+INDUSTRIES = ['Wells', 'Pipelines', 'Compressors', 'Refineries',
+    'Landfills', 'Mines', 'Pits', 'Trains', 'Other']
+SENSES = ['Sight', 'Smell', 'Taste', 'Touch', 'Sound']
+DESCRIPTIONS = [
+    'Strong odor near the well pad.',
+    'Loud compressor noise through the night.',
+    'Truck traffic and dust on the county road.',
+    'Flaring visible from the highway.',
+    'Discolored water in the creek below the site.',
+    ''
+]
+
+
+def load_anchor_locations(states: List[str]=None) -> List[Dict]:
+    '''
+    Reads the mock locations used to anchor synthetic report
+    coordinates so that each report resolves to a known state.
+
+    Parameters:
+        states (list of str): The state names to keep. Defaults
+            to all states with mock location data.
+
+    Returns:
+        (list of dict): The anchor locations.
+    '''
+    with open(MOCK_LOCATIONS_FILE) as f:
+        locations = json.load(f)
+    if states:
+        wanted = {s.lower() for s in states}
+        locations = [loc for loc in locations if loc['state'].lower() in wanted]
+    if not locations:
+        raise Exception(f"No mock locations configured for states {states}.")
+    return locations
+
+
+class SyntheticReportGenerator:
+    '''
+    Deterministically generates FracTracker API report features
+    by index. Report dates increase with the index, which lets
+    date filters be resolved to index ranges by binary search.
+    '''
+
+    def __init__(
+        self,
+        num_reports: int,
+        begin_date: datetime=DEFAULT_BEGIN_DATE,
+        end_date: datetime=DEFAULT_END_DATE,
+        duplicate_rate: float=0.0,
+        states: List[str]=None,
+        seed: int=0) -> None:
+        '''
+        The constructor for `SyntheticReportGenerator`.
+
+        Parameters:
+            num_reports (int): The total number of reports to serve.
+
+            begin_date (datetime): The date of the first report.
+
+            end_date (datetime): The date of the last report.
+
+            duplicate_rate (float): The probability that a report
+                repeats the content of the previous one with a new
+                id and image, as happens in the live API.
+
+            states (list of str): The states in which reports are
+                located. Defaults to all states with mock locations.
+
+            seed (int): The random seed.
+
+        Returns:
+            None
+        '''
+        self.num_reports = num_reports
+        self.begin_date = begin_date
+        self.end_date = end_date
+        self.duplicate_rate = duplicate_rate
+        self.seed = seed
+        self.anchors = load_anchor_locations(states)
+        self._step = (end_date - begin_date) / max(num_reports, 1)
+
+
+    def __len__(self) -> int:
+        return self.num_reports
+
+
+    def _rng(self, index: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + index)
+
+
+    def _is_duplicate(self, index: int) -> bool:
+        return index > 0 and self._rng(-index - 1).random() < self.duplicate_rate
+
+
+    def _base_index(self, index: int) -> int:
+        while self._is_duplicate(index):
+            index -= 1
+        return index
+
+
+    def date(self, index: int) -> datetime:
+        '''
+        The report date of the report at a given index.
+        '''
+        base = self._base_index(index)
+        return (self.begin_date + self._step * base).replace(microsecond=0)
+
+
+    def index_range(self, begin_date: datetime=None, end_date: datetime=None) -> range:
+        '''
+        Resolves an inclusive report date range to a range of indices.
+
+        Parameters:
+            begin_date (datetime): The inclusive minimum report date.
+
+            end_date (datetime): The inclusive maximum report date.
+
+        Returns:
+            (range): The matching report indices.
+        '''
+        class _Dates:
+            def __len__(_): return self.num_reports
+            def __getitem__(_, i): return self.date(i)
+
+        dates = _Dates()
+        start = bisect.bisect_left(dates, begin_date) if begin_date else 0
+        stop = bisect.bisect_right(dates, end_date) if end_date else self.num_reports
+        return range(start, max(start, stop))
+
+
+    def feature(self, index: int) -> Dict:
+        '''
+        Generates the report feature at a given index.
+
+        Parameters:
+            index (int): The report index.
+
+        Returns:
+            (dict): The report, structured as in the live API.
+        '''
+        base = self._base_index(index)
+        rng = self._rng(base)
+        anchor = rng.choice(self.anchors)
+        lat = round(anchor['lat'] + rng.uniform(-0.05, 0.05), 6)
+        lon = round(anchor['lon'] + rng.uniform(-0.05, 0.05), 6)
+        user_id = rng.randint(1, 50_000)
+        senses = rng.sample(SENSES, rng.randint(0, 3))
+        industries = rng.sample(INDUSTRIES, rng.randint(1, 2))
+        num_images = self._rng(index).randint(0, 3)
+        report_id = index + 1
+
+        return {
+            'geometry': {
+                'geometries': [{'coordinates': [lon, lat], 'type': 'Point'}],
+                'type': 'GeometryCollection'
+            },
+            'id': report_id,
+            'properties': {
+                'created_by': {
+                    'geometry': None,
+                    'id': user_id,
+                    'properties': {
+                        'email': f'user{user_id}@example.com',
+                        'first_name': rng.choice(['', 'Jane', 'John']),
+                        'id': user_id,
+                        'last_name': rng.choice(['', 'Doe', 'Roe'])
+                    },
+                    'type': 'Feature'
+                },
+                'creator_id': user_id,
+                'description': rng.choice(DESCRIPTIONS),
+                'id': report_id,
+                'images': [{
+                    'geometry': None,
+                    'id': report_id * 10 + i,
+                    'properties': {
+                        'original': IMAGE_URL_TEMPLATE.format(f'{report_id}_{i}')
+                    },
+                    'type': 'Feature'
+                } for i in range(num_images)],
+                'industries': [{
+                    'geometry': None,
+                    'properties': {'name': name},
+                    'type': 'Feature'
+                } for name in industries],
+                'is_public': True,
+                'report_date': self.date(index).isoformat(),
+                'senses': [{
+                    'geometry': None,
+                    'properties': {'name': name},
+                    'type': 'Feature'
+                } for name in senses],
+                'title': None
+            },
+            'type': 'Feature'
+        }
+
+
+class MockFracTrackerAPI:
+    '''
+    A threaded HTTP server that mimics the FracTracker report endpoint.
+    May be used as a context manager, in which case the server runs
+    on a background thread for the duration of the block.
+    '''
+
+    def __init__(
+        self,
+        generator: SyntheticReportGenerator,
+        results_per_page: int=DEFAULT_RESULTS_PER_PAGE,
+        latency_in_sec: float=0.0,
+        error_rate: float=0.0,
+        host: str='127.0.0.1',
+        port: int=0) -> None:
+        '''
+        The constructor for `MockFracTrackerAPI`.
+
+        Parameters:
+            generator (SyntheticReportGenerator): The report source.
+
+            results_per_page (int): The number of reports per page.
+
+            latency_in_sec (float): The delay added to every response.
+
+            error_rate (float): The probability that a request fails
+                with a "503 - Service Unavailable" response.
+
+            host (str): The host address to bind.
+
+            port (int): The port to bind. Defaults to any free port.
+
+        Returns:
+            None
+        '''
+        self.generator = generator
+        self.results_per_page = results_per_page
+        self.latency_in_sec = latency_in_sec
+        self.error_rate = error_rate
+        self.num_requests = 0
+        self.num_errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(generator.seed)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+
+    @property
+    def url(self) -> str:
+        '''
+        The report endpoint served by the simulator.
+        '''
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/data/report"
+
+
+    def start(self) -> 'MockFracTrackerAPI':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def stop(self) -> None:
+        if self._thread:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+
+    def __enter__(self) -> 'MockFracTrackerAPI':
+        return self.start()
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+    def get_page(self, query: Dict, page_num: int) -> Dict:
+        '''
+        Builds one page of results for a parsed query.
+
+        Parameters:
+            query (dict): The parsed `q` parameter. Filters on
+                `report_date` ('ge' and 'le') and `id` ('in') are
+                supported.
+
+            page_num (int): The one-based page number.
+
+        Returns:
+            (dict): The page, structured as in the live API.
+        '''
+        begin_date = end_date = ids = None
+        for f in query.get('filters', []):
+            if f.get('name') == 'id' and f['op'] == 'in':
+                ids = f['val']
+            elif f.get('name') == 'report_date':
+                value = datetime.fromisoformat(f['val'])
+                if f['op'] == 'ge':
+                    begin_date = value
+                elif f['op'] == 'le':
+                    end_date = value
+
+        # Report ids are one more than their index
+        indices = self.generator.index_range(begin_date, end_date)
+        if ids is not None:
+            indices = [i for i in sorted({int(i) - 1 for i in ids}) if i in indices]
+        num_results = len(indices)
+        total_pages = -(-num_results // self.results_per_page)
+        start = (page_num - 1) * self.results_per_page
+        page_indices = indices[start:start + self.results_per_page]
+
+        return {
+            'features': [self.generator.feature(i) for i in page_indices],
+            'properties': {
+                'num_results': num_results,
+                'page': page_num,
+                'total_pages': total_pages
+            },
+            'type': 'FeatureCollection'
+        }
+
+
+    def _make_handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with simulator._lock:
+                    simulator.num_requests += 1
+                    fail = simulator._rng.random() < simulator.error_rate
+                    if fail:
+                        simulator.num_errors += 1
+
+                if simulator.latency_in_sec:
+                    time.sleep(simulator.latency_in_sec)
+
+                if fail:
+                    self.send_error(503, 'Service Unavailable')
+                    return
+
+                params = parse_qs(urlparse(self.path).query)
+                try:
+                    query = json.loads(params.get('q', ['{}'])[0])
+                    page_num = int(params.get('page', ['1'])[0])
+                    body = json.dumps(simulator.get_page(query, page_num)).encode()
+                except (ValueError, KeyError) as e:
+                    self.send_error(400, f'Bad Request. {e}')
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--num-reports', type=int, default=1_000_000)
+    parser.add_argument('--results-per-page', type=int, default=DEFAULT_RESULTS_PER_PAGE)
+    parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--states', nargs='*', default=None)
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    generator = SyntheticReportGenerator(
+        num_reports=args.num_reports,
+        duplicate_rate=args.duplicate_rate,
+        states=args.states)
+    api = MockFracTrackerAPI(
+        generator,
+        results_per_page=args.results_per_page,
+        latency_in_sec=args.latency,
+        error_rate=args.error_rate,
+        host='0.0.0.0',
+        port=args.port)
+    print(f"Serving {args.num_reports} synthetic reports at {api.url}. "
+        f"Set FRACTRACKER_API_URL to target it.")
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        api.stop()
@@ -0,0 +1,110 @@
+'''
+mock_geocoder.py
+
+An offline stand-in for reverse geocoding. Resolves coordinates to the
+nearest mock location in `tests/data/mock_locations.json` so that
+reports served by the API simulator never reach Nominatim.
+'''
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+from models.mock_location import MockLocation
+from tests.mocks.mock_fractracker_api import load_anchor_locations
+from typing import Dict, Optional, Tuple
+from unittest import mock
+from utilities import geocoding
+from utilities.geocoding import GeocodeResult, GeocodingProvider, GeocodingScheduler
+
+
+class MockGeocoder:
+    '''
+    Builds `MockLocation` instances for coordinates
+    by snapping them to the closest anchor location.
+    '''
+
+    def __init__(self) -> None:
+        self.anchors = load_anchor_locations()
+        self.num_lookups = 0
+
+
+    def nearest(self, lat: float, lon: float) -> Dict:
+        '''
+        Returns the anchor location closest to the coordinates.
+        '''
+        self.num_lookups += 1
+        return min(self.anchors,
+            key=lambda a: (a['lat'] - lat) ** 2 + (a['lon'] - lon) ** 2)
+
+
+    def reverse(self, query: Tuple[float, float], **kwargs) -> SimpleNamespace:
+        '''
+        Mimics `geopy.Nominatim.reverse`, returning an object
+        whose `raw` attribute holds the Nominatim address fields.
+        '''
+        anchor = self.nearest(*query)
+        return SimpleNamespace(raw={
+            'display_name': anchor['full_address'],
+            'address': {
+                'state': anchor['state'],
+                'postcode': anchor['zip'],
+                'county': anchor['county']
+            }
+        })
+
+
+    def __call__(self, lat: float, lon: float) -> MockLocation:
+        anchor = self.nearest(lat, lon)
+        return MockLocation(
+            lat=lat,
+            lon=lon,
+            state=anchor['state'],
+            zip=anchor['zip'],
+            county=anchor['county'],
+            full_address=anchor['full_address'])
+
+
+class MockGeocodingProvider(GeocodingProvider):
+    '''
+    A geocoding provider answering from a `MockGeocoder`.
+    '''
+
+    def __init__(self, geocoder: MockGeocoder, min_delay_in_sec: float=0) -> None:
+        super().__init__('mock', min_delay_in_sec)
+        self.geocoder = geocoder
+
+
+    def reverse(self, lat: float, lon: float) -> Optional[GeocodeResult]:
+        anchor = self.geocoder.nearest(lat, lon)
+        return GeocodeResult(
+            state=anchor['state'],
+            county=anchor['county'],
+            zip=anchor['zip'],
+            full_address=anchor['full_address'])
+
+
+@contextmanager
+def offline_geocoding():
+    '''
+    Patches the geocoder used by `ApiReport`, as well as the
+    shared geocoding scheduler, for the duration of the block.
+    Yields the `MockGeocoder`.
+    '''
+    geocoder = MockGeocoder()
+    scheduler = GeocodingScheduler([MockGeocodingProvider(geocoder)])
+    with mock.patch('models.api_report.GeocodedLocation', geocoder), \
+        mock.patch('models.report_table.GeocodedLocation', geocoder), \
+        mock.patch.object(geocoding, '_geocoder', scheduler):
+        yield geocoder
+
+
+@contextmanager
+def offline_nominatim():
+    '''
+    Replaces the shared geocoding scheduler so that real
+    `GeocodedLocation` instances are built without network
+    access or rate limiting. Yields the `MockGeocoder`.
+    '''
+    geocoder = MockGeocoder()
+    scheduler = GeocodingScheduler([MockGeocodingProvider(geocoder)])
+    with mock.patch.object(geocoding, '_geocoder', scheduler):
+        yield geocoder
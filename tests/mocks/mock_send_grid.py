@@ -0,0 +1,181 @@
+'''
+mock_send_grid.py
+
+A local HTTP server that mimics the SendGrid v3 mail endpoint, so that
+complaint emails can be sent and timed without contacting SendGrid.
+Every message is recorded with its recipients, subject and number of
+attachments. Slow or failing deliveries can be simulated with a delay
+added to every response (`latency_in_sec`) and the probability that a
+request fails (`error_rate`).
+
+`SendGridEmail` is pointed at the server with `redirect_send_grid`.
+To run the server standalone, enter the command:
+
+    python -m tests.mocks.mock_send_grid --port 5003
+'''
+
+import argparse
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sendgrid import SendGridAPIClient
+from typing import Dict, List
+from unittest import mock
+
+
+class MockSendGrid:
+    '''
+    A threaded HTTP server that accepts SendGrid v3 mail requests.
+    May be used as a context manager, in which case the server runs
+    on a background thread for the duration of the block.
+    '''
+
+    def __init__(
+        self,
+        latency_in_sec: float=0.0,
+        error_rate: float=0.0,
+        seed: int=0,
+        host: str='127.0.0.1',
+        port: int=0) -> None:
+        '''
+        The constructor for `MockSendGrid`.
+
+        Parameters:
+            latency_in_sec (float): The delay added to every response.
+
+            error_rate (float): The probability that a request fails
+                with a "503 - Service Unavailable" response.
+
+            seed (int): The random seed for injected errors.
+
+            host (str): The host address to bind.
+
+            port (int): The port to bind. Defaults to any free port.
+
+        Returns:
+            None
+        '''
+        self.latency_in_sec = latency_in_sec
+        self.error_rate = error_rate
+        self.messages: List[Dict] = []
+        self.num_requests = 0
+        self.num_errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+
+    @property
+    def url(self) -> str:
+        '''
+        The root URL of the server, used as the SendGrid API host.
+        '''
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+    def start(self) -> 'MockSendGrid':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+
+    def stop(self) -> None:
+        if self._thread:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+
+    def __enter__(self) -> 'MockSendGrid':
+        return self.start()
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+    def _make_handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                with simulator._lock:
+                    simulator.num_requests += 1
+                    fail = simulator._rng.random() < simulator.error_rate
+                    if fail:
+                        simulator.num_errors += 1
+
+                if simulator.latency_in_sec:
+                    time.sleep(simulator.latency_in_sec)
+
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                if self.path != '/v3/mail/send':
+                    self.send_error(404, 'Not Found')
+                    return
+                if fail:
+                    error = json.dumps({'errors': [{'message': 'Service Unavailable'}]}).encode()
+                    self.send_response(503)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(error)))
+                    self.end_headers()
+                    self.wfile.write(error)
+                    return
+
+                mail = json.loads(body)
+                personalization = mail['personalizations'][0]
+                with simulator._lock:
+                    simulator.messages.append({
+                        'to': [p['email'] for p in personalization.get('to', [])],
+                        'cc': [p['email'] for p in personalization.get('cc', [])],
+                        'subject': mail.get('subject'),
+                        'num_attachments': len(mail.get('attachments', []))
+                    })
+
+                self.send_response(202)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
+
+
+@contextmanager
+def redirect_send_grid(server: MockSendGrid):
+    '''
+    Sends every `SendGridEmail` to a local server for the
+    duration of the block, with a placeholder API key.
+    '''
+    client = partial(SendGridAPIClient, host=server.url)
+    with mock.patch('utilities.sendgrid_email.SendGridAPIClient', client), \
+        mock.patch.dict('os.environ', {'SENDGRID_API_KEY': 'SG.mock'}):
+        yield server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=5003)
+    args = parser.parse_args()
+
+    server = MockSendGrid(
+        latency_in_sec=args.latency,
+        error_rate=args.error_rate,
+        host='0.0.0.0',
+        port=args.port)
+    print(f"Accepting SendGrid mail at {server.url}/v3/mail/send.")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,157 @@
+'''
+test_agency_health.py
+
+Unit tests run against the agency circuit breakers and concurrency limits.
+'''
+
+import json
+import unittest
+from constants import MOCK_LOCATIONS_FILE
+from models.agency_health import (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN,
+    AgencyHealth, DeferredSubmissions, deferred_submissions, get_agency_health,
+    get_deferred_submissions, reset_agency_health, resubmit_deferred)
+from models.base_report import ReportError
+from models.metadata import (STATUS_DEFERRED, STATUS_NOT_SUBMITTED, STATUS_REJECTED,
+    STATUS_SUBMITTED, WEB_SUBMISSION, submit_and_return_metadata)
+from models.mock_report import MockReport
+from utilities.config import Config
+
+
+AGENCY_NAME = 'Test Agency'
+
+
+class FlakyAgency:
+    '''
+    A submission function that fails until marked as available.
+    '''
+
+    def __init__(self) -> None:
+        self.available = False
+        self.num_calls = 0
+
+    def __call__(self, report) -> None:
+        self.num_calls += 1
+        if not self.available:
+            raise Exception('Agency web form unavailable.')
+
+
+class TestAgencyHealth(unittest.TestCase):
+
+    def setUp(self):
+        reset_agency_health()
+        with open(MOCK_LOCATIONS_FILE) as f:
+            self.reports = [MockReport(loc) for loc in json.load(f)]
+
+
+    def tearDown(self):
+        reset_agency_health()
+
+
+    def submit(self, submit_fun, report):
+        return submit_and_return_metadata(
+            report=report,
+            submit_fun=submit_fun,
+            submission_type=WEB_SUBMISSION,
+            agency=AGENCY_NAME)
+
+
+    def test_circuit_opens_and_defers(self):
+        '''
+        Test that submissions are deferred once the failure threshold is hit.
+        '''
+        agency = FlakyAgency()
+        health = get_agency_health(AGENCY_NAME)
+        statuses = [self.submit(agency, r).status for r in self.reports[:5]]
+
+        threshold = health.failure_threshold
+        self.assertEqual(statuses[:threshold], [STATUS_NOT_SUBMITTED] * threshold)
+        self.assertEqual(statuses[threshold:], [STATUS_DEFERRED] * (5 - threshold))
+        self.assertEqual(agency.num_calls, threshold)
+        self.assertEqual(health.state, CIRCUIT_OPEN)
+        self.assertEqual(len(get_deferred_submissions()), 5 - threshold)
+
+
+    def test_deferred_retried_after_probe(self):
+        '''
+        Test that deferred submissions are retried once the agency recovers.
+        '''
+        agency = FlakyAgency()
+        health = get_agency_health(AGENCY_NAME)
+        health.reset_timeout_in_sec = 0.05
+        metadata = [self.submit(agency, r) for r in self.reports[:5]]
+        deferred_ids = {m.id for m in metadata if m.status == STATUS_DEFERRED}
+
+        agency.available = True
+        retried = resubmit_deferred(max_wait_in_sec=1)
+        self.assertEqual({m.id for m in retried}, deferred_ids)
+        self.assertTrue(all(m.status == STATUS_SUBMITTED for m in retried))
+        self.assertEqual(health.state, CIRCUIT_CLOSED)
+        self.assertFalse(get_deferred_submissions())
+
+
+    def test_deferred_per_run(self):
+        '''
+        Test that runs sharing the process only retry
+        the submissions they deferred themselves.
+        '''
+        agency = FlakyAgency()
+        health = get_agency_health(AGENCY_NAME)
+        health.reset_timeout_in_sec = 0.05
+        for report in self.reports[:health.failure_threshold]:
+            self.submit(agency, report)
+
+        runs = [DeferredSubmissions(), DeferredSubmissions()]
+        run_reports = [self.reports[3:5], self.reports[5:6]]
+        for deferred, reports in zip(runs, run_reports):
+            with deferred_submissions(deferred):
+                for report in reports:
+                    self.assertEqual(self.submit(agency, report).status, STATUS_DEFERRED)
+        self.assertEqual([len(d) for d in runs], [2, 1])
+        self.assertFalse(get_deferred_submissions())
+
+        agency.available = True
+        retried = resubmit_deferred(max_wait_in_sec=1, deferred=runs[0])
+        self.assertEqual({m.id for m in retried}, {r.id for r in run_reports[0]})
+        self.assertEqual([len(d) for d in runs], [0, 1])
+
+
+    def test_report_failures_not_counted(self):
+        '''
+        Test that submissions failing because of their report are
+        rejected without opening the circuit or holding its probe.
+        '''
+        def unknown_county(report):
+            raise ReportError("County 'Atlantis' is not an option of the web form.")
+
+        health = get_agency_health(AGENCY_NAME)
+        metadata = [self.submit(unknown_county, r) for r in self.reports[:5]]
+        self.assertEqual({m.status for m in metadata}, {STATUS_REJECTED})
+        self.assertEqual(health.state, CIRCUIT_CLOSED)
+        self.assertEqual(health.consecutive_failures, 0)
+
+        health.state, health.opened_at = CIRCUIT_OPEN, 0
+        self.assertEqual(self.submit(unknown_county, self.reports[0]).status, STATUS_REJECTED)
+        self.assertEqual(health.state, CIRCUIT_HALF_OPEN)
+        self.assertEqual(self.submit(FlakyAgency(), self.reports[1]).status, STATUS_NOT_SUBMITTED)
+        self.assertEqual(health.state, CIRCUIT_OPEN)
+
+        # Deferred submissions are left to the retry queue by default
+        self.assertEqual(Config().submission_deferred_max_wait_in_sec, 0)
+
+
+    def test_concurrency_adapts_to_latency(self):
+        '''
+        Test that the concurrency limit grows on fast submissions
+        and is halved on slow submissions.
+        '''
+        health = AgencyHealth(AGENCY_NAME, max_concurrency=4)
+        for _ in range(10):
+            health.record_success(latency_in_sec=1.0)
+        self.assertEqual(health.concurrency, 4)
+
+        health.record_success(latency_in_sec=5.0)
+        self.assertEqual(health.concurrency, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
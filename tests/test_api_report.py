@@ -0,0 +1,91 @@
+'''
+test_api_report.py
+
+Unit tests run against the compact report and metadata classes.
+'''
+
+import json
+import unittest
+from constants import ROOT_DIRECTORY
+from datetime import datetime, timezone
+from models.api_report import ApiReport
+from models.base_report import ReportError
+from models.metadata import Metadata
+from tests.mocks.mock_geocoder import offline_nominatim
+
+
+class TestApiReport(unittest.TestCase):
+
+    def setUp(self):
+        with open(f"{ROOT_DIRECTORY}/data_analysis/api_data/sample_report.json") as f:
+            self.sample = json.load(f)
+        with offline_nominatim():
+            self.report = ApiReport(self.sample, check_emails=False)
+
+
+    def test_property_api_preserved(self):
+        '''
+        Test that dates and senses keep their original representations.
+        '''
+        report_date = self.sample['properties']['report_date']
+        self.assertEqual(self.report.date, report_date)
+        self.assertEqual(self.report.date_time, datetime.fromisoformat(report_date))
+        self.assertEqual(self.report.senses, {'Sight': True, 'Smell': False,
+            'Taste': False, 'Touch': False, 'Sound': False})
+        self.assertTrue(self.report.location.is_valid)
+
+
+    def test_unknown_senses_kept(self):
+        '''
+        Test that senses with unknown names are logged and kept as other.
+        '''
+        self.sample['properties']['senses'].append({'properties': {'name': 'Hearing'}})
+        with offline_nominatim(), self.assertLogs('fractracker', 'WARNING') as logs:
+            report = ApiReport(self.sample, check_emails=False)
+        self.assertIn('Hearing', logs.output[0])
+        self.assertTrue(report.senses['Sight'])
+        self.assertTrue(report.senses['Other'])
+        self.assertNotIn('Other', self.report.senses)
+
+
+    def test_report_date_parsed_on_use(self):
+        '''
+        Test that UTC dates with a `Z` suffix are parsed and that an
+        invalid date fails only the report reading it as a `datetime`.
+        '''
+        self.sample['properties']['report_date'] = '2021-03-01T12:30:00Z'
+        with offline_nominatim():
+            report = ApiReport(self.sample, check_emails=False)
+        self.assertEqual(report.date, '2021-03-01T12:30:00Z')
+        self.assertEqual(report.date_time, datetime(2021, 3, 1, 12, 30, tzinfo=timezone.utc))
+
+        self.sample['properties']['report_date'] = 'March 1st'
+        with offline_nominatim():
+            report = ApiReport(self.sample, check_emails=False)
+        self.assertEqual(Metadata(report).report_date, 'March 1st')
+        with self.assertRaises(ReportError):
+            report.date_time
+
+
+    def test_instances_use_slots(self):
+        '''
+        Test that reports, locations and metadata carry no instance dict.
+        '''
+        meta = Metadata(self.report)
+        for obj in (self.report, self.report.location, meta):
+            self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+        self.assertIn(str(self.report.id), repr(self.report))
+
+
+    def test_metadata_row(self):
+        '''
+        Test that metadata converts to a row in column order.
+        '''
+        row = Metadata(self.report, status_reason='Test.').to_dict()
+        self.assertEqual(list(row), list(Metadata.FIELDS))
+        self.assertEqual(row['report_date'], self.report.date)
+        self.assertEqual(row['status_reason'], 'Test.')
+
+
+if __name__ == '__main__':
+    unittest.main()
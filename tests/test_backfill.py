@@ -0,0 +1,139 @@
+'''
+test_backfill.py
+
+Unit tests run against the windowed backfill of long date ranges.
+'''
+
+import tempfile
+import threading
+import time
+import unittest
+import pandas as pd
+from datetime import date, datetime, timedelta
+from models.backfill import (STATUS_COMPLETED, STATUS_FAILED,
+    BackfillCheckpoints, run_backfill, split_range)
+from tests.mocks.mock_fractracker_api import MockFracTrackerAPI, SyntheticReportGenerator
+from tests.mocks.mock_geocoder import offline_geocoding
+from unittest import mock
+from utilities.fractracker_api import FracAPI
+from utilities.storage import LocalDatastore
+
+
+class TestBackfill(unittest.TestCase):
+
+    def test_split_range(self):
+        '''
+        Test that date ranges are split into consecutive inclusive
+        windows, with a shorter last week if needed.
+        '''
+        self.assertEqual(split_range(date(2021, 3, 1), date(2021, 3, 3), 'day'), [
+            (date(2021, 3, 1), date(2021, 3, 1)),
+            (date(2021, 3, 2), date(2021, 3, 2)),
+            (date(2021, 3, 3), date(2021, 3, 3))])
+        self.assertEqual(split_range(date(2021, 3, 1), date(2021, 3, 10), 'week'), [
+            (date(2021, 3, 1), date(2021, 3, 7)),
+            (date(2021, 3, 8), date(2021, 3, 10))])
+        with self.assertRaises(Exception):
+            split_range(date(2021, 3, 1), date(2021, 3, 10), 'month')
+
+
+    def test_rerun_skips_completed_windows(self):
+        '''
+        Test that windows are retrieved concurrently, up to the
+        maximum, submitted in order and checkpointed, and that a
+        rerun only retries the windows that failed.
+        '''
+        lock = threading.Lock()
+        active, max_active, fetched, submitted = [0], [0], [], []
+        unavailable = {'01-03-2021'}
+
+        def fetch(begin_date, end_date):
+            with lock:
+                active[0] += 1
+                max_active[0] = max(max_active[0], active[0])
+                fetched.append(begin_date)
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            if begin_date in unavailable:
+                raise Exception('API unavailable.')
+            return [begin_date]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            datastore = LocalDatastore(f"{tmp_dir}/backfill.csv")
+            summary = run_backfill('01-01-2021', '01-06-2021', 'day', fetch,
+                submitted.extend, BackfillCheckpoints(datastore).load(), max_workers=3)
+
+            self.assertEqual(summary, {'windows': 6, 'skipped': 0, 'completed': 5, 'failed': 1})
+            self.assertEqual(submitted, ['01-01-2021', '01-02-2021', '01-04-2021',
+                '01-05-2021', '01-06-2021'])
+            self.assertGreater(max_active[0], 1)
+            self.assertLessEqual(max_active[0], 3)
+            checkpoints = datastore.read_data()
+            statuses = dict(zip(checkpoints['begin_date'], checkpoints['status']))
+            self.assertEqual(statuses['2021-01-03'], STATUS_FAILED)
+            self.assertEqual(statuses['2021-01-04'], STATUS_COMPLETED)
+
+            unavailable.clear()
+            summary = run_backfill('01-01-2021', '01-06-2021', 'day', fetch,
+                submitted.extend, BackfillCheckpoints(datastore).load(), max_workers=3)
+            self.assertEqual(summary, {'windows': 6, 'skipped': 5, 'completed': 1, 'failed': 0})
+            self.assertEqual(fetched[6:], ['01-03-2021'])
+
+
+    def test_windows_cover_range(self):
+        '''
+        Test that backfilling a range window by window retrieves the
+        same reports from the API as retrieving the range at once,
+        including those made after midnight on each window's last day.
+        '''
+        generator = SyntheticReportGenerator(num_reports=300,
+            begin_date=datetime(2020, 1, 1), end_date=datetime(2020, 2, 1))
+        with MockFracTrackerAPI(generator, results_per_page=50) as api, \
+            offline_geocoding():
+            fetch = lambda begin_date, end_date: FracAPI(begin_date, end_date,
+                check_emails=False, base_url=api.url).reports
+            expected = sorted(r.id for r in fetch('01-01-2020', '01-31-2020'))
+
+            for window in ('day', 'week'):
+                submitted = []
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    checkpoints = BackfillCheckpoints(LocalDatastore(f"{tmp_dir}/backfill.csv"))
+                    run_backfill('01-01-2020', '01-31-2020', window, fetch,
+                        submitted.extend, checkpoints.load())
+                self.assertEqual(sorted(r.id for r in submitted), expected)
+
+        self.assertEqual(len(expected), len(generator.index_range(
+            datetime(2020, 1, 1), datetime(2020, 2, 1) - timedelta(microseconds=1))))
+
+
+    def test_backfill_request(self):
+        '''
+        Test that the app backfills the range given in a request
+        and saves each window's submissions.
+        '''
+        import main
+
+        windows = []
+        def get_api_reports(begin_date, end_date):
+            windows.append((begin_date, end_date))
+            return []
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+            mock.patch.object(main, 'get_api_reports', get_api_reports), \
+            mock.patch.object(main, 'submit_reports', return_value=pd.DataFrame({'id': [1]})), \
+            mock.patch.object(main, 'datastore', LocalDatastore(f"{tmp_dir}/metadata.csv")), \
+            mock.patch.object(main, 'retry_datastore', LocalDatastore(f"{tmp_dir}/retry.csv")), \
+            mock.patch.object(main, 'backfill_datastore', LocalDatastore(f"{tmp_dir}/backfill.csv")):
+            response = main.app.test_client().post('/', json={'start_date': '02-01-2021',
+                'end_date': '02-20-2021', 'backfill': True, 'window': 'week'})
+            checkpoints = pd.read_csv(f"{tmp_dir}/backfill.csv")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(windows), [('02-01-2021', '02-07-2021'),
+            ('02-08-2021', '02-14-2021'), ('02-15-2021', '02-20-2021')])
+        self.assertEqual(list(checkpoints['status']), [STATUS_COMPLETED] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
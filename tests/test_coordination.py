@@ -0,0 +1,192 @@
+'''
+test_coordination.py
+
+Unit tests run against the coordination of concurrent submission runs.
+'''
+
+import json
+import tempfile
+import threading
+import time
+import unittest
+import pandas as pd
+from constants import MOCK_LOCATIONS_FILE
+from models.metadata import Metadata
+from models.mock_report import MockReport
+from models.shard import Shard
+from unittest import mock
+from utilities.config import Config
+from utilities.coordination import (Lease, LeaseLost, LeaseUnavailable,
+    held_leases)
+from utilities.storage import LocalDatastore, WriteConflict
+
+
+class TestCoordination(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_lease(self):
+        '''
+        Test that a lease is held by one owner at a time until
+        released or expired, and that conditional writes fail
+        once the data was changed.
+        '''
+        datastore = LocalDatastore(f"{self.tmp_dir.name}/lease.csv")
+        first = Lease(datastore, 'run', owner='first')
+        second = Lease(datastore, 'run', owner='second')
+
+        with first.hold():
+            self.assertFalse(second.acquire())
+            with self.assertRaises(LeaseUnavailable):
+                with second.hold():
+                    pass
+        self.assertTrue(second.acquire())
+
+        second.release()
+        expired = Lease(datastore, 'run', ttl_in_sec=-1, owner='expired')
+        self.assertTrue(expired.acquire())
+        self.assertTrue(first.acquire())
+
+        _, version = datastore.read_versioned_data()
+        datastore.write_data(pd.DataFrame({'id': [1]}))
+        with self.assertRaises(WriteConflict):
+            datastore.write_data_if(pd.DataFrame({'id': [2]}), version)
+
+
+    def test_concurrent_requests(self):
+        '''
+        Test that concurrent identical requests are coalesced into one
+        run and that requests are skipped while another instance
+        holds the lease.
+        '''
+        import main
+
+        started, finish, calls = threading.Event(), threading.Event(), []
+
+        def submit_run(start_date, end_date, shard=None):
+            calls.append(start_date)
+            started.set()
+            finish.wait(10)
+            return "Automated complaint submission complete.", 201
+
+        with mock.patch.object(main, 'submit_run', submit_run), \
+            mock.patch.object(main, 'datastore',
+                LocalDatastore(f"{self.tmp_dir.name}/metadata.csv")):
+            body = {'start_date': '02-01-2021', 'end_date': '02-02-2021'}
+            responses = []
+            post = lambda: responses.append(main.app.test_client().post('/', json=body))
+            threads = [threading.Thread(target=post) for _ in range(3)]
+            threads[0].start()
+            started.wait(10)
+            for thread in threads[1:]:
+                thread.start()
+            # Let the other requests join the run before it completes
+            time.sleep(0.2)
+            finish.set()
+            for thread in threads:
+                thread.join(10)
+
+            self.assertEqual(calls, ['02-01-2021'])
+            self.assertEqual([r.status_code for r in responses], [201] * 3)
+
+            with main.run_lease().hold():
+                response = main.app.test_client().post('/', json=body)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(calls, ['02-01-2021'])
+
+            # Runs conflict with those of overlapping shards only
+            with main.run_lease(Shard.from_spec({'states': ['ohio'], 'index': 1, 'count': 4})).hold():
+                for shard, status_code in (
+                    (None, 409),
+                    ({'states': ['ohio', 'texas']}, 409),
+                    ({'index': 3, 'count': 6}, 409),
+                    ({'states': ['texas']}, 201),
+                    ({'index': 0, 'count': 2}, 201)):
+                    response = main.app.test_client().post('/', json={**body, 'shard': shard})
+                    self.assertEqual(response.status_code, status_code, shard)
+            self.assertEqual(len(calls), 3)
+
+
+    def test_lost_lease_stops_run(self):
+        '''
+        Test that a run whose lease was taken by another run stops
+        submitting, saves what it submitted, then fails.
+        '''
+        import main
+
+        datastore = LocalDatastore(f"{self.tmp_dir.name}/metadata.csv")
+        lease = Lease(datastore.sibling('leases'), 'all', ttl_in_sec=0.3, owner='first')
+        with lease.hold():
+            self.assertEqual(held_leases(), (lease,))
+            # Another run takes over the lease once expired
+            pd.DataFrame({'name': ['all'], 'owner': ['second'],
+                'expires': [time.time() + 60]}).to_csv(
+                f"{self.tmp_dir.name}/metadata_leases.csv", index=False)
+            self.assertTrue(lease.lost.wait(2))
+            with self.assertRaises(LeaseLost):
+                lease.check()
+        self.assertEqual(held_leases(), ())
+
+        with open(MOCK_LOCATIONS_FILE) as f:
+            reports = [MockReport(loc) for loc in json.load(f)]
+        submitted = []
+
+        class DryRunSubmission:
+            def __init__(self, report, agencies=None, rejections=None, deferred=None):
+                submitted.append(report.id)
+                lease.lost.set()
+                self.metadata = [Metadata(report, agency=report.location.state)]
+
+        lease = Lease(datastore.sibling('leases'), 'all', owner='third')
+        with mock.patch.object(main, 'Submission', DryRunSubmission), \
+            mock.patch.object(main, 'validate_submissions', return_value={}), \
+            mock.patch.object(main, 'prepare_submissions'), \
+            mock.patch.object(main, 'datastore', datastore), \
+            mock.patch.object(Config, 'submission_max_workers', new_callable=mock.PropertyMock,
+                return_value=1):
+            with self.assertRaises(LeaseUnavailable):
+                with lease.hold():
+                    pass
+
+            lease = Lease(datastore.sibling('leases'), '0_of_2', owner='third',
+                conflicts=lambda name, other: False)
+            with lease.hold(), self.assertRaises(LeaseLost):
+                main.submit_and_save(reports, None, datastore)
+
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual(list(datastore.read_data()['id']), submitted)
+
+
+    def test_conflicting_writes_merged(self):
+        '''
+        Test that metadata saved by another run while a run was
+        submitting is merged with that run's own metadata.
+        '''
+        import main
+
+        datastore = LocalDatastore(f"{self.tmp_dir.name}/metadata.csv")
+        datastore.write_data(pd.DataFrame({'id': [1, 2], 'agency': ['a', 'a'],
+            'status': ['failed', 'failed']}))
+
+        base_df, version = datastore.read_versioned_data()
+        other_df = main.replace_metadata(base_df, pd.DataFrame({'id': [1, 3],
+            'agency': ['a', 'a'], 'status': ['submitted', 'submitted']}))
+        datastore.write_data(other_df)
+
+        metadata_df = main.replace_metadata(base_df, pd.DataFrame({'id': [2, 4],
+            'agency': ['a', 'a'], 'status': ['submitted', 'submitted']}))
+        main.write_merged(datastore, metadata_df, base_df, version)
+
+        merged_df = datastore.read_data()
+        self.assertEqual(dict(zip(merged_df['id'], merged_df['status'])), {
+            1: 'submitted', 2: 'submitted', 3: 'submitted', 4: 'submitted'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+'''
+test_county_index.py
+
+Unit tests run against the index mapping geocoded
+county names to web form dropdown options.
+'''
+
+import json
+import unittest
+from constants import MOCK_LOCATIONS_FILE
+from models.mock_report import MockReport
+from submissions import texas
+from unittest import mock
+from utilities.county_index import CountyOption, get_county_index, normalize_county
+
+
+# States whose web forms have a county dropdown
+STATES = ('colorado', 'new_mexico', 'pennsylvania', 'texas', 'west_virginia')
+
+
+class TestCountyIndex(unittest.TestCase):
+
+    def test_normalize_county(self):
+        '''
+        Test that accents, designations and punctuation are ignored.
+        '''
+        self.assertEqual(normalize_county('Doña Ana County'), normalize_county('Dona Ana'))
+        self.assertEqual(normalize_county('City and County of Broomfield'), 'broomfield')
+        self.assertEqual(normalize_county('DeWitt County'), normalize_county('De Witt'))
+        self.assertEqual(normalize_county(' St. Mary Parish '), 'stmary')
+
+
+    def test_geocoded_counties_found(self):
+        '''
+        Test that counties as returned by the geocoder map to
+        the option values or texts used by each form.
+        '''
+        self.assertEqual(get_county_index('texas').option('Harris County'),
+            CountyOption(value='Harris', text='Harris'))
+        self.assertEqual(get_county_index('new_mexico').option('Doña Ana County'),
+            CountyOption(value=None, text='Dona Ana'))
+        self.assertEqual(get_county_index('colorado').option('Weld County').text, 'Weld County')
+        self.assertEqual(get_county_index('pennsylvania').option('McKean County').text, 'McKean')
+
+        with open(MOCK_LOCATIONS_FILE) as f:
+            for location in json.load(f):
+                state = location['state'].lower().replace(' ', '_')
+                if state in STATES:
+                    self.assertIn(location['county'], get_county_index(state))
+
+
+    def test_unknown_county_caught_before_launch(self):
+        '''
+        Test that a county missing from the form fails
+        the submission before a browser is launched.
+        '''
+        with open(MOCK_LOCATIONS_FILE) as f:
+            report = MockReport(next(l for l in json.load(f) if l['state'] == 'Texas'))
+
+        with mock.patch.object(report.location, '_county', 'Cook County'), \
+            mock.patch('submissions.texas.web_utilities.launch_chrome_browser') as launch:
+            with self.assertRaises(Exception):
+                texas.submit(report)
+        launch.assert_not_called()
+
+
+    def test_select_by_value_or_text(self):
+        '''
+        Test that options are selected by value when the form
+        is keyed by value and by visible text otherwise.
+        '''
+        with mock.patch('selenium.webdriver.support.ui.Select') as select:
+            get_county_index('west_virginia').select(mock.Mock(), 'Kanawha County')
+            get_county_index('pennsylvania').select(mock.Mock(), 'Westmoreland County')
+        select.return_value.select_by_value.assert_called_once_with('Kanawha')
+        select.return_value.select_by_visible_text.assert_called_once_with('Westmoreland')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+'''
+test_email_template.py
+
+Unit tests run against the precompiled complaint email templates.
+'''
+
+import json
+import unittest
+from constants import MOCK_LOCATIONS_FILE
+from models import email_template
+from models.email_template import append_num_suffix, render_batch, render_email
+from models.mock_report import MockReport
+from models.state_email import StateEmail
+from unittest import mock
+
+
+AGENCY_NAME = 'Test Agency'
+
+
+class TestEmailTemplate(unittest.TestCase):
+
+    def setUp(self):
+        with open(MOCK_LOCATIONS_FILE) as f:
+            self.report = MockReport(json.load(f)[0])
+
+
+    def tearDown(self):
+        email_template.discard_rendered()
+
+
+    def test_num_suffixes(self):
+        '''
+        Test the English suffixes of days and other numbers.
+        '''
+        expected = {1: '1st', 2: '2nd', 3: '3rd', 4: '4th', 11: '11th', 12: '12th',
+            13: '13th', 21: '21st', 22: '22nd', 23: '23rd', 31: '31st', 212: '212th'}
+        for num, formatted in expected.items():
+            self.assertEqual(append_num_suffix(num), formatted)
+
+
+    def test_plain_text_message(self):
+        '''
+        Test that the plain-text body reads as the original message,
+        omitting passages for missing names, counties and descriptions.
+        '''
+        email = render_email(self.report, AGENCY_NAME)
+        self.assertTrue(email.plain.startswith(
+            'To the Test Agency:\n\nHi, my name is N/A N/A. On January 2nd, '))
+        self.assertIn(f'{self.report.lat:.4f} degrees latitude and '
+            f'{self.report.lon:.4f} degrees longitude in {self.report.location.county}. '
+            'In the app, I included the following description: '
+            '"PLEASE DISREGARD THIS SUBMISSION.". Please contact me directly at '
+            'noreply@noreply.com to follow up', email.plain)
+        self.assertTrue(email.plain.endswith('\n\nSincerely,\nN/A N/A'))
+
+        with mock.patch.object(MockReport, 'description', ''), \
+            mock.patch.object(MockReport, 'first_name', ''):
+            email = render_email(self.report, AGENCY_NAME)
+        self.assertIn('To the Test Agency:\n\nOn January 2nd', email.plain)
+        self.assertIn('degrees longitude in Sacramento County. Please contact', email.plain)
+        self.assertTrue(email.plain.endswith('have a great day!'))
+
+
+    def test_html_escapes_fields(self):
+        '''
+        Test that report fields are escaped in the HTML body.
+        '''
+        with mock.patch.object(MockReport, 'description', 'Odor <strong> & smoke'):
+            email = render_email(self.report, AGENCY_NAME)
+        self.assertIn('<blockquote>Odor &lt;strong&gt; &amp; smoke</blockquote>', email.html)
+        self.assertIn('"Odor <strong> & smoke"', email.plain)
+
+
+    def test_batch_rendered_once(self):
+        '''
+        Test that emails rendered in a batch are used by `StateEmail`.
+        '''
+        render_batch([self.report], AGENCY_NAME)
+        with mock.patch.object(email_template, 'email_fields') as email_fields:
+            state_email = StateEmail(self.report, 'to@example.com',
+                'from@example.com', 'cc@example.com', AGENCY_NAME, 'Subject')
+            message = state_email._create_email_message()
+        email_fields.assert_not_called()
+        self.assertTrue(message.startswith('To the Test Agency:'))
+        self.assertEqual(state_email.to_email, 'to@example.com')
+
+
+    def test_rendered_discarded_after_failed_run(self):
+        '''
+        Test that emails rendered for a run are discarded
+        even if its submissions fail.
+        '''
+        import main
+        import pandas as pd
+
+        def prepare_submissions(reports):
+            render_batch(reports, AGENCY_NAME)
+
+        with mock.patch.object(main, 'prepare_submissions', prepare_submissions), \
+            mock.patch.object(main, 'validate_submissions', return_value={}), \
+            mock.patch.object(main, 'Submission', side_effect=Exception('Browser crashed.')):
+            with self.assertRaises(Exception):
+                main.submit_reports([self.report], metadata_df=pd.DataFrame({'id': []}))
+        self.assertEqual(email_template._rendered, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+'''
+test_email_validation.py
+
+Unit tests run against the cached validation of email addresses.
+'''
+
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from utilities.email_validation import EmailValidationService, email_domain
+from utilities.storage import LocalDatastore
+
+
+class FakeValidator:
+    '''
+    Stands in for `validate_email`, recording its calls. Addresses
+    at 'example.com' are valid and the domain 'invalid.test'
+    has no mail servers.
+    '''
+
+    def __init__(self, delay_in_sec: float=0.0) -> None:
+        self.delay_in_sec = delay_in_sec
+        self.calls = []
+        self.max_concurrent = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, email_address, check_dns=True, check_smtp=True, **kwargs):
+        with self._lock:
+            self.calls.append((email_address, check_dns, check_smtp))
+            self._active += 1
+            self.max_concurrent = max(self.max_concurrent, self._active)
+        time.sleep(self.delay_in_sec)
+        with self._lock:
+            self._active -= 1
+        if not check_dns and not check_smtp:
+            return '@' in email_address
+        return not email_address.endswith('@invalid.test')
+
+    def lookups(self, smtp: bool=False):
+        return [c[0] for c in self.calls if c[1] and c[2] == smtp]
+
+
+class TestEmailValidation(unittest.TestCase):
+
+    def test_domain_results_reused(self):
+        '''
+        Test that each domain is looked up once for all its addresses
+        and that invalid domains fail without an SMTP check.
+        '''
+        fake = FakeValidator()
+        service = EmailValidationService()
+        addresses = ['Jane@Example.com', 'john@example.com', 'jo@invalid.test', 'not-an-email']
+
+        with mock.patch('utilities.email_validation.validate_email', fake):
+            results = service.validate_many(addresses)
+            self.assertTrue(service.is_valid('jane@example.com'))
+
+        self.assertEqual(email_domain('Jane@Example.com'), 'example.com')
+        self.assertEqual(results, {'Jane@Example.com': True, 'john@example.com': True,
+            'jo@invalid.test': False, 'not-an-email': False})
+        self.assertCountEqual(fake.lookups(), ['postmaster@example.com', 'postmaster@invalid.test'])
+        self.assertCountEqual(fake.lookups(smtp=True), ['jane@example.com', 'john@example.com'])
+
+
+    def test_results_expire_and_persist(self):
+        '''
+        Test that results are reloaded from the datastore,
+        but checked again once their time-to-live has passed.
+        '''
+        fake = FakeValidator()
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+            mock.patch('utilities.email_validation.validate_email', fake):
+            datastore = LocalDatastore(f"{tmp_dir}/email_validation_cache.csv")
+            service = EmailValidationService(datastore, check_smtp=False)
+            self.assertTrue(service.is_valid('jane@example.com'))
+            service.save()
+
+            reloaded = EmailValidationService(datastore, check_smtp=False).load()
+            self.assertTrue(reloaded.is_valid('jane@example.com'))
+            self.assertEqual(len(fake.lookups()), 1)
+
+            later = datetime.utcnow() + timedelta(days=8)
+            with mock.patch('utilities.email_validation.datetime') as clock:
+                clock.utcnow.return_value = later
+                self.assertTrue(reloaded.is_valid('jane@example.com'))
+            self.assertEqual(len(fake.lookups()), 2)
+
+
+    def test_page_validated_concurrently(self):
+        '''
+        Test that the addresses of a page are checked concurrently
+        and that ambiguous results are not cached.
+        '''
+        fake = FakeValidator(delay_in_sec=0.05)
+        service = EmailValidationService(max_workers=8)
+        addresses = [f'user{i}@domain{i}.org' for i in range(16)]
+
+        with mock.patch('utilities.email_validation.validate_email', fake):
+            start = time.perf_counter()
+            service.validate_many(addresses)
+            elapsed = time.perf_counter() - start
+
+            with mock.patch('utilities.email_validation.validate_email', return_value=None):
+                self.assertIsNone(service.domain_is_valid('timeout.org'))
+            self.assertTrue(service.domain_is_valid('timeout.org'))
+
+        self.assertGreater(fake.max_concurrent, 1)
+        self.assertLess(elapsed, 16 * 2 * 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
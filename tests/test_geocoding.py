@@ -0,0 +1,118 @@
+'''
+test_geocoding.py
+
+Unit tests run against the scheduler routing reverse
+geocoding lookups across providers.
+'''
+
+import threading
+import time
+import unittest
+from models.geocoded_location import GeocodedLocation
+from tests.mocks.mock_geocoder import MockGeocoder, offline_nominatim
+from typing import Optional
+from unittest import mock
+from utilities.geocoding import (GeocodeResult, GeocodingProvider,
+    GeocodingScheduler, LocalFileProvider, NominatimProvider)
+
+
+RESULT = GeocodeResult(state='Pennsylvania', county='Greene County',
+    zip='15370', full_address=None)
+
+
+class RecordingProvider(GeocodingProvider):
+    '''
+    A provider answering every lookup with the same
+    result and recording the coordinates it was given.
+    '''
+
+    def __init__(self, name: str, min_delay_in_sec: float=0, fails: bool=False) -> None:
+        super().__init__(name, min_delay_in_sec)
+        self.fails = fails
+        self.lookups = []
+        self._lock = threading.Lock()
+
+
+    def reverse(self, lat: float, lon: float) -> Optional[GeocodeResult]:
+        with self._lock:
+            self.lookups.append((lat, lon))
+        if self.fails:
+            raise Exception('Service unavailable.')
+        return RESULT
+
+
+class TestGeocoding(unittest.TestCase):
+
+    def test_routes_to_available_provider(self):
+        '''
+        Test that lookups go to a provider with capacity rather
+        than waiting on the rate limit of a busy provider.
+        '''
+        first = RecordingProvider('first', min_delay_in_sec=60)
+        second = RecordingProvider('second', min_delay_in_sec=60)
+        scheduler = GeocodingScheduler([first, second])
+
+        start = time.monotonic()
+        scheduler.reverse(40.0, -80.0)
+        scheduler.reverse(41.0, -81.0)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(first.lookups, [(40.0, -80.0)])
+        self.assertEqual(second.lookups, [(41.0, -81.0)])
+
+
+    def test_fallback_and_cache(self):
+        '''
+        Test that a failed lookup falls back to the next provider
+        and that answers are cached, while failures are not.
+        '''
+        failing = RecordingProvider('failing', fails=True)
+        backup = RecordingProvider('backup', min_delay_in_sec=0.01)
+        scheduler = GeocodingScheduler([failing, backup])
+
+        self.assertEqual(scheduler.reverse(40.0, -80.0), RESULT)
+        self.assertEqual(scheduler.reverse(40.0000001, -80.0), RESULT)
+        self.assertEqual((len(failing.lookups), len(backup.lookups)), (1, 1))
+        self.assertEqual((scheduler.hits, scheduler.misses), (1, 1))
+
+        scheduler = GeocodingScheduler([failing])
+        self.assertIsNone(scheduler.reverse(40.0, -80.0))
+        self.assertIsNone(scheduler.reverse(40.0, -80.0))
+        self.assertEqual(scheduler.hits, 0)
+
+
+    def test_reverse_many(self):
+        '''
+        Test that concurrent lookups preserve the order
+        of coordinates and geocode duplicates once.
+        '''
+        provider = RecordingProvider('provider')
+        scheduler = GeocodingScheduler([provider], max_workers=4)
+        coords = [(40.0 + i % 5, -80.0) for i in range(20)]
+        self.assertEqual(scheduler.reverse_many(coords), [RESULT] * 20)
+        self.assertEqual(sorted(provider.lookups), sorted(set(coords)))
+
+
+    def test_normalized_results(self):
+        '''
+        Test that providers normalize their answers to the
+        fields used by `GeocodedLocation`.
+        '''
+        local = LocalFileProvider('data/all_api_report_locations.csv')
+        self.assertEqual(local.reverse(39.9816746679072, -80.1348030567169), RESULT)
+        self.assertIsNone(local.reverse(0.0, 0.0))
+
+        geocoder = MockGeocoder()
+        with mock.patch('geopy.Nominatim', lambda **kwargs: geocoder):
+            result = NominatimProvider(domain='localhost:8088', min_delay_in_sec=0).reverse(38.5, -121.5)
+        anchor = geocoder.nearest(38.5, -121.5)
+        self.assertEqual(result, GeocodeResult(state=anchor['state'],
+            county=anchor['county'], zip=anchor['zip'], full_address=anchor['full_address']))
+
+        with offline_nominatim():
+            location = GeocodedLocation(38.5, -121.5)
+        self.assertTrue(location.is_valid)
+        self.assertEqual(location.county, anchor['county'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+'''
+test_logger.py
+
+Unit tests run against the app's queued, structured logging.
+'''
+
+import io
+import json
+import logging
+import threading
+import unittest
+from utilities.logger import SamplingFilter, log_context, setup_logging
+
+
+class TestLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.logger = logging.getLogger(f"test_logger.{self.id()}")
+        self.logger.propagate = False
+
+
+    def tearDown(self):
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+
+
+    def records(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+
+    def test_json_records_with_context(self):
+        '''
+        Test that records are written as JSON by the listener, with
+        the fields of the log context of the thread that logged them.
+        '''
+        listener = setup_logging(self.logger, levels={self.logger.name: 'INFO'},
+            json_format=True, stream=self.stream)
+
+        def submit(report_id):
+            with log_context(report_id=report_id, state='Ohio', stage='submission'):
+                self.logger.info(f'Submitted report {report_id}.')
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.logger.debug('Not logged below the configured level.')
+        self.logger.warning('Outside any context.', extra={'stage': 'fetch'})
+        listener.stop()
+
+        records = self.records()
+        self.assertEqual(len(records), 5)
+        for record in records[:4]:
+            self.assertEqual(record['message'], f"Submitted report {record['report_id']}.")
+            self.assertEqual((record['state'], record['stage'], record['severity']),
+                ('Ohio', 'submission', 'INFO'))
+        self.assertEqual(records[4]['stage'], 'fetch')
+        self.assertNotIn('report_id', records[4])
+
+
+    def test_debug_sampling(self):
+        '''
+        Test that DEBUG records are sampled per line of
+        code and that records of other levels are kept.
+        '''
+        listener = setup_logging(self.logger, levels={self.logger.name: 'DEBUG'},
+            json_format=True, debug_sample_rate=0.25, stream=self.stream)
+        for i in range(8):
+            self.logger.debug('Geocoded location %s.', i)
+            self.logger.info('Processed page %s.', i)
+        listener.stop()
+
+        messages = [r['message'] for r in self.records()]
+        self.assertEqual([m for m in messages if m.startswith('Geocoded')],
+            ['Geocoded location 0.', 'Geocoded location 4.'])
+        self.assertEqual(len([m for m in messages if m.startswith('Processed')]), 8)
+
+        self.assertFalse(SamplingFilter(0).filter(logging.makeLogRecord(
+            {'levelno': logging.DEBUG})))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+'''
+test_merged_report.py
+
+Unit tests run against the merging of near-identical reports.
+'''
+
+import json
+import tempfile
+import unittest
+from constants import MOCK_LOCATIONS_FILE
+from datetime import datetime, timedelta
+from models.merged_report import MergedReport, haversine_in_m, merge_nearby_reports
+from models.metadata import STATUS_MERGED, Metadata
+from models.mock_report import MockReport
+from typing import List
+from unittest import mock
+from utilities.storage import LocalDatastore
+
+
+# Degrees of latitude per meter
+LAT_PER_M = 1 / 111_195
+
+START = datetime(2021, 5, 1, 12, 0)
+
+
+class IncidentReport(MockReport):
+    '''
+    A mock report with a given position, time, user and images.
+    '''
+
+    def __init__(
+        self,
+        north_in_m: float,
+        minutes: float,
+        email: str='jane@example.com',
+        images: List[str]=(),
+        smell: bool=False) -> None:
+        with open(MOCK_LOCATIONS_FILE) as f:
+            super().__init__(json.load(f)[0])
+        self._lat += north_in_m * LAT_PER_M
+        self._date = START + timedelta(minutes=minutes)
+        self._email = email
+        self._images = list(images)
+        self._smell = smell
+
+    @property
+    def date(self) -> str:
+        return self._date.isoformat()
+
+    @property
+    def email(self) -> str:
+        return self._email
+
+    @property
+    def image_url(self) -> List[str]:
+        return self._images
+
+    @property
+    def senses(self):
+        return {**super().senses, 'Smell': self._smell}
+
+
+class TestMergedReport(unittest.TestCase):
+
+    def test_nearby_reports_merged(self):
+        '''
+        Test that reports filed from a few meters apart within minutes
+        are merged, with the images and senses of both.
+        '''
+        first = IncidentReport(0, 0, images=['a.jpg'])
+        again = IncidentReport(20, 5, images=['b.jpg', 'a.jpg'], smell=True)
+        elsewhere = IncidentReport(2_000, 5)
+        self.assertAlmostEqual(haversine_in_m(first.lat, first.lon, again.lat, again.lon), 20, 0)
+
+        reports = merge_nearby_reports([again, elsewhere, first], 50, 30)
+        self.assertEqual(len(reports), 2)
+        merged = reports[0]
+        self.assertIsInstance(merged, MergedReport)
+        self.assertIs(reports[1], elsewhere)
+        self.assertEqual(merged.id, first.id)
+        self.assertEqual(merged.merged_ids, [again.id])
+        self.assertEqual(merged.image_url, ['a.jpg', 'b.jpg'])
+        self.assertTrue(merged.senses['Smell'])
+        self.assertEqual(merged.description, first.description)
+
+
+    def test_merge_limits(self):
+        '''
+        Test that chains of nearby reports merge, but not reports
+        outside the time window, from other users or when disabled.
+        '''
+        chain = [IncidentReport(0, 0), IncidentReport(40, 20), IncidentReport(80, 40)]
+        later = IncidentReport(0, 120)
+        other_user = IncidentReport(0, 0, email='john@example.com')
+        reports = chain + [later, other_user]
+
+        merged = merge_nearby_reports(reports, 50, 30)
+        self.assertEqual(len(merged), 3)
+        self.assertEqual(merged[0].merged_ids, [chain[1].id, chain[2].id])
+        self.assertEqual(merged[1:], [later, other_user])
+        self.assertEqual(merge_nearby_reports(reports, 0, 30), reports)
+
+
+    def test_merged_reports_recorded(self):
+        '''
+        Test that merged reports are recorded in the metadata,
+        so that they are not submitted on later runs.
+        '''
+        import main
+
+        first, again = IncidentReport(0, 0), IncidentReport(10, 1)
+        submitted = []
+
+        class DryRunSubmission:
+            def __init__(self, report, agencies=None, rejections=None, deferred=None):
+                submitted.append(report)
+                self.metadata = [Metadata(report)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+            mock.patch.object(main, 'Submission', DryRunSubmission), \
+            mock.patch.object(main, 'validate_submissions', return_value={}), \
+            mock.patch.object(main, 'prepare_submissions'), \
+            mock.patch.object(main, 'datastore', LocalDatastore(f"{tmp_dir}/metadata.csv")):
+            metadata_df = main.submit_reports([first, again])
+
+        self.assertEqual([r.id for r in submitted], [first.id])
+        statuses = dict(zip(metadata_df['id'], metadata_df['status']))
+        self.assertEqual(statuses[again.id], STATUS_MERGED)
+
+
+if __name__ == '__main__':
+    unittest.main()
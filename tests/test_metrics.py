@@ -0,0 +1,91 @@
+'''
+test_metrics.py
+
+Unit tests run against the metrics exposed by the app.
+'''
+
+import json
+import tempfile
+import unittest
+import pandas as pd
+from constants import MOCK_LOCATIONS_FILE
+from models.mock_report import MockReport
+from utilities import metrics, web_workers
+from utilities.storage import LocalDatastore
+
+
+def submit_with_browser_launch(report: MockReport) -> None:
+    metrics.BROWSER_LAUNCH_SECONDS.observe(1.5)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_exposition_format(self):
+        '''
+        Test that counters and histograms are rendered
+        in the Prometheus text exposition format.
+        '''
+        registry = metrics.Registry()
+        counter = metrics.Counter('submissions_total', 'Submissions.',
+            ['state', 'status'], registry=registry)
+        histogram = metrics.Histogram('latency_seconds', 'Latency.',
+            buckets=[0.5, 1], registry=registry)
+
+        counter.inc(state='West Virginia', status='submitted')
+        counter.inc(2, state='Ohio', status='not "submitted"')
+        histogram.observe(0.25)
+        histogram.observe(0.75)
+        with self.assertRaises(Exception):
+            counter.inc(state='Ohio')
+
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP submissions_total Submissions.',
+            '# TYPE submissions_total counter',
+            'submissions_total{state="Ohio",status="not \\"submitted\\""} 2',
+            'submissions_total{state="West Virginia",status="submitted"} 1',
+            '# HELP latency_seconds Latency.',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.5"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 2',
+            'latency_seconds_sum 1',
+            'latency_seconds_count 2',
+            '']))
+
+
+    def test_metrics_endpoint(self):
+        '''
+        Test that the app exposes metrics recorded while it runs,
+        such as the bytes written to its datastore.
+        '''
+        import main
+
+        written = metrics.DATASTORE_BYTES.value(datastore='local', operation='write')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            LocalDatastore(f"{tmp_dir}/metadata.csv").write_data(pd.DataFrame({'id': [1, 2]}))
+        self.assertEqual(metrics.DATASTORE_BYTES.value(
+            datastore='local', operation='write'), written + len('id\n1\n2\n'))
+
+        response = main.app.test_client().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, metrics.CONTENT_TYPE)
+        body = response.get_data(as_text=True)
+        self.assertIn('# TYPE fractracker_reports_fetched_total counter', body)
+        self.assertIn('fractracker_datastore_bytes_total{datastore="local",operation="write"}', body)
+
+
+    def test_worker_metrics_merged(self):
+        '''
+        Test that metrics recorded within isolated
+        web workers are added to those of the app.
+        '''
+        with open(MOCK_LOCATIONS_FILE) as f:
+            report = MockReport(json.load(f)[0])
+
+        launches = metrics.BROWSER_LAUNCH_SECONDS.count()
+        web_workers.run_isolated(submit_with_browser_launch, report, timeout_in_sec=30)
+        self.assertEqual(metrics.BROWSER_LAUNCH_SECONDS.count(), launches + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
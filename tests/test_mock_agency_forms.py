@@ -0,0 +1,102 @@
+'''
+test_mock_agency_forms.py
+
+Unit tests run against the replica agency web form server.
+'''
+
+import requests
+import unittest
+from html.parser import HTMLParser
+from tests.mocks.mock_agency_forms import MockAgencyForms
+
+
+# Element ids and names each state module looks up on its form
+EXPECTED_ELEMENTS = {
+    'california': {'air', 'water', 'waste', 'complaintDetailsButton',
+        'almostDoneButton', 'iButton', 'dateOfOccurence',
+        'details:JCMC:detailsForm:descriptionTextArea',
+        'ComplaintContact:JCMC:AnonymousForm:confirmEmail'},
+    'colorado': {'Field103_other', 'Field100', 'Field47-0', 'Field5',
+        'Field97-1', 'Field39-0', 'Field39-1', 'Field40', 'action'},
+    'new_mexico': {'value1', 'value13', 'value16', 'value4',
+        'value17', 'value24', 'submit1'},
+    'ohio': {'Complaints', 'validate-form', 'screenContentPage'},
+    'pennsylvania': {'ec_name', 'email', 'pd1_comments_field', 'pd2_comments_field',
+        'ConfirmationCheckYes', 'buttonOk', 'countyProblem', 'locationProblem',
+        'OBKey__312_1', 'SubmitButton', 'submitForm'},
+    'texas': {'datepicker', 'location', 'concern', 'name', 'email',
+        'city', 'who', 'time', 'ampm', 'county', 'content'},
+    'west_virginia/frame': {'c_county', 'c_location', 'c_description', 'c_name', 'submit'}
+}
+
+
+class ElementCollector(HTMLParser):
+    '''
+    Collects the title and every element id and name on a page.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.elements, self.title, self._in_title = set(), '', False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self.elements.update(v for k, v in attrs.items() if k in ('id', 'name'))
+        self._in_title = tag == 'title'
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            self._in_title = False
+
+
+class TestMockAgencyForms(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.forms = MockAgencyForms().start()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.forms.stop()
+
+
+    def test_replicas_expose_module_elements(self):
+        '''
+        Test that every replica contains the elements its module uses.
+        '''
+        for state, expected in EXPECTED_ELEMENTS.items():
+            collector = ElementCollector()
+            collector.feed(requests.get(self.forms.url(state)).text)
+            self.assertFalse(expected - collector.elements, state)
+
+
+    def test_titles_pass_page_checks(self):
+        '''
+        Test that each replica title contains the module's check string.
+        '''
+        check_strings = {'california': 'New', 'colorado': 'Submission',
+            'new_mexico': 'Envir', 'ohio': 'Environmental Complaint',
+            'pennsylvania': 'Complaint Form', 'texas': 'TCEQ',
+            'west_virginia': 'Complaint'}
+        for state, check_string in check_strings.items():
+            collector = ElementCollector()
+            collector.feed(requests.get(self.forms.url(state)).text)
+            self.assertIn(check_string, collector.title, state)
+
+
+    def test_submission_recorded_with_files(self):
+        '''
+        Test that a multipart submission is recorded with its files.
+        '''
+        response = requests.post(f"{self.forms.base_url}/new_mexico/submit",
+            data={'value16': 'Odor'}, files={'photo': ('photo_1.jpg', b'123')})
+        self.assertIn('Your notification has been received.', response.text)
+        submission = self.forms.submissions['new_mexico'][-1]
+        self.assertEqual(submission['value16'], ['Odor'])
+        self.assertEqual(submission['__files__'], [('photo', 'photo_1.jpg', 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+'''
+test_mock_fractracker_api.py
+
+Unit tests run against the local FracTracker API simulator.
+'''
+
+import unittest
+from datetime import datetime, timedelta
+from tests.mocks.mock_fractracker_api import MockFracTrackerAPI, SyntheticReportGenerator
+from tests.mocks.mock_geocoder import offline_geocoding
+from utilities.fractracker_api import FracAPI
+
+
+class TestMockFracTrackerAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = SyntheticReportGenerator(
+            num_reports=250,
+            begin_date=datetime(2018, 1, 1),
+            end_date=datetime(2019, 1, 1),
+            duplicate_rate=0.2)
+
+
+    def test_generation_is_deterministic(self):
+        '''
+        Test that a report index always produces the same report.
+        '''
+        self.assertEqual(self.generator.feature(42), self.generator.feature(42))
+
+
+    def test_duplicates_share_content(self):
+        '''
+        Test that duplicate reports only differ by id and images.
+        '''
+        dup = next(i for i in range(1, 250) if self.generator._is_duplicate(i))
+        first, second = self.generator.feature(dup - 1), self.generator.feature(dup)
+        self.assertNotEqual(first['id'], second['id'])
+        for key in ('report_date', 'description'):
+            self.assertEqual(first['properties'][key], second['properties'][key])
+        self.assertEqual(first['geometry'], second['geometry'])
+
+
+    def test_page_structure(self):
+        '''
+        Test that pages report totals the way the live API does.
+        '''
+        api = MockFracTrackerAPI(self.generator, results_per_page=100)
+        page = api.get_page({'filters': []}, 3)
+        api.stop()
+        self.assertEqual(page['properties']['num_results'], 250)
+        self.assertEqual(page['properties']['total_pages'], 3)
+        self.assertEqual(len(page['features']), 50)
+
+
+    def test_fracapi_reads_all_reports(self):
+        '''
+        Test that `FracAPI` retrieves every report in a date
+        range, through the end of its last day.
+        '''
+        expected = len(self.generator.index_range(
+            datetime(2018, 3, 1), datetime(2018, 6, 2) - timedelta(microseconds=1)))
+        with MockFracTrackerAPI(self.generator, results_per_page=7) as api, \
+            offline_geocoding():
+            results = FracAPI("03-01-2018", "06-01-2018",
+                check_emails=False, base_url=api.url)
+        self.assertGreater(expected, 0)
+        self.assertEqual(len(results.reports), expected)
+        self.assertTrue(all(r.location.is_valid for r in results.reports))
+
+
+    def test_injected_errors(self):
+        '''
+        Test that an injected server error surfaces as an exception.
+        '''
+        with MockFracTrackerAPI(self.generator, error_rate=1.0) as api:
+            with self.assertRaises(Exception):
+                FracAPI("03-01-2018", "06-01-2018",
+                    check_emails=False, base_url=api.url)
+
+
+if __name__ == '__main__':
+    unittest.main()
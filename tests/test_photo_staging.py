@@ -0,0 +1,136 @@
+'''
+test_photo_staging.py
+
+Unit tests run against the staging of photos uploaded to web forms.
+'''
+
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from utilities.config import Config
+from utilities.photo_staging import (CHUNK_SIZE_IN_BYTES, PhotoStage,
+    bind_photo_stage, get_photo_stage, staged_photos)
+
+
+class MockPhotoResponse:
+    '''
+    A streamed response for a photo whose content is its URL, repeated.
+    '''
+
+    def __init__(self, url, repeat=1, status_code=200, content_length=True):
+        self.content = url.encode('utf-8') * repeat
+        self.ok = status_code < 400
+        self.headers = {'Content-Length': str(len(self.content))} if content_length else {}
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class TestPhotoStaging(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_photos_staged_once(self):
+        '''
+        Test that photos are streamed to the scratch directory once
+        each, even when requested again or concurrently (e.g., for
+        another agency), and removed when the stage is cleared.
+        '''
+        lock, downloads = threading.Lock(), []
+
+        def get(url, stream=False, timeout=None):
+            with lock:
+                downloads.append(url)
+            return MockPhotoResponse(url, repeat=CHUNK_SIZE_IN_BYTES)
+
+        stage = PhotoStage(scratch_dir=self.tmp_dir.name)
+        urls = ['https://example.org/1.jpg', 'https://example.org/2.jpg']
+        with mock.patch('requests.get', get):
+            threads = [threading.Thread(target=stage.stage, args=(urls,)) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            paths = stage.stage(urls + urls[:1])
+
+        self.assertEqual(sorted(downloads), urls)
+        self.assertEqual(paths[0], paths[2])
+        with open(paths[1], 'rb') as f:
+            self.assertEqual(f.read(), urls[1].encode('utf-8') * CHUNK_SIZE_IN_BYTES)
+        self.assertTrue(paths[0].startswith(self.tmp_dir.name))
+
+        directory = stage.directory
+        stage.clear()
+        self.assertFalse(os.path.exists(directory))
+
+
+    def test_failed_downloads_removed(self):
+        '''
+        Test that photos over the size limit, whether declared or
+        streamed, and unavailable photos fail to stage without
+        leaving partial downloads behind.
+        '''
+        stage = PhotoStage(scratch_dir=self.tmp_dir.name, max_size_in_mb=0.5)
+        responses = {
+            'https://example.org/declared.jpg': dict(repeat=20000),
+            'https://example.org/streamed.jpg': dict(repeat=20000, content_length=False),
+            'https://example.org/missing.jpg': dict(status_code=404)
+        }
+
+        def get(url, stream=False, timeout=None):
+            return MockPhotoResponse(url, **responses[url])
+
+        with mock.patch('requests.get', get):
+            for url in responses:
+                with self.assertRaises(Exception):
+                    stage.stage([url])
+        self.assertEqual(os.listdir(stage.directory), [])
+
+
+    def test_runs_staged_apart(self):
+        '''
+        Test that each run stages photos to its own directory, used
+        by the threads submitting its reports, and that ending a run
+        leaves the photos of a concurrent run in place.
+        '''
+        def get(url, stream=False, timeout=None):
+            return MockPhotoResponse(url)
+
+        urls = ['https://example.org/1.jpg']
+        with mock.patch.object(Config, 'photo_staging_scratch_directory',
+            new_callable=mock.PropertyMock, return_value=self.tmp_dir.name), \
+            mock.patch('requests.get', get):
+            with staged_photos() as first, staged_photos() as second:
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    stage = lambda s: get_photo_stage().stage(urls)[0]
+                    first_path = executor.submit(bind_photo_stage(stage, first), None).result()
+                    second_path, = executor.map(bind_photo_stage(stage), [None])
+                self.assertTrue(first_path.startswith(first.directory))
+                self.assertTrue(second_path.startswith(second.directory))
+                self.assertIs(get_photo_stage(), second)
+
+                first.clear()
+                self.assertFalse(os.path.exists(first_path))
+                self.assertTrue(os.path.exists(second_path))
+            self.assertFalse(os.path.exists(second_path))
+        self.assertIsNot(get_photo_stage(), second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+'''
+test_profiling.py
+
+Unit tests run against the on-demand profiling of submission runs.
+'''
+
+import glob
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from utilities.profiling import DETERMINISTIC, SAMPLING, profiled
+from utilities.storage import LocalDatastore
+
+
+def submit_slowly(report_id: int) -> int:
+    start, total = time.time(), 0
+    while time.time() - start < 0.05:
+        total += sum(range(1000))
+    return total
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_profiles_written(self):
+        '''
+        Test that runs are profiled across the threads they start
+        and that the call graph and collapsed stacks are written
+        next to the metadata.
+        '''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            datastore = LocalDatastore(f"{tmp_dir}/metadata.csv")
+            for mode in (DETERMINISTIC, SAMPLING):
+                with profiled(mode, datastore, f"profile_{mode}", interval_in_sec=0.001):
+                    with ThreadPoolExecutor(max_workers=2) as executor:
+                        list(executor.map(submit_slowly, range(4)))
+
+            stats = pstats.Stats(f"{tmp_dir}/metadata_profile_{DETERMINISTIC}.pstats")
+            calls = [v[1] for k, v in stats.stats.items() if k[2] == 'submit_slowly']
+            self.assertEqual(calls, [4])
+            self.assertFalse(os.path.exists(f"{tmp_dir}/metadata_profile_{SAMPLING}.pstats"))
+
+            with open(f"{tmp_dir}/metadata_profile_{SAMPLING}.collapsed") as f:
+                lines = f.read().splitlines()
+            sampled = [l for l in lines if 'submit_slowly (test_profiling.py' in l]
+            self.assertTrue(sampled)
+            for line in sampled:
+                stack, count = line.rsplit(' ', 1)
+                self.assertTrue(stack.startswith('ThreadPoolExecutor'))
+                self.assertGreater(int(count), 0)
+
+            with self.assertRaises(Exception):
+                with profiled('tracing', datastore, 'profile'):
+                    pass
+
+
+    def test_profiled_request(self):
+        '''
+        Test that a request body's flag profiles the run.
+        '''
+        import main
+
+        def submit_run(start_date, end_date, shard=None):
+            submit_slowly(0)
+            return "Automated complaint submission complete.", 201
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+            mock.patch.object(main, 'submit_run', submit_run), \
+            mock.patch.object(main, 'datastore', LocalDatastore(f"{tmp_dir}/metadata.csv")):
+            client = main.app.test_client()
+            self.assertEqual(client.post('/', json={}).status_code, 201)
+            self.assertEqual(glob.glob(f"{tmp_dir}/metadata_profile_*"), [])
+
+            response = client.post('/', json={'profile': True})
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(glob.glob(f"{tmp_dir}/metadata_profile_*.pstats")), 1)
+            self.assertEqual(len(glob.glob(f"{tmp_dir}/metadata_profile_*.collapsed")), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+'''
+test_report_table.py
+
+Unit tests run against the columnar report table.
+'''
+
+import json
+import unittest
+from constants import ROOT_DIRECTORY
+from models.api_report import ApiReport
+from models.report_table import ReportTable
+from tests.mocks.mock_fractracker_api import SyntheticReportGenerator
+from tests.mocks.mock_geocoder import offline_geocoding
+
+
+class TestReportTable(unittest.TestCase):
+
+    def setUp(self):
+        with open(f"{ROOT_DIRECTORY}/data_analysis/api_data/sample_report.json") as f:
+            sample = json.load(f)
+        generator = SyntheticReportGenerator(num_reports=50)
+        self.features = [sample] + [generator.feature(i) for i in range(50)]
+        self.table = ReportTable.from_features(self.features)
+
+
+    def test_rows_match_api_reports(self):
+        '''
+        Test that table rows expose the same values as `ApiReport`.
+        '''
+        properties = ['id', 'lat', 'lon', 'description', 'date', 'first_name',
+            'last_name', 'email', 'senses', 'image_url', 'report_type']
+        with offline_geocoding():
+            for feature, row in zip(self.features, self.table):
+                report = ApiReport(feature, check_emails=False)
+                for name in properties:
+                    self.assertEqual(getattr(row, name), getattr(report, name), name)
+                self.assertEqual(row.location.state, report.location.state)
+
+
+    def test_concat_pages(self):
+        '''
+        Test that tables built per page stack into one table.
+        '''
+        pages = [ReportTable.from_features(self.features[i:i + 20])
+            for i in range(0, len(self.features), 20)]
+        table = ReportTable.concat(pages)
+        self.assertEqual(len(table), len(self.features))
+        self.assertEqual(list(table.columns['id']), list(self.table.columns['id']))
+
+
+    def test_dataframe_columns(self):
+        '''
+        Test that sense bitmasks expand into boolean columns.
+        '''
+        df = self.table.to_dataframe()
+        self.assertEqual(len(df.index), len(self.features))
+        self.assertTrue(df.loc[0, 'senses.Sight'])
+        self.assertFalse(df.loc[0, 'senses.Smell'])
+
+
+if __name__ == '__main__':
+    unittest.main()
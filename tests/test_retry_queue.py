@@ -0,0 +1,143 @@
+'''
+test_retry_queue.py
+
+Unit tests run against the persistent queue of failed submissions.
+'''
+
+import json
+import os
+import tempfile
+import unittest
+from constants import MOCK_LOCATIONS_FILE
+from datetime import datetime, timedelta
+from models.merged_report import MergedReport
+from models.metadata import (STATUS_DEFERRED, STATUS_NOT_SUBMITTED,
+    STATUS_SUBMITTED, WEB_SUBMISSION, Metadata)
+from models.mock_report import MockReport
+from models.retry_queue import RetryQueue
+from tests.mocks.mock_fractracker_api import MockFracTrackerAPI, SyntheticReportGenerator
+from tests.mocks.mock_geocoder import offline_geocoding
+from unittest import mock
+from utilities.storage import LocalDatastore
+
+
+AGENCY_NAME = 'Test Agency'
+
+
+class TestRetryQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.datastore = LocalDatastore(f"{self.tmp_dir.name}/retry_queue.csv")
+        with open(MOCK_LOCATIONS_FILE) as f:
+            self.report = MockReport(json.load(f)[0])
+        self.now = datetime(2021, 1, 1)
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def metadata(self, status: str) -> Metadata:
+        return Metadata(self.report, submission_type=WEB_SUBMISSION,
+            agency=AGENCY_NAME, status=status)
+
+
+    def test_backoff_and_max_attempts(self):
+        '''
+        Test that delays double per failed attempt and that
+        submissions are dropped after the maximum attempts.
+        '''
+        queue = RetryQueue(self.datastore, max_attempts=3, base_delay_in_sec=60)
+        key = (self.report.id, AGENCY_NAME)
+
+        queue.record([self.metadata(STATUS_NOT_SUBMITTED)], now=self.now)
+        self.assertEqual(queue.entries[key]['next_attempt_time'], self.now + timedelta(seconds=60))
+        self.assertEqual(queue.due(now=self.now), {})
+
+        queue.record([self.metadata(STATUS_DEFERRED)], now=self.now)
+        self.assertEqual(queue.entries[key]['attempts'], 1)
+
+        queue.record([self.metadata(STATUS_NOT_SUBMITTED)], now=self.now)
+        self.assertEqual(queue.entries[key]['next_attempt_time'], self.now + timedelta(seconds=120))
+        self.assertEqual(queue.due(now=self.now + timedelta(seconds=120)),
+            {self.report.id: [AGENCY_NAME]})
+
+        queue.record([self.metadata(STATUS_NOT_SUBMITTED)], now=self.now)
+        self.assertEqual(len(queue), 0)
+
+
+    def test_persisted_between_runs(self):
+        '''
+        Test that the queue survives a round trip through its datastore
+        and that successful submissions are removed.
+        '''
+        queue = RetryQueue(self.datastore)
+        queue.record([self.metadata(STATUS_NOT_SUBMITTED)], now=self.now)
+        queue.save()
+
+        reloaded = RetryQueue(self.datastore).load()
+        self.assertEqual(list(reloaded.entries), list(queue.entries))
+        for field in ('attempts', 'last_status', 'next_attempt_time'):
+            self.assertEqual([e[field] for e in reloaded.entries.values()],
+                [e[field] for e in queue.entries.values()])
+
+        reloaded.record([self.metadata(STATUS_SUBMITTED)], now=self.now)
+        reloaded.save()
+        self.assertEqual(len(RetryQueue(self.datastore).load()), 0)
+
+
+    def test_retries_fetched_by_id(self):
+        '''
+        Test that only reports due for a retry are requested from
+        the API and that they are resubmitted to the failed agency.
+        '''
+        import main
+
+        generator = SyntheticReportGenerator(num_reports=500)
+        queue = RetryQueue(self.datastore)
+        queue.entries = {(report_id, AGENCY_NAME): {'id': report_id,
+            'agency': AGENCY_NAME, 'attempts': 1, 'next_attempt_time': self.now}
+            for report_id in (3, 250, 9999)}
+
+        with MockFracTrackerAPI(generator) as api, offline_geocoding(), \
+            mock.patch.dict(os.environ, {'FRACTRACKER_API_URL': api.url}):
+            submissions = main.get_retry_submissions(queue)
+            num_requests = api.num_requests
+
+        self.assertEqual(sorted(r.id for r, _ in submissions), [3, 250])
+        self.assertTrue(all(agencies == [AGENCY_NAME] for _, agencies in submissions))
+        self.assertEqual(num_requests, 2)
+        self.assertNotIn((9999, AGENCY_NAME), queue.entries)
+
+
+    def test_merged_reports_retried_whole(self):
+        '''
+        Test that the reports merged into a queued report are kept
+        between runs and merged into it again when it is retried.
+        '''
+        import main
+
+        generator = SyntheticReportGenerator(num_reports=50)
+        queue = RetryQueue(self.datastore)
+        queue.record([Metadata(self.report, submission_type=WEB_SUBMISSION,
+            agency=AGENCY_NAME, status=STATUS_NOT_SUBMITTED)], now=self.now,
+            merged_ids={self.report.id: [4, 5]})
+        queue.save()
+        queue = RetryQueue(self.datastore).load()
+        self.assertEqual(queue.merged_ids(self.report.id), [4, 5])
+
+        queue.entries = {(3, AGENCY_NAME): {'id': 3, 'agency': AGENCY_NAME, 'attempts': 1,
+            'next_attempt_time': self.now, 'merged_ids': [4, 5]}}
+        with MockFracTrackerAPI(generator) as api, offline_geocoding(), \
+            mock.patch.dict(os.environ, {'FRACTRACKER_API_URL': api.url}):
+            [(report, agencies)] = main.get_retry_submissions(queue)
+
+        self.assertIsInstance(report, MergedReport)
+        self.assertEqual((report.id, report.merged_ids, agencies), (3, [4, 5], [AGENCY_NAME]))
+        for member in report.reports:
+            self.assertIn(member.description, report.description)
+
+
+if __name__ == '__main__':
+    unittest.main()
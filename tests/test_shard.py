@@ -0,0 +1,105 @@
+'''
+test_shard.py
+
+Unit tests run against sharded submission runs.
+'''
+
+import json
+import tempfile
+import unittest
+import pandas as pd
+from constants import MOCK_LOCATIONS_FILE
+from models.metadata import Metadata
+from models.mock_report import MockReport
+from models.shard import Shard
+from unittest import mock
+from utilities.config import Config
+from utilities.storage import LocalDatastore
+
+
+def mock_reports():
+    with open(MOCK_LOCATIONS_FILE) as f:
+        return [MockReport(loc) for loc in json.load(f)]
+
+
+class TestShard(unittest.TestCase):
+
+    def test_shard_selection(self):
+        '''
+        Test that shards select reports by state and that
+        hash shards partition reports between them.
+        '''
+        reports = mock_reports()
+
+        shard = Shard.from_spec({'states': ['West Virginia', 'ohio']})
+        self.assertEqual(shard.name, 'ohio_west_virginia')
+        self.assertEqual(sorted(r.location.state for r in shard.select(reports)),
+            ['Ohio', 'West Virginia'])
+
+        hashed = [Shard.from_spec({'index': i, 'count': 3}) for i in range(3)]
+        selected = [r.id for s in hashed for r in s.select(reports)]
+        self.assertCountEqual(selected, [r.id for r in reports])
+        self.assertEqual(hashed[1].name, '1_of_3')
+
+        for name in ('all', 'ohio_west_virginia', '1_of_3', 'new_mexico_north_dakota_0_of_2'):
+            self.assertEqual(Shard.from_name(name).name, name)
+        self.assertFalse(hashed[0].overlaps(hashed[1]))
+        self.assertTrue(hashed[1].overlaps(Shard.from_spec({'index': 4, 'count': 6})))
+        self.assertFalse(shard.overlaps(Shard.from_spec({'states': ['Texas']})))
+        self.assertTrue(shard.overlaps(Shard()))
+
+        for spec in ({'states': ['Atlantis']}, {'index': 3, 'count': 3},
+            {'index': 0}, {'state': ['ohio']}):
+            with self.assertRaises(Exception):
+                Shard.from_spec(spec)
+
+
+    def test_shards_merged(self):
+        '''
+        Test that shards submit only their reports to their own
+        partitions, which are then merged into the metadata, and
+        that merged reports are not submitted again.
+        '''
+        import main
+
+        submitted = []
+
+        class DryRunSubmission:
+            def __init__(self, report, agencies=None, rejections=None, deferred=None):
+                submitted.append(report.location.state)
+                self.metadata = [Metadata(report, agency=report.location.state)]
+
+        reports = mock_reports()
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+            mock.patch.object(main, 'get_api_reports', return_value=reports), \
+            mock.patch.object(main, 'Submission', DryRunSubmission), \
+            mock.patch.object(main, 'validate_submissions', return_value={}), \
+            mock.patch.object(main, 'prepare_submissions'), \
+            mock.patch.object(main, 'datastore', LocalDatastore(f"{tmp_dir}/metadata.csv")), \
+            mock.patch.object(Config, 'metadata_path', new_callable=mock.PropertyMock,
+                return_value=f"{tmp_dir}/metadata.csv"), \
+            mock.patch.object(Config, 'retry_queue_path', new_callable=mock.PropertyMock,
+                return_value=f"{tmp_dir}/retry_queue.csv"):
+            client = main.app.test_client()
+            email_shard = {'states': ['Kentucky', 'Nebraska']}
+            web_shard = {'states': ['Ohio']}
+
+            for spec in (email_shard, web_shard):
+                response = client.post('/', json={'shard': spec})
+                self.assertEqual(response.status_code, 201)
+            self.assertEqual(submitted, ['Kentucky', 'Nebraska', 'Ohio'])
+            partition = pd.read_csv(f"{tmp_dir}/metadata_ohio.csv")
+            self.assertEqual(list(partition['state']), ['Ohio'])
+
+            response = client.post('/merge', json={'shards': [email_shard, web_shard]})
+            self.assertEqual(response.status_code, 201)
+            metadata_df = pd.read_csv(f"{tmp_dir}/metadata.csv")
+            self.assertEqual(sorted(metadata_df['state']), ['Kentucky', 'Nebraska', 'Ohio'])
+            self.assertEqual(len(pd.read_csv(f"{tmp_dir}/metadata_ohio.csv").index), 0)
+
+            client.post('/', json={'shard': web_shard})
+            self.assertEqual(submitted, ['Kentucky', 'Nebraska', 'Ohio'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+'''
+test_validation.py
+
+Unit tests run against the pre-flight checks made
+before reports are submitted to state agencies.
+'''
+
+import json
+import unittest
+from constants import MOCK_LOCATIONS_FILE
+from models import validation
+from models.agency_health import reset_agency_health
+from models.metadata import (EMAIL_SUBMISSION, STATUS_NOT_SUBMITTED, STATUS_REJECTED,
+    STATUS_SUBMITTED, WEB_SUBMISSION, Metadata, submit_and_return_metadata)
+from models.mock_report import MockReport
+from models.submission import Submission, validate_submissions
+from submissions import california, ohio, texas
+from types import SimpleNamespace
+from unittest import mock
+from utilities.config import Config
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        with open(MOCK_LOCATIONS_FILE) as f:
+            self.locations = {l['state']: l for l in json.load(f)}
+        self.reports = {state: MockReport(l) for state, l in self.locations.items()}
+
+
+    def tearDown(self):
+        validation.clear_photo_checks()
+
+
+    def test_precise_reasons(self):
+        '''
+        Test that missing fields and counties absent
+        from the web form are reported individually.
+        '''
+        report = self.reports['Texas']
+        self.assertEqual(validation.rejection_reasons(texas, report), [])
+
+        with mock.patch.object(report.location, '_county', None), \
+            mock.patch.object(MockReport, 'email', ''):
+            self.assertEqual(validation.rejection_reasons(texas, report),
+                ['Missing location.county.', 'Missing email.'])
+
+        with mock.patch.object(report.location, '_county', 'Cook County'):
+            self.assertEqual(validation.rejection_reasons(texas, report),
+                ["County 'Cook County' is not an option of the Texas web form."])
+
+
+    def test_photos_checked_once_in_bulk(self):
+        '''
+        Test that each photo is requested once for a batch of reports
+        and that reports with broken photos are rejected.
+        '''
+        reports = [MockReport(self.locations['Ohio']) for _ in range(5)]
+        photos = {r.id: [f'https://photos.test/{r.id}_{n}.jpg' for n in range(4)] for r in reports}
+        broken = photos[reports[2].id][1]
+
+        def head(url, **kwargs):
+            return SimpleNamespace(ok=url != broken, status_code=200 if url != broken else 404)
+
+        with mock.patch.object(MockReport, 'image_url', property(lambda r: photos[r.id])), \
+            mock.patch('models.validation.requests.head', side_effect=head) as head_mock:
+            rejections = validation.validate_batch(ohio, reports)
+
+        self.assertEqual(head_mock.call_count, len(reports) * ohio.MAX_ALLOWED_PHOTOS)
+        self.assertEqual(rejections, {reports[2].id:
+            [f"Photo '{broken}' could not be retrieved (HTTP 404)."]})
+
+
+    def test_rejected_without_submitting(self):
+        '''
+        Test that rejected reports are recorded with their
+        reasons and never reach the state module.
+        '''
+        report = self.reports['Texas']
+        with mock.patch.object(report.location, '_county', 'Cook County'):
+            rejections = validate_submissions(list(self.reports.values()))
+            with mock.patch.object(texas, 'submit') as submit:
+                metadata = Submission(report, rejections=rejections.get(report.id)).metadata
+
+        self.assertEqual(list(rejections), [report.id])
+        submit.assert_not_called()
+        self.assertEqual(metadata[0].status, STATUS_REJECTED)
+        self.assertEqual(metadata[0].agency, texas.AGENCY_NAME)
+        self.assertIn('Cook County', metadata[0].status_reason)
+
+
+    def test_nameless_reports_submitted(self):
+        '''
+        Test that reports whose users left their names blank
+        pass pre-flight checks and reach the web form.
+        '''
+        reports = [self.reports['Ohio'], self.reports['California']]
+        self.addCleanup(reset_agency_health)
+        with mock.patch.object(MockReport, 'first_name', ''), \
+            mock.patch.object(MockReport, 'last_name', ''), \
+            mock.patch.object(Config, 'web_worker_isolation',
+                new_callable=mock.PropertyMock, return_value=False):
+            self.assertEqual(validate_submissions(reports), {})
+            self.assertEqual(ohio.fill_dictionaries(reports[0])[1]['name'], ' ')
+            for module, report in zip((ohio, california), reports):
+                with mock.patch.object(module, 'submit') as submit:
+                    metadata = Submission(report).metadata
+                submit.assert_called_once_with(report)
+                self.assertEqual(metadata[0].status, STATUS_SUBMITTED)
+
+
+    def test_required_fields_from_state_module(self):
+        '''
+        Test that failed submissions of reports missing a field
+        required by the submitting state module are rejected.
+        '''
+        report = self.reports['Texas']
+        submit = mock.Mock(side_effect=Exception('Form error.'))
+        module = SimpleNamespace(REQUIRED_FIELDS=('email',), main=lambda r: [
+            submit_and_return_metadata(r, submit, EMAIL_SUBMISSION, 'Agency')])
+
+        self.addCleanup(reset_agency_health)
+        with mock.patch('models.submission.state_module', return_value=module):
+            self.assertEqual(Submission(report).metadata[0].status, STATUS_NOT_SUBMITTED)
+            with mock.patch.object(MockReport, 'email', ''):
+                self.assertEqual(Submission(report).metadata[0].status, STATUS_REJECTED)
+
+
+    def test_rejected_per_submission(self):
+        '''
+        Test that a rejection only replaces the submission to its
+        agency with its submission type, and that the report's
+        other submissions are made.
+        '''
+        report = self.reports['Texas']
+        email, web = mock.Mock(), mock.Mock()
+        module = SimpleNamespace(main=lambda r: [
+            submit_and_return_metadata(r, email, EMAIL_SUBMISSION, 'Agency'),
+            submit_and_return_metadata(r, web, WEB_SUBMISSION, 'Agency'),
+            submit_and_return_metadata(r, web, WEB_SUBMISSION, 'Other Agency')])
+        rejection = Metadata(report, submission_type=WEB_SUBMISSION, agency='Agency',
+            status=STATUS_REJECTED, status_reason='Missing email.', submission_time=None)
+
+        self.addCleanup(reset_agency_health)
+        with mock.patch('models.submission.state_module', return_value=module):
+            metadata = Submission(report, rejections=[rejection]).metadata
+
+        self.assertEqual([(m.agency, m.submission_type, m.status) for m in metadata], [
+            ('Agency', EMAIL_SUBMISSION, STATUS_SUBMITTED),
+            ('Agency', WEB_SUBMISSION, STATUS_REJECTED),
+            ('Other Agency', WEB_SUBMISSION, STATUS_SUBMITTED)])
+        email.assert_called_once_with(report)
+        web.assert_called_once_with(report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+'''
+test_web_utilities.py
+
+Unit tests run against the web form utilities.
+'''
+
+import unittest
+from selenium.webdriver.common.by import By
+from unittest import mock
+from utilities import metrics, web_utilities
+from utilities.config import Config
+
+
+class TestFillForm(unittest.TestCase):
+
+    def setUp(self):
+        self.browser = mock.Mock()
+        self.elem = mock.Mock(tag_name='input')
+        self.elem.is_selected.return_value = False
+        wait = mock.patch('utilities.web_utilities.WebDriverWait')
+        self.wait = wait.start()
+        self.wait.return_value.until.return_value = self.elem
+        self.addCleanup(wait.stop)
+
+
+    def test_single_script_execution(self):
+        '''
+        Test that all fields are set with one script execution
+        and that no field is completed through WebDriver.
+        '''
+        self.browser.execute_script.return_value = []
+        with mock.patch('utilities.web_utilities.time.sleep') as sleep:
+            web_utilities.fill_form(self.browser,
+                {'name': 'Jane Doe', 'zip': 15370, 'note': None, 'agree': True}, By.ID)
+
+        self.browser.execute_script.assert_called_once_with(web_utilities.FILL_FORM_SCRIPT,
+            [('name', 'Jane Doe'), ('zip', '15370'), ('note', ''), ('agree', True)], By.ID)
+        self.wait.assert_not_called()
+        sleep.assert_not_called()
+
+
+    def test_fallback_for_unfilled_fields(self):
+        '''
+        Test that only fields the script could not set are
+        typed or clicked through WebDriver.
+        '''
+        self.browser.execute_script.return_value = ['late', 'agree']
+        with mock.patch('utilities.web_utilities.time.sleep'):
+            web_utilities.fill_form(self.browser,
+                {'early': 'a', 'late': 'b', 'agree': True}, By.ID)
+
+        self.assertEqual(self.wait.return_value.until.call_count, 2)
+        self.elem.send_keys.assert_any_call('b')
+        self.assertNotIn(mock.call('a'), self.elem.send_keys.call_args_list)
+        self.elem.click.assert_called_once()
+
+
+
+class TestBrowserProfile(unittest.TestCase):
+
+    def launch(self, profile=None):
+        '''
+        Launches a mock browser on a form, returning it and its options.
+        '''
+        browser = mock.Mock(title='Complaint Form')
+        browser.execute_script.return_value = 2048
+        with mock.patch('utilities.web_utilities.webdriver.Chrome', return_value=browser) as chrome, \
+            mock.patch('utilities.web_utilities.time.sleep'):
+            web_utilities.launch_chrome_browser('https://forms.example.gov/complaints',
+                'Complaint', profile=profile)
+        return browser, chrome.call_args.kwargs['options']
+
+
+    def test_resources_blocked(self):
+        '''
+        Test that images, blocked URLs and hosts outside the profile's
+        allowlist, except the form's own, are not loaded, and that the
+        bytes transferred by the browser are recorded.
+        '''
+        profile = web_utilities.BrowserProfile(allowed_hosts=('*.arcgis.com',),
+            blocked_url_patterns=('*/tile/*',))
+        transferred = metrics.BROWSER_TRANSFER_BYTES.value(host='forms.example.gov')
+        browser, options = self.launch(profile)
+
+        self.assertEqual(browser.method_calls[:3], [
+            mock.call.execute_cdp_cmd('Network.enable', {}),
+            mock.call.execute_cdp_cmd('Network.setBlockedURLs', {'urls': ['*/tile/*']}),
+            mock.call.get('https://forms.example.gov/complaints')])
+        self.assertEqual(options.experimental_options['prefs'],
+            {'profile.managed_default_content_settings.images': 2})
+        self.assertIn('--host-resolver-rules=MAP * ~NOTFOUND, EXCLUDE localhost, '
+            'EXCLUDE 127.0.0.1, EXCLUDE forms.example.gov, EXCLUDE *.arcgis.com',
+            options.arguments)
+        self.assertEqual(metrics.BROWSER_TRANSFER_BYTES.value(
+            host='forms.example.gov'), transferred + 2048)
+
+        # Forms whose state module declares no profile load everything
+        browser, options = self.launch()
+        browser.execute_cdp_cmd.assert_not_called()
+        self.assertNotIn('prefs', options.experimental_options)
+        self.assertFalse([a for a in options.arguments if a.startswith('--host-resolver-rules')])
+
+
+    def test_blocking_disabled(self):
+        '''
+        Test that nothing is blocked when disabled in the config file.
+        '''
+        with mock.patch.object(Config, 'web_form_resource_blocking',
+            new_callable=mock.PropertyMock, return_value=False):
+            browser, options = self.launch(web_utilities.BrowserProfile(allowed_hosts=()))
+
+        browser.execute_cdp_cmd.assert_not_called()
+        self.assertNotIn('prefs', options.experimental_options)
+        self.assertFalse([a for a in options.arguments if a.startswith('--host-resolver-rules')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+'''
+test_web_workers.py
+
+Unit tests run against the isolated web submission workers.
+'''
+
+import json
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from constants import MOCK_LOCATIONS_FILE
+from models.base_report import ReportError
+from models.mock_report import MockReport
+from utilities import web_workers
+
+
+def pid_path(report: MockReport) -> str:
+    return os.path.join(tempfile.gettempdir(), f"{report.id}.pid")
+
+
+def submit_successfully(report: MockReport) -> None:
+    pass
+
+
+def submit_with_error(report: MockReport) -> None:
+    raise Exception(f"Form for report {report.id} not found.")
+
+
+def submit_with_unknown_county(report: MockReport) -> None:
+    raise ReportError(f"County of report {report.id} not offered.")
+
+
+def submit_with_hung_browser(report: MockReport) -> None:
+    # Stand in for a browser launched by the worker
+    browser = subprocess.Popen(['sleep', '60'])
+    with open(pid_path(report), 'w') as f:
+        f.write(str(browser.pid))
+    time.sleep(60)
+
+
+def submit_with_leak(report: MockReport) -> None:
+    leaked = bytearray(256 * 2**20)
+    time.sleep(60)
+
+
+def is_running(pid: int) -> bool:
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+class TestWebWorkers(unittest.TestCase):
+
+    def setUp(self):
+        with open(MOCK_LOCATIONS_FILE) as f:
+            self.report = MockReport(json.load(f)[0])
+
+
+    def test_outcome_returned(self):
+        '''
+        Test that successful submissions return and that failed
+        submissions raise their reason, as a `ReportError` if
+        caused by the report.
+        '''
+        web_workers.run_isolated(submit_successfully, self.report)
+        with self.assertRaisesRegex(Exception, f"report {self.report.id} not found") as context:
+            web_workers.run_isolated(submit_with_error, self.report)
+        self.assertNotIsInstance(context.exception, ReportError)
+        with self.assertRaisesRegex(ReportError, f"report {self.report.id} not offered"):
+            web_workers.run_isolated(submit_with_unknown_county, self.report)
+
+
+    @unittest.skipUnless(os.path.isdir('/proc'), "Requires /proc.")
+    def test_timeout_kills_browser(self):
+        '''
+        Test that a hung worker is killed at its timeout
+        along with any browser it launched.
+        '''
+        self.addCleanup(lambda: os.path.exists(pid_path(self.report))
+            and os.remove(pid_path(self.report)))
+        with self.assertRaisesRegex(Exception, "timed out"):
+            web_workers.run_isolated(submit_with_hung_browser, self.report, timeout_in_sec=3)
+
+        with open(pid_path(self.report)) as f:
+            browser_pid = int(f.read())
+        time.sleep(0.5)
+        self.assertFalse(is_running(browser_pid))
+
+
+    @unittest.skipUnless(os.path.isdir('/proc'), "Requires /proc.")
+    def test_memory_limit(self):
+        '''
+        Test that a worker exceeding its memory limit is killed.
+        '''
+        start = time.monotonic()
+        with self.assertRaisesRegex(Exception, "memory limit"):
+            web_workers.run_isolated(submit_with_leak, self.report,
+                timeout_in_sec=30, memory_limit_in_mb=128)
+        self.assertLess(time.monotonic() - start, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ config.py
 import os
 import yaml
 from constants import DEV, ROOT_DIRECTORY, TEST
+from typing import Dict, List
 
 
 class Config:
@@ -46,6 +47,33 @@ class Config:
 
 
 
+    @property
+    def backfill_checkpoints_path(self) -> str:
+        '''
+        The filepath of the checkpoints of backfilled date windows.
+        '''
+        return self._config.get('paths', {}).get('backfill_checkpoints',
+            'data/report_submissions_backfill_checkpoints.csv')
+
+
+    @property
+    def backfill_max_workers(self) -> int:
+        '''
+        The number of backfill windows whose reports are
+        retrieved concurrently. Defaults to 4.
+        '''
+        return self._config.get('backfill', {}).get('max_workers', 4)
+
+
+    @property
+    def backfill_window(self) -> str:
+        '''
+        The default length of backfill windows,
+        either 'day' or 'week'. Defaults to 'week'.
+        '''
+        return self._config.get('backfill', {}).get('window', 'week')
+
+
     @property
     def cc_email(self) -> str:
         '''
@@ -55,6 +83,16 @@ class Config:
         return self._config['email']['cc']
 
     
+    @property
+    def cloud_backfill_blob_name(self) -> str:
+        '''
+        The name of the cloud blob (file) holding the
+        checkpoints of backfilled date windows.
+        '''
+        return self._config.get('cloud', {}).get('backfill_blob_name',
+            'report_submissions_backfill_checkpoints')
+
+
     @property
     def cloud_blob_name(self) -> str:
         '''
@@ -63,6 +101,25 @@ class Config:
         return self._config['cloud']['blob_name']
 
 
+    @property
+    def cloud_email_validation_blob_name(self) -> str:
+        '''
+        The name of the cloud blob caching email validation results.
+        '''
+        return self._config.get('cloud', {}).get('email_validation_blob_name',
+            'email_validation_cache')
+
+
+    @property
+    def cloud_retry_queue_blob_name(self) -> str:
+        '''
+        The name of the cloud blob (file) holding the queue
+        of failed submissions to retry.
+        '''
+        return self._config.get('cloud', {}).get('retry_queue_blob_name',
+            'report_submissions_retry_queue')
+
+
     @property
     def cloud_bucket_name(self) -> str:
         '''
@@ -79,6 +136,43 @@ class Config:
         return self._config['paths']['cloud_metadata']
 
 
+    @property
+    def coordination_lease_ttl_in_sec(self) -> float:
+        '''
+        The number of seconds a run's lease lasts without being
+        renewed, after which another run may take it over (e.g.,
+        if the instance holding it crashed). Defaults to 1800.
+        '''
+        return self._config.get('coordination', {}).get('lease_ttl_in_sec', 1800)
+
+
+    @property
+    def coordination_write_attempts(self) -> int:
+        '''
+        The number of times metadata is merged and written again when
+        another run changed it in the meantime. Defaults to 5.
+        '''
+        return self._config.get('coordination', {}).get('write_attempts', 5)
+
+
+    @property
+    def deduplication_distance_in_m(self) -> float:
+        '''
+        The maximum distance, in meters, between reports from the
+        same user that are merged as one incident. Defaults to 50.
+        '''
+        return self._config.get('deduplication', {}).get('distance_in_m', 50)
+
+
+    @property
+    def deduplication_window_in_min(self) -> float:
+        '''
+        The maximum number of minutes between reports from the
+        same user that are merged as one incident. Defaults to 30.
+        '''
+        return self._config.get('deduplication', {}).get('window_in_min', 30)
+
+
     @property
     def default_app_host(self) -> str:
         '''
@@ -94,12 +188,63 @@ class Config:
         '''
         return self._config['flask']['port']
 
+
+    @property
+    def email_validation_cache_path(self) -> str:
+        '''
+        The filepath of the cached email validation results.
+        '''
+        return self._config.get('paths', {}).get('email_validation_cache',
+            'data/email_validation_cache.csv')
+
+
+    @property
+    def email_validation_check_smtp(self) -> bool:
+        '''
+        Whether email addresses are checked with their domain's mail
+        server, rather than only checking that the domain has one.
+        Defaults to True.
+        '''
+        return self._config.get('email_validation', {}).get('check_smtp', True)
+
+
+    @property
+    def email_validation_enabled(self) -> bool:
+        '''
+        Whether the email addresses of retrieved reports
+        are validated. Defaults to False.
+        '''
+        return self._config.get('email_validation', {}).get('enabled', False)
+
+
+    @property
+    def email_validation_max_workers(self) -> int:
+        '''
+        The number of email addresses validated
+        concurrently. Defaults to 8.
+        '''
+        return self._config.get('email_validation', {}).get('max_workers', 8)
+
+
+    @property
+    def email_validation_ttl_in_sec(self) -> float:
+        '''
+        The number of seconds for which email validation
+        results are reused. Defaults to one week.
+        '''
+        return self._config.get('email_validation', {}).get('ttl_in_sec', 604800)
+
+
     @property
     def fractracker_base_api_url(self) -> str:
         '''
         The base URL for retrieving reports from the FracTracker API.
+        The environmental variable 'FRACTRACKER_API_URL', if set, takes
+        precedence (e.g., to target a local API simulator). Returns
+        None if neither is configured.
         '''
-        return self._config['api']['fractracker_base_url']
+        default_url = self._config.get('api', {}).get('fractracker_base_url')
+        return os.getenv('FRACTRACKER_API_URL', default_url)
 
 
     @property
@@ -111,6 +256,61 @@ class Config:
         return self._config['email']['from']
 
 
+    @property
+    def geocoding_cache_size(self) -> int:
+        '''
+        The maximum number of reverse geocoded coordinates kept in memory.
+        '''
+        return self._config.get('geocoding', {}).get('cache_size', 10000)
+
+
+    @property
+    def geocoding_max_workers(self) -> int:
+        '''
+        The number of coordinates reverse geocoded concurrently
+        when prefetching the locations of a page of reports.
+        '''
+        return self._config.get('geocoding', {}).get('max_workers', 4)
+
+
+    @property
+    def geocoding_providers(self) -> List[Dict]:
+        '''
+        The settings of each reverse geocoding provider, in order
+        of preference. Defaults to the public Nominatim endpoint,
+        limited to one request per second.
+        '''
+        default = [{'type': 'nominatim', 'min_delay_in_sec': 1}]
+        return self._config.get('geocoding', {}).get('providers', default)
+
+
+    @property
+    def logging_debug_sample_rate(self) -> float:
+        '''
+        The share of DEBUG records logged by each line of code that
+        are kept (e.g., 0.1 for one in ten). Defaults to 1.
+        '''
+        return self._config.get('logging', {}).get('debug_sample_rate', 1.0)
+
+
+    @property
+    def logging_format(self) -> str:
+        '''
+        The format of log records, either 'json' or 'text'.
+        Defaults to 'text'.
+        '''
+        return self._config.get('logging', {}).get('format', 'text')
+
+
+    @property
+    def logging_levels(self) -> Dict[str, str]:
+        '''
+        The levels of loggers by name, such as 'fractracker' for the
+        app, 'urllib3' for a library or 'root' for all other loggers.
+        '''
+        return self._config.get('logging', {}).get('levels', {})
+
+
     @property
     def metadata_path(self) -> str:
         '''
@@ -119,6 +319,208 @@ class Config:
         return self._config['paths']['metadata']
 
 
+    @property
+    def photo_staging_max_size_in_mb(self) -> float:
+        '''
+        The size, in megabytes, above which a photo
+        is not uploaded to a web form. Defaults to 10.
+        '''
+        return self._config.get('photo_staging', {}).get('max_size_in_mb', 10)
+
+
+    @property
+    def photo_staging_max_workers(self) -> int:
+        '''
+        The number of photos downloaded concurrently
+        for a web form. Defaults to 4.
+        '''
+        return self._config.get('photo_staging', {}).get('max_workers', 4)
+
+
+    @property
+    def photo_staging_scratch_directory(self) -> str:
+        '''
+        The directory to which photos are downloaded for web forms.
+        Defaults to None, in which case `/dev/shm` is used where
+        available and the temporary directory otherwise.
+        '''
+        return self._config.get('photo_staging', {}).get('scratch_directory')
+
+
+    @property
+    def photo_staging_timeout_in_sec(self) -> float:
+        '''
+        The timeout, in seconds, of each connection to and read
+        from the server of a photo being downloaded. Defaults to 30.
+        '''
+        return self._config.get('photo_staging', {}).get('timeout_in_sec', 30)
+
+
+    @property
+    def profiling_interval_in_sec(self) -> float:
+        '''
+        The interval, in seconds, at which the stacks of a
+        profiled run's threads are sampled. Defaults to 0.005.
+        '''
+        return self._config.get('profiling', {}).get('interval_in_sec', 0.005)
+
+
+    @property
+    def profiling_mode(self) -> str:
+        '''
+        The mode in which runs are profiled, either 'deterministic'
+        or 'sampling'. Defaults to None, in which case runs are
+        only profiled when requested.
+        '''
+        return self._config.get('profiling', {}).get('mode')
+
+
+    @property
+    def retry_base_delay_in_sec(self) -> float:
+        '''
+        The number of seconds to wait before first retrying a failed
+        submission. Doubles with each failed attempt. Defaults to 3600.
+        '''
+        return self._config.get('retry', {}).get('base_delay_in_sec', 3600)
+
+
+    @property
+    def retry_max_attempts(self) -> int:
+        '''
+        The number of failed attempts after which a submission
+        is no longer retried. Defaults to 5.
+        '''
+        return self._config.get('retry', {}).get('max_attempts', 5)
+
+
+    @property
+    def retry_max_delay_in_sec(self) -> float:
+        '''
+        The maximum number of seconds to wait between retries
+        of a failed submission. Defaults to one week.
+        '''
+        return self._config.get('retry', {}).get('max_delay_in_sec', 604800)
+
+
+    @property
+    def retry_queue_path(self) -> str:
+        '''
+        The filepath of the queue of failed submissions to retry.
+        '''
+        return self._config.get('paths', {}).get('retry_queue',
+            'data/report_submissions_retry_queue.csv')
+
+
+    @property
+    def submission_deferred_max_wait_in_sec(self) -> float:
+        '''
+        The maximum number of seconds to wait at the end of a run
+        for open agency circuits to allow deferred submissions.
+        Defaults to 0, leaving them to the retry queue.
+        '''
+        return self._config.get('submission', {}).get('deferred_max_wait_in_sec', 0)
+
+
+    @property
+    def submission_failure_threshold(self) -> int:
+        '''
+        The number of consecutive failed submissions after
+        which an agency's circuit opens. Defaults to 3.
+        '''
+        return self._config.get('submission', {}).get('failure_threshold', 3)
+
+
+    @property
+    def submission_latency_tolerance(self) -> float:
+        '''
+        The multiple of an agency's fastest observed submission
+        latency above which its concurrency is reduced. Defaults to 2.
+        '''
+        return self._config.get('submission', {}).get('latency_tolerance', 2.0)
+
+
+    @property
+    def submission_max_concurrency_per_agency(self) -> int:
+        '''
+        The maximum number of concurrent submissions to a
+        single agency. Defaults to 2.
+        '''
+        return self._config.get('submission', {}).get('max_concurrency_per_agency', 2)
+
+
+    @property
+    def submission_max_workers(self) -> int:
+        '''
+        The number of reports submitted concurrently across
+        all agencies. Defaults to 4.
+        '''
+        return self._config.get('submission', {}).get('max_workers', 4)
+
+
+    @property
+    def submission_reset_timeout_in_sec(self) -> float:
+        '''
+        The number of seconds an open agency circuit waits
+        before probing the agency again. Defaults to 300.
+        '''
+        return self._config.get('submission', {}).get('reset_timeout_in_sec', 300)
+
+
+    @property
+    def web_form_resource_blocking(self) -> bool:
+        '''
+        Whether browsers skip the resources web forms can be completed
+        without, such as images, fonts and trackers, according to the
+        profile of each state module. Defaults to True.
+        '''
+        return self._config.get('web_forms', {}).get('block_resources', True)
+
+
+    @property
+    def web_worker_cpu_limit_in_sec(self) -> int:
+        '''
+        The CPU time available to each process of an isolated
+        web submission worker. Defaults to 300.
+        '''
+        return self._config.get('web_workers', {}).get('cpu_limit_in_sec', 300)
+
+
+    @property
+    def web_worker_isolation(self) -> bool:
+        '''
+        Whether web forms are submitted in isolated worker
+        processes rather than in-process. Defaults to False.
+        '''
+        return self._config.get('web_workers', {}).get('isolated', False)
+
+
+    @property
+    def web_worker_max_processes(self) -> int:
+        '''
+        The maximum number of isolated web submission
+        workers running at once. Defaults to 2.
+        '''
+        return self._config.get('web_workers', {}).get('max_processes', 2)
+
+
+    @property
+    def web_worker_memory_limit_in_mb(self) -> float:
+        '''
+        The resident memory of a web submission worker and its
+        browser above which both are killed. Defaults to 1024.
+        '''
+        return self._config.get('web_workers', {}).get('memory_limit_in_mb', 1024)
+
+
+    @property
+    def web_worker_timeout_in_sec(self) -> float:
+        '''
+        The number of seconds after which a web submission
+        worker and its browser are killed. Defaults to 600.
+        '''
+        return self._config.get('web_workers', {}).get('timeout_in_sec', 600)
+
+
     @property
     def to_email(self) -> str:
         '''
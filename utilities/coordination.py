@@ -0,0 +1,315 @@
+'''
+coordination.py
+
+Coordinates submission runs, so that a run triggered twice (e.g., when
+Cloud Scheduler retries a request still being served) or runs over the
+same reports on several instances do not submit reports twice.
+
+Within an instance, concurrent identical triggers are coalesced into a
+single run whose outcome they all share. Across instances, a run holds
+a lease, stored through a datastore shared by the leases of all runs
+and written with conditional writes (generation-match preconditions
+for Google Cloud Storage and a lock file for local CSVs), for as long
+as it lasts. A lease cannot be acquired while a conflicting one (e.g.,
+of a run over some of the same reports) is held. The lease expires
+after a time-to-live unless renewed, so that a crashed run does not
+block later runs for good, and a run whose lease expired or was taken
+is told to stop.
+'''
+
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Iterator, Tuple
+from utilities.logger import logger
+from utilities.storage import IDatastore, WriteConflict
+
+
+# Columns of the persisted leases, in order
+LEASE_COLUMNS = ['name', 'owner', 'expires']
+
+
+class LeaseUnavailable(Exception):
+    '''
+    Raised when a lease is held by another run
+    '''
+
+
+class LeaseLost(Exception):
+    '''
+    Raised when a run's lease expired or was taken by another run
+    '''
+
+
+class Lease:
+    '''
+    An expiring lease on a run, persisted through a datastore shared
+    by the leases of every run. A lease cannot be held while another
+    owner holds one whose name conflicts with its own.
+    '''
+
+    def __init__(
+        self,
+        datastore: IDatastore,
+        name: str,
+        ttl_in_sec: float=1800,
+        owner: str=None,
+        conflicts: Callable[[str, str], bool]=None,
+        write_attempts: int=5) -> None:
+        '''
+        The constructor for `Lease`.
+
+        Parameters:
+            datastore (IDatastore): The datastore holding the leases. It
+                must support versioned reads and conditional writes.
+
+            name (str): The name of the run leased (e.g., 'ohio').
+
+            ttl_in_sec (float): The number of seconds the lease
+                lasts without being renewed. It is renewed every
+                third of that while held.
+
+            owner (str): Identifies the holder of the lease.
+                Defaults to the host, process and a random suffix.
+
+            conflicts (function): Whether runs of two names cannot
+                run at once (e.g., because they would submit the same
+                reports). Defaults to whether the names are equal.
+
+            write_attempts (int): The number of times the leases are
+                read and written again when another run changed them
+                in the meantime.
+
+        Returns:
+            None
+        '''
+        self._datastore = datastore
+        self.name = name
+        self.ttl_in_sec = ttl_in_sec
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.conflicts = conflicts or (lambda name, other: name == other)
+        self.write_attempts = write_attempts
+        self.expires = 0.0
+        self.lost = threading.Event()
+
+
+    def acquire(self) -> bool:
+        '''
+        Acquires or renews the lease, unless another owner holds a
+        conflicting lease that has not expired. If two owners acquire
+        leases at once, the conditional write lets only one of them
+        succeed, and the other checks the leases again.
+
+        Parameters:
+            None
+
+        Returns:
+            (bool): Whether the lease is now held.
+        '''
+        import pandas as pd
+
+        for _ in range(self.write_attempts):
+            df, version = self._datastore.read_versioned_data()
+            now = time.time()
+            others = [l for l in df.to_dict('records') if l['owner'] != self.owner
+                and float(l['expires']) > now] if len(df.index) else []
+            holder = next((l for l in others if self.conflicts(self.name, l['name'])), None)
+            if holder is not None:
+                logger.info(f"Lease '{self.name}' conflicts with lease "
+                    f"'{holder['name']}' held by {holder['owner']}.")
+                return False
+
+            expires = now + self.ttl_in_sec
+            leases_df = pd.DataFrame(others + [{'name': self.name, 'owner': self.owner,
+                'expires': expires}], columns=LEASE_COLUMNS)
+            try:
+                self._datastore.write_data_if(leases_df, version)
+            except WriteConflict:
+                logger.info(f"Leases changed while acquiring lease '{self.name}'. Retrying.")
+                continue
+            self.expires = expires
+            return True
+
+        raise WriteConflict(f"Failed to write lease '{self.name}' "
+            f"after {self.write_attempts} conflicting writes.")
+
+
+    def release(self) -> None:
+        '''
+        Releases the lease, if still held.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        '''
+        import pandas as pd
+
+        for _ in range(self.write_attempts):
+            df, version = self._datastore.read_versioned_data()
+            leases = df.to_dict('records') if len(df.index) else []
+            others = [l for l in leases if l['owner'] != self.owner]
+            if len(others) == len(leases):
+                logger.warning(f"Lease '{self.name}' was no longer held on release.")
+                return
+            try:
+                self._datastore.write_data_if(pd.DataFrame(others, columns=LEASE_COLUMNS), version)
+                return
+            except WriteConflict:
+                continue
+        logger.warning(f"Failed to release lease '{self.name}' "
+            f"after {self.write_attempts} conflicting writes.")
+
+
+    def check(self) -> None:
+        '''
+        Raises `LeaseLost` if the lease was lost while held.
+        '''
+        if self.lost.is_set():
+            raise LeaseLost(f"Lost lease '{self.name}' while running.")
+
+
+    @contextmanager
+    def hold(self) -> Iterator['Lease']:
+        '''
+        Holds the lease for the duration of a `with` block, renewing
+        it in the background. Should the lease expire before being
+        renewed, or be taken by another run, `lost` is set, so that
+        the run may stop (see `held_leases`).
+
+        Parameters:
+            None
+
+        Returns:
+            (Lease): The lease itself.
+        '''
+        try:
+            acquired = self.acquire()
+        except WriteConflict:
+            acquired = False
+        if not acquired:
+            raise LeaseUnavailable(f"A run conflicting with '{self.name}' is already in progress.")
+
+        self.lost.clear()
+        stopped = threading.Event()
+
+        def renew() -> None:
+            while not stopped.wait(self.ttl_in_sec / 3):
+                try:
+                    if time.time() < self.expires and self.acquire():
+                        continue
+                except Exception as e:
+                    logger.error(f"Failed to renew lease '{self.name}'. {e}")
+                    if time.time() < self.expires:
+                        continue
+                logger.error(f"Lost lease '{self.name}' while running.")
+                self.lost.set()
+                return
+
+        renewal = threading.Thread(target=renew, daemon=True)
+        renewal.start()
+        token = _held.set(_held.get() + (self,))
+        try:
+            yield self
+        finally:
+            _held.reset(token)
+            stopped.set()
+            renewal.join()
+            try:
+                self.release()
+            except Exception as e:
+                logger.error(f"Failed to release lease '{self.name}'. {e}")
+
+
+# The leases held by the run in progress in the current thread
+_held: ContextVar[Tuple[Lease, ...]] = ContextVar('held_leases', default=())
+
+
+def held_leases() -> Tuple[Lease, ...]:
+    '''
+    The leases held by the run in progress in the current thread,
+    to be checked between units of work (e.g., submissions), also
+    from the threads the run starts.
+
+    Parameters:
+        None
+
+    Returns:
+        (tuple of Lease): The leases.
+    '''
+    return _held.get()
+
+
+class _Call:
+    '''
+    A call in flight, shared by the callers coalesced into it.
+    '''
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+    Coalesces concurrent calls with the same key into one. The first
+    caller runs the function, while the others wait for it to return
+    and share its result, or its exception.
+    '''
+
+    def __init__(self) -> None:
+        '''
+        The constructor for `SingleFlight`.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        '''
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+
+    def do(self, key: Hashable, fun: Callable[[], Any]) -> Any:
+        '''
+        Runs a function, unless a call with the same key is in flight,
+        in which case it waits for that call instead.
+
+        Parameters:
+            key (hashable): Identifies calls that may be coalesced.
+
+            fun (function): The function to run.
+
+        Returns:
+            (any): The result of the function.
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            logger.info(f"Joining call {key} already in flight.")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fun()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,194 @@
+'''
+county_index.py
+
+Maps county names returned by the geocoder (e.g., 'Doña Ana County')
+to the options of each state web form's county dropdown. Indices are
+built once from form snapshots saved under `data/form_snapshots`, so
+that dropdowns are set with a single lookup and unknown counties are
+caught before a browser is launched.
+
+To refresh a snapshot from the live form, run
+`python -m utilities.county_index <state>`.
+'''
+
+import json
+import re
+import sys
+import unicodedata
+from constants import FORM_SNAPSHOT_DIRECTORY
+from functools import lru_cache
+from models.base_report import ReportError
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+# Selenium is only imported by the modules filling web forms
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webelement import WebElement
+
+
+# Designations stripped from county names before comparison
+COUNTY_DESIGNATIONS = re.compile(r'^city and county of |^city of | county$| parish$| borough$')
+
+
+class CountyOption(NamedTuple):
+    '''
+    An option of a county dropdown. The value is None when the
+    form's option is selected by its visible text instead.
+    '''
+    value: Optional[str]
+    text: str
+
+
+def normalize_county(name: str) -> str:
+    '''
+    Normalizes a county name for comparison by removing accents,
+    designations such as 'County', punctuation and whitespace.
+    Example: 'Doña Ana County' and 'Dona Ana' both become 'donaana'.
+
+    Parameters:
+        name (str): The county name.
+
+    Returns:
+        (str): The normalized name.
+    '''
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    name = COUNTY_DESIGNATIONS.sub('', name.lower().strip())
+    return re.sub(r'[^a-z0-9]', '', name)
+
+
+class CountyIndex:
+    '''
+    The options of one state web form's county dropdown,
+    keyed by normalized county name.
+    '''
+
+    def __init__(self, state: str, options: List[Dict]) -> None:
+        '''
+        The constructor for `CountyIndex`.
+
+        Parameters:
+            state (str): The state, as named in `submissions` (e.g., 'new_mexico').
+
+            options (list of dict): The dropdown options, each with a
+                'text' and, optionally, a 'value'.
+
+        Returns:
+            None
+        '''
+        self.state = state
+        self._options = {}
+        for option in options:
+            key = normalize_county(option['text'])
+            self._options[key] = CountyOption(option.get('value'), option['text'])
+
+
+    def __contains__(self, county: str) -> bool:
+        return bool(county) and normalize_county(county) in self._options
+
+
+    def __len__(self) -> int:
+        return len(self._options)
+
+
+    def option(self, county: str) -> CountyOption:
+        '''
+        Looks up the dropdown option for a county.
+
+        Parameters:
+            county (str): The county name returned by the geocoder.
+
+        Returns:
+            (CountyOption): The option.
+        '''
+        if county not in self:
+            state_name = self.state.replace('_', ' ').title()
+            raise ReportError(f"County '{county}' is not an option of the {state_name} web form.")
+        return self._options[normalize_county(county)]
+
+
+    def select(self, element: 'WebElement', county: str) -> None:
+        '''
+        Selects a county in the form's dropdown.
+
+        Parameters:
+            element (WebElement): The county `<select>` element.
+
+            county (str): The county name returned by the geocoder.
+
+        Returns:
+            None
+        '''
+        from selenium.webdriver.support.ui import Select
+
+        option = self.option(county)
+        if option.value is not None:
+            Select(element).select_by_value(option.value)
+        else:
+            Select(element).select_by_visible_text(option.text)
+
+
+def snapshot_path(state: str) -> str:
+    '''
+    The path of a state web form's snapshot.
+    '''
+    return f'{FORM_SNAPSHOT_DIRECTORY}/{state}.json'
+
+
+def load_snapshot(state: str) -> Dict:
+    '''
+    Reads a state web form's snapshot.
+    '''
+    with open(snapshot_path(state)) as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_county_index(state: str) -> CountyIndex:
+    '''
+    Retrieves the county index of a state web form,
+    building it from the form's snapshot on first use.
+
+    Parameters:
+        state (str): The state, as named in `submissions` (e.g., 'texas').
+
+    Returns:
+        (CountyIndex): The index.
+    '''
+    return CountyIndex(state, load_snapshot(state)['options'])
+
+
+def capture_snapshot(state: str) -> None:
+    '''
+    Refreshes a state web form's snapshot with the
+    options currently offered by the live form.
+
+    Parameters:
+        state (str): The state, as named in `submissions`.
+
+    Returns:
+        None
+    '''
+    from utilities import web_utilities
+
+    snapshot = load_snapshot(state)
+    with web_utilities.chrome_browser(snapshot['url'], '', avoid_detection=True) as browser:
+        if snapshot.get('frame'):
+            browser.switch_to.frame(snapshot['frame'])
+        element = browser.find_element(snapshot['select']['by'], snapshot['select']['target'])
+        options = browser.execute_script(
+            "return Array.from(arguments[0].options)"
+            ".filter(o => o.value)"
+            ".map(o => ({value: o.value, text: o.text.trim()}));", element)
+
+    # Keep option values only for forms selected by value
+    if not any('value' in o for o in snapshot['options']):
+        options = [{'text': o['text']} for o in options]
+    snapshot['options'] = options
+    with open(snapshot_path(state), 'w') as f:
+        json.dump(snapshot, f, indent=2)
+        f.write('\n')
+    get_county_index.cache_clear()
+
+
+if __name__ == '__main__':
+    for state in sys.argv[1:]:
+        capture_snapshot(state)
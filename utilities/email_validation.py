@@ -0,0 +1,279 @@
+'''
+email_validation.py
+
+Validates the email addresses of FracTracker users, caching results
+so that each domain's mail servers (MX records) are looked up, and each
+address is checked, at most once per time-to-live. Addresses are
+validated a page of reports at a time, concurrently, and the cache is
+persisted through a datastore so that results carry across runs.
+
+A result of None means the check was ambiguous (e.g., a mail server
+timed out). Ambiguous results are not cached.
+'''
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from constants import PROD, PROD_ENV, TEST
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from utilities.config import Config
+from utilities.logger import logger
+from utilities.storage import CloudDatastore, IDatastore, LocalDatastore
+
+
+# Columns of the persisted cache, in order
+EMAIL_CACHE_COLUMNS = ['kind', 'key', 'is_valid', 'expires']
+DOMAIN = 'domain'
+ADDRESS = 'address'
+
+
+def validate_email(**kwargs) -> Optional[bool]:
+    '''
+    Calls `validate_email` from the py3-validate-email package,
+    importing it on first use, since the package loads its blacklist
+    of domains on import.
+    '''
+    from validate_email import validate_email as validate
+    return validate(**kwargs)
+
+
+def email_domain(address: str) -> Optional[str]:
+    '''
+    Returns the lowercased domain of an email address,
+    or None if the address has no domain.
+    '''
+    _, at, domain = (address or '').strip().rpartition('@')
+    return domain.lower() if at and domain else None
+
+
+class EmailValidationService:
+    '''
+    Validates email addresses with time-limited caches of
+    domain and address results.
+    '''
+
+    def __init__(
+        self,
+        datastore: IDatastore=None,
+        ttl_in_sec: float=604800,
+        max_workers: int=8,
+        dns_timeout_in_sec: float=10,
+        check_smtp: bool=True,
+        smtp_timeout_in_sec: float=10) -> None:
+        '''
+        The constructor for `EmailValidationService`.
+
+        Parameters:
+            datastore (IDatastore): The datastore persisting the cache
+                between runs. If None, results are only kept in memory.
+
+            ttl_in_sec (float): The number of seconds for which a
+                result is reused. Defaults to one week.
+
+            max_workers (int): The number of concurrent checks.
+
+            dns_timeout_in_sec (float): The timeout of MX lookups.
+
+            check_smtp (bool): Whether to ask each domain's mail server
+                whether it accepts the address, rather than only
+                checking that the domain has one.
+
+            smtp_timeout_in_sec (float): The timeout of SMTP checks.
+
+        Returns:
+            None
+        '''
+        self._datastore = datastore
+        self.ttl = timedelta(seconds=ttl_in_sec)
+        self.max_workers = max_workers
+        self.dns_timeout_in_sec = dns_timeout_in_sec
+        self.check_smtp = check_smtp
+        self.smtp_timeout_in_sec = smtp_timeout_in_sec
+        self.entries: Dict[Tuple[str, str], Tuple[bool, datetime]] = {}
+        self._lock = threading.Lock()
+
+
+    def load(self) -> 'EmailValidationService':
+        '''
+        Reads unexpired results from the datastore, if any.
+
+        Parameters:
+            None
+
+        Returns:
+            (EmailValidationService): The service itself.
+        '''
+        if self._datastore is None:
+            return self
+        df = self._datastore.read_data()
+        now = datetime.utcnow()
+        with self._lock:
+            self.entries = {}
+            if len(df.index):
+                for entry in df.to_dict('records'):
+                    expires = datetime.fromisoformat(entry['expires'])
+                    if expires > now:
+                        self.entries[(entry['kind'], entry['key'])] = \
+                            (bool(entry['is_valid']), expires)
+        logger.info(f'Loaded {len(self.entries)} cached email validation result(s).')
+        return self
+
+
+    def save(self) -> None:
+        '''
+        Writes unexpired results to the datastore, if any.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        '''
+        if self._datastore is None:
+            return
+        now = datetime.utcnow()
+        with self._lock:
+            rows = [{'kind': kind, 'key': key, 'is_valid': is_valid, 'expires': expires.isoformat()}
+                for (kind, key), (is_valid, expires) in self.entries.items() if expires > now]
+        import pandas as pd
+        self._datastore.write_data(pd.DataFrame(rows, columns=EMAIL_CACHE_COLUMNS))
+
+
+    def _cached(self, kind: str, key: str) -> Tuple[bool, Optional[bool]]:
+        '''
+        Looks up a result, returning whether one was
+        found along with the result itself.
+        '''
+        with self._lock:
+            entry = self.entries.get((kind, key))
+        if entry and entry[1] > datetime.utcnow():
+            return True, entry[0]
+        return False, None
+
+
+    def _cache(self, kind: str, key: str, is_valid: Optional[bool]) -> Optional[bool]:
+        '''
+        Stores a result unless it is ambiguous and returns it.
+        '''
+        if is_valid is not None:
+            with self._lock:
+                self.entries[(kind, key)] = (bool(is_valid), datetime.utcnow() + self.ttl)
+        return is_valid
+
+
+    def domain_is_valid(self, domain: str) -> Optional[bool]:
+        '''
+        Checks that a domain has mail servers.
+
+        Parameters:
+            domain (str): The lowercased domain (e.g., 'example.com').
+
+        Returns:
+            (bool): Whether the domain has mail servers,
+                or None if the lookup was ambiguous.
+        '''
+        found, is_valid = self._cached(DOMAIN, domain)
+        if found:
+            return is_valid
+        is_valid = validate_email(
+            email_address=f'postmaster@{domain}',
+            check_format=False,
+            check_blacklist=False,
+            check_dns=True,
+            dns_timeout=self.dns_timeout_in_sec,
+            check_smtp=False)
+        return self._cache(DOMAIN, domain, is_valid)
+
+
+    def is_valid(self, address: str) -> Optional[bool]:
+        '''
+        Validates an email address: its format, that its domain is not
+        blacklisted and has mail servers and, if enabled, that the mail
+        server accepts it.
+
+        Parameters:
+            address (str): The email address.
+
+        Returns:
+            (bool): Whether the address is valid,
+                or None if the check was ambiguous.
+        '''
+        key = (address or '').strip().lower()
+        found, is_valid = self._cached(ADDRESS, key)
+        if found:
+            return is_valid
+
+        domain = email_domain(key)
+        if domain is None or not validate_email(
+            email_address=key,
+            check_format=True,
+            check_blacklist=True,
+            check_dns=False,
+            check_smtp=False):
+            return self._cache(ADDRESS, key, False)
+
+        domain_is_valid = self.domain_is_valid(domain)
+        if not domain_is_valid or not self.check_smtp:
+            return self._cache(ADDRESS, key, domain_is_valid)
+
+        return self._cache(ADDRESS, key, validate_email(
+            email_address=key,
+            check_format=False,
+            check_blacklist=False,
+            check_dns=True,
+            dns_timeout=self.dns_timeout_in_sec,
+            check_smtp=True,
+            smtp_timeout=self.smtp_timeout_in_sec))
+
+
+    def validate_many(self, addresses: Iterable[str]) -> Dict[str, Optional[bool]]:
+        '''
+        Validates addresses concurrently, looking up each
+        uncached domain once before checking the addresses.
+
+        Parameters:
+            addresses (iterable of str): The email addresses.
+
+        Returns:
+            (dict): The result for each address.
+        '''
+        addresses = list(dict.fromkeys(a for a in addresses if a))
+        domains = list(dict.fromkeys(d for d in map(email_domain, addresses)
+            if d and not self._cached(DOMAIN, d)[0]))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self.domain_is_valid, domains))
+            return dict(zip(addresses, executor.map(self.is_valid, addresses)))
+
+
+# The service shared by all reports, created on first use
+_service: Optional[EmailValidationService] = None
+_service_lock = threading.Lock()
+
+
+def get_email_validator() -> EmailValidationService:
+    '''
+    Returns the shared email validation service, creating it from the
+    config file and loading its persisted cache on first use. The cache
+    is stored on Google Cloud in test and production environments and
+    in a local file otherwise.
+    '''
+    global _service
+    with _service_lock:
+        if _service is None:
+            config = Config()
+            if PROD_ENV in (TEST, PROD):
+                datastore = CloudDatastore(config.cloud_bucket_name,
+                    config.cloud_email_validation_blob_name)
+            else:
+                datastore = LocalDatastore(config.email_validation_cache_path)
+            _service = EmailValidationService(
+                datastore,
+                ttl_in_sec=config.email_validation_ttl_in_sec,
+                max_workers=config.email_validation_max_workers,
+                check_smtp=config.email_validation_check_smtp)
+            try:
+                _service.load()
+            except Exception as e:
+                logger.warning(f'Failed to load cached email validation results. {e}')
+        return _service
@@ -5,12 +5,20 @@ Utilities for interfacing with FracTracker Alliance's internal APIs.
 '''
 
 import datetime
+import json
 import os
 import requests
-from datetime import datetime
-from models.api_report import ApiReport
-from typing import Dict, List
-from utilities.logger import logger
+from datetime import datetime, timedelta
+from models.api_report import ApiReport, feature_coordinates, feature_email
+from models.geocoded_location import GeocodedLocation
+from typing import TYPE_CHECKING, Dict, List
+from utilities import metrics
+from utilities.email_validation import get_email_validator
+from utilities.logger import log_context, logger
+
+# Bulk retrieval, with its numpy and pandas dependencies, is imported on first use
+if TYPE_CHECKING:
+    from models.report_table import ReportTable
 
 FRACTRACKER_BASE_ENDPOINT = "https://api.fractracker.org/v1/data/report"
 class FracAPI:
@@ -20,9 +28,12 @@ class FracAPI:
 
     def __init__(
         self, 
-        begin_date:str, 
+        begin_date:str=None, 
         end_date:str=None,
-        check_emails:bool=True) -> None:
+        check_emails:bool=True,
+        base_url:str=None,
+        bulk:bool=False,
+        ids:List[int]=None) -> None:
         '''
         Constructor for FracAPI class.
         
@@ -31,35 +42,64 @@ class FracAPI:
                 Formatted as "MM-DD-YYYY".
 
             end_date (str): The inclusive maximum report date.
-                Formatted as "MM-DD-YYYY". If no value provided,
-                defaults to current date.
+                Formatted as "MM-DD-YYYY". Reports dated through the
+                end of that day are retrieved. If no value provided,
+                defaults to the current time.
             
             check_emails (bool): A boolean indicating whether
                 report email addresses should be validated.
 
+            base_url (str): The report endpoint to query. Defaults
+                to the live FracTracker API, but may point at a
+                local simulator for offline load testing.
+
+            bulk (bool): Whether to normalize each page into a
+                columnar `ReportTable` (exposed as `table`) instead
+                of building one `ApiReport` per report. Reports are
+                then views over the table rows and are only reverse
+                geocoded once their location is accessed. Email
+                addresses are not validated in bulk mode.
+
+            ids (list of int): The ids of specific reports to retrieve
+                (e.g., reports whose submissions failed). When given,
+                reports are filtered by id instead of by date.
+
         Returns:
             None
         '''
-        # Parse start and end dates
-        today = datetime.now()
-        date_fmt = "%m-%d-%Y"
-        self.begin_date = datetime.strptime(begin_date, date_fmt)
-        if type(end_date) == str:
-            self.end_date = datetime.strptime(end_date, date_fmt)
-        else:
-            self.end_date = today
+        self.base_url = base_url or FRACTRACKER_BASE_ENDPOINT
+        self.ids = ids
 
-        # Confirm we have correct dates that precede today
-        assert self.begin_date <= today and self.end_date <= today
+        # Parse start and end dates
+        if ids is None:
+            today = datetime.now()
+            date_fmt = "%m-%d-%Y"
+            self.begin_date = datetime.strptime(begin_date, date_fmt)
+            if type(end_date) == str:
+                # Include reports made after midnight on the last day
+                end_of_day = datetime.strptime(end_date, date_fmt) \
+                    + timedelta(days=1) - timedelta(microseconds=1)
+                self.end_date = min(end_of_day, today)
+            else:
+                self.end_date = today
+
+            # Confirm we have correct dates that precede today
+            assert self.begin_date <= today and self.end_date <= today
 
         self.query = self.gen_query()
 
         # Get all reports and then remove duplicates
-        self.reports = self.get_reports_for_date(check_emails)
+        with log_context(stage='fetch'):
+            if bulk:
+                self.table = self.get_table_for_date()
+                self.reports = list(self.table)
+            else:
+                self.reports = self.get_reports_for_date(check_emails)
 
     def gen_query(self) -> List[str]:
         '''
-        Creates query filter for a date range.
+        Creates query filter for a date range, or for
+        a list of report ids if any were given.
 
         Parameters:
             None
@@ -67,6 +107,10 @@ class FracAPI:
         Returns:
             (list of str): The list of filter strings.
         '''
+        if self.ids is not None:
+            id_filter = json.dumps({"val": list(self.ids), "op": "in", "name": "id"})
+            return [f'{{"filters":[{id_filter}]}}']
+
         begin_date_filter = self.gen_date_filter(self.begin_date, "ge")
         end_date_filter = self.gen_date_filter(self.end_date, "le")
         return [f'{{"filters":[{begin_date_filter},{end_date_filter}]}}']
@@ -99,13 +143,15 @@ class FracAPI:
             (list of dict): JSON-structured response containing reports.
         '''
         params = {'q': self.query, 'page': page_num}
-        response = requests.get(FRACTRACKER_BASE_ENDPOINT, params=params)
+        response = requests.get(self.base_url, params=params)
 
         if not response.ok:
             raise Exception(f"Call for reports failed with status code "
                 f"'{response.status_code} - {response.reason}'.")
         
-        return response.json()
+        page = response.json()
+        metrics.REPORTS_FETCHED.inc(len(page.get('features', [])))
+        return page
 
     def process_current_page(
         self,
@@ -164,8 +210,44 @@ class FracAPI:
         reports = []
         for page_num in range(num_pages):
             new_page = self.get_one_page(page_num=page_num + 1)
+
+            # Geocode the page's locations concurrently across providers
+            GeocodedLocation.prefetch(feature_coordinates(r) for r in new_page['features'])
+            # Validate the page's email addresses concurrently, reusing cached results
+            if check_emails:
+                get_email_validator().validate_many(feature_email(r) for r in new_page['features'])
             new_reports = [ApiReport(r, check_emails) for r in new_page['features']]
             reports.extend(new_reports)
             logger.info(f'Processed page {page_num+1}/{num_pages}')
 
+        if check_emails:
+            get_email_validator().save()
         return reports
+
+    def get_table_for_date(self) -> 'ReportTable':
+        '''
+        Queries API for all reports by looping over all pages and
+        normalizes each page into a columnar table in one pass.
+
+        Inputs:
+            None
+
+        Returns:
+            (ReportTable): The retrieved reports.
+        '''
+        from models.report_table import ReportTable
+
+        first_page_json = self.get_one_page()
+        num_pages = first_page_json['properties']['total_pages']
+        num_results = first_page_json['properties']['num_results']
+
+        logger.info(f'Total number of pages: {num_pages}')
+        logger.info(f'Total number of reports: {num_results}')
+
+        tables = [ReportTable.from_features(first_page_json['features'])]
+        for page_num in range(2, num_pages + 1):
+            new_page = self.get_one_page(page_num=page_num)
+            tables.append(ReportTable.from_features(new_page['features']))
+            logger.info(f'Processed page {page_num}/{num_pages}')
+
+        return ReportTable.concat(tables)
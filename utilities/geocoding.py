@@ -0,0 +1,377 @@
+'''
+geocoding.py
+
+Reverse geocoding across several configured providers, such as a
+self-hosted Nominatim instance, a file of previously geocoded
+coordinates and the public Nominatim endpoint. Each provider has its
+own rate limit, and lookups are routed to whichever provider can take
+a request soonest. Results are cached and normalized to the state,
+county, zip code and street address used by `GeocodedLocation`.
+'''
+
+import csv
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from constants import ROOT_DIRECTORY
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from utilities import metrics
+from utilities.config import Config
+from utilities.logger import logger
+
+
+PUBLIC_NOMINATIM_DOMAIN = 'nominatim.openstreetmap.org'
+
+
+class GeocodeResult(NamedTuple):
+    '''
+    A reverse geocoded location, normalized across providers.
+    '''
+    state: str
+    county: Optional[str]
+    zip: Optional[str]
+    full_address: Optional[str]
+
+
+class GeocodingProvider(ABC):
+    '''
+    An abstract reverse geocoding backend with its own rate limit.
+    '''
+
+    def __init__(self, name: str, min_delay_in_sec: float=0) -> None:
+        '''
+        The constructor for `GeocodingProvider`.
+
+        Parameters:
+            name (str): The name used to identify the provider in logs.
+
+            min_delay_in_sec (float): The minimum number of seconds
+                between requests to the provider.
+
+        Returns:
+            None
+        '''
+        self.name = name
+        self.min_delay_in_sec = min_delay_in_sec
+        self.num_requests = 0
+        self._next_slot = 0.0
+
+
+    def seconds_until_available(self, now: float) -> float:
+        '''
+        The number of seconds until the provider can take a request.
+        '''
+        return max(0.0, self._next_slot - now)
+
+
+    def reserve(self, now: float) -> float:
+        '''
+        Reserves the provider's next request slot. Callers
+        are expected to serialize reservations.
+
+        Parameters:
+            now (float): The current monotonic time.
+
+        Returns:
+            (float): The number of seconds to wait for the slot.
+        '''
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.min_delay_in_sec
+        self.num_requests += 1
+        return slot - now
+
+
+    @abstractmethod
+    def reverse(self, lat: float, lon: float) -> Optional[GeocodeResult]:
+        '''
+        Reverse geocodes a coordinate pair.
+
+        Parameters:
+            lat (float): The latitude.
+
+            lon (float): The longitude.
+
+        Returns:
+            (GeocodeResult): The location, or None if the
+                provider could not find one. Raises an
+                exception if the request failed.
+        '''
+        raise NotImplementedError
+
+
+class NominatimProvider(GeocodingProvider):
+    '''
+    Reverse geocodes through a Nominatim server, either the public
+    endpoint or a self-hosted instance.
+    '''
+
+    def __init__(
+        self,
+        domain: str=PUBLIC_NOMINATIM_DOMAIN,
+        scheme: str='https',
+        user_agent: str='def',
+        timeout_in_sec: float=30,
+        min_delay_in_sec: float=1) -> None:
+        '''
+        The constructor for `NominatimProvider`.
+
+        Parameters:
+            domain (str): The domain of the Nominatim server.
+
+            scheme (str): Either 'http' or 'https'.
+
+            user_agent (str): The user agent sent with requests.
+
+            timeout_in_sec (float): The request timeout.
+
+            min_delay_in_sec (float): The minimum number of seconds
+                between requests. The public endpoint allows one
+                request per second.
+
+        Returns:
+            None
+        '''
+        import geopy
+
+        super().__init__(f'nominatim:{domain}', min_delay_in_sec)
+        self._geolocator = geopy.Nominatim(
+            user_agent=user_agent,
+            timeout=timeout_in_sec,
+            domain=domain,
+            scheme=scheme)
+
+
+    def reverse(self, lat: float, lon: float) -> Optional[GeocodeResult]:
+        location = self._geolocator.reverse((lat, lon))
+        if not location:
+            return None
+        address = location.raw.get('address', {})
+        if 'state' not in address:
+            return None
+        return GeocodeResult(
+            state=address['state'],
+            county=address.get('county'),
+            zip=address.get('postcode'),
+            full_address=location.raw.get('display_name'))
+
+
+class LocalFileProvider(GeocodingProvider):
+    '''
+    Answers lookups from a CSV file of previously geocoded
+    coordinates (e.g., `data/all_api_report_locations.csv`),
+    with 'lat', 'lon', 'location.state', 'location.county'
+    and 'location.zip' columns. Coordinates not in the file
+    are left to other providers.
+    '''
+
+    def __init__(self, path: str) -> None:
+        '''
+        The constructor for `LocalFileProvider`.
+
+        Parameters:
+            path (str): The path of the CSV file, absolute or
+                relative to the project root.
+
+        Returns:
+            None
+        '''
+        super().__init__(f'local:{path}')
+        if not path.startswith('/'):
+            path = f'{ROOT_DIRECTORY}/{path}'
+
+        self._locations = {}
+        with open(path) as f:
+            for row in csv.DictReader(f):
+                if row.get('location.is_valid') == 'False' or not row.get('location.state'):
+                    continue
+                key = coordinate_key(float(row['lat']), float(row['lon']))
+                self._locations[key] = GeocodeResult(
+                    state=row['location.state'],
+                    county=row.get('location.county') or None,
+                    zip=row.get('location.zip') or None,
+                    full_address=row.get('location.full_address') or None)
+
+
+    def reverse(self, lat: float, lon: float) -> Optional[GeocodeResult]:
+        return self._locations.get(coordinate_key(lat, lon))
+
+
+def coordinate_key(lat: float, lon: float) -> Tuple[float, float]:
+    '''
+    Rounds coordinates to roughly 10 centimeters for use as a lookup key.
+    '''
+    return (round(lat, 6), round(lon, 6))
+
+
+class GeocodingScheduler:
+    '''
+    Routes reverse geocoding lookups across providers. Each lookup
+    goes to the provider that can take a request soonest, falling
+    back to the next provider if it fails or finds nothing. Results
+    are kept in a least-recently-used cache.
+    '''
+
+    def __init__(
+        self,
+        providers: List[GeocodingProvider],
+        cache_size: int=10000,
+        max_workers: int=4) -> None:
+        '''
+        The constructor for `GeocodingScheduler`.
+
+        Parameters:
+            providers (list of GeocodingProvider): The providers, in
+                order of preference when several are available.
+
+            cache_size (int): The maximum number of cached lookups.
+
+            max_workers (int): The number of concurrent lookups
+                made by `reverse_many`.
+
+        Returns:
+            None
+        '''
+        if not providers:
+            raise Exception("At least one geocoding provider must be configured.")
+        self.providers = providers
+        self.cache_size = cache_size
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def reverse(self, lat: float, lon: float) -> Optional[GeocodeResult]:
+        '''
+        Reverse geocodes a coordinate pair.
+
+        Parameters:
+            lat (float): The latitude.
+
+            lon (float): The longitude.
+
+        Returns:
+            (GeocodeResult): The location, or None if no provider
+                could find one.
+        '''
+        key = coordinate_key(lat, lon)
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                metrics.GEOCODE_CACHE_LOOKUPS.inc(result='hit')
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            self.misses += 1
+            metrics.GEOCODE_CACHE_LOOKUPS.inc(result='miss')
+
+        result, failed, tried = None, False, []
+        while len(tried) < len(self.providers):
+            provider, wait = self._reserve(exclude=tried)
+            tried.append(provider)
+            if wait:
+                time.sleep(wait)
+            try:
+                result = provider.reverse(lat, lon)
+            except Exception as e:
+                logger.warning(f'Geocoding ({lat}, {lon}) with {provider.name} failed. {e}')
+                failed = True
+                continue
+            if result:
+                # Logged lazily, since pages are geocoded location by location
+                logger.debug('Geocoded (%s, %s) with %s.', lat, lon, provider.name)
+                break
+
+        # Only cache definitive answers
+        if result or not failed:
+            with self._lock:
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+
+    def reverse_many(self, coords: Iterable[Tuple[float, float]]) -> List[Optional[GeocodeResult]]:
+        '''
+        Reverse geocodes many coordinate pairs concurrently, such
+        as those of a page of reports, warming the cache.
+
+        Parameters:
+            coords (iterable of (float, float)): The latitude-longitude pairs.
+
+        Returns:
+            (list of GeocodeResult): The locations, in order.
+        '''
+        coords = list(coords)
+        unique = list(dict.fromkeys(coordinate_key(lat, lon) for lat, lon in coords))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(unique, executor.map(lambda c: self.reverse(*c), unique)))
+        return [results[coordinate_key(lat, lon)] for lat, lon in coords]
+
+
+    def _reserve(self, exclude: List[GeocodingProvider]) -> Tuple[GeocodingProvider, float]:
+        '''
+        Picks the provider with capacity soonest, preferring earlier
+        providers on ties, and reserves its next request slot.
+        '''
+        with self._lock:
+            now = time.monotonic()
+            candidates = [p for p in self.providers if p not in exclude]
+            provider = min(candidates, key=lambda p: p.seconds_until_available(now))
+            return provider, provider.reserve(now)
+
+
+def build_provider(spec: Dict) -> GeocodingProvider:
+    '''
+    Creates a provider from its configuration.
+
+    Parameters:
+        spec (dict): The provider settings. The 'type' key is either
+            'nominatim' or 'local'; remaining keys are passed to the
+            provider's constructor.
+
+    Returns:
+        (GeocodingProvider): The provider.
+    '''
+    settings = dict(spec)
+    provider_type = settings.pop('type', None)
+    if provider_type == 'nominatim':
+        return NominatimProvider(**settings)
+    if provider_type == 'local':
+        return LocalFileProvider(**settings)
+    raise Exception(f"Unknown geocoding provider type '{provider_type}'.")
+
+
+# The scheduler shared by all lookups, created on first use
+_geocoder: Optional[GeocodingScheduler] = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder() -> GeocodingScheduler:
+    '''
+    Retrieves the shared scheduler, creating it from the
+    geocoding settings in the config file on first use.
+
+    Parameters:
+        None
+
+    Returns:
+        (GeocodingScheduler): The scheduler.
+    '''
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            config = Config()
+            providers = []
+            for spec in config.geocoding_providers:
+                try:
+                    providers.append(build_provider(spec))
+                except Exception as e:
+                    logger.warning(f'Skipping geocoding provider {spec}. {e}')
+            _geocoder = GeocodingScheduler(
+                providers,
+                cache_size=config.geocoding_cache_size,
+                max_workers=config.geocoding_max_workers)
+        return _geocoder
@@ -1,27 +1,158 @@
 '''
 logger.py
 
-Configures a logger for standard input.
+Configures the app's logging. Records are handed to a queue and
+written to standard error by a listener thread, so that submission
+workers never wait on the stream. In the test and production
+environments, records are written as JSON objects, one per line, with
+the id and state of the report and the stage of the run being logged
+(see `log_context`), and as text in development. Levels are set per
+logger, and DEBUG records are sampled per line of code, both in the
+config file's `logging` section.
 '''
 
+import atexit
+import contextvars
+import itertools
+import json
 import logging
+import queue
+import sys
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterator, Tuple
+from utilities.config import Config
+
+
+# The fields describing the work being logged, added to each record
+CONTEXT_FIELDS = ('report_id', 'state', 'stage')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_context: contextvars.ContextVar[Dict] = contextvars.ContextVar('log_context', default={})
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    '''
+    Adds fields (e.g., `report_id`, `state` or `stage`) to the records
+    logged within a `with` block by the current thread. Fields passed
+    through `extra` when logging take precedence.
+    '''
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    '''
+    Adds the fields of the current log context to records.
+    '''
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    '''
+    Keeps one in every `1 / rate` DEBUG records logged by each
+    line of code, and every record of a higher level.
+    '''
+
+    def __init__(self, rate: float=1.0) -> None:
+        super().__init__()
+        self.every = round(1 / rate) if rate > 0 else None
+        self._counters: Dict[Tuple[str, int], itertools.count] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every is None:
+            return False
+        key = (record.pathname, record.lineno)
+        counter = self._counters.get(key) or self._counters.setdefault(key, itertools.count())
+        return next(counter) % self.every == 0
 
-# Create logger
-logger = logging.getLogger("fractracker")
-logger.setLevel(logging.DEBUG)
 
-# Create console handler and set level to debug
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
+class JsonFormatter(logging.Formatter):
+    '''
+    Formats records as JSON objects, with the fields of their log context.
+    '''
 
-# Create formatter
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'severity': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(
+    target: logging.Logger,
+    levels: Dict[str, str]=None,
+    json_format: bool=False,
+    debug_sample_rate: float=1.0,
+    stream=None) -> QueueListener:
+    '''
+    Routes the records of a logger, and of those propagating to it,
+    through a queue to a stream written by a listener thread.
+
+    Parameters:
+        target (Logger): The logger handing records to the queue.
+
+        levels (dict of str): The levels of loggers, by name.
+
+        json_format (bool): Whether records are written as JSON.
+            Defaults to False, in which case they are written as text.
+
+        debug_sample_rate (float): The share of DEBUG records kept.
+
+        stream (file): The stream written. Defaults to standard error.
+
+    Returns:
+        (QueueListener): The started listener.
+    '''
+    for name, level in (levels or {}).items():
+        logging.getLogger(None if name == 'root' else name).setLevel(level.upper())
+
+    # Filters run in the logging thread, before records are queued
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(SamplingFilter(debug_sample_rate))
+    queue_handler.addFilter(ContextFilter())
+    target.addHandler(queue_handler)
+
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+    listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+_config = Config()
+logger = logging.getLogger("fractracker")
+logger.setLevel(logging.DEBUG)
 
-# Add formatter to ch
-ch.setFormatter(formatter)
+# Handle the records of the app and of libraries (e.g., urllib3)
+listener = setup_logging(
+    logging.getLogger(),
+    levels=_config.logging_levels,
+    json_format=_config.logging_format == 'json',
+    debug_sample_rate=_config.logging_debug_sample_rate)
 
-# Add ch to logger
-logger.addHandler(ch)
+# Write queued records before exiting
+atexit.register(listener.stop)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,397 @@
+'''
+metrics.py
+
+Counters and histograms describing the throughput and latency of the
+pipeline, exposed in the Prometheus text exposition format by the
+app's `/metrics` endpoint. Metrics are kept in memory for the life
+of the process, so that a scraper can compare them across nightly
+runs. Samples recorded within isolated web workers are sent back to
+the app along with the outcome of their submission (see
+`web_workers`).
+
+References:
+- https://prometheus.io/docs/instrumenting/exposition_formats/
+'''
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The upper bounds of histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    '''
+    Escapes a label value or help text for the exposition format.
+    '''
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    '''
+    Formats a sample value, writing whole numbers without decimals.
+    '''
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    '''
+    A named metric with zero or more labels, registered on creation.
+    '''
+
+    kind = None
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str]=(),
+        registry: 'Registry'=None) -> None:
+        '''
+        The constructor for `Metric`.
+
+        Parameters:
+            name (str): The metric name (e.g., 'fractracker_reports_fetched_total').
+
+            documentation (str): The help text.
+
+            label_names (iterable of str): The names of the labels
+                given with every sample.
+
+            registry (Registry): The registry exposing the metric.
+                Defaults to the app's registry.
+
+        Returns:
+            None
+        '''
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        '''
+        Orders a sample's label values by label name.
+        '''
+        if set(labels) != set(self.label_names):
+            raise Exception(f"Metric '{self.name}' takes labels "
+                f"{list(self.label_names)}, not {list(labels)}.")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+
+    def _labels(self, key: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...]=()) -> str:
+        '''
+        Formats a sample's labels, as in `{state="Ohio",channel="web"}`.
+        '''
+        pairs = list(zip(self.label_names, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+    def dump(self) -> Dict[Tuple[str, ...], object]:
+        '''
+        Copies the metric's values, keyed by label values.
+        '''
+        raise NotImplementedError
+
+
+    def merge(self, values: Dict[Tuple[str, ...], object]) -> None:
+        '''
+        Adds values dumped from the same metric (e.g., in another process).
+        '''
+        raise NotImplementedError
+
+
+    def reset(self) -> None:
+        '''
+        Discards the metric's values.
+        '''
+        with self._lock:
+            self._values = {}
+
+
+    def render(self) -> List[str]:
+        '''
+        Formats the metric's help, type and samples as lines.
+        '''
+        return [f'# HELP {self.name} {_escape(self.documentation)}',
+            f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    '''
+    A metric that only increases, such as a number of reports.
+    '''
+
+    kind = 'counter'
+
+    def inc(self, amount: float=1, **labels) -> None:
+        '''
+        Increases the counter.
+
+        Parameters:
+            amount (float): The non-negative increase.
+
+            labels: The value of each label.
+
+        Returns:
+            None
+        '''
+        if amount < 0:
+            raise Exception(f"Counter '{self.name}' cannot decrease.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+    def value(self, **labels) -> float:
+        '''
+        The counter's value for the given labels.
+        '''
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+    def dump(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+
+    def merge(self, values: Dict[Tuple[str, ...], float]) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.dump().items()):
+            lines.append(f'{self.name}{self._labels(key)} {_format(value)}')
+        return lines
+
+
+class Histogram(Metric):
+    '''
+    A metric counting observations, such as latencies, in buckets.
+    '''
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str]=(),
+        buckets: Iterable[float]=DEFAULT_BUCKETS,
+        registry: 'Registry'=None) -> None:
+        '''
+        The constructor for `Histogram`.
+
+        Parameters:
+            name (str): The metric name (e.g., 'fractracker_email_send_seconds').
+
+            documentation (str): The help text.
+
+            label_names (iterable of str): The names of the labels
+                given with every observation.
+
+            buckets (iterable of float): The upper bounds of the buckets.
+
+            registry (Registry): The registry exposing the metric.
+                Defaults to the app's registry.
+
+        Returns:
+            None
+        '''
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, label_names, registry)
+
+
+    def observe(self, value: float, **labels) -> None:
+        '''
+        Records an observation.
+
+        Parameters:
+            value (float): The observed value (e.g., seconds).
+
+            labels: The value of each label.
+
+        Returns:
+            None
+        '''
+        key = self._key(labels)
+        with self._lock:
+            counts, count, total = self._values.get(key, ([0] * len(self.buckets), 0, 0.0))
+            counts = [c + (value <= bound) for c, bound in zip(counts, self.buckets)]
+            self._values[key] = (counts, count + 1, total + value)
+
+
+    @contextmanager
+    def time(self, **labels):
+        '''
+        Observes the seconds taken by the block, even if it fails.
+
+        Parameters:
+            labels: The value of each label.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+    def count(self, **labels) -> int:
+        '''
+        The number of observations for the given labels.
+        '''
+        with self._lock:
+            return self._values.get(self._key(labels), (None, 0, 0.0))[1]
+
+
+    def dump(self) -> Dict[Tuple[str, ...], Tuple[List[int], int, float]]:
+        with self._lock:
+            return dict(self._values)
+
+
+    def merge(self, values: Dict[Tuple[str, ...], Tuple[List[int], int, float]]) -> None:
+        with self._lock:
+            for key, (counts, count, total) in values.items():
+                old_counts, old_count, old_total = self._values.get(
+                    key, ([0] * len(self.buckets), 0, 0.0))
+                self._values[key] = ([a + b for a, b in zip(old_counts, counts)],
+                    old_count + count, old_total + total)
+
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, (counts, count, total) in sorted(self.dump().items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket'
+                    f'{self._labels(key, (("le", _format(bound)),))} {bucket_count}')
+            lines.append(f'{self.name}_bucket{self._labels(key, (("le", "+Inf"),))} {count}')
+            lines.append(f'{self.name}_sum{self._labels(key)} {_format(total)}')
+            lines.append(f'{self.name}_count{self._labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    '''
+    The metrics exposed together by an endpoint.
+    '''
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+
+    def register(self, metric: Metric) -> None:
+        '''
+        Adds a metric, which must have a unique name.
+        '''
+        with self._lock:
+            if metric.name in self._metrics:
+                raise Exception(f"Metric '{metric.name}' is already registered.")
+            self._metrics[metric.name] = metric
+
+
+    def dump(self) -> Dict[str, Dict]:
+        '''
+        Copies the values of every metric with at
+        least one sample, keyed by metric name.
+        '''
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: values for m in metrics for values in [m.dump()] if values}
+
+
+    def merge(self, dumped: Dict[str, Dict]) -> None:
+        '''
+        Adds the values dumped from another registry with the same
+        metrics (e.g., in a worker process). Unknown metrics are ignored.
+        '''
+        for name, values in dumped.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+
+    def reset(self) -> None:
+        '''
+        Discards the values of every metric.
+        '''
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+    def render(self) -> str:
+        '''
+        Formats every metric in the text exposition format.
+        '''
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return ''.join(line + '\n' for metric in metrics for line in metric.render())
+
+
+# The registry exposed by the app's `/metrics` endpoint
+REGISTRY = Registry()
+
+REPORTS_FETCHED = Counter(
+    'fractracker_reports_fetched_total',
+    'Reports retrieved from the FracTracker API.')
+
+GEOCODE_CACHE_LOOKUPS = Counter(
+    'fractracker_geocode_cache_lookups_total',
+    'Reverse geocoding cache lookups, by result (hit or miss).',
+    ['result'])
+
+SUBMISSIONS = Counter(
+    'fractracker_submissions_total',
+    'Agency submissions, by state, channel (web or email) and status.',
+    ['state', 'channel', 'status'])
+
+BROWSER_LAUNCH_SECONDS = Histogram(
+    'fractracker_browser_launch_seconds',
+    'Seconds taken to launch headless Chrome.')
+
+BROWSER_PAGE_LOAD_SECONDS = Histogram(
+    'fractracker_browser_page_load_seconds',
+    'Seconds taken to load a web form in the browser, by host.',
+    ['host'])
+
+BROWSER_TRANSFER_BYTES = Counter(
+    'fractracker_browser_transfer_bytes_total',
+    'Bytes transferred by the browser while loading web forms, by host.',
+    ['host'])
+
+FORM_SUBMISSION_SECONDS = Histogram(
+    'fractracker_form_submission_seconds',
+    'Seconds taken to submit a web form, by agency.',
+    ['agency'])
+
+EMAIL_SEND_SECONDS = Histogram(
+    'fractracker_email_send_seconds',
+    'Seconds taken to send an email through SendGrid.')
+
+DATASTORE_BYTES = Counter(
+    'fractracker_datastore_bytes_total',
+    'Bytes read from or written to datastores, by datastore (cloud or local) and operation.',
+    ['datastore', 'operation'])
+
+DATASTORE_SECONDS = Histogram(
+    'fractracker_datastore_seconds',
+    'Seconds taken to read from or write to datastores, by datastore and operation.',
+    ['datastore', 'operation'])
@@ -0,0 +1,311 @@
+'''
+photo_staging.py
+
+Stages the photos of reports as local files for web forms to upload.
+Photos are downloaded concurrently and streamed to disk in chunks, to
+a scratch directory in memory (`/dev/shm`) where available, outside
+the source tree. Downloads are capped in size and time, and partial
+downloads are removed as soon as they fail.
+
+Staged photos are named after their URL and kept until the end of the
+run, so that a report submitted to several agencies downloads each of
+its photos once. Each run stages photos to its own directory (see
+`staged_photos`), so that concurrent runs in one instance never
+remove each other's photos. Isolated web workers stage photos to the
+directory of their run, which removes it once the run ends, even if
+it failed.
+'''
+
+import atexit
+import hashlib
+import os
+import requests
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional
+from utilities.config import Config
+from utilities.coordination import SingleFlight
+
+
+# The scratch directory used where available, held in memory
+MEMORY_SCRATCH_DIRECTORY = '/dev/shm'
+
+# The size of the chunks in which photos are written to disk
+CHUNK_SIZE_IN_BYTES = 64 * 1024
+
+
+def scratch_directory() -> str:
+    '''
+    Returns the directory in which photos are staged: `/dev/shm`
+    if it exists and is writable, or the temporary directory.
+    '''
+    if os.path.isdir(MEMORY_SCRATCH_DIRECTORY) and os.access(MEMORY_SCRATCH_DIRECTORY, os.W_OK):
+        return MEMORY_SCRATCH_DIRECTORY
+    return tempfile.gettempdir()
+
+
+class PhotoStage:
+    '''
+    A directory of photos downloaded for upload.
+    '''
+
+    def __init__(
+        self,
+        scratch_dir: str=None,
+        directory: str=None,
+        max_size_in_mb: float=10,
+        max_workers: int=4,
+        timeout_in_sec: float=30) -> None:
+        '''
+        The constructor for `PhotoStage`.
+
+        Parameters:
+            scratch_dir (str): The directory in which the stage
+                creates its own. Defaults to `scratch_directory()`.
+
+            directory (str): A directory created by another stage
+                (e.g., that of the app, in a web worker), which
+                remains responsible for removing it. Defaults to
+                None, in which case the stage creates its own
+                directory on first use and removes it when cleared.
+
+            max_size_in_mb (float): The size above which a
+                photo is not downloaded.
+
+            max_workers (int): The number of photos
+                downloaded concurrently.
+
+            timeout_in_sec (float): The timeout of each connection
+                to, and each read from, the photo's server.
+
+        Returns:
+            None
+        '''
+        self._scratch_dir = scratch_dir
+        self._directory = directory
+        self._owns_directory = directory is None
+        self._lock = threading.Lock()
+        self._downloads = SingleFlight()
+        self.max_bytes = int(max_size_in_mb * 1024 * 1024)
+        self.max_workers = max_workers
+        self.timeout_in_sec = timeout_in_sec
+
+
+    @property
+    def directory(self) -> str:
+        '''
+        The directory of the staged photos, created on first use.
+        '''
+        with self._lock:
+            if self._directory is None:
+                scratch_dir = self._scratch_dir or scratch_directory()
+                os.makedirs(scratch_dir, exist_ok=True)
+                self._directory = tempfile.mkdtemp(prefix='fractracker_photos_', dir=scratch_dir)
+            return self._directory
+
+
+    def path(self, url: str) -> str:
+        '''
+        The path at which the photo from a URL is staged.
+        '''
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{name}.jpg")
+
+
+    def stage(self, urls: List[str]) -> List[str]:
+        '''
+        Downloads the photos not already staged, concurrently.
+
+        Parameters:
+            urls (list of str): The photo URLs.
+
+        Returns:
+            (list of str): The absolute paths of the staged photos,
+                in the order of their URLs.
+        '''
+        paths = [self.path(url) for url in urls]
+        missing = list(dict.fromkeys(u for u, p in zip(urls, paths) if not os.path.exists(p)))
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                # Concurrent requests for the same photo share one download
+                download = lambda url: self._downloads.do(url, lambda: self._download(url))
+                list(executor.map(download, missing))
+        return paths
+
+
+    def _download(self, url: str) -> str:
+        '''
+        Streams a photo to a partial file, which replaces the
+        staged photo once complete and is removed otherwise.
+        '''
+        path = self.path(url)
+        if os.path.exists(path):
+            return path
+
+        partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with requests.get(url, stream=True, timeout=self.timeout_in_sec) as response:
+                if not response.ok:
+                    raise Exception("Failed to retrieve FrackTracker "
+                        f"photo from '{url}'.")
+                size = int(response.headers.get('Content-Length') or 0)
+                if size > self.max_bytes:
+                    raise Exception(f"Photo '{url}' exceeds {self.max_bytes} bytes.")
+
+                size = 0
+                with open(partial_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE_IN_BYTES):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise Exception(f"Photo '{url}' exceeds {self.max_bytes} bytes.")
+                        f.write(chunk)
+            os.replace(partial_path, path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        return path
+
+
+    def clear(self) -> None:
+        '''
+        Removes the staged photos, along with the directory
+        if created by the stage.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        '''
+        with self._lock:
+            if self._directory is None or not self._owns_directory:
+                return
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+# The stage of the run in progress, bound to the threads submitting its reports
+_run_stage: ContextVar[Optional[PhotoStage]] = ContextVar('photo_stage', default=None)
+
+# The stage used outside of runs (e.g., when submitting a state's mock report)
+_stage: Optional[PhotoStage] = None
+_stage_lock = threading.Lock()
+
+
+def new_photo_stage(directory: str=None) -> PhotoStage:
+    '''
+    Creates a stage from the photo staging settings in the config file.
+
+    Parameters:
+        directory (str): A directory created by another stage.
+            Defaults to None, in which case the stage creates its own.
+
+    Returns:
+        (PhotoStage): The stage.
+    '''
+    config = Config()
+    return PhotoStage(
+        scratch_dir=config.photo_staging_scratch_directory,
+        directory=directory,
+        max_size_in_mb=config.photo_staging_max_size_in_mb,
+        max_workers=config.photo_staging_max_workers,
+        timeout_in_sec=config.photo_staging_timeout_in_sec)
+
+
+def get_photo_stage() -> PhotoStage:
+    '''
+    Retrieves the stage of the run in progress in the current
+    thread or, outside of runs, the process's own stage,
+    created on first use.
+
+    Parameters:
+        None
+
+    Returns:
+        (PhotoStage): The stage.
+    '''
+    stage = _run_stage.get()
+    if stage is not None:
+        return stage
+
+    global _stage
+    with _stage_lock:
+        if _stage is None:
+            _stage = new_photo_stage()
+            # Remove staged photos once the process exits
+            atexit.register(_stage.clear)
+        return _stage
+
+
+@contextmanager
+def staged_photos() -> Iterator[PhotoStage]:
+    '''
+    Stages the photos uploaded within a `with` block (e.g., a run)
+    to a new directory, removed once the block ends. Threads
+    started within the block use the stage only if their work
+    is wrapped with `bind_photo_stage`.
+
+    Parameters:
+        None
+
+    Returns:
+        (PhotoStage): The stage.
+    '''
+    stage = new_photo_stage()
+    token = _run_stage.set(stage)
+    # Remove staged photos should the app exit mid-run
+    atexit.register(stage.clear)
+    try:
+        yield stage
+    finally:
+        _run_stage.reset(token)
+        stage.clear()
+        atexit.unregister(stage.clear)
+
+
+def bind_photo_stage(fun: Callable, stage: PhotoStage=None) -> Callable:
+    '''
+    Wraps a function so that it stages photos with the given stage,
+    in whichever thread it is called (e.g., by an executor, whose
+    threads do not inherit the context of the thread submitting work).
+
+    Parameters:
+        fun (function): The function.
+
+        stage (PhotoStage): The stage. Defaults
+            to that of the current thread.
+
+    Returns:
+        (function): The wrapped function.
+    '''
+    stage = stage or get_photo_stage()
+
+    def bound(*args, **kwargs):
+        token = _run_stage.set(stage)
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            _run_stage.reset(token)
+    return bound
+
+
+def use_photo_stage(directory: str) -> None:
+    '''
+    Stages photos to a directory created by another process, such
+    as the app starting a web worker, which will remove it.
+
+    Parameters:
+        directory (str): The directory.
+
+    Returns:
+        None
+    '''
+    global _stage
+    with _stage_lock:
+        _stage = new_photo_stage(directory)
@@ -0,0 +1,202 @@
+'''
+profiling.py
+
+Profiles submission runs on demand, to find hot spots in production-like
+runs (e.g., parsing API reports, handling metadata with pandas or
+orchestrating browsers). Two modes are offered:
+
+- `deterministic` profiles every function call of the app's process
+  with cProfile, in every thread started during the run (e.g., those
+  submitting reports concurrently), and writes the merged call graph
+  as a pstats file.
+
+- `sampling` records the stacks of every thread at a fixed interval,
+  which slows the run far less, and writes them as collapsed stacks,
+  one line per stack with the number of samples, as read by flame
+  graph tools (e.g., `flamegraph.pl` or speedscope).
+
+Collapsed stacks are written in both modes. Web forms submitted in
+isolated worker processes are not profiled beyond the wait on them.
+'''
+
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from utilities.logger import logger
+from utilities.storage import IDatastore
+
+
+DETERMINISTIC = 'deterministic'
+SAMPLING = 'sampling'
+PROFILING_MODES = [DETERMINISTIC, SAMPLING]
+
+
+def frame_label(frame) -> str:
+    '''
+    Labels a stack frame by function, file and line of definition.
+    '''
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RunProfiler:
+    '''
+    Profiles every thread of the process while started.
+    '''
+
+    def __init__(self, mode: str=SAMPLING, interval_in_sec: float=0.005) -> None:
+        '''
+        The constructor for `RunProfiler`.
+
+        Parameters:
+            mode (str): Either `DETERMINISTIC` or `SAMPLING`.
+
+            interval_in_sec (float): The interval at
+                which the stacks of threads are sampled.
+
+        Returns:
+            None
+        '''
+        if mode not in PROFILING_MODES:
+            raise Exception(f"Unknown profiling mode '{mode}'. "
+                f"Expected one of {PROFILING_MODES}.")
+        self.mode = mode
+        self.interval_in_sec = interval_in_sec
+        self.samples = Counter()
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+
+    def start(self) -> None:
+        '''
+        Starts profiling the current thread and those started
+        afterwards, and sampling the stacks of all threads.
+        '''
+        if self.mode == DETERMINISTIC:
+            # Called once in each new thread, before it runs
+            threading.setprofile(self._profile_thread)
+            self._profile_thread()
+        self._sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+        self._sampler.start()
+
+
+    def stop(self) -> None:
+        '''
+        Stops profiling. Threads started during the run
+        should have ended, as in a completed run.
+        '''
+        self._stopped.set()
+        if self._sampler:
+            self._sampler.join()
+        if self.mode == DETERMINISTIC:
+            threading.setprofile(None)
+            for profile in self._profiles:
+                profile.disable()
+
+
+    def _profile_thread(self, *args) -> None:
+        '''
+        Enables a profiler for the current thread.
+        '''
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+
+    def _sample(self) -> None:
+        '''
+        Counts the stacks of all other threads at every interval.
+        '''
+        names = {}
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_in_sec):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+    def collapsed_stacks(self) -> str:
+        '''
+        The sampled stacks, one per line, followed by their count.
+        '''
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+    def pstats_data(self) -> Optional[bytes]:
+        '''
+        The call graph merged across threads, in the format written by
+        `pstats.Stats.dump_stats`, or None if not profiled deterministically.
+        '''
+        if not self._profiles:
+            return None
+        stats = pstats.Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+        return marshal.dumps(stats.stats)
+
+
+@contextmanager
+def profiled(
+    mode: Optional[str],
+    datastore: IDatastore,
+    name: str,
+    interval_in_sec: float=0.005) -> Iterator[Optional[RunProfiler]]:
+    '''
+    Profiles a `with` block, if a mode is given, then writes the profile
+    alongside a datastore (e.g., next to the metadata), even if the
+    block raised an exception. Failing to write the profile is logged
+    rather than failing the run.
+
+    Parameters:
+        mode (str): Either `DETERMINISTIC`, `SAMPLING` or
+            None, in which case nothing is profiled.
+
+        datastore (IDatastore): The datastore alongside
+            which the profile is written.
+
+        name (str): The name of the profile (e.g., 'profile_20210301T000000').
+            Files are named after it, as `<name>.pstats` and `<name>.collapsed`.
+
+        interval_in_sec (float): The interval at
+            which the stacks of threads are sampled.
+
+    Returns:
+        (RunProfiler): The profiler, if any.
+    '''
+    if not mode:
+        yield None
+        return
+
+    profiler = RunProfiler(mode, interval_in_sec)
+    logger.info(f"Profiling run as '{name}' ({mode}).")
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        try:
+            data = profiler.pstats_data()
+            if data is not None:
+                datastore.write_artifact(f"{name}.pstats", data)
+            datastore.write_artifact(f"{name}.collapsed",
+                profiler.collapsed_stacks().encode('utf-8'))
+        except Exception as e:
+            logger.error(f"Failed to save profile '{name}'. {e}")
@@ -22,6 +22,7 @@ from sendgrid.helpers.mail import (
 )
 from email_validator import validate_email, EmailNotValidError
 from python_http_client.exceptions import HTTPError
+from utilities import metrics
 from utilities.logger import logger
 
 
@@ -37,7 +38,8 @@ class SendGridEmail:
         from_email: str,
         to_email: str,
         subject: str,
-        cc_email: str=None) -> None:
+        cc_email: str=None,
+        html_body: str=None) -> None:
         '''
         The public constructor.
 
@@ -54,11 +56,15 @@ class SendGridEmail:
 
             subject (str): The email subject line.
 
+            html_body (str): An optional HTML version of the message
+                body, sent alongside the plain-text version.
+
         Returns:
             None
         '''
         self.key = key
         self.message_body= message_body
+        self.html_body = html_body
         self.from_email = self._validate_email_address(from_email)
         self.to_email = self._validate_email_address(to_email)
         self.cc_email = self._validate_email_address(cc_email) if cc_email else None
@@ -159,7 +165,8 @@ class SendGridEmail:
             self.from_email,
             self.to_email,
             self.subject,
-            self.message_body)
+            self.message_body,
+            html_content=self.html_body)
 
         message.attachment = self.attachments
 
@@ -169,7 +176,8 @@ class SendGridEmail:
         # Send email
         try:
             sg = SendGridAPIClient(self.key)
-            response = sg.send(message)
+            with metrics.EMAIL_SEND_SECONDS.time():
+                response = sg.send(message)
             logger.info(f"Email submitted with response code: {response.status_code}")
 
         except HTTPError as e:
@@ -1,10 +1,27 @@
 from abc import ABC, abstractmethod
 import os
-from google.cloud import storage
+import uuid
+from contextlib import contextmanager
 from io import StringIO
-import pandas as pd
+from utilities import metrics
 from utilities.logger import logger
 
+try:
+    import fcntl
+except ImportError:
+    # File locks are unavailable on Windows
+    fcntl = None
+
+# pandas and the Google Cloud client library are imported on first
+# use, since importing them dominates the start-up time of the app
+
+
+class WriteConflict(Exception):
+    '''
+    Raised when a conditional write finds that the data was
+    changed since the version it was conditioned on was read
+    '''
+
 class IDatastore(ABC):
     '''
     Interface for Datastore class
@@ -26,43 +43,164 @@ class IDatastore(ABC):
         raise NotImplementedError
 
 
+    def read_versioned_data(self):
+        '''
+        Read data along with its version, to condition a later write on
+        '''
+        raise NotImplementedError
+
+
+    def write_data_if(self, df, version):
+        '''
+        Write data only if it is still at the version given, raising
+        `WriteConflict` otherwise
+        '''
+        raise NotImplementedError
+
+
+    def sibling(self, suffix):
+        '''
+        A datastore of the same kind stored alongside this one,
+        named after it with a suffix
+        '''
+        raise NotImplementedError
+
+
+    def write_artifact(self, name, data):
+        '''
+        Write a file of bytes (e.g., a profile) alongside the data,
+        named after it and the name given
+        '''
+        raise NotImplementedError
+
+
 class CloudDatastore(IDatastore):
     '''
     Class for working with data on cloud
     '''
     def __init__(self, bucket_name:str, cloud_blob_name:str):
         '''
-        Constructor for cloud datastore
+        Constructor for cloud datastore. The storage client
+        is created when data is first read or written.
+        '''
+        self._bucket_name = bucket_name
+        self._cloud_blob_name = cloud_blob_name
+        self._bucket_ref = None
+        self._blob_ref = None
+
+    @property
+    def _bucket(self):
+        '''
+        The cloud bucket, created on first use
+        '''
+        if self._bucket_ref is None:
+            from google.cloud import storage
+            storage_client = storage.Client()
+            self._bucket_ref = storage_client.bucket(self._bucket_name)
+        return self._bucket_ref
+
+    @property
+    def _blob(self):
+        '''
+        The cloud blob, created on first use
+        '''
+        if self._blob_ref is None:
+            self._blob_ref = self._bucket.blob(self._cloud_blob_name)
+        return self._blob_ref
+
+    def sibling(self, suffix):
+        '''
+        A blob in the same bucket, named after this one with a suffix
         '''
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        self._blob = bucket.blob(cloud_blob_name)   
+        return CloudDatastore(self._bucket_name, f"{self._cloud_blob_name}_{suffix}")
+
+    def write_artifact(self, name, data):
+        '''
+        Write a blob of bytes to the same bucket, named after this one
+        '''
+        blob_name = f"{self._cloud_blob_name}_{name}"
+        with metrics.DATASTORE_SECONDS.time(datastore='cloud', operation='write'):
+            self._bucket.blob(blob_name).upload_from_string(
+                data, content_type='application/octet-stream')
+        metrics.DATASTORE_BYTES.inc(len(data), datastore='cloud', operation='write')
+        logger.info(f'Saved {blob_name} to Google Cloud.')
 
     def write_data(self, df):
         '''
         Write data to cloud
         '''
-        # Write records
-        csv_str = df.to_csv(header=True, encoding='utf-8', index=False)
+        with metrics.DATASTORE_SECONDS.time(datastore='cloud', operation='write'):
+            # Write records
+            csv_str = df.to_csv(header=True, encoding='utf-8', index=False)
 
-        # Upload data
-        self._blob.upload_from_string(csv_str, content_type='text/csv')
+            # Upload data
+            self._blob.upload_from_string(csv_str, content_type='text/csv')
+        metrics.DATASTORE_BYTES.inc(len(csv_str.encode('utf-8')),
+            datastore='cloud', operation='write')
         logger.info(f'Saved metadata to Google Cloud.')
 
     def read_data(self):
         '''
         Read data from Cloud
         '''
+        import pandas as pd
+
         # if blob exists, read data from blob into df
         # else return blank dataframe
-        if self._blob.exists():
-            bytes_file = self.blob.download_as_bytes(timeout=(3, 60))
-            # Parse downloaded bytes into in-memory text stream 
-            s = str(bytes_file, encoding='utf-8')
-            df = pd.read_csv(StringIO(s))
-            return df
-        else:
-            return pd.Dataframe()
+        with metrics.DATASTORE_SECONDS.time(datastore='cloud', operation='read'):
+            if self._blob.exists():
+                bytes_file = self._blob.download_as_bytes(timeout=(3, 60))
+                metrics.DATASTORE_BYTES.inc(len(bytes_file), datastore='cloud', operation='read')
+                # Parse downloaded bytes into in-memory text stream 
+                s = str(bytes_file, encoding='utf-8')
+                df = pd.read_csv(StringIO(s))
+                return df
+            else:
+                return pd.DataFrame()
+
+    def read_versioned_data(self, attempts=5):
+        '''
+        Read data from Cloud along with the generation of its blob,
+        which is 0 if the blob does not exist yet
+        '''
+        import pandas as pd
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+
+        with metrics.DATASTORE_SECONDS.time(datastore='cloud', operation='read'):
+            for _ in range(attempts):
+                blob = self._bucket.get_blob(self._cloud_blob_name)
+                if blob is None:
+                    return pd.DataFrame(), 0
+                try:
+                    # Download the generation just looked up, rather
+                    # than one written since
+                    bytes_file = blob.download_as_bytes(
+                        if_generation_match=blob.generation, timeout=(3, 60))
+                except (NotFound, PreconditionFailed):
+                    continue
+                metrics.DATASTORE_BYTES.inc(len(bytes_file), datastore='cloud', operation='read')
+                s = str(bytes_file, encoding='utf-8')
+                return pd.read_csv(StringIO(s)), blob.generation
+        raise Exception(f"Blob {self._cloud_blob_name} kept changing while being read.")
+
+    def write_data_if(self, df, version):
+        '''
+        Write data to cloud if its blob is still at the generation given,
+        using a generation-match precondition
+        '''
+        from google.api_core.exceptions import PreconditionFailed
+
+        with metrics.DATASTORE_SECONDS.time(datastore='cloud', operation='write'):
+            csv_str = df.to_csv(header=True, encoding='utf-8', index=False)
+            try:
+                self._blob.upload_from_string(csv_str, content_type='text/csv',
+                    if_generation_match=version)
+            except PreconditionFailed:
+                raise WriteConflict(f"Blob {self._cloud_blob_name} was "
+                    f"changed since generation {version}.")
+        metrics.DATASTORE_BYTES.inc(len(csv_str.encode('utf-8')),
+            datastore='cloud', operation='write')
+        logger.info(f'Saved metadata to Google Cloud.')
 
 
 class LocalDatastore(IDatastore):
@@ -75,21 +213,102 @@ class LocalDatastore(IDatastore):
         '''
         self._filepath = filepath
 
+    def sibling(self, suffix):
+        '''
+        A CSV in the same directory, named after this one with a suffix
+        '''
+        root, extension = os.path.splitext(self._filepath)
+        return LocalDatastore(f"{root}_{suffix}{extension}")
+
+    def write_artifact(self, name, data):
+        '''
+        Write a file of bytes to the same directory, named after the CSV
+        '''
+        root, _ = os.path.splitext(self._filepath)
+        filepath = f"{root}_{name}"
+        with metrics.DATASTORE_SECONDS.time(datastore='local', operation='write'):
+            with open(filepath, 'wb') as f:
+                f.write(data)
+        metrics.DATASTORE_BYTES.inc(len(data), datastore='local', operation='write')
+        logger.info(f'Saved {filepath} locally.')
+
     def write_data(self, df):
         '''
         Write data to local CSV
         '''
-        df.to_csv(self._filepath, index=False)
+        with metrics.DATASTORE_SECONDS.time(datastore='local', operation='write'):
+            df.to_csv(self._filepath, index=False)
+        metrics.DATASTORE_BYTES.inc(os.path.getsize(self._filepath),
+            datastore='local', operation='write')
         logger.info(f'Saved metadata locally.')
 
     def read_data(self):
         '''
         Read data from CSV
         '''
+        import pandas as pd
+
         # # if CSV exists, read in metadata CSV
         # else, return blank dataframe
         if os.path.exists(self._filepath):
-            return pd.read_csv(self._filepath)
+            with metrics.DATASTORE_SECONDS.time(datastore='local', operation='read'):
+                df = pd.read_csv(self._filepath)
+            metrics.DATASTORE_BYTES.inc(os.path.getsize(self._filepath),
+                datastore='local', operation='read')
+            return df
         else:
             return pd.DataFrame()
 
+    @contextmanager
+    def _locked(self):
+        '''
+        Holds an exclusive lock on a lock file next to the CSV,
+        so that versions are checked and written atomically
+        across processes
+        '''
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self._filepath}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _version(self):
+        '''
+        The version of the CSV, which is None if it does not exist yet.
+        Writes replace the file, so its inode changes with every write.
+        '''
+        try:
+            stat = os.stat(self._filepath)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def read_versioned_data(self):
+        '''
+        Read data from CSV along with its version
+        '''
+        with self._locked():
+            return self.read_data(), self._version()
+
+    def write_data_if(self, df, version):
+        '''
+        Write data to local CSV if it is still at the version given
+        '''
+        with self._locked():
+            current = self._version()
+            if current != version:
+                raise WriteConflict(f"{self._filepath} was changed since "
+                    f"version {version}.")
+            with metrics.DATASTORE_SECONDS.time(datastore='local', operation='write'):
+                # Write to a temporary file first, so that the CSV is
+                # replaced as a whole and gets a new version
+                tmp_filepath = f"{self._filepath}.{uuid.uuid4().hex}.tmp"
+                df.to_csv(tmp_filepath, index=False)
+                os.replace(tmp_filepath, self._filepath)
+        metrics.DATASTORE_BYTES.inc(os.path.getsize(self._filepath),
+            datastore='local', operation='write')
+        logger.info(f'Saved metadata locally.')
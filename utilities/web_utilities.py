@@ -5,33 +5,125 @@ Common utilities used for accessing state websites.
 '''
 
 import os
-import requests
-import shutil
 import time
-import uuid
-from constants import ROOT_DIRECTORY, SCREENSHOT_DIRECTORY
+from contextlib import contextmanager
+from constants import SCREENSHOT_DIRECTORY
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.common.exceptions import NoSuchElementException
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List
+from urllib.parse import urlparse
+from utilities import metrics
+from utilities.config import Config
+from utilities.photo_staging import get_photo_stage
+
+
+# URL patterns of resources that forms can be completed without:
+# fonts, media, and analytics and advertising trackers
+DEFAULT_BLOCKED_URL_PATTERNS = (
+    '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+    '*.mp4*', '*.webm*', '*.mp3*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*connect.facebook.net*', '*hotjar.com*', '*nr-data.net*')
+
+# Sums the bytes transferred for the page and its resources so far
+TRANSFER_SIZE_SCRIPT = '''
+return performance.getEntriesByType('navigation')
+    .concat(performance.getEntriesByType('resource'))
+    .reduce((total, entry) => total + (entry.transferSize || 0), 0);
+'''
+
+
+class BrowserProfile:
+    '''
+    The resources a browser loads for a state's web form. Images are
+    not loaded, URLs matching blocked patterns are blocked through the
+    DevTools protocol and, if allowed hosts are given, the names of
+    all other hosts (e.g., of analytics or map tiles) fail to resolve.
+    The host of the form itself is always allowed. State modules opt
+    in by declaring their own profile as `BROWSER_PROFILE`, once their
+    form has been checked to complete without the blocked resources.
+    '''
+
+    def __init__(
+        self,
+        allowed_hosts: Iterable[str]=None,
+        blocked_url_patterns: Iterable[str]=DEFAULT_BLOCKED_URL_PATTERNS,
+        block_images: bool=True) -> None:
+        '''
+        The constructor for `BrowserProfile`.
+
+        Parameters:
+            allowed_hosts (iterable of str): The hosts the form loads
+                resources from, which may start with a wildcard (e.g.,
+                '*.arcgis.com'). Defaults to None, in which case
+                all hosts are allowed.
+
+            blocked_url_patterns (iterable of str): The URLs blocked,
+                with '*' as a wildcard. Defaults to fonts, media
+                and trackers.
+
+            block_images (bool): Whether images are not loaded.
+                Defaults to True.
+
+        Returns:
+            None
+        '''
+        self.allowed_hosts = tuple(allowed_hosts) if allowed_hosts is not None else None
+        self.blocked_url_patterns = tuple(blocked_url_patterns)
+        self.block_images = block_images
+
+
+    def apply_options(self, options: webdriver.ChromeOptions, url: str) -> None:
+        '''
+        Sets the Chrome preferences and switches of the profile.
+        '''
+        if self.block_images:
+            options.add_experimental_option('prefs',
+                {'profile.managed_default_content_settings.images': 2})
+        if self.allowed_hosts is not None:
+            # Chromedriver reaches the browser through the loopback interface
+            hosts = ('localhost', '127.0.0.1', urlparse(url).hostname) + self.allowed_hosts
+            rules = ', '.join(['MAP * ~NOTFOUND'] + [f'EXCLUDE {h}' for h in dict.fromkeys(hosts)])
+            options.add_argument(f'--host-resolver-rules={rules}')
+
+
+    def apply_network(self, browser: WebDriver) -> None:
+        '''
+        Blocks the URLs matching the profile's patterns
+        in a launched browser, before any page is loaded.
+        '''
+        if self.blocked_url_patterns:
+            browser.execute_cdp_cmd('Network.enable', {})
+            browser.execute_cdp_cmd('Network.setBlockedURLs',
+                {'urls': list(self.blocked_url_patterns)})
+
+
+# The profile of forms whose state module does not declare one,
+# which loads every resource
+DEFAULT_PROFILE = BrowserProfile(blocked_url_patterns=(), block_images=False)
 
 
 def launch_chrome_browser(
     url: str,
     check_string,
     page_load_wait_in_sec=10,
-    avoid_detection=False) -> WebDriver:
+    avoid_detection=False,
+    profile: BrowserProfile=None) -> WebDriver:
     '''
     Launches webdriver for a given url.
 
     Input: 
      - url (string)
      - check_string (string) check to ensure we went to the correct webpage
+     - profile (BrowserProfile) the resources to block, unless disabled
+       in the config file. Defaults to `DEFAULT_PROFILE`.
 
     Returns: selenium webdriver instance
     '''
@@ -41,6 +133,14 @@ def launch_chrome_browser(
     chromeOptions.add_argument("--headless")
     chromeOptions.add_argument("--disable-dev-shm-usage") 
     chromeOptions.add_argument("--hide-scrollbars")
+
+    # Skip resources not needed to complete the form
+    if not Config().web_form_resource_blocking:
+        profile = None
+    elif profile is None:
+        profile = DEFAULT_PROFILE
+    if profile:
+        profile.apply_options(chromeOptions, url)
     
     # Add additional options and run script if should avoid Selenium detection
     if avoid_detection:
@@ -48,21 +148,95 @@ def launch_chrome_browser(
         chromeOptions.add_experimental_option("excludeSwitches", ["enable-automation"])
         chromeOptions.add_experimental_option('useAutomationExtension', False)
 
-        browser = webdriver.Chrome(options=chromeOptions)
+        with metrics.BROWSER_LAUNCH_SECONDS.time():
+            browser = webdriver.Chrome(options=chromeOptions)
         browser.execute_cdp_cmd('Network.setUserAgentOverride', {"userAgent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.53 Safari/537.36'})
         browser.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     else:
-        browser = webdriver.Chrome(options=chromeOptions)
+        with metrics.BROWSER_LAUNCH_SECONDS.time():
+            browser = webdriver.Chrome(options=chromeOptions)
     
-    # Navigate to page and confirm it's correct
-    browser.get(url)
-    time.sleep(page_load_wait_in_sec)
-    assert check_string in browser.title
+    # Navigate to page and confirm it's correct, quitting
+    # the browser rather than leaking it if not
+    host = urlparse(url).hostname or ''
+    try:
+        if profile:
+            profile.apply_network(browser)
+        with metrics.BROWSER_PAGE_LOAD_SECONDS.time(host=host):
+            browser.get(url)
+        time.sleep(page_load_wait_in_sec)
+        assert check_string in browser.title
+    except BaseException:
+        quit_browser(browser)
+        raise
+
+    # Record the bytes transferred to load the form, where the
+    # browser exposes resource timings
+    try:
+        metrics.BROWSER_TRANSFER_BYTES.inc(
+            browser.execute_script(TRANSFER_SIZE_SCRIPT) or 0, host=host)
+    except Exception:
+        pass
 
     # Wait one second for page to load
     return browser
 
 
+def quit_browser(browser: WebDriver) -> None:
+    '''
+    Quits a browser, killing its driver process if the
+    browser does not respond (e.g., after a crash).
+
+    Parameters:
+        browser (WebDriver): The browser.
+
+    Returns:
+        None
+    '''
+    try:
+        browser.quit()
+    except Exception:
+        process = getattr(getattr(browser, 'service', None), 'process', None)
+        if process:
+            process.kill()
+
+
+@contextmanager
+def chrome_browser(
+    url: str,
+    check_string: str,
+    page_load_wait_in_sec: float=10,
+    avoid_detection: bool=False,
+    profile: BrowserProfile=None) -> Iterator[WebDriver]:
+    '''
+    Launches a browser as in `launch_chrome_browser` and quits it on
+    exit, including when the submission raises an exception.
+
+    Parameters:
+        url (str): The URL of the web form.
+
+        check_string (str): Text expected in the page title.
+
+        page_load_wait_in_sec (float): The number of seconds
+            to wait for the page to load. Defaults to 10.
+
+        avoid_detection (bool): Whether to hide that the
+            browser is automated. Defaults to False.
+
+        profile (BrowserProfile): The resources to block.
+            Defaults to `DEFAULT_PROFILE`.
+
+    Returns:
+        (Iterator[WebDriver]): The browser.
+    '''
+    browser = launch_chrome_browser(url, check_string, page_load_wait_in_sec,
+        avoid_detection, profile)
+    try:
+        yield browser
+    finally:
+        quit_browser(browser)
+
+
 def take_screenshot(browser: WebDriver, filename: str) -> None:
     '''
     Take a screenshot of current browser state.
@@ -82,6 +256,118 @@ def take_screenshot(browser: WebDriver, filename: str) -> None:
     browser.save_screenshot(f"{SCREENSHOT_DIRECTORY}/{filename}")
 
 
+# Sets the value of each form field in one round trip. Text inputs are
+# set through the native value setter so that frameworks observing the
+# element see the change, selects match an option by value or visible
+# text and checkboxes and radio buttons are clicked. Returns the keys
+# of fields that could not be set, such as fields not yet rendered.
+FILL_FORM_SCRIPT = '''
+const [fields, method] = arguments;
+const find = (key) => {
+    switch (method) {
+        case 'id': return [document.getElementById(key)];
+        case 'name': return Array.from(document.getElementsByName(key));
+        case 'xpath': return [document.evaluate(key, document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue];
+        default: return [document.querySelector(key)];
+    }
+};
+const fire = (el, ...types) => types.forEach(
+    t => el.dispatchEvent(new Event(t, {bubbles: true})));
+const unfilled = [];
+for (const [key, value] of fields) {
+    const matches = find(key).filter(el => el);
+    let el = matches[0];
+    if (!el || el.disabled) { unfilled.push(key); continue; }
+    const type = (el.type || '').toLowerCase();
+    if (type === 'radio' || type === 'checkbox') {
+        if (typeof value === 'string') {
+            el = matches.find(m => m.value === value);
+            if (!el) { unfilled.push(key); continue; }
+        }
+        if (el.checked !== (value !== false)) el.click();
+    } else if (el.tagName === 'SELECT') {
+        const option = Array.from(el.options).find(o => o.value === value)
+            || Array.from(el.options).find(o => o.text.trim() === value);
+        if (!option) { unfilled.push(key); continue; }
+        option.selected = true;
+        fire(el, 'input', 'change');
+    } else if (el.tagName === 'INPUT' || el.tagName === 'TEXTAREA') {
+        const proto = el.tagName === 'INPUT' ? HTMLInputElement : HTMLTextAreaElement;
+        Object.getOwnPropertyDescriptor(proto.prototype, 'value').set.call(el, value);
+        fire(el, 'input', 'change', 'blur');
+    } else {
+        unfilled.push(key);
+    }
+}
+return unfilled;
+'''
+
+
+def fill_form(
+    browser: WebDriver,
+    fields: Dict,
+    find_by_method: str=By.ID,
+    fallback_wait_in_sec: int=10) -> None:
+    '''
+    Completes a form's text fields, dropdowns, checkboxes and radio
+    buttons with a single script execution, dispatching the input and
+    change events the page would receive from a user. Fields the script
+    cannot set (e.g., fields rendered late or widgets that are not form
+    controls) are completed one at a time through WebDriver instead.
+
+    Parameters:
+        browser (WebDriver): A browser currently on
+            the webpage of interest.
+
+        fields (dict): The values keyed by their element's id, name,
+            xpath or CSS selector, in the order they should be set.
+            Text fields and dropdowns take a string, with dropdown
+            options matched by value or visible text. Checkboxes
+            and radio buttons take True to be checked or, for radio
+            buttons found by name, the value of the choice.
+
+        find_by_method (str): The method used to find the elements
+            (e.g., `By.NAME`). Defaults to `By.ID`.
+
+        fallback_wait_in_sec (int): The number of seconds to wait for
+            each field completed through WebDriver to be clickable.
+
+    Returns:
+        None
+    '''
+    fields = {key: val if isinstance(val, bool) else '' if val is None else str(val)
+        for key, val in fields.items()}
+    unfilled = browser.execute_script(
+        FILL_FORM_SCRIPT, list(fields.items()), find_by_method)
+
+    for key in unfilled:
+        val, method, target = fields[key], find_by_method, key
+        if isinstance(val, str) and method == By.NAME:
+            # Radio button choices are found by name and value
+            candidates = browser.find_elements(By.NAME, key)
+            if candidates and candidates[0].get_attribute('type') == 'radio':
+                method, target = By.XPATH, f"//input[@name='{key}' and @value='{val}']"
+                val = True
+
+        elem = WebDriverWait(browser, fallback_wait_in_sec).until(
+            EC.element_to_be_clickable((method, target)))
+        if isinstance(val, bool):
+            if elem.is_selected() != val:
+                elem.click()
+        elif elem.tag_name == 'select':
+            select = Select(elem)
+            try:
+                select.select_by_value(val)
+            except NoSuchElementException:
+                select.select_by_visible_text(val)
+        else:
+            elem.clear()
+            elem.send_keys(val)
+            elem.send_keys(Keys.TAB)
+            time.sleep(0.5)
+
+
 def complete_text_fields_id(text_elements: Dict, browser: WebDriver) -> None:
     '''
     Completes all text fields set up in dictionary by HTML object ID.
@@ -91,12 +377,7 @@ def complete_text_fields_id(text_elements: Dict, browser: WebDriver) -> None:
       and values as (string) inputs, e.g., ("Miami")
     - browser: (selenium webdriver instance)
     '''
-    for id, val in text_elements.items():
-        elem = browser.find_element_by_id(id)
-        elem.clear()
-        elem.send_keys(val)
-        elem.send_keys(Keys.TAB)
-        time.sleep(0.5)
+    fill_form(browser, text_elements, By.ID)
 
 
 def complete_text_fields_name(text_elements: Dict, browser: WebDriver) -> None:
@@ -107,12 +388,7 @@ def complete_text_fields_name(text_elements: Dict, browser: WebDriver) -> None:
       string inputs, e.g., ("Miami")
     - current selenium webdriver instance (browser)
     '''
-    for name, val in text_elements.items():
-        var_ = WebDriverWait(browser, 10).until(
-            EC.element_to_be_clickable((By.NAME, name)))
-        var_.send_keys(val)
-        var_.send_keys(Keys.TAB)
-        time.sleep(0.5)
+    fill_form(browser, text_elements, By.NAME)
 
 
 def upload_photos(
@@ -121,8 +397,9 @@ def upload_photos(
     input_xpath: str,
     upload_wait_in_sec: int=10) -> None:
     '''
-    Downloads images from URLs and then uploads
-    each image to a webpage.
+    Stages images from URLs (see `utilities.photo_staging`)
+    and then uploads each image to a webpage. Staged images
+    are removed at the end of the run.
 
     Parameters:
         browser (WebDriver): A browser currently on
@@ -134,31 +411,13 @@ def upload_photos(
             input element on the webpage.
 
         upload_wait_in_sec (int): The number of seconds
-            to wait for the upload to complete before
-            removing the downloaded images from the local
-            file system. Defaults to 10.
+            to wait for the upload to complete. Defaults to 10.
 
     Returns:
         None
     '''
-    # Create temp directory on file system
-    unique_id = uuid.uuid4().hex
-    photo_dir = f"{ROOT_DIRECTORY}/submissions/{unique_id}"
-    os.makedirs(photo_dir, exist_ok=True)
-
-    # Retrieve photos and write to temp directory as JPGs
-    photo_paths = []
-    for i in range(len(image_urls)):
-        url = image_urls[i]
-        response = requests.get(url)
-        if not response.ok:
-            raise Exception("Failed to retrieve FrackTracker "
-                f"photo from '{url}'.")
-
-        temp_file_name = f"{photo_dir}/photo_{i+1}.jpg"
-        with open(temp_file_name, "wb") as f:
-            f.write(response.content)
-            photo_paths.append(os.path.abspath(temp_file_name))
+    # Retrieve photos, reusing those staged for another agency
+    photo_paths = get_photo_stage().stage(image_urls)
 
     # Join photo file paths into one string and submit through input element
     # NOTE: Multiple files can be sent in one command
@@ -167,9 +426,8 @@ def upload_photos(
         .until(EC.presence_of_element_located((By.XPATH, input_xpath))))
     photo_input_elem.send_keys(photo_keys)
 
-    # Wait for upload to complete and then remove temp directory
+    # Wait for upload to complete
     time.sleep(upload_wait_in_sec)
-    shutil.rmtree(photo_dir)
 
 
 def submit_web_form(
@@ -0,0 +1,225 @@
+'''
+web_workers.py
+
+Runs web form submissions in worker processes isolated from the
+application, so that a hung or leaked Chrome cannot grow the memory
+of the Flask/gunicorn process. Each submission runs in a freshly
+spawned process that leads its own process group, so that the
+browser and driver it launches can be killed along with it. Workers
+are limited in CPU time and resident memory, given a timeout, and
+always killed, along with their browsers, once their submission ends.
+
+Isolation is enabled with the config file's `web_workers` section.
+'''
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Callable, Optional, Tuple
+from models.base_report import Report, ReportError
+from utilities import metrics
+from utilities.config import Config
+from utilities.logger import log_context
+from utilities.photo_staging import get_photo_stage, use_photo_stage
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+# The interval at which running workers are checked
+POLL_INTERVAL_IN_SEC = 0.5
+
+PAGE_SIZE_IN_BYTES = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+_context = multiprocessing.get_context('spawn')
+_slots: Optional[threading.BoundedSemaphore] = None
+_slots_lock = threading.Lock()
+
+
+def _get_slots() -> threading.BoundedSemaphore:
+    '''
+    Returns the semaphore limiting the number of
+    concurrent workers, creating it on first use.
+    '''
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(Config().web_worker_max_processes)
+        return _slots
+
+
+def _work(
+    conn: Connection,
+    submit_fun: Callable[[Report], None],
+    report: Report,
+    cpu_limit_in_sec: Optional[int],
+    photo_dir: str) -> None:
+    '''
+    Submits a report within a worker process, sending back
+    None on success or the reason the submission failed and
+    whether it was caused by the report (see `ReportError`),
+    along with the metrics recorded by the worker. Photos
+    are staged to the directory of the run, which removes
+    them even if the worker is killed.
+    '''
+    os.setsid()
+    if resource and cpu_limit_in_sec:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit_in_sec, cpu_limit_in_sec))
+    use_photo_stage(photo_dir)
+    try:
+        with log_context(report_id=report.id, state=report.location.state, stage='submission'):
+            submit_fun(report)
+        conn.send((None, metrics.REGISTRY.dump()))
+    except BaseException as e:
+        error = (str(e) or type(e).__name__, isinstance(e, ReportError))
+        conn.send((error, metrics.REGISTRY.dump()))
+    finally:
+        conn.close()
+
+
+def process_group_rss_in_mb(pgid: int) -> float:
+    '''
+    Sums the resident memory of every process in a process group
+    (e.g., a worker along with its driver and browser processes).
+    Returns zero where `/proc` is not available.
+
+    Parameters:
+        pgid (int): The process group id.
+
+    Returns:
+        (float): The resident memory, in megabytes.
+    '''
+    if not os.path.isdir('/proc'):
+        return 0.0
+
+    pages = 0
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                # Fields following the parenthesized command name,
+                # starting with the process state
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[2]) == pgid:
+                pages += int(fields[21])
+        except (OSError, IndexError, ValueError):
+            continue
+    return pages * PAGE_SIZE_IN_BYTES / 2**20
+
+
+def _kill(process: multiprocessing.Process) -> None:
+    '''
+    Kills a worker's process group, including any browser
+    it launched, or the worker alone if it has no group yet.
+    '''
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        if process.is_alive():
+            process.kill()
+
+
+def _watch(
+    process: multiprocessing.Process,
+    conn: Connection,
+    timeout_in_sec: float,
+    memory_limit_in_mb: Optional[float]) -> Optional[Tuple[str, bool]]:
+    '''
+    Waits for a worker to report the outcome of its submission,
+    returning the reason it failed and whether the report caused
+    it, or None if it succeeded.
+    '''
+    deadline = time.monotonic() + timeout_in_sec
+    while True:
+        if conn.poll(POLL_INTERVAL_IN_SEC):
+            try:
+                error, samples = conn.recv()
+            except EOFError:
+                return f"Web worker exited with code {process.exitcode}.", False
+            metrics.REGISTRY.merge(samples)
+            return error
+        if not process.is_alive() and not conn.poll():
+            return f"Web worker exited with code {process.exitcode}.", False
+        if time.monotonic() > deadline:
+            return f"Web submission timed out after {timeout_in_sec} seconds.", False
+        if memory_limit_in_mb and process_group_rss_in_mb(process.pid) > memory_limit_in_mb:
+            return f"Web submission exceeded the memory limit of {memory_limit_in_mb} MB.", False
+
+
+def run_isolated(
+    submit_fun: Callable[[Report], None],
+    report: Report,
+    timeout_in_sec: float=None,
+    memory_limit_in_mb: float=None,
+    cpu_limit_in_sec: int=None) -> None:
+    '''
+    Submits a report in an isolated worker process. Limits
+    default to the values in the config file.
+
+    Parameters:
+        submit_fun (function): The state-specific submission function.
+            Must be defined at the top level of its module.
+
+        report (Report): The complaint from the FracTracker API.
+
+        timeout_in_sec (float): The number of seconds after
+            which the worker and its browser are killed.
+
+        memory_limit_in_mb (float): The resident memory of the
+            worker and its browser above which both are killed.
+
+        cpu_limit_in_sec (int): The CPU time available
+            to each process of the worker.
+
+    Returns:
+        None
+    '''
+    config = Config()
+    timeout_in_sec = timeout_in_sec or config.web_worker_timeout_in_sec
+    memory_limit_in_mb = memory_limit_in_mb or config.web_worker_memory_limit_in_mb
+    cpu_limit_in_sec = cpu_limit_in_sec or config.web_worker_cpu_limit_in_sec
+
+    with _get_slots():
+        receiver, sender = _context.Pipe(duplex=False)
+        process = _context.Process(
+            target=_work,
+            args=(sender, submit_fun, report, cpu_limit_in_sec,
+                get_photo_stage().directory),
+            daemon=True)
+        process.start()
+        sender.close()
+        try:
+            error = _watch(process, receiver, timeout_in_sec, memory_limit_in_mb)
+        finally:
+            _kill(process)
+            process.join()
+            receiver.close()
+
+    if error:
+        reason, is_report_error = error
+        raise (ReportError if is_report_error else Exception)(reason)
+
+
+def submit(submit_fun: Callable[[Report], None], report: Report) -> None:
+    '''
+    Submits a report's web form in an isolated worker if
+    enabled in the config file, or in-process otherwise.
+
+    Parameters:
+        submit_fun (function): The state-specific submission function.
+
+        report (Report): The complaint from the FracTracker API.
+
+    Returns:
+        None
+    '''
+    if Config().web_worker_isolation:
+        run_isolated(submit_fun, report)
+    else:
+        submit_fun(report)